@@ -0,0 +1,121 @@
+# execute `source scripts/init_pythonpath.sh` before executing this
+#
+# Compares the merge-join diff of DictToLevelDBWriter with the previous approach
+# (one pass over the LevelDB for deletions plus a point lookup per input key).
+#
+# Usage: python benchmark/benchmark_leveldb_diff.py [nb_entries] [changed_fraction]
+
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import plyvel
+
+from fvttpacker.__common.change_counts import ChangeType
+from fvttpacker.__constants import UTF_8
+from fvttpacker.__packer.__dict_to_leveldb_writer import DictToLevelDBWriter
+
+nb_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+changed_fraction = float(sys.argv[2]) if len(sys.argv) > 2 else 0.01
+
+
+def create_entries() -> Dict[str, str]:
+    result: Dict[str, str] = dict()
+
+    for i in range(nb_entries):
+        document = {"_id": f"{i:016d}", "name": f"Actor {i}", "system": {"hp": i % 100, "tags": ["a", "b"]}}
+        result[f"!actors!{i:016d}"] = json.dumps(document, separators=(",", ":"))
+
+    return result
+
+
+def create_db(path_to_db: Path,
+              entries: Dict[str, str]) -> None:
+    db = plyvel.DB(str(path_to_db), create_if_missing=True)
+
+    with db.write_batch() as wb:
+        for (key, value) in entries.items():
+            wb.put(key.encode(UTF_8), value.encode(UTF_8))
+
+    db.compact_range()
+    db.close()
+
+
+def modify_entries(entries: Dict[str, str]) -> Dict[str, str]:
+    result = dict(entries)
+    keys: List[str] = sorted(result.keys())
+    nb_changed = int(len(keys) * changed_fraction)
+
+    for key in keys[0:nb_changed]:
+        result[key] = result[key].replace("Actor", "Changed actor")
+
+    for key in keys[nb_changed:2 * nb_changed]:
+        del result[key]
+
+    for i in range(nb_changed):
+        result[f"!actors!new{i:016d}"] = "{}"
+
+    return result
+
+
+def diff_with_point_lookups(input_dict: Dict[str, str],
+                            db: plyvel.DB) -> int:
+    """
+    The approach used before the merge-join, without writing.
+    """
+
+    nb_changes = 0
+
+    for key_bytes in db.iterator(include_value=False):
+        if key_bytes.decode(UTF_8) not in input_dict.keys():
+            nb_changes += 1
+
+    for (key_str, value_str) in input_dict.items():
+        current_value_bytes = db.get(key_str.encode(UTF_8))
+
+        if current_value_bytes is None or current_value_bytes != value_str.encode(UTF_8):
+            nb_changes += 1
+
+    return nb_changes
+
+
+def diff_with_merge_join(input_dict: Dict[str, str],
+                         db: plyvel.DB) -> int:
+    nb_changes = 0
+
+    for (change_type, _, _) in DictToLevelDBWriter.diff_entries(sorted(input_dict.items()), db):
+        if change_type != ChangeType.unchanged:
+            nb_changes += 1
+
+    return nb_changes
+
+
+def measure(diff_function,
+            input_dict: Dict[str, str],
+            path_to_db: Path) -> None:
+    # reopen for each run, so both start with a cold block cache
+    db = plyvel.DB(str(path_to_db))
+
+    start = time.perf_counter()
+    nb_changes = diff_function(input_dict, db)
+    duration = time.perf_counter() - start
+
+    db.close()
+
+    print(f"{diff_function.__name__}: {duration:.3f}s, {nb_changes} changes")
+
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    path_to_db = Path(tmp_dir).joinpath("actors")
+    original_entries = create_entries()
+    create_db(path_to_db, original_entries)
+
+    input_entries = modify_entries(original_entries)
+
+    print(f"{nb_entries} entries, {changed_fraction:.1%} updated, deleted and created each")
+
+    for function in [diff_with_point_lookups, diff_with_merge_join, diff_with_point_lookups, diff_with_merge_join]:
+        measure(function, input_entries, path_to_db)
@@ -0,0 +1,106 @@
+# execute `source scripts/init_pythonpath.sh` before executing this
+#
+# Compares the LevelDB profiles with and without compaction after the pack: how long the pack takes, how large the
+# packed LevelDBs are and how long a fresh process needs to open and read them completely (like Foundry does when it
+# loads the world). Every pack and every read happens in its own child process.
+#
+# Usage: python benchmark/benchmark_leveldb_options.py [nb_documents] [document_size_in_bytes]
+
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from fvttpacker.__unpacker.unpacker import Unpacker
+from fvttpacker.leveldb_options import leveldb_profiles
+from world_generator import WorldGenerator
+
+nb_documents = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+document_size = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+pack_script = """
+import sys
+import time
+from pathlib import Path
+
+from fvttpacker.__packer.packer import Packer
+from fvttpacker.leveldb_options import leveldb_profiles
+from fvttpacker.pack_options import PackOptions
+
+start = time.perf_counter()
+
+Packer.pack_world_dirs_under_x_into_dbs_under_y(
+    Path(sys.argv[1]),
+    Path(sys.argv[2]),
+    pack_options=PackOptions(leveldb_options=leveldb_profiles[sys.argv[3]](), compact=sys.argv[4] == "True"))
+
+print(time.perf_counter() - start)
+"""
+
+read_script = """
+import sys
+import time
+from pathlib import Path
+
+import plyvel
+
+start = time.perf_counter()
+
+for path_to_db in Path(sys.argv[1]).iterdir():
+    # default options, like Foundry
+    db = plyvel.DB(str(path_to_db))
+
+    for _ in db.iterator():
+        pass
+
+    db.close()
+
+print(time.perf_counter() - start)
+"""
+
+
+def run_script(script: str,
+               *args: str) -> float:
+    """
+    :return: The duration in seconds the script printed
+    """
+
+    result = subprocess.run([sys.executable, "-c", script] + list(args),
+                            check=True,
+                            stdout=subprocess.PIPE)
+
+    return float(result.stdout.decode().strip().splitlines()[-1])
+
+
+def get_size(path_to_dir: Path) -> int:
+    return sum(path.stat().st_size for path in path_to_dir.rglob("*") if path.is_file())
+
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    path_to_tmp_dir = Path(tmp_dir)
+    path_to_world = path_to_tmp_dir.joinpath("world")
+    path_to_unpacked = path_to_tmp_dir.joinpath("unpacked")
+    path_to_packed = path_to_tmp_dir.joinpath("packed")
+
+    path_to_world.mkdir()
+    path_to_unpacked.mkdir()
+
+    WorldGenerator(nb_documents, document_size).generate(path_to_world)
+    Unpacker.unpack_world_dbs_under_x_into_dirs_under_y(path_to_world, path_to_unpacked)
+
+    print(f"{nb_documents} documents of about {document_size} bytes")
+    print(f"{'profile':>12} {'compact':>8} {'pack':>9} {'size':>10} {'cold read':>10}")
+
+    for profile in leveldb_profiles.keys():
+        for compact in [False, True]:
+            shutil.rmtree(path_to_packed, ignore_errors=True)
+            path_to_packed.mkdir()
+
+            pack_seconds = run_script(pack_script, str(path_to_unpacked), str(path_to_packed), profile, str(compact))
+            # before the read, opening a LevelDB that was not compacted writes its log into a table
+            size = get_size(path_to_packed)
+            read_seconds = run_script(read_script, str(path_to_packed))
+
+            print(f"{profile:>12} {str(compact):>8} {pack_seconds:8.3f}s {size / 1024 / 1024:8.1f}MiB "
+                  f"{read_seconds:9.3f}s")
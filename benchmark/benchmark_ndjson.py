@@ -0,0 +1,115 @@
+# execute `source scripts/init_pythonpath.sh` before executing this
+#
+# Measures the throughput of unpacking a LevelDB into newline delimited json and packing it back, compared with
+# unpacking into and packing from a directory. Each variant runs in its own child process, which also reports its own
+# peak RSS (Linux only). The ndjson variants keep only a bounded number of entries in memory: unpacking does not
+# depend on the size of the LevelDB, packing is bounded by the memory limit of the batches plus the keys kept for a
+# rollback.
+#
+# Usage: python benchmark/benchmark_ndjson.py [nb_entries] [entry_size_in_bytes]
+
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import plyvel
+
+nb_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+entry_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+variant_script = """
+import sys
+from pathlib import Path
+from fvttpacker.__packer.packer import Packer
+from fvttpacker.__unpacker.unpacker import Unpacker
+from fvttpacker.pack_options import PackOptions
+from fvttpacker.unpack_options import UnpackOptions
+
+(variant, path_to_db, path_to_other) = (sys.argv[1], Path(sys.argv[2]), Path(sys.argv[3]))
+
+if variant == "unpack ndjson":
+    with open(path_to_other, "wb") as output_stream:
+        Unpacker.unpack_db_at_x_into_ndjson_stream(path_to_db, output_stream)
+elif variant == "unpack ndjson --validate":
+    with open(path_to_other, "wb") as output_stream:
+        Unpacker.unpack_db_at_x_into_ndjson_stream(path_to_db, output_stream, UnpackOptions(validate=True))
+elif variant == "unpack dir":
+    Unpacker.unpack_db_at_x_into_dir_at_y(path_to_db, path_to_other)
+elif variant.startswith("pack ndjson"):
+    with open(path_to_other, "rb") as input_stream:
+        Packer.pack_ndjson_stream_into_db_at_y(input_stream, path_to_db)
+elif variant.startswith("pack dir"):
+    Packer.pack_dir_at_x_into_db_at_y(path_to_other, path_to_db)
+
+with open("/proc/self/status", "rt") as status:
+    print([line.split()[1] for line in status if line.startswith("VmHWM:")][0])
+"""
+
+
+def create_db(path_to_db: Path) -> int:
+    """
+    :return: Number of bytes of all keys and values
+    """
+
+    nb_bytes = 0
+    db = plyvel.DB(str(path_to_db), create_if_missing=True)
+
+    with db.write_batch() as wb:
+        for i in range(nb_entries):
+            document = {
+                "_id": f"{i:016d}",
+                "name": f"Message {i}",
+                "content": "x" * entry_size,
+                "flags": {"core": {"sourceId": None}},
+                "rolls": [{"total": i, "dice": [1, 2, 3]}]
+            }
+            key = f"!messages!{i:016d}".encode()
+            value = json.dumps(document, separators=(",", ":")).encode()
+            nb_bytes += len(key) + len(value)
+            wb.put(key, value)
+
+    # move everything out of the log, otherwise only the first variant would pay for replaying it
+    db.compact_range()
+    db.close()
+
+    return nb_bytes
+
+
+def measure(variant: str,
+            path_to_db: Path,
+            path_to_other: Path,
+            nb_bytes: int) -> None:
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", variant_script, variant, str(path_to_db), str(path_to_other)],
+                            check=True,
+                            stdout=subprocess.PIPE)
+    duration = time.perf_counter() - start
+
+    print(f"{variant:<26} {duration:7.2f}s {nb_entries / duration:10.0f} entries/s "
+          f"{nb_bytes / duration / 1024 / 1024:7.1f} MiB/s "
+          f"peak RSS {int(result.stdout.decode().split()[-1]) / 1024:6.1f} MiB")
+
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    path_to_tmp_dir = Path(tmp_dir)
+    path_to_db = path_to_tmp_dir.joinpath("messages")
+    path_to_ndjson = path_to_tmp_dir.joinpath("messages.ndjson")
+    path_to_dir = path_to_tmp_dir.joinpath("unpacked")
+    path_to_dir.mkdir()
+
+    nb_bytes = create_db(path_to_db)
+
+    print(f"{nb_entries} entries, {nb_bytes / 1024 / 1024:.1f} MiB (process start-up included)")
+
+    measure("unpack ndjson", path_to_db, path_to_ndjson, nb_bytes)
+    measure("unpack ndjson --validate", path_to_db, path_to_ndjson, nb_bytes)
+    measure("unpack dir", path_to_db, path_to_dir, nb_bytes)
+    # nothing changed, only compared
+    measure("pack ndjson (unchanged)", path_to_db, path_to_ndjson, nb_bytes)
+    measure("pack dir (unchanged)", path_to_db, path_to_dir, nb_bytes)
+    # everything is written
+    measure("pack ndjson (new)", path_to_tmp_dir.joinpath("new_from_ndjson"), path_to_ndjson, nb_bytes)
+    measure("pack dir (new)", path_to_tmp_dir.joinpath("new_from_dir"), path_to_dir, nb_bytes)
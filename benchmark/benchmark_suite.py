@@ -0,0 +1,292 @@
+# execute `source scripts/init_pythonpath.sh` before executing this
+#
+# Times and memory-profiles pack, unpack, no-op repack, no-op unpack and a full round trip on a synthetic world
+# (see world_generator.py). Every run happens in its own child process, which reports its duration and its own peak
+# RSS (Linux only). The results can be written as json and compared with the results of an earlier run to catch
+# regressions.
+#
+# Usage: python benchmark/benchmark_suite.py --help
+#
+# e.g. python benchmark/benchmark_suite.py --documents 20000 --output results.json
+#      python benchmark/benchmark_suite.py --documents 20000 --baseline results.json
+
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import click
+import plyvel
+
+from fvttpacker.__common.json_codec import default_json_codec
+from fvttpacker.__constants import UTF_8, version, world_db_names
+from world_generator import WorldGenerator
+
+scenario_unpack = "unpack"
+scenario_noop_unpack = "noop-unpack"
+scenario_pack = "pack"
+scenario_noop_repack = "noop-repack"
+scenario_round_trip = "round-trip"
+
+scenarios = [scenario_unpack, scenario_noop_unpack, scenario_pack, scenario_noop_repack, scenario_round_trip]
+
+run_script = """
+import json
+import sys
+import time
+from pathlib import Path
+
+from fvttpacker.__packer.packer import Packer
+from fvttpacker.__unpacker.unpacker import Unpacker
+from fvttpacker.pack_options import PackOptions
+from fvttpacker.unpack_options import UnpackOptions
+
+(operations, options) = (sys.argv[1].split(","), json.loads(sys.argv[2]))
+paths = [Path(arg) for arg in sys.argv[3:]]
+
+start = time.perf_counter()
+
+for (operation, path_to_input, path_to_target) in zip(operations, paths, paths[1:]):
+    if operation == "unpack":
+        Unpacker.unpack_world_dbs_under_x_into_dirs_under_y(path_to_input,
+                                                            path_to_target,
+                                                            unpack_options=UnpackOptions(**options))
+    else:
+        Packer.pack_world_dirs_under_x_into_dbs_under_y(path_to_input,
+                                                        path_to_target,
+                                                        pack_options=PackOptions(**options))
+
+duration = time.perf_counter() - start
+
+# VmHWM instead of ru_maxrss, ru_maxrss survives the exec and would start at the RSS of the parent
+with open("/proc/self/status", "rt") as status:
+    peak_rss_kib = int([line.split()[1] for line in status if line.startswith("VmHWM:")][0])
+
+print(json.dumps({"seconds": duration, "peak_rss_kib": peak_rss_kib}))
+"""
+
+
+def run(operations: List[str],
+        options: Dict[str, Any],
+        paths: List[Path]) -> Tuple[float, int]:
+    """
+    Runs the given operations ("pack" or "unpack") one after another in a child process, each from one of the given
+    paths into the next one.
+
+    :return: The duration in seconds and the peak RSS in KiB of the child process
+    """
+
+    result = subprocess.run([sys.executable, "-c", run_script, ",".join(operations), json.dumps(options)]
+                            + [str(path) for path in paths],
+                            check=True,
+                            stdout=subprocess.PIPE)
+
+    result_dict = json.loads(result.stdout.decode(UTF_8).strip().splitlines()[-1])
+
+    return result_dict["seconds"], result_dict["peak_rss_kib"]
+
+
+def create_empty_dir(path_to_dir: Path) -> Path:
+    shutil.rmtree(path_to_dir, ignore_errors=True)
+    path_to_dir.mkdir(parents=True)
+    return path_to_dir
+
+
+def assert_same_values(path_to_original_world: Path,
+                       path_to_repacked_world: Path) -> None:
+    """
+    Compares the decoded values, the original world is not minified like fvttpacker minifies.
+    """
+
+    for db_name in world_db_names:
+        original_db = plyvel.DB(str(path_to_original_world.joinpath(db_name)))
+        repacked_db = plyvel.DB(str(path_to_repacked_world.joinpath(db_name)))
+
+        try:
+            original_entries = [(key, json.loads(value)) for (key, value) in original_db.iterator()]
+            repacked_entries = [(key, json.loads(value)) for (key, value) in repacked_db.iterator()]
+
+            if original_entries != repacked_entries:
+                raise Exception(f"Round trip changed the values of '{db_name}'")
+        finally:
+            original_db.close()
+            repacked_db.close()
+
+
+def run_scenario(scenario: str,
+                 path_to_tmp_dir: Path,
+                 pack_options: Dict[str, Any],
+                 unpack_options: Dict[str, Any]) -> Tuple[float, int]:
+    path_to_world = path_to_tmp_dir.joinpath("world")
+    path_to_unpacked = path_to_tmp_dir.joinpath("unpacked")
+    path_to_packed = path_to_tmp_dir.joinpath("packed")
+
+    if scenario == scenario_unpack:
+        return run(["unpack"], unpack_options, [path_to_world, create_empty_dir(path_to_tmp_dir.joinpath("target"))])
+
+    if scenario == scenario_noop_unpack:
+        return run(["unpack"], unpack_options, [path_to_world, path_to_unpacked])
+
+    if scenario == scenario_pack:
+        return run(["pack"], pack_options, [path_to_unpacked, create_empty_dir(path_to_tmp_dir.joinpath("target"))])
+
+    if scenario == scenario_noop_repack:
+        return run(["pack"], pack_options, [path_to_unpacked, path_to_packed])
+
+    if scenario == scenario_round_trip:
+        path_to_round_trip_unpacked = create_empty_dir(path_to_tmp_dir.joinpath("round-trip-unpacked"))
+        path_to_round_trip_packed = create_empty_dir(path_to_tmp_dir.joinpath("round-trip-packed"))
+
+        # pack and unpack are run with the same options
+        result = run(["unpack", "pack"],
+                     unpack_options,
+                     [path_to_world, path_to_round_trip_unpacked, path_to_round_trip_packed])
+
+        assert_same_values(path_to_world, path_to_round_trip_packed)
+
+        return result
+
+    raise ValueError(f"Unknown scenario '{scenario}'")
+
+
+def compare_with_baseline(results: Dict[str, Any],
+                          baseline: Dict[str, Any],
+                          tolerance: float) -> bool:
+    """
+    :return: True if no scenario got slower or needs more memory than the baseline allows
+    """
+
+    is_ok = True
+
+    print()
+    print(f"Compared with the baseline of version {baseline['fvttpacker_version']} (tolerance {tolerance:.0%}):")
+
+    if baseline["parameters"] != results["parameters"]:
+        print(f"Warning: the baseline was run with other parameters: {baseline['parameters']}")
+
+    for (scenario, result) in results["results"].items():
+        baseline_result = baseline["results"].get(scenario)
+
+        if baseline_result is None:
+            continue
+
+        time_ratio = result["median_seconds"] / baseline_result["median_seconds"]
+        memory_ratio = result["peak_rss_kib"] / baseline_result["peak_rss_kib"]
+
+        is_regression = time_ratio > 1 + tolerance or memory_ratio > 1 + tolerance
+        is_ok = is_ok and not is_regression
+
+        print(f"{scenario:>12}: time {time_ratio:6.2f}x, memory {memory_ratio:6.2f}x"
+              f"{'  REGRESSION' if is_regression else ''}")
+
+    return is_ok
+
+
+@click.command()
+@click.option("--documents", "nb_documents", type=click.IntRange(min=1), default=10000, show_default=True,
+              help="Total number of documents of the world.")
+@click.option("--document-size", type=click.IntRange(min=1), default=2000, show_default=True,
+              help="Approximate size of each document in bytes.")
+@click.option("--depth", "nesting_depth", type=click.IntRange(min=1), default=3, show_default=True,
+              help="Nesting depth of the documents.")
+@click.option("--seed", type=int, default=0, show_default=True)
+@click.option("--repeat", type=click.IntRange(min=1), default=3, show_default=True,
+              help="Number of runs of each scenario.")
+@click.option("--scenario", "selected_scenarios", type=click.Choice(scenarios), multiple=True,
+              help="Scenario to run, can be given multiple times. Default: all")
+@click.option("--jobs", type=click.IntRange(min=1), default=1, show_default=True)
+@click.option("--streaming", is_flag=True)
+@click.option("--manifest", "use_manifest", is_flag=True)
+@click.option("--output", "path_to_output", type=click.Path(dir_okay=False),
+              help="Write the results as json into this file.")
+@click.option("--baseline", "path_to_baseline", type=click.Path(exists=True, dir_okay=False),
+              help="Compare with the results of an earlier run, exits with 1 on regressions.")
+@click.option("--tolerance", type=float, default=0.1, show_default=True,
+              help="Allowed relative slowdown and memory increase compared with the baseline.")
+def main(nb_documents: int,
+         document_size: int,
+         nesting_depth: int,
+         seed: int,
+         repeat: int,
+         selected_scenarios: Tuple[str, ...],
+         jobs: int,
+         streaming: bool,
+         use_manifest: bool,
+         path_to_output: str,
+         path_to_baseline: str,
+         tolerance: float) -> None:
+    unpack_options = {"streaming": streaming, "jobs": jobs, "use_manifest": use_manifest}
+    pack_options = dict(unpack_options)
+
+    results: Dict[str, Any] = {
+        "fvttpacker_version": version,
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "json_backend": default_json_codec.name,
+        "parameters": {
+            "documents": nb_documents,
+            "document_size": document_size,
+            "depth": nesting_depth,
+            "seed": seed,
+            "repeat": repeat,
+            "jobs": jobs,
+            "streaming": streaming,
+            "manifest": use_manifest
+        },
+        "results": dict()
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path_to_tmp_dir = Path(tmp_dir)
+
+        generator = WorldGenerator(nb_documents, document_size, nesting_depth, seed)
+        nb_documents_by_db_name = generator.generate(create_empty_dir(path_to_tmp_dir.joinpath("world")))
+
+        print(f"World with {sum(nb_documents_by_db_name.values())} documents of about {document_size} bytes, "
+              f"depth {nesting_depth}")
+
+        # prepare the input of the pack and no-op scenarios
+        run(["unpack", "pack"],
+            unpack_options,
+            [path_to_tmp_dir.joinpath("world"),
+             create_empty_dir(path_to_tmp_dir.joinpath("unpacked")),
+             create_empty_dir(path_to_tmp_dir.joinpath("packed"))])
+
+        for scenario in selected_scenarios or scenarios:
+            durations: List[float] = list()
+            peak_rss_kib = 0
+
+            for _ in range(repeat):
+                (duration, run_peak_rss_kib) = run_scenario(scenario, path_to_tmp_dir, pack_options, unpack_options)
+                durations.append(duration)
+                peak_rss_kib = max(peak_rss_kib, run_peak_rss_kib)
+
+            results["results"][scenario] = {
+                "seconds": durations,
+                "min_seconds": min(durations),
+                "median_seconds": statistics.median(durations),
+                "peak_rss_kib": peak_rss_kib
+            }
+
+            print(f"{scenario:>12}: median {statistics.median(durations):8.3f}s, min {min(durations):8.3f}s, "
+                  f"peak RSS {peak_rss_kib / 1024:8.1f} MiB")
+
+    if path_to_output is not None:
+        with open(path_to_output, "wt", encoding=UTF_8) as file:
+            json.dump(results, file, indent="  ")
+
+    if path_to_baseline is not None:
+        with open(path_to_baseline, "rt", encoding=UTF_8) as file:
+            baseline = json.load(file)
+
+        if not compare_with_baseline(results, baseline, tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
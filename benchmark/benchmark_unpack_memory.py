@@ -0,0 +1,72 @@
+# execute `source scripts/init_pythonpath.sh` before executing this
+#
+# Compares the peak RSS of the default unpack with the streaming unpack.
+# Each variant runs in its own child process, which reports its own peak RSS (Linux only).
+#
+# Usage: python benchmark/benchmark_unpack_memory.py [nb_entries] [entry_size_in_bytes]
+
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import plyvel
+
+nb_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+entry_size = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+unpack_script = """
+import sys
+from pathlib import Path
+from fvttpacker.__unpacker.unpacker import Unpacker
+from fvttpacker.unpack_options import UnpackOptions
+
+Unpacker.unpack_db_at_x_into_dir_at_y(Path(sys.argv[1]),
+                                      Path(sys.argv[2]),
+                                      UnpackOptions(streaming=sys.argv[3] == "streaming"))
+
+# VmHWM instead of ru_maxrss, ru_maxrss survives the exec and would start at the RSS of the parent
+with open("/proc/self/status", "rt") as status:
+    print([line.split()[1] for line in status if line.startswith("VmHWM:")][0])
+"""
+
+
+def create_db(path_to_db: Path) -> None:
+    db = plyvel.DB(str(path_to_db), create_if_missing=True)
+
+    with db.write_batch() as wb:
+        for i in range(nb_entries):
+            document = {
+                "_id": f"{i:016d}",
+                "name": f"Message {i}",
+                "content": "x" * entry_size,
+                "flags": {"core": {"sourceId": None}},
+                "rolls": [{"total": i, "dice": [1, 2, 3]}]
+            }
+            wb.put(f"!messages!{i:016d}".encode(), json.dumps(document, separators=(",", ":")).encode())
+
+    # move everything out of the log, otherwise only the first variant would pay for replaying it
+    db.compact_range()
+    db.close()
+
+
+def measure_peak_rss_kib(path_to_db: Path,
+                         path_to_target_dir: Path,
+                         mode: str) -> int:
+    result = subprocess.run([sys.executable, "-c", unpack_script, str(path_to_db), str(path_to_target_dir), mode],
+                            check=True,
+                            stdout=subprocess.PIPE)
+
+    return int(result.stdout.decode().strip().splitlines()[-1])
+
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    path_to_db = Path(tmp_dir).joinpath("messages")
+    create_db(path_to_db)
+
+    print(f"{nb_entries} entries with {entry_size} bytes of content each")
+
+    for mode in ["streaming", "default"]:
+        peak_rss = measure_peak_rss_kib(path_to_db, Path(tmp_dir).joinpath(mode), mode)
+        print(f"{mode}: peak RSS {peak_rss / 1024:.1f} MiB")
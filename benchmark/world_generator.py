@@ -0,0 +1,153 @@
+# execute `source scripts/init_pythonpath.sh` before executing this
+#
+# Generates synthetic Foundry worlds, i.e. one LevelDB per name in `world_db_names` filled with documents that look
+# roughly like the ones Foundry stores.
+#
+# Usage: python benchmark/world_generator.py <target_dir> [nb_documents] [document_size_in_bytes] [nesting_depth]
+
+import json
+import random
+import string
+import sys
+from pathlib import Path
+from typing import Any, Dict
+
+import plyvel
+
+from fvttpacker.__constants import UTF_8, world_db_names
+
+# How the documents are distributed across the LevelDBs of a world, LevelDBs that are missing get the default weight
+db_name_weights = {
+    "actors": 10,
+    "items": 20,
+    "journal": 8,
+    "messages": 30,
+    "scenes": 4,
+    "tables": 4,
+    "settings": 2
+}
+default_db_name_weight = 1
+
+id_chars = string.ascii_letters + string.digits
+words = ["goblin", "sword", "ancient", "tavern", "dragon", "shield", "whisper", "torch", "river", "crown", "Ærwyn",
+         "Über", "café", "—", "“quoted”"]
+
+
+class WorldGenerator:
+
+    def __init__(self,
+                 nb_documents: int = 10000,
+                 document_size: int = 2000,
+                 nesting_depth: int = 3,
+                 seed: int = 0):
+        """
+        :param nb_documents: Total number of documents, distributed across the LevelDBs by `db_name_weights`
+        :param document_size: Approximate size of each document in bytes, as stored in the LevelDB. Documents are never
+        smaller than what their nesting depth requires.
+        :param nesting_depth: Depth of the nested objects in the `system` field of each document
+        :param seed: Seed of the random numbers, the same parameters always generate the same world
+        """
+        self.nb_documents = nb_documents
+        self.document_size = document_size
+        self.nesting_depth = nesting_depth
+        self.seed = seed
+
+    def generate(self,
+                 path_to_target_dir: Path) -> Dict[str, int]:
+        """
+        Creates one LevelDB per world database name under the given directory (`path_to_target_dir`).
+
+        :return: The number of documents of each LevelDB by name
+        """
+
+        rng = random.Random(self.seed)
+        result: Dict[str, int] = dict()
+
+        total_weight = sum(db_name_weights.get(db_name, default_db_name_weight) for db_name in world_db_names)
+
+        for db_name in world_db_names:
+            weight = db_name_weights.get(db_name, default_db_name_weight)
+            nb_db_documents = max(1, self.nb_documents * weight // total_weight)
+
+            db = plyvel.DB(str(path_to_target_dir.joinpath(db_name)), create_if_missing=True)
+
+            try:
+                with db.write_batch() as wb:
+                    for _ in range(nb_db_documents):
+                        document = self.create_document(rng, db_name)
+                        key = f"!{db_name}!{document['_id']}"
+                        # like Foundry, which does not escape non-ASCII characters
+                        value = json.dumps(document, separators=(",", ":"), ensure_ascii=False)
+                        wb.put(key.encode(UTF_8), value.encode(UTF_8))
+
+                # move everything out of the log, otherwise the first benchmark run would pay for replaying it
+                db.compact_range()
+            finally:
+                db.close()
+
+            result[db_name] = nb_db_documents
+
+        return result
+
+    def create_document(self,
+                        rng: random.Random,
+                        db_name: str) -> Dict[str, Any]:
+
+        document: Dict[str, Any] = {
+            "_id": "".join(rng.choice(id_chars) for _ in range(16)),
+            "name": " ".join(rng.choice(words) for _ in range(rng.randint(1, 4))),
+            "type": db_name,
+            "img": f"icons/{rng.choice(words)}.webp",
+            "system": WorldGenerator.__create_nested(rng, self.nesting_depth),
+            "description": "",
+            "folder": None,
+            "sort": rng.randint(0, 10) * 100000,
+            "ownership": {"default": 0},
+            "flags": {},
+            "_stats": {"coreVersion": "11.315", "createdTime": 1700000000000 + rng.randint(0, 10 ** 9)}
+        }
+
+        current_size = len(json.dumps(document, separators=(",", ":"), ensure_ascii=False).encode(UTF_8))
+        missing_size = self.document_size - current_size
+
+        description_parts = ["<p>"]
+        description_size = 7
+
+        while description_size < missing_size:
+            word = rng.choice(words)
+            description_parts.append(word)
+            description_parts.append(" ")
+            description_size += len(word.encode(UTF_8)) + 1
+
+        description_parts.append("</p>")
+        document["description"] = "".join(description_parts)
+
+        return document
+
+    @staticmethod
+    def __create_nested(rng: random.Random,
+                        depth: int) -> Dict[str, Any]:
+
+        leaf = {"value": rng.randint(0, 100), "max": 100, "bonus": round(rng.uniform(-5, 5), 2), "tags": []}
+
+        if depth <= 1:
+            return leaf
+
+        # grows linearly with the depth
+        return {
+            "attributes": WorldGenerator.__create_nested(rng, depth - 1),
+            "details": {"level": rng.randint(1, 20), "active": rng.random() < 0.5, "source": None},
+            "list": [leaf, [1, 2, 3]]
+        }
+
+
+if __name__ == "__main__":
+    path_to_world = Path(sys.argv[1])
+    path_to_world.mkdir(parents=True, exist_ok=True)
+
+    generator = WorldGenerator(nb_documents=int(sys.argv[2]) if len(sys.argv) > 2 else 10000,
+                               document_size=int(sys.argv[3]) if len(sys.argv) > 3 else 2000,
+                               nesting_depth=int(sys.argv[4]) if len(sys.argv) > 4 else 3)
+
+    for (name, nb_documents) in generator.generate(path_to_world).items():
+        print(f"{name}: {nb_documents} documents")
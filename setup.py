@@ -29,5 +29,9 @@ setuptools.setup(
     entry_points={
         'console_scripts': [f'{app_name} = fvttpacker.__cli_wrapper.main:main'],
     },
-    install_requires=["appdirs", "click", "plyvel"]
+    install_requires=["appdirs", "click", "plyvel"],
+    extras_require={
+        "fast": ["orjson"],
+        "zstd": ["zstandard"]
+    }
 )
@@ -0,0 +1,131 @@
+import struct
+import zlib
+from typing import Any, Dict, Tuple, Type, Union
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from fvttpacker.bundle_options import bundle_compression_auto, bundle_compression_zlib, bundle_compression_zstd
+from fvttpacker.fvttpacker_exception import FvttPackerException
+
+bundle_magic = b"FVTTBNDL"
+bundle_version = 1
+
+# magic, version
+header_struct = struct.Struct("<8sI")
+# offset of the index, magic
+trailer_struct = struct.Struct("<Q8s")
+
+# number of compressed bytes read from or written into a bundle at once
+io_chunk_size = 1024 * 1024
+
+decompression_errors: Tuple[Type[BaseException], ...] = (zlib.error,)
+
+if zstandard is not None:
+    decompression_errors += (zstandard.ZstdError,)
+
+
+class BundledDb:
+    """
+    Where the compressed entries of a single LevelDB are stored in a bundle.
+    """
+
+    def __init__(self,
+                 offset: int,
+                 length: int = 0,
+                 nb_entries: int = 0,
+                 raw_length: int = 0):
+        """
+        :param offset: Position of the first compressed byte in the bundle
+        :param length: Number of compressed bytes
+        :param nb_entries: Number of entries, i.e. lines
+        :param raw_length: Number of uncompressed bytes
+        """
+        self.offset = offset
+        self.length = length
+        self.nb_entries = nb_entries
+        self.raw_length = raw_length
+
+    def to_dict(self) -> Dict[str, int]:
+        return {
+            "offset": self.offset,
+            "length": self.length,
+            "entries": self.nb_entries,
+            "raw_length": self.raw_length
+        }
+
+    @staticmethod
+    def from_dict(value: Dict[str, Any]) -> "BundledDb":
+        return BundledDb(value["offset"],
+                         value["length"],
+                         value["entries"],
+                         value["raw_length"])
+
+
+class BundleFormat:
+    """
+    A bundle consists of:
+    - a header (`header_struct`)
+    - a compressed frame for each LevelDB, each one decompresses into one line per entry: `[<key as json>,<value>]`
+    - the index: json with the compression and a `BundledDb` for each LevelDB
+    - a trailer (`trailer_struct`) that points to the index
+
+    Each frame can be decompressed on its own, so a single LevelDB can be read without reading the others.
+    """
+
+    @staticmethod
+    def resolve_compression(compression: str) -> str:
+        """
+        :return: The compression to use for the given one (`compression`), i.e. `bundle_compression_auto` resolved
+        """
+
+        if compression == bundle_compression_auto:
+            return bundle_compression_zlib if zstandard is None else bundle_compression_zstd
+
+        BundleFormat.__assert_compression_is_available(compression)
+
+        return compression
+
+    @staticmethod
+    def create_compressor(compression: str,
+                          compression_level: Union[int, None]) -> Any:
+        """
+        :return: An object with `compress(bytes) -> bytes` and `flush() -> bytes`, that compresses a single frame
+        """
+
+        BundleFormat.__assert_compression_is_available(compression)
+
+        if compression == bundle_compression_zstd:
+            if compression_level is None:
+                return zstandard.ZstdCompressor(write_checksum=True).compressobj()
+
+            return zstandard.ZstdCompressor(level=compression_level, write_checksum=True).compressobj()
+
+        if compression_level is None:
+            return zlib.compressobj()
+
+        return zlib.compressobj(compression_level)
+
+    @staticmethod
+    def create_decompressor(compression: str) -> Any:
+        """
+        :return: An object with `decompress(bytes) -> bytes`, that decompresses a single frame
+        """
+
+        BundleFormat.__assert_compression_is_available(compression)
+
+        if compression == bundle_compression_zstd:
+            return zstandard.ZstdDecompressor().decompressobj()
+
+        return zlib.decompressobj()
+
+    @staticmethod
+    def __assert_compression_is_available(compression: str) -> None:
+
+        if compression == bundle_compression_zstd and zstandard is None:
+            raise FvttPackerException("zstd needs the zstandard package, install it with `pip install zstandard`.")
+
+        if compression not in [bundle_compression_zstd, bundle_compression_zlib]:
+            raise FvttPackerException(f"Unknown bundle compression '{compression}'.")
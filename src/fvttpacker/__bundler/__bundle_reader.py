@@ -0,0 +1,135 @@
+import json
+from json import JSONDecodeError
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+from fvttpacker.__bundler.__bundle_format import BundledDb, BundleFormat, bundle_magic, bundle_version, \
+    decompression_errors, header_struct, io_chunk_size, trailer_struct
+from fvttpacker.__common.metrics_recorder import MetricsRecorder
+from fvttpacker.__constants import UTF_8
+from fvttpacker.fvttpacker_exception import FvttPackerException
+from fvttpacker.key_filter import KeyFilter
+from fvttpacker.metrics import Counter, Stage
+
+key_decoder = json.JSONDecoder()
+
+
+class BundleReader:
+    """
+    Reads the index of a bundle (see `BundleFormat`) and the entries of the LevelDBs in it.
+    Only the frame of the requested LevelDB is read and decompressed.
+    """
+
+    def __init__(self,
+                 path_to_bundle: Path):
+        """
+        :raises FvttPackerException: If the given file (`path_to_bundle`) is not a bundle or the bundle is incomplete
+        """
+
+        self.__path_to_bundle = path_to_bundle
+
+        try:
+            with open(path_to_bundle, "rb") as file:
+                (magic, version) = header_struct.unpack(file.read(header_struct.size))
+
+                if magic != bundle_magic:
+                    raise FvttPackerException(f"'{path_to_bundle}' is not a bundle.")
+
+                if version != bundle_version:
+                    raise FvttPackerException(f"Bundle '{path_to_bundle}' has version {version}, only version "
+                                              f"{bundle_version} is supported.")
+
+                file.seek(-trailer_struct.size, 2)
+                trailer_offset = file.tell()
+                (index_offset, magic) = trailer_struct.unpack(file.read(trailer_struct.size))
+
+                if magic != bundle_magic or not header_struct.size <= index_offset < trailer_offset:
+                    raise FvttPackerException(f"Bundle '{path_to_bundle}' is incomplete.")
+
+                file.seek(index_offset)
+                index = json.loads(file.read(trailer_offset - index_offset).decode(UTF_8))
+
+            self.compression: str = index["compression"]
+            self.bundled_dbs: Dict[str, BundledDb] = {db_name: BundledDb.from_dict(value)
+                                                      for (db_name, value) in index["dbs"].items()}
+        except (OSError, ValueError, KeyError, TypeError) as err:
+            # struct.error is a ValueError as well as JSONDecodeError and UnicodeDecodeError
+            raise FvttPackerException(f"Unable to read bundle '{path_to_bundle}'.", err)
+
+    def read_entries(self,
+                     db_name: str,
+                     key_filter: KeyFilter = KeyFilter()) -> Iterator[Tuple[str, str]]:
+        """
+        Reads the entries of the LevelDB with the given name (`db_name`) from the bundle.
+        The values are returned as they were stored in the LevelDB, they are not parsed.
+        Whether the frame was complete is checked once the last entry was read.
+
+        :param db_name: Must be one of `bundled_dbs`
+        :param key_filter: Only the entries whose keys are selected by this filter are returned
+        :return: Iterator over the (key, value) tuples, sorted by key
+        """
+
+        bundled_db = self.bundled_dbs[db_name]
+        decompressor = BundleFormat.create_decompressor(self.compression)
+
+        nb_entries = 0
+        raw_length = 0
+        rest = b""
+
+        with open(self.__path_to_bundle, "rb") as file:
+            file.seek(bundled_db.offset)
+            remaining = bundled_db.length
+
+            while remaining > 0:
+                with MetricsRecorder.time(Stage.file_read):
+                    compressed = file.read(min(remaining, io_chunk_size))
+
+                if len(compressed) == 0:
+                    raise FvttPackerException(f"Bundle '{self.__path_to_bundle}' is truncated.")
+
+                remaining -= len(compressed)
+                MetricsRecorder.count(Counter.bytes_read, len(compressed))
+
+                try:
+                    with MetricsRecorder.time(Stage.bundle_decompress):
+                        lines = (rest + decompressor.decompress(compressed)).split(b"\n")
+                except decompression_errors as err:
+                    raise FvttPackerException(f"Unable to decompress LevelDB '{db_name}' of bundle "
+                                              f"'{self.__path_to_bundle}'.", err)
+
+                # the last line is incomplete, or empty if the data ended with a line break
+                rest = lines.pop()
+
+                for line in lines:
+                    nb_entries += 1
+                    raw_length += len(line) + 1
+
+                    (key_str, value_str) = self.__parse_line(db_name, line)
+
+                    if key_filter.matches(key_str):
+                        yield key_str, value_str
+
+        if len(rest) > 0 or nb_entries != bundled_db.nb_entries or raw_length != bundled_db.raw_length:
+            raise FvttPackerException(f"LevelDB '{db_name}' of bundle '{self.__path_to_bundle}' is corrupt, "
+                                      f"expected {bundled_db.nb_entries} entries but found {nb_entries}.")
+
+    def __parse_line(self,
+                     db_name: str,
+                     line: bytes) -> Tuple[str, str]:
+        """
+        Splits the given line (`line`) of a frame into the key and the value, without parsing the value.
+        """
+
+        try:
+            line_str = line.decode(UTF_8)
+
+            if line_str.startswith("[") and line_str.endswith("]"):
+                (key_str, end) = key_decoder.raw_decode(line_str, 1)
+
+                if isinstance(key_str, str) and line_str[end] == ",":
+                    return key_str, line_str[end + 1:-1]
+        except (UnicodeDecodeError, JSONDecodeError, IndexError):
+            pass
+
+        raise FvttPackerException(f"LevelDB '{db_name}' of bundle '{self.__path_to_bundle}' contains an invalid "
+                                  f"entry: '{line[:100]!r}'")
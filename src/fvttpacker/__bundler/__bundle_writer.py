@@ -0,0 +1,152 @@
+import json
+import logging
+import os
+import secrets
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, Tuple, Union
+
+from fvttpacker.__bundler.__bundle_format import BundledDb, BundleFormat, bundle_magic, bundle_version, \
+    header_struct, io_chunk_size, trailer_struct
+from fvttpacker.__common.metrics_recorder import MetricsRecorder
+from fvttpacker.__constants import UTF_8
+from fvttpacker.fvttpacker_exception import FvttPackerException
+from fvttpacker.metrics import Counter, Stage
+
+# followed by a random part
+temp_bundle_infix = ".fvttpacker-bundle-"
+
+
+class BundleWriter:
+    """
+    Writes the entries of LevelDBs into a new bundle, see `BundleFormat`.
+    The bundle is written into a temporary file next to the target path, which replaces the target once the bundle
+    is complete. So an interrupted export never leaves a partial bundle behind.
+
+    Usage: `with BundleWriter(path_to_bundle, compression, None) as bundle_writer: bundle_writer.write_db(...)`
+    """
+
+    def __init__(self,
+                 path_to_bundle: Path,
+                 compression: str,
+                 compression_level: Union[int, None]):
+        """
+        :param compression: One of `bundle_compression_choices` except `bundle_compression_auto`
+        """
+
+        self.__path_to_bundle = path_to_bundle
+        self.__compression = compression
+        self.__compression_level = compression_level
+        self.__bundled_dbs: Dict[str, BundledDb] = dict()
+
+        # not `tempfile.mkstemp`, the bundle gets the same permissions as any other new file
+        self.__path_to_temp_file = path_to_bundle.with_name(path_to_bundle.name + temp_bundle_infix
+                                                            + secrets.token_hex(8))
+        self.__file: BinaryIO = open(self.__path_to_temp_file, "xb")
+
+        self.__file.write(header_struct.pack(bundle_magic, bundle_version))
+
+    def __enter__(self) -> "BundleWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def write_db(self,
+                 db_name: str,
+                 raw_entries: Iterable[Tuple[bytes, bytes]]) -> BundledDb:
+        """
+        Compresses the given entries (`raw_entries`) of the LevelDB with the given name (`db_name`) into a new frame.
+
+        :param raw_entries: (key, value) tuples as they are stored in the LevelDB, sorted by key
+        :return: Where the entries were written
+        """
+
+        if db_name in self.__bundled_dbs:
+            raise FvttPackerException(f"LevelDB '{db_name}' was already written into the bundle.")
+
+        bundled_db = BundledDb(self.__file.tell())
+        compressor = BundleFormat.create_compressor(self.__compression, self.__compression_level)
+        pending_chunks = list()
+        nb_pending_bytes = 0
+
+        for (key_bytes, value_bytes) in raw_entries:
+
+            if b"\n" in value_bytes:
+                # would end the line of the entry
+                raise FvttPackerException(f"Value of key '{key_bytes.decode(UTF_8)}' in LevelDB '{db_name}' contains "
+                                          f"a line break and can't be written into a bundle.")
+
+            key_json = json.dumps(key_bytes.decode(UTF_8), ensure_ascii=False).encode(UTF_8)
+            line = b"[" + key_json + b"," + value_bytes + b"]\n"
+
+            bundled_db.nb_entries += 1
+            bundled_db.raw_length += len(line)
+
+            with MetricsRecorder.time(Stage.bundle_compress):
+                compressed = compressor.compress(line)
+
+            if len(compressed) > 0:
+                pending_chunks.append(compressed)
+                nb_pending_bytes += len(compressed)
+
+            if nb_pending_bytes >= io_chunk_size:
+                self.__write(b"".join(pending_chunks))
+                pending_chunks = list()
+                nb_pending_bytes = 0
+
+        with MetricsRecorder.time(Stage.bundle_compress):
+            pending_chunks.append(compressor.flush())
+
+        self.__write(b"".join(pending_chunks))
+
+        bundled_db.length = self.__file.tell() - bundled_db.offset
+        self.__bundled_dbs[db_name] = bundled_db
+
+        logging.info("Wrote %s entries of LevelDB '%s' into the bundle, %s bytes compressed into %s",
+                     bundled_db.nb_entries,
+                     db_name,
+                     bundled_db.raw_length,
+                     bundled_db.length)
+
+        return bundled_db
+
+    def close(self) -> None:
+        """
+        Writes the index and the trailer and replaces the target with the complete bundle.
+        """
+
+        index_offset = self.__file.tell()
+        index: Dict[str, Any] = {
+            "version": bundle_version,
+            "compression": self.__compression,
+            "dbs": {db_name: bundled_db.to_dict() for (db_name, bundled_db) in self.__bundled_dbs.items()}
+        }
+
+        self.__write(json.dumps(index, indent="  ").encode(UTF_8))
+        self.__write(trailer_struct.pack(index_offset, bundle_magic))
+        self.__file.close()
+
+        os.replace(self.__path_to_temp_file, self.__path_to_bundle)
+
+        logging.info("Wrote bundle '%s' with %s LevelDBs",
+                     self.__path_to_bundle,
+                     len(self.__bundled_dbs))
+
+    def discard(self) -> None:
+        """
+        Deletes the incomplete bundle, the target is left as it was.
+        """
+
+        self.__file.close()
+        self.__path_to_temp_file.unlink()
+
+    def __write(self,
+                data: bytes) -> None:
+
+        with MetricsRecorder.time(Stage.file_write):
+            self.__file.write(data)
+
+        MetricsRecorder.count(Counter.bytes_written, len(data))
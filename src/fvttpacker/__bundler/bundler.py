@@ -0,0 +1,293 @@
+import logging
+import shutil
+from json import JSONDecodeError
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple, Union
+
+from plyvel import DB
+
+from fvttpacker.__bundler.__bundle_format import BundleFormat
+from fvttpacker.__bundler.__bundle_reader import BundleReader
+from fvttpacker.__bundler.__bundle_writer import BundleWriter
+from fvttpacker.__common.assert_helper import AssertHelper
+from fvttpacker.__common.change_counts import ChangeCounts
+from fvttpacker.__common.json_codec import default_json_codec
+from fvttpacker.__common.leveldb_helper import LevelDBHelper
+from fvttpacker.__common.metrics_recorder import MetricsRecorder
+from fvttpacker.__common.overwrite_helper import OverwriteHelper
+from fvttpacker.__common.stat_cache import StatCache
+from fvttpacker.__constants import world_db_names
+from fvttpacker.__packer.__batch_writer import WriteBatchOptions
+from fvttpacker.__packer.__dict_to_leveldb_writer import DictToLevelDBWriter
+from fvttpacker.__packer.__leveldb_write_journal import LevelDBWriteJournal
+from fvttpacker.bundle_options import BundleOptions
+from fvttpacker.fvttpacker_exception import FvttPackerException
+from fvttpacker.metrics import Stage
+from fvttpacker.overwrite_confirmer import OverwriteConfirmer, AllYesOverwriteConfirmer
+from fvttpacker.pack_options import PackOptions
+from fvttpacker.unpack_options import UnpackOptions
+
+
+class Bundler:
+    """
+    Exports LevelDBs into a single compressed file, a bundle, and imports bundles into LevelDBs.
+    Unlike unpacked directories, a bundle is a single file that is cheap to copy, and unlike the LevelDBs themselves,
+    it does not depend on the version of LevelDB.
+    """
+
+    @staticmethod
+    def export_world_dbs_under_x_into_bundle_at_y(
+            x_path_to_parent_input_dir: Path,
+            y_path_to_target_bundle: Path,
+            overwrite_confirmer: OverwriteConfirmer = AllYesOverwriteConfirmer(),
+            unpack_options: UnpackOptions = UnpackOptions(),
+            bundle_options: BundleOptions = BundleOptions()) -> None:
+        """
+        Exports the LevelDBs under the given directory (`x_path_to_parent_input_dir`) that belong to a world into a
+        bundle at the given path (`y_path_to_target_bundle`).
+
+        :param x_path_to_parent_input_dir: e.g. "./foundrydata/Data/worlds/test/data"
+        :param y_path_to_target_bundle: e.g. "./test.fvttbundle"
+        :param overwrite_confirmer: Asked whether an existing bundle is overwritten
+        :param unpack_options: Only `leveldb_options`, `snapshot`, `key_filter` and `metrics_observer` are used
+        :param bundle_options: Options that control how the bundle is written
+        """
+
+        Bundler.export_given_dbs_under_x_into_bundle_at_y(x_path_to_parent_input_dir,
+                                                          y_path_to_target_bundle,
+                                                          world_db_names,
+                                                          overwrite_confirmer,
+                                                          unpack_options,
+                                                          bundle_options)
+
+    @staticmethod
+    def export_given_dbs_under_x_into_bundle_at_y(
+            x_path_to_parent_input_dir: Path,
+            y_path_to_target_bundle: Path,
+            db_names: Iterable[str],
+            overwrite_confirmer: OverwriteConfirmer = AllYesOverwriteConfirmer(),
+            unpack_options: UnpackOptions = UnpackOptions(),
+            bundle_options: BundleOptions = BundleOptions()) -> None:
+        """
+        Same as `export_world_dbs_under_x_into_bundle_at_y`, but exports the LevelDBs with the given names
+        (`db_names`).
+        """
+
+        db_names_to_input_db_paths: Dict[str, Path] = dict()
+
+        with StatCache.share():
+            AssertHelper.assert_path_to_parent_input_dir_is_ok(x_path_to_parent_input_dir)
+
+            if not StatCache.is_dir(y_path_to_target_bundle.parent):
+                raise FvttPackerException(f"Directory '{y_path_to_target_bundle.parent}' does not exist")
+
+            if StatCache.is_dir(y_path_to_target_bundle):
+                raise FvttPackerException(f"Path '{y_path_to_target_bundle}' already exists but as a directory.")
+
+            for db_name in db_names:
+                path_to_input_db = x_path_to_parent_input_dir.joinpath(db_name)
+
+                if not StatCache.is_dir(path_to_input_db):
+                    raise FvttPackerException(f"Missing LevelDB '{db_name}' under '{x_path_to_parent_input_dir}'.")
+
+                db_names_to_input_db_paths[db_name] = path_to_input_db
+
+            if StatCache.exists(y_path_to_target_bundle) \
+                    and not overwrite_confirmer.confirm_overwrite_bundle(y_path_to_target_bundle):
+                return
+
+        # before anything is read -> fail fast
+        compression = BundleFormat.resolve_compression(bundle_options.compression)
+
+        with MetricsRecorder.observe(unpack_options.metrics_observer):
+            Bundler.__export_dbs(db_names_to_input_db_paths,
+                                 y_path_to_target_bundle,
+                                 compression,
+                                 unpack_options,
+                                 bundle_options)
+
+    @staticmethod
+    def __export_dbs(db_names_to_input_db_paths: Dict[str, Path],
+                     path_to_target_bundle: Path,
+                     compression: str,
+                     unpack_options: UnpackOptions,
+                     bundle_options: BundleOptions) -> None:
+
+        with BundleWriter(path_to_target_bundle, compression, bundle_options.compression_level) as bundle_writer:
+            for (db_name, path_to_input_db) in db_names_to_input_db_paths.items():
+                path_to_db_to_open = path_to_input_db
+
+                if unpack_options.snapshot:
+                    with MetricsRecorder.time(Stage.leveldb_snapshot):
+                        path_to_db_to_open = LevelDBHelper.copy_db_snapshot(path_to_input_db)
+
+                try:
+                    input_db = LevelDBHelper.try_open_db(path_to_db_to_open,
+                                                         skip_checks=True,
+                                                         must_exist=True,
+                                                         leveldb_options=unpack_options.leveldb_options)
+
+                    try:
+                        raw_entries = MetricsRecorder.time_iterator(
+                            LevelDBHelper.iterate_db(input_db, unpack_options.key_filter),
+                            Stage.leveldb_read)
+                        bundled_db = bundle_writer.write_db(db_name, raw_entries)
+                    finally:
+                        input_db.close()
+                finally:
+                    if unpack_options.snapshot:
+                        shutil.rmtree(path_to_db_to_open, ignore_errors=True)
+
+                target_change_counts = ChangeCounts()
+                target_change_counts.nb_created = bundled_db.nb_entries
+                MetricsRecorder.count_target(path_to_input_db, target_change_counts)
+
+    @staticmethod
+    def import_bundle_at_x_into_dbs_under_y(
+            x_path_to_bundle: Path,
+            y_path_to_parent_target_dir: Path,
+            overwrite_confirmer: OverwriteConfirmer = AllYesOverwriteConfirmer(),
+            pack_options: PackOptions = PackOptions(),
+            db_names: Union[Iterable[str], None] = None) -> None:
+        """
+        Imports the LevelDBs of the given bundle (`x_path_to_bundle`) into the LevelDBs with the same names under the
+        given directory (`y_path_to_parent_target_dir`), without unpacking them into directories first.
+        Like packing, only the entries that changed are written and the LevelDBs are rolled back if the import fails.
+
+        :param x_path_to_bundle: e.g. "./test.fvttbundle"
+        :param y_path_to_parent_target_dir: e.g. "./foundrydata/Data/worlds/test/data"
+        :param overwrite_confirmer: Asked whether existing LevelDBs are overwritten
+        :param pack_options: Only `streaming`, `memory_limit`, `validate`, `metrics_observer`, `leveldb_options`,
+        `compact`, the batch options, `sync` and `key_filter` are used. The entries are always written with
+        `strategy_diff`.
+        :param db_names: The names of the LevelDBs to import, None means all LevelDBs of the bundle
+        """
+
+        bundle_reader = BundleReader(x_path_to_bundle)
+
+        if db_names is None:
+            db_names = bundle_reader.bundled_dbs.keys()
+
+        target_db_paths_to_db_names: Dict[Path, str] = dict()
+
+        with StatCache.share():
+            AssertHelper.assert_path_to_parent_target_dir_is_ok(y_path_to_parent_target_dir)
+
+            for db_name in db_names:
+                if db_name not in bundle_reader.bundled_dbs:
+                    raise FvttPackerException(f"Missing LevelDB '{db_name}' in bundle '{x_path_to_bundle}'.")
+
+                target_db_paths_to_db_names[y_path_to_parent_target_dir.joinpath(db_name)] = db_name
+
+            AssertHelper.assert_paths_to_target_dbs_are_ok(target_db_paths_to_db_names.keys())
+
+            # ask which existing dbs should be overwritten and filter out the dbs that should not be
+            target_db_paths = OverwriteHelper.ask_and_filter_out_non_overwrite(
+                {path_to_target_db: path_to_target_db for path_to_target_db in target_db_paths_to_db_names.keys()},
+                overwrite_confirmer.confirm_batch_overwrite_leveldb)
+
+        with MetricsRecorder.observe(pack_options.metrics_observer):
+            Bundler.__import_dbs(bundle_reader,
+                                 {target_db_paths_to_db_names[path_to_target_db]: path_to_target_db
+                                  for path_to_target_db in target_db_paths},
+                                 pack_options)
+
+    @staticmethod
+    def __import_dbs(bundle_reader: BundleReader,
+                     db_names_to_target_db_paths: Dict[str, Path],
+                     pack_options: PackOptions) -> None:
+
+        key_filter = pack_options.key_filter
+        db_names_to_entries: Dict[str, List[Tuple[str, str]]] = dict()
+        db_names_to_dbs: Dict[str, DB] = dict()
+        # the keys written into each LevelDB, so they can be restored if a later batch or LevelDB fails
+        journals: List[LevelDBWriteJournal] = list()
+
+        batch_options = WriteBatchOptions.from_pack_options(pack_options)
+        change_counts = ChangeCounts()
+
+        for db_name in db_names_to_target_db_paths.keys():
+            if pack_options.streaming:
+                # only decompress and validate all LevelDBs of the bundle -> fail fast
+                for _ in Bundler.__read_entries(bundle_reader, db_name, pack_options):
+                    pass
+            else:
+                # read all LevelDBs of the bundle -> fail fast
+                db_names_to_entries[db_name] = list(Bundler.__read_entries(bundle_reader, db_name, pack_options))
+
+        try:
+            # open all the dbs -> fail fast
+            for (db_name, path_to_target_db) in db_names_to_target_db_paths.items():
+                db_names_to_dbs[db_name] = LevelDBHelper.try_open_db(path_to_target_db,
+                                                                     skip_checks=True,
+                                                                     must_exist=False,
+                                                                     leveldb_options=pack_options.leveldb_options)
+
+            # coming this far means:
+            # - all LevelDBs of the bundle were successfully read into lists or validated
+            # - all target dbs were successfully opened as LevelDBs
+
+            for (db_name, target_db) in db_names_to_dbs.items():
+                if pack_options.streaming:
+                    input_entries = Bundler.__read_entries(bundle_reader, db_name, pack_options)
+                else:
+                    input_entries = db_names_to_entries.pop(db_name)
+
+                journals.append(LevelDBWriteJournal(target_db))
+                target_change_counts = DictToLevelDBWriter.write_entries_into_db(input_entries,
+                                                                                 target_db,
+                                                                                 batch_options,
+                                                                                 journals[-1],
+                                                                                 key_filter)
+
+                if pack_options.compact and target_change_counts.nb_changes > 0:
+                    logging.info("Compacting LevelDB '%s'", hex(id(target_db)))
+
+                    with MetricsRecorder.time(Stage.compaction):
+                        target_db.compact_range()
+
+                change_counts.add(target_change_counts)
+                MetricsRecorder.count_target(db_names_to_target_db_paths[db_name], target_change_counts)
+        except BaseException:
+            # leave the LevelDBs as they were before the import
+            for journal in reversed(journals):
+                journal.rollback(pack_options.sync)
+            raise
+        finally:
+            # the snapshots of the journals must be released before their dbs are closed
+            for journal in journals:
+                journal.release()
+
+            for target_db in db_names_to_dbs.values():
+                target_db.close()
+
+        logging.info("Total number of changes: %s (%s)",
+                     change_counts.nb_changes,
+                     change_counts)
+
+    @staticmethod
+    def __read_entries(bundle_reader: BundleReader,
+                       db_name: str,
+                       pack_options: PackOptions) -> Iterable[Tuple[str, str]]:
+        """
+        :return: The entries of the given LevelDB of the bundle, their values parsed if `pack_options.validate` is True
+        """
+
+        entries = bundle_reader.read_entries(db_name, pack_options.key_filter)
+
+        if not pack_options.validate:
+            # a frame is checked as a whole, the values are what the exported LevelDB contained
+            return entries
+
+        return Bundler.__validate_entries(entries)
+
+    @staticmethod
+    def __validate_entries(entries: Iterable[Tuple[str, str]]) -> Iterable[Tuple[str, str]]:
+
+        for (key_str, value_str) in entries:
+            try:
+                default_json_codec.loads(value_str)
+            except JSONDecodeError as err:
+                raise FvttPackerException(f"Error while parsing value of key '{key_str}' as json, reason:\n'{err}'")
+
+            yield key_str, value_str
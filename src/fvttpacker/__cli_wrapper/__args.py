@@ -14,3 +14,48 @@ verbosity_choices = [
     verbosity_error,
     verbosity_critical
 ]
+
+streaming_option = "--streaming"
+memory_limit_option = "--memory-limit"
+jobs_option = "--jobs"
+manifest_option = "--manifest"
+validate_option = "--validate"
+metrics_json_option = "--metrics-json"
+leveldb_profile_option = "--leveldb-profile"
+write_buffer_size_option = "--write-buffer-size"
+block_cache_size_option = "--block-cache-size"
+bloom_filter_bits_option = "--bloom-filter-bits"
+compression_option = "--compression"
+max_open_files_option = "--max-open-files"
+compact_option = "--compact"
+debounce_option = "--debounce"
+poll_interval_option = "--poll-interval"
+polling_option = "--polling"
+max_batch_entries_option = "--max-batch-entries"
+max_batch_bytes_option = "--max-batch-bytes"
+sync_option = "--sync"
+snapshot_option = "--snapshot"
+include_option = "--include"
+exclude_option = "--exclude"
+strategy_option = "--strategy"
+layout_option = "--layout"
+layout_depth_option = "--layout-depth"
+io_threads_option = "--io-threads"
+bundle_compression_option = "--bundle-compression"
+bundle_compression_level_option = "--bundle-compression-level"
+db_option = "--db"
+all_option = "--all"
+max_listed_keys_option = "--max-listed-keys"
+plan_option = "--plan"
+apply_plan_option = "--apply-plan"
+format_option = "--format"
+blob_threshold_option = "--blob-threshold"
+resume_option = "--resume"
+
+format_dir = "dir"
+format_ndjson = "ndjson"
+
+format_choices = [
+    format_dir,
+    format_ndjson
+]
@@ -46,6 +46,21 @@ class InteractiveOverwriteConfirmer(OverwriteConfirmer):
 
         return result
 
+    def confirm_overwrite_bundle(self,
+                                 path_to_target_bundle: Path) -> bool:
+
+        question = str(f"The bundle '{path_to_target_bundle}' already exists.\n"
+                       f"Do you want to overwrite it?\n")
+
+        result = self.__user_interactor.ask_yes_or_no_question(question)
+
+        if result:
+            self.__text_io_wrapper_out.write(f"Overwriting '{path_to_target_bundle}'.\n")
+        else:
+            self.__text_io_wrapper_out.write(f"Not overwriting '{path_to_target_bundle}'.\n")
+
+        return result
+
     def confirm_batch_overwrite_leveldb(self,
                                         paths_to_target_dbs: List[Path]) -> Dict[Path, bool]:
 
@@ -1,13 +1,28 @@
 import logging
 from pathlib import Path
+from typing import Tuple, Union
 
 import click
 
 from fvttpacker.__cli_wrapper import __args
+from fvttpacker.__bundler.bundler import Bundler
 from fvttpacker.__cli_wrapper.__interactive_overwrite_confirmer import InteractiveOverwriteConfirmer
 from fvttpacker.__packer.packer import Packer
 from fvttpacker.__unpacker.unpacker import Unpacker
+from fvttpacker.__verifier.verifier import Verifier
+from fvttpacker.__watcher.watcher import Watcher
+from fvttpacker.bundle_options import BundleOptions, bundle_compression_auto, bundle_compression_choices
+from fvttpacker.change_plan import ChangePlan, JsonFilePlanObserver, PlanObserver
+from fvttpacker.dir_layout import DirLayout, layout_choices, max_depth
+from fvttpacker.key_filter import KeyFilter
+from fvttpacker.leveldb_options import LevelDBOptions, compression_choices, leveldb_profiles, profile_default
+from fvttpacker.metrics import JsonFileMetricsObserver, MetricsObserver
 from fvttpacker.overwrite_confirmer import AllYesOverwriteConfirmer
+from fvttpacker.pack_options import PackOptions, strategy_choices, strategy_diff
+from fvttpacker.unpack_options import UnpackOptions
+from fvttpacker.verify_options import VerifyOptions
+from fvttpacker.verify_result import default_max_listed_keys
+from fvttpacker.watch_options import WatchOptions
 
 
 @click.group()
@@ -30,17 +45,285 @@ def get_overwrite_confirmer(context: click.Context):
         return InteractiveOverwriteConfirmer()
 
 
+def key_filter_options(func):
+    func = click.option(__args.exclude_option, "excludes", multiple=True,
+                        help="Skip keys with this prefix or matching this glob. Can be given multiple times.")(func)
+    func = click.option(__args.include_option, "includes", multiple=True,
+                        help="Only process keys with this prefix or matching this glob, e.g. '!actors!'. Can be given "
+                             "multiple times.")(func)
+    return func
+
+
+def leveldb_options(func):
+    func = click.option(__args.max_open_files_option, type=click.IntRange(min=1),
+                        help="Number of files each LevelDB keeps open. Overrides the profile.")(func)
+    func = click.option(__args.compression_option, type=click.Choice(compression_choices),
+                        help="Compression of newly written tables. Overrides the profile.")(func)
+    func = click.option(__args.bloom_filter_bits_option, type=click.IntRange(min=1),
+                        help="Bits per key of the bloom filters of newly written tables. Overrides the profile.")(func)
+    func = click.option(__args.block_cache_size_option, type=click.IntRange(min=1),
+                        help="Block cache size in MiB of each LevelDB. Overrides the profile.")(func)
+    func = click.option(__args.write_buffer_size_option, type=click.IntRange(min=1),
+                        help="Write buffer size in MiB of each LevelDB. Overrides the profile.")(func)
+    func = click.option(__args.leveldb_profile_option, type=click.Choice(list(leveldb_profiles.keys())),
+                        default=profile_default,
+                        help="Options the LevelDBs are opened with.")(func)
+    return func
+
+
+def get_leveldb_options(leveldb_profile: str,
+                        write_buffer_size: Union[int, None],
+                        block_cache_size: Union[int, None],
+                        bloom_filter_bits: Union[int, None],
+                        compression: Union[str, None],
+                        max_open_files: Union[int, None]) -> LevelDBOptions:
+    result = leveldb_profiles[leveldb_profile]()
+
+    if write_buffer_size is not None:
+        result.write_buffer_size = write_buffer_size * 1024 * 1024
+
+    if block_cache_size is not None:
+        result.block_cache_size = block_cache_size * 1024 * 1024
+
+    if bloom_filter_bits is not None:
+        result.bloom_filter_bits = bloom_filter_bits
+
+    if compression is not None:
+        result.compression = compression
+
+    if max_open_files is not None:
+        result.max_open_files = max_open_files
+
+    return result
+
+
+def pack_options(func):
+    func = leveldb_options(func)
+    func = key_filter_options(func)
+    func = click.option(__args.strategy_option, type=click.Choice(strategy_choices), default=strategy_diff,
+                        show_default=True,
+                        help="diff: only write the changes, rebuild: write new LevelDBs and swap them in, "
+                             "auto: rebuild the LevelDBs where most of the entries changed. With --streaming or "
+                             "--format ndjson the entries can't be sampled, so auto always uses the diff.")(func)
+    func = click.option(__args.sync_option, is_flag=True,
+                        help="Sync each batch to disk before writing the next one.")(func)
+    func = click.option(__args.max_batch_bytes_option, type=click.IntRange(min=1),
+                        help="Approximate maximum size in MiB of a single batch. Defaults to half of --memory-limit "
+                             "for --streaming.")(func)
+    func = click.option(__args.max_batch_entries_option, type=click.IntRange(min=1),
+                        help="Maximum number of changed entries written with a single batch.")(func)
+    func = click.option(__args.compact_option, is_flag=True,
+                        help="Compact each LevelDB that changed after packing it.")(func)
+    func = click.option(__args.metrics_json_option, type=click.Path(dir_okay=False),
+                        help="Write the time spent in each stage and the changes of each LevelDB as json into this "
+                             "file.")(func)
+    func = click.option(__args.validate_option, is_flag=True,
+                        help="Parse every file, even the ones that did not change.")(func)
+    func = click.option(__args.manifest_option, "use_manifest", is_flag=True,
+                        help="Skip directories and files that did not change since the last run.")(func)
+    func = click.option(__args.io_threads_option, type=click.IntRange(min=1), default=1,
+                        help="Number of threads each process reads the input files on.")(func)
+    func = click.option(__args.jobs_option, type=click.IntRange(min=1), default=1,
+                        help="Number of processes used to read the input files.")(func)
+    func = click.option(__args.memory_limit_option, type=click.IntRange(min=1),
+                        help="Approximate memory ceiling in MiB for --streaming.")(func)
+    func = click.option(__args.streaming_option, is_flag=True,
+                        help="Validate all files first, then read and write them in chunks.")(func)
+    return func
+
+
+def get_pack_options(streaming: bool,
+                     jobs: int,
+                     io_threads: int,
+                     use_manifest: bool,
+                     validate: bool,
+                     compact: bool,
+                     strategy: str,
+                     sync: bool,
+                     includes: Tuple[str, ...],
+                     excludes: Tuple[str, ...],
+                     memory_limit: int = None,
+                     max_batch_entries: int = None,
+                     max_batch_bytes: int = None,
+                     metrics_json: str = None,
+                     plan: str = None,
+                     apply_plan: str = None,
+                     resume: bool = False,
+                     **leveldb_kwargs) -> PackOptions:
+    if plan is not None and apply_plan is not None:
+        raise click.UsageError(f"{__args.plan_option} and {__args.apply_plan_option} can't be used together.")
+
+    assert_no_plan_with_resume(plan, apply_plan, resume)
+
+    result = PackOptions(streaming=streaming,
+                         jobs=jobs,
+                         io_threads=io_threads,
+                         use_manifest=use_manifest,
+                         validate=validate,
+                         metrics_observer=get_metrics_observer(metrics_json),
+                         leveldb_options=get_leveldb_options(**leveldb_kwargs),
+                         compact=compact,
+                         strategy=strategy,
+                         max_batch_entries=max_batch_entries,
+                         sync=sync,
+                         key_filter=KeyFilter(includes, excludes),
+                         plan_observer=get_plan_observer(plan),
+                         plan=get_plan(apply_plan),
+                         resume=resume)
+
+    if memory_limit is not None:
+        result.memory_limit = memory_limit * 1024 * 1024
+
+    if max_batch_bytes is not None:
+        result.max_batch_bytes = max_batch_bytes * 1024 * 1024
+
+    return result
+
+
+def plan_options(func):
+    func = click.option(__args.apply_plan_option, type=click.Path(exists=True, dir_okay=False),
+                        help="Make exactly the changes of a plan written with --plan. Fails if anything changed "
+                             "since the plan was made.")(func)
+    func = click.option(__args.plan_option, type=click.Path(dir_okay=False),
+                        help="Change nothing, only write the changes that would be made as json into this file.")(func)
+    return func
+
+
+def resume_option(func):
+    func = click.option(__args.resume_option, is_flag=True,
+                        help="Record the progress in each directory and continue where the last run with "
+                             "--resume stopped, e.g. after it was killed.")(func)
+    return func
+
+
+def assert_no_plan_with_resume(plan: Union[str, None],
+                               apply_plan: Union[str, None],
+                               resume: bool) -> None:
+    if resume and (plan is not None or apply_plan is not None):
+        raise click.UsageError(f"{__args.resume_option} can't be used with {__args.plan_option} or "
+                               f"{__args.apply_plan_option}.")
+
+
+def get_plan_observer(plan: Union[str, None]) -> Union[PlanObserver, None]:
+    if plan is None:
+        return None
+
+    return JsonFilePlanObserver(Path(plan))
+
+
+def get_plan(apply_plan: Union[str, None]) -> Union[ChangePlan, None]:
+    if apply_plan is None:
+        return None
+
+    return ChangePlan.load(Path(apply_plan))
+
+
+def assert_no_plan(plan_observer: Union[PlanObserver, None],
+                   plan: Union[ChangePlan, None]) -> None:
+    if plan_observer is not None or plan is not None:
+        raise click.UsageError(f"{__args.plan_option} and {__args.apply_plan_option} can't be used with "
+                               f"{__args.format_option} {__args.format_ndjson}.")
+
+
+def dir_layout_options(func):
+    func = click.option(__args.layout_depth_option, type=click.IntRange(min=1, max=max_depth), default=1,
+                        show_default=True,
+                        help="Number of levels of sub-directories of a layout other than flat.")(func)
+    return func
+
+
+def unpack_options(func):
+    func = leveldb_options(func)
+    func = key_filter_options(func)
+    func = dir_layout_options(func)
+    func = click.option(__args.layout_option, type=click.Choice(layout_choices),
+                        help="Put the files into sub-directories, named after a hash or the first characters of the "
+                             "id of each entry. Existing directories are migrated. By default each directory keeps "
+                             "its layout.")(func)
+    func = click.option(__args.blob_threshold_option, type=click.IntRange(min=1),
+                        help="Move strings of at least this many KiB, e.g. embedded images, into files of their own "
+                             "in the sub-directory .fvttpacker-blobs, each stored once. Packing inserts them "
+                             "again.")(func)
+    func = click.option(__args.snapshot_option, is_flag=True,
+                        help="Unpack a copy of each LevelDB, so LevelDBs in use by a running Foundry can be "
+                             "unpacked.")(func)
+    func = click.option(__args.metrics_json_option, type=click.Path(dir_okay=False),
+                        help="Write the time spent in each stage and the changes of each directory as json into this "
+                             "file.")(func)
+    func = click.option(__args.validate_option, is_flag=True,
+                        help="Parse every entry, even the ones that did not change.")(func)
+    func = click.option(__args.manifest_option, "use_manifest", is_flag=True,
+                        help="Skip LevelDBs and entries that did not change since the last run.")(func)
+    func = click.option(__args.io_threads_option, type=click.IntRange(min=1), default=1,
+                        help="Number of threads each process reads and writes the target files on.")(func)
+    func = click.option(__args.jobs_option, type=click.IntRange(min=1), default=1,
+                        help="Number of processes used to decode and format the entries.")(func)
+    func = click.option(__args.streaming_option, is_flag=True,
+                        help="Write each entry as soon as it is read, instead of reading all entries first. "
+                             "An invalid entry stops the unpack after the entries before it were written.")(func)
+    return func
+
+
+def get_unpack_options(streaming: bool,
+                       jobs: int,
+                       io_threads: int,
+                       use_manifest: bool,
+                       validate: bool,
+                       snapshot: bool,
+                       includes: Tuple[str, ...],
+                       excludes: Tuple[str, ...],
+                       layout: Union[str, None],
+                       layout_depth: int,
+                       metrics_json: str = None,
+                       plan: str = None,
+                       apply_plan: str = None,
+                       blob_threshold: Union[int, None] = None,
+                       resume: bool = False,
+                       **leveldb_kwargs) -> UnpackOptions:
+    if plan is not None and apply_plan is not None:
+        raise click.UsageError(f"{__args.plan_option} and {__args.apply_plan_option} can't be used together.")
+
+    assert_no_plan_with_resume(plan, apply_plan, resume)
+
+    return UnpackOptions(streaming=streaming,
+                         jobs=jobs,
+                         io_threads=io_threads,
+                         use_manifest=use_manifest,
+                         validate=validate,
+                         metrics_observer=get_metrics_observer(metrics_json),
+                         leveldb_options=get_leveldb_options(**leveldb_kwargs),
+                         snapshot=snapshot,
+                         key_filter=KeyFilter(includes, excludes),
+                         dir_layout=None if layout is None else DirLayout(layout, layout_depth),
+                         plan_observer=get_plan_observer(plan),
+                         plan=get_plan(apply_plan),
+                         blob_threshold=None if blob_threshold is None else blob_threshold * 1024,
+                         resume=resume)
+
+
+def get_metrics_observer(metrics_json: Union[str, None]) -> Union[MetricsObserver, None]:
+    if metrics_json is None:
+        return None
+
+    return JsonFileMetricsObserver(Path(metrics_json))
+
+
 @cli.command()
 @click.pass_context
 @click.argument('source_dir', type=click.Path(exists=True))
 @click.argument('target_dir', type=click.Path(exists=True))
+@plan_options
+@resume_option
+@unpack_options
 def unpack_world(context: click.Context,
                  source_dir: str,
-                 target_dir: str) -> None:
+                 target_dir: str,
+                 **kwargs) -> None:
     Unpacker.unpack_world_dbs_under_x_into_dirs_under_y(
         Path(source_dir),
         Path(target_dir),
-        get_overwrite_confirmer(context)
+        get_overwrite_confirmer(context),
+        get_unpack_options(**kwargs)
     )
 
 
@@ -48,13 +331,18 @@ def unpack_world(context: click.Context,
 @click.pass_context
 @click.argument('source_dir', type=click.Path(exists=True))
 @click.argument('target_dir', type=click.Path(exists=True))
+@plan_options
+@resume_option
+@pack_options
 def pack_world(context: click.Context,
                source_dir: str,
-               target_dir: str) -> None:
+               target_dir: str,
+               **kwargs) -> None:
     Packer.pack_world_dirs_under_x_into_dbs_under_y(
         Path(source_dir),
         Path(target_dir),
-        get_overwrite_confirmer(context)
+        get_overwrite_confirmer(context),
+        get_pack_options(**kwargs)
     )
 
 
@@ -62,13 +350,18 @@ def pack_world(context: click.Context,
 @click.pass_context
 @click.argument('source_dir', type=click.Path(exists=True))
 @click.argument('target_dir', type=click.Path(exists=True))
+@plan_options
+@resume_option
+@unpack_options
 def unpack_all(context: click.Context,
                source_dir: str,
-               target_dir: str) -> None:
+               target_dir: str,
+               **kwargs) -> None:
     Unpacker.unpack_all_dbs_under_x_into_dirs_under_y(
         Path(source_dir),
         Path(target_dir),
-        get_overwrite_confirmer(context)
+        get_overwrite_confirmer(context),
+        get_unpack_options(**kwargs)
     )
 
 
@@ -76,38 +369,329 @@ def unpack_all(context: click.Context,
 @click.pass_context
 @click.argument('source_dir', type=click.Path(exists=True))
 @click.argument('target_dir', type=click.Path(exists=True))
+@plan_options
+@resume_option
+@pack_options
 def pack_all(context: click.Context,
              source_dir: str,
-             target_dir: str) -> None:
+             target_dir: str,
+             **kwargs) -> None:
     Packer.pack_dirs_under_x_into_dbs_under_y(
         Path(source_dir),
         Path(target_dir),
-        get_overwrite_confirmer(context)
+        get_overwrite_confirmer(context),
+        get_pack_options(**kwargs)
     )
 
 
 @cli.command()
-@click.argument('source_dir', type=click.Path(exists=True))
+@click.argument('source_dir', type=click.Path(exists=True, allow_dash=True))
 @click.argument('target_dir', type=click.Path(exists=True))
+@plan_options
+@resume_option
+@pack_options
+@click.option(__args.format_option, "input_format", type=click.Choice(__args.format_choices),
+              default=__args.format_dir, show_default=True,
+              help="ndjson: SOURCE_DIR is a file (- for stdin) with a {\"key\": ..., \"value\": ...} object per "
+                   "line, sorted by key.")
 def pack(source_dir: str,
-         target_dir: str) -> None:
-    Packer.pack_dir_at_x_into_db_at_y(
-        Path(source_dir),
-        Path(target_dir)
-    )
+         target_dir: str,
+         input_format: str,
+         **kwargs) -> None:
+    pack_options = get_pack_options(**kwargs)
+
+    if input_format == __args.format_dir:
+        Packer.pack_dir_at_x_into_db_at_y(
+            Path(source_dir),
+            Path(target_dir),
+            pack_options
+        )
+        return
+
+    assert_no_plan(pack_options.plan_observer, pack_options.plan)
+
+    with click.open_file(source_dir, "rb") as input_stream:
+        Packer.pack_ndjson_stream_into_db_at_y(
+            input_stream,
+            Path(target_dir),
+            pack_options
+        )
 
 
 @cli.command()
 @click.argument('source_dir', type=click.Path(exists=True))
-@click.argument('target_dir', type=click.Path(exists=True))
+@click.argument('target_dir', type=click.Path(allow_dash=True))
+@plan_options
+@resume_option
+@unpack_options
+@click.option(__args.format_option, "output_format", type=click.Choice(__args.format_choices),
+              default=__args.format_dir, show_default=True,
+              help="ndjson: TARGET_DIR is a file (- for stdout) that gets a {\"key\": ..., \"value\": ...} object "
+                   "per line, sorted by key.")
 def unpack(source_dir: str,
-           target_dir: str) -> None:
-    Unpacker.unpack_db_at_x_into_dir_at_y(
+           target_dir: str,
+           output_format: str,
+           **kwargs) -> None:
+    unpack_options = get_unpack_options(**kwargs)
+
+    if output_format == __args.format_dir:
+        if not Path(target_dir).exists():
+            raise click.BadParameter(f"Path '{target_dir}' does not exist.", param_hint="'TARGET_DIR'")
+
+        Unpacker.unpack_db_at_x_into_dir_at_y(
+            Path(source_dir),
+            Path(target_dir),
+            unpack_options
+        )
+        return
+
+    assert_no_plan(unpack_options.plan_observer, unpack_options.plan)
+
+    # a file is only replaced once all lines were written
+    with click.open_file(target_dir, "wb", atomic=True) as output_stream:
+        Unpacker.unpack_db_at_x_into_ndjson_stream(
+            Path(source_dir),
+            output_stream,
+            unpack_options
+        )
+
+
+@cli.command()
+@click.argument('source_dir', type=click.Path(exists=True))
+@click.argument('target_dir', type=click.Path(exists=True))
+@pack_options
+@click.option(__args.debounce_option, type=click.IntRange(min=0), default=100, show_default=True,
+              help="Milliseconds without changes after which the changes are written.")
+@click.option(__args.poll_interval_option, type=click.IntRange(min=1), default=1000, show_default=True,
+              help="Milliseconds between checks for changes when polling.")
+@click.option(__args.polling_option, "use_polling", is_flag=True,
+              help="Poll for changes even if inotify is available.")
+def watch(source_dir: str,
+          target_dir: str,
+          debounce: int,
+          poll_interval: int,
+          use_polling: bool,
+          **kwargs) -> None:
+    """
+    Packs all sub-folders of SOURCE_DIR into the LevelDBs under TARGET_DIR, then writes every change of their files
+    into the LevelDBs until interrupted.
+    """
+    pack_options = get_pack_options(**kwargs)
+    watch_options = WatchOptions(debounce_seconds=debounce / 1000,
+                                 poll_interval_seconds=poll_interval / 1000,
+                                 use_polling=use_polling)
+
+    if pack_options.max_batch_entries is not None:
+        watch_options.max_batch_entries = pack_options.max_batch_entries
+
+    Watcher.watch_dirs_under_x_into_dbs_under_y(
         Path(source_dir),
-        Path(target_dir)
+        Path(target_dir),
+        pack_options,
+        watch_options
     )
 
 
+@cli.command()
+@click.argument('dirs', nargs=-1, required=True, type=click.Path(exists=True, file_okay=False))
+@click.option(__args.layout_option, type=click.Choice(layout_choices), required=True,
+              help="The layout to move the files to.")
+@dir_layout_options
+def migrate_layout(dirs: Tuple[str, ...],
+                   layout: str,
+                   layout_depth: int) -> None:
+    """
+    Moves the files of the unpacked DIRS into the sub-directories of the given layout.
+    """
+    dir_layout = DirLayout(layout, layout_depth)
+
+    for path_to_dir in dirs:
+        DirLayout.migrate(Path(path_to_dir), dir_layout)
+
+
+@cli.command()
+@click.pass_context
+@click.argument('source_dir', type=click.Path(exists=True, file_okay=False))
+@click.argument('target_bundle', type=click.Path(dir_okay=False))
+@leveldb_options
+@key_filter_options
+@click.option(__args.db_option, "db_names", multiple=True,
+              help="Export the LevelDB with this name instead of the ones of a world. Can be given multiple times.")
+@click.option(__args.bundle_compression_level_option, type=int,
+              help="Level of the compression. Defaults to the default level of the compression.")
+@click.option(__args.bundle_compression_option, type=click.Choice(bundle_compression_choices),
+              default=bundle_compression_auto, show_default=True,
+              help="Compression of the bundle. auto: zstd if the zstandard package is installed, zlib otherwise.")
+@click.option(__args.snapshot_option, is_flag=True,
+              help="Export a copy of each LevelDB, so LevelDBs in use by a running Foundry can be exported.")
+@click.option(__args.metrics_json_option, type=click.Path(dir_okay=False),
+              help="Write the time spent in each stage and the number of entries of each LevelDB as json into this "
+                   "file.")
+def export(context: click.Context,
+           source_dir: str,
+           target_bundle: str,
+           db_names: Tuple[str, ...],
+           bundle_compression: str,
+           bundle_compression_level: Union[int, None],
+           snapshot: bool,
+           includes: Tuple[str, ...],
+           excludes: Tuple[str, ...],
+           metrics_json: str = None,
+           **leveldb_kwargs) -> None:
+    """
+    Exports the LevelDBs of the world under SOURCE_DIR into a single compressed file, TARGET_BUNDLE.
+    """
+    unpack_options = UnpackOptions(metrics_observer=get_metrics_observer(metrics_json),
+                                   leveldb_options=get_leveldb_options(**leveldb_kwargs),
+                                   snapshot=snapshot,
+                                   key_filter=KeyFilter(includes, excludes))
+    bundle_options = BundleOptions(compression=bundle_compression,
+                                   compression_level=bundle_compression_level)
+
+    if len(db_names) == 0:
+        Bundler.export_world_dbs_under_x_into_bundle_at_y(
+            Path(source_dir),
+            Path(target_bundle),
+            get_overwrite_confirmer(context),
+            unpack_options,
+            bundle_options
+        )
+    else:
+        Bundler.export_given_dbs_under_x_into_bundle_at_y(
+            Path(source_dir),
+            Path(target_bundle),
+            db_names,
+            get_overwrite_confirmer(context),
+            unpack_options,
+            bundle_options
+        )
+
+
+@cli.command(name="import")
+@click.pass_context
+@click.argument('source_bundle', type=click.Path(exists=True, dir_okay=False))
+@click.argument('target_dir', type=click.Path(exists=True, file_okay=False))
+@leveldb_options
+@key_filter_options
+@click.option(__args.db_option, "db_names", multiple=True,
+              help="Only import the LevelDB with this name. Can be given multiple times.")
+@click.option(__args.sync_option, is_flag=True,
+              help="Sync each batch to disk before writing the next one.")
+@click.option(__args.max_batch_bytes_option, type=click.IntRange(min=1),
+              help="Approximate maximum size in MiB of a single batch. Defaults to half of --memory-limit for "
+                   "--streaming.")
+@click.option(__args.max_batch_entries_option, type=click.IntRange(min=1),
+              help="Maximum number of changed entries written with a single batch.")
+@click.option(__args.compact_option, is_flag=True,
+              help="Compact each LevelDB that changed after importing it.")
+@click.option(__args.metrics_json_option, type=click.Path(dir_okay=False),
+              help="Write the time spent in each stage and the changes of each LevelDB as json into this file.")
+@click.option(__args.validate_option, is_flag=True,
+              help="Parse every value of the bundle.")
+@click.option(__args.memory_limit_option, type=click.IntRange(min=1),
+              help="Approximate memory ceiling in MiB for --streaming.")
+@click.option(__args.streaming_option, is_flag=True,
+              help="Check the whole bundle first, then decompress and write each LevelDB in batches.")
+def import_bundle(context: click.Context,
+                  source_bundle: str,
+                  target_dir: str,
+                  db_names: Tuple[str, ...],
+                  streaming: bool,
+                  validate: bool,
+                  compact: bool,
+                  sync: bool,
+                  includes: Tuple[str, ...],
+                  excludes: Tuple[str, ...],
+                  memory_limit: int = None,
+                  max_batch_entries: int = None,
+                  max_batch_bytes: int = None,
+                  metrics_json: str = None,
+                  **leveldb_kwargs) -> None:
+    """
+    Imports the LevelDBs of SOURCE_BUNDLE into the LevelDBs with the same names under TARGET_DIR.
+    """
+    pack_options = PackOptions(streaming=streaming,
+                               validate=validate,
+                               metrics_observer=get_metrics_observer(metrics_json),
+                               leveldb_options=get_leveldb_options(**leveldb_kwargs),
+                               compact=compact,
+                               max_batch_entries=max_batch_entries,
+                               sync=sync,
+                               key_filter=KeyFilter(includes, excludes))
+
+    if memory_limit is not None:
+        pack_options.memory_limit = memory_limit * 1024 * 1024
+
+    if max_batch_bytes is not None:
+        pack_options.max_batch_bytes = max_batch_bytes * 1024 * 1024
+
+    Bundler.import_bundle_at_x_into_dbs_under_y(
+        Path(source_bundle),
+        Path(target_dir),
+        get_overwrite_confirmer(context),
+        pack_options,
+        db_names if len(db_names) > 0 else None
+    )
+
+
+@cli.command()
+@click.pass_context
+@click.argument('path_a', type=click.Path(file_okay=False))
+@click.argument('path_b', type=click.Path(file_okay=False))
+@leveldb_options
+@key_filter_options
+@click.option(__args.all_option, "verify_all", is_flag=True,
+              help="Compare each LevelDB or directory under PATH_A with the one with the same name under PATH_B.")
+@click.option(__args.max_listed_keys_option, type=click.IntRange(min=0), default=default_max_listed_keys,
+              show_default=True,
+              help="Number of keys listed per kind of mismatch.")
+@click.option(__args.snapshot_option, is_flag=True,
+              help="Compare a copy of each LevelDB, so LevelDBs in use by a running Foundry can be compared.")
+@click.option(__args.metrics_json_option, type=click.Path(dir_okay=False),
+              help="Write the time spent in each stage as json into this file.")
+@click.option(__args.validate_option, is_flag=True,
+              help="Parse every file, even the ones that match.")
+@click.option(__args.io_threads_option, type=click.IntRange(min=1), default=1,
+              help="Number of threads each process reads the files on.")
+@click.option(__args.jobs_option, type=click.IntRange(min=1), default=1,
+              help="Number of processes used for the comparison.")
+def verify(context: click.Context,
+           path_a: str,
+           path_b: str,
+           verify_all: bool,
+           max_listed_keys: int,
+           jobs: int,
+           io_threads: int,
+           validate: bool,
+           snapshot: bool,
+           includes: Tuple[str, ...],
+           excludes: Tuple[str, ...],
+           metrics_json: str = None,
+           **leveldb_kwargs) -> None:
+    """
+    Checks that PATH_A and PATH_B contain the same entries. Each can be a LevelDB or an unpacked directory, which is
+    compared by the values its files would be packed into. Exits with 1 if they differ.
+    """
+    verify_options = VerifyOptions(jobs=jobs,
+                                   io_threads=io_threads,
+                                   validate=validate,
+                                   metrics_observer=get_metrics_observer(metrics_json),
+                                   leveldb_options=get_leveldb_options(**leveldb_kwargs),
+                                   snapshot=snapshot,
+                                   key_filter=KeyFilter(includes, excludes))
+
+    if verify_all:
+        results = Verifier.verify_all_under_x_against_y(Path(path_a), Path(path_b), verify_options)
+    else:
+        results = [Verifier.verify_x_against_y(Path(path_a), Path(path_b), verify_options)]
+
+    for result in results:
+        click.echo(result.format(max_listed_keys))
+
+    if not all(result.is_equal for result in results):
+        context.exit(1)
+
+
 def main():
     cli(obj={})
 
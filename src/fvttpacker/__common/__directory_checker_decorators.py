@@ -2,6 +2,7 @@ from pathlib import Path
 from typing import Dict
 
 from fvttpacker.__common.assert_helper import AssertHelper
+from fvttpacker.__common.stat_cache import StatCache
 
 
 def check_input_dir_and_target_dir(func):
@@ -9,34 +10,45 @@ def check_input_dir_and_target_dir(func):
                 y_path_to_parent_target_dir: Path,
                 *args,
                 **kwargs):
-        AssertHelper.assert_path_to_parent_input_dir_is_ok(x_path_to_parent_input_dir)
-        AssertHelper.assert_path_to_parent_target_dir_is_ok(y_path_to_parent_target_dir)
+        with StatCache.share():
+            AssertHelper.assert_path_to_parent_input_dir_is_ok(x_path_to_parent_input_dir)
+            AssertHelper.assert_path_to_parent_target_dir_is_ok(y_path_to_parent_target_dir)
 
-        func(x_path_to_parent_input_dir,
-             y_path_to_parent_target_dir,
-             *args,
-             **kwargs)
+        return func(x_path_to_parent_input_dir,
+                    y_path_to_parent_target_dir,
+                    *args,
+                    **kwargs)
 
     return wrapper
 
 
 def check_input_dbs_and_target_dirs(func):
-    def wrapper(input_db_paths_to_target_dir_paths: Dict[Path, Path]):
-        AssertHelper.assert_paths_to_input_dbs_are_ok(input_db_paths_to_target_dir_paths.keys())
+    def wrapper(input_db_paths_to_target_dir_paths: Dict[Path, Path],
+                *args,
+                **kwargs):
+        with StatCache.share():
+            AssertHelper.assert_paths_to_input_dbs_are_ok(input_db_paths_to_target_dir_paths.keys())
 
-        AssertHelper.assert_paths_to_target_dirs_are_ok(input_db_paths_to_target_dir_paths.values())
+            AssertHelper.assert_paths_to_target_dirs_are_ok(input_db_paths_to_target_dir_paths.values())
 
-        func(input_db_paths_to_target_dir_paths)
+        return func(input_db_paths_to_target_dir_paths,
+                    *args,
+                    **kwargs)
 
     return wrapper
 
 
 def check_input_dirs_and_target_dbs(func):
-    def wrapper(input_dir_paths_to_target_db_paths: Dict[Path, Path]):
-        AssertHelper.assert_paths_to_input_dirs_are_ok(input_dir_paths_to_target_db_paths.keys())
+    def wrapper(input_dir_paths_to_target_db_paths: Dict[Path, Path],
+                *args,
+                **kwargs):
+        with StatCache.share():
+            AssertHelper.assert_paths_to_input_dirs_are_ok(input_dir_paths_to_target_db_paths.keys())
 
-        AssertHelper.assert_paths_to_target_dbs_are_ok(input_dir_paths_to_target_db_paths.values())
+            AssertHelper.assert_paths_to_target_dbs_are_ok(input_dir_paths_to_target_db_paths.values())
 
-        func(input_dir_paths_to_target_db_paths)
+        return func(input_dir_paths_to_target_db_paths,
+                    *args,
+                    **kwargs)
 
     return wrapper
@@ -2,6 +2,7 @@ from pathlib import Path
 from typing import Iterable
 
 from fvttpacker.__common.leveldb_helper import LevelDBHelper
+from fvttpacker.__common.stat_cache import StatCache
 from fvttpacker.fvttpacker_exception import FvttPackerException
 
 
@@ -13,15 +14,15 @@ class AssertHelper:
                                    must_exist: bool):
 
         # parent dir may have to exist
-        if parent_dir_must_exist and not path_to_dir.parent.exists():
+        if parent_dir_must_exist and not StatCache.exists(path_to_dir.parent):
             raise FvttPackerException(f"Directory '{path_to_dir.parent}' does not exist")
 
         # may have to exist
-        if must_exist and not path_to_dir.exists():
+        if must_exist and not StatCache.exists(path_to_dir):
             raise FvttPackerException(f"Directory '{path_to_dir}' does not exist")
 
         # if exists, must be a directory
-        if path_to_dir.exists() and not path_to_dir.is_dir():
+        if StatCache.exists(path_to_dir) and not StatCache.is_dir(path_to_dir):
             raise FvttPackerException(f"Path '{path_to_dir}' already exists but not as a directory.")
 
     @staticmethod
@@ -0,0 +1,173 @@
+import logging
+import os
+import re
+import secrets
+from pathlib import Path
+from typing import Any, Union
+
+from fvttpacker.__common.json_codec import default_json_codec
+from fvttpacker.__common.manifest import Manifest
+from fvttpacker.__common.metrics_recorder import MetricsRecorder
+from fvttpacker.__constants import UTF_8
+from fvttpacker.dir_layout import max_depth
+from fvttpacker.fvttpacker_exception import FvttPackerException
+from fvttpacker.metrics import Counter, Stage
+
+# stored in each directory that was unpacked with a blob threshold, hidden like the layout and manifest files
+blob_dir_name = ".fvttpacker-blobs"
+
+# the only field of the objects that replace the strings that were moved into the blob store
+blob_reference_field = "$fvttpacker-blob"
+
+# a reference inside a minified value, a string in the value can't match because its quotes are escaped
+blob_reference_pattern = re.compile(r'\{"\$fvttpacker-blob":"([0-9a-f]{32})"}')
+
+
+class BlobStore:
+    """
+    Keeps large strings of the values of an unpacked directory, e.g. the base64 images of fog or of scene thumbnails,
+    in files of their own, named after the hashes of their contents. The files of the entries reference them as
+    `{"$fvttpacker-blob": "<hash>"}` instead, so they stay small and packing them does not parse the strings.
+    A string is only stored once, no matter how many entries contain it.
+    """
+
+    def __init__(self,
+                 path_to_dir: Path,
+                 threshold: int,
+                 is_writing: bool = True):
+        """
+        :param path_to_dir: The unpacked directory, the blobs are stored in its sub-directory `blob_dir_name`
+        :param threshold: Strings with at least this many characters are moved into the blob store
+        :param is_writing: If False the references are created without storing the strings, e.g. for plans
+        """
+        self.path_to_blob_dir = path_to_dir.joinpath(blob_dir_name)
+        self.threshold = threshold
+        self.is_writing = is_writing
+
+    def is_affected(self,
+                    value_str: str) -> bool:
+        """
+        :return: True if the given minified value (`value_str`) might contain a string that has to be moved into the
+        blob store, or an object that looks like a reference
+        """
+        return len(value_str) >= self.threshold or blob_reference_field in value_str
+
+    def externalize(self,
+                    key_str: str,
+                    value: Any) -> Any:
+        """
+        :return: The given decoded value (`value`) of the entry with the given key (`key_str`), with all strings of at
+        least `threshold` characters replaced by references to the blob store
+        """
+
+        if isinstance(value, str):
+            if len(value) < self.threshold:
+                return value
+
+            return {blob_reference_field: self.__store(value)}
+
+        if isinstance(value, list):
+            return [self.externalize(key_str, item) for item in value]
+
+        if isinstance(value, dict):
+            if blob_reference_field in value:
+                raise FvttPackerException(f"The value of key '{key_str}' contains the field '{blob_reference_field}' "
+                                          f"itself, it can't be unpacked with a blob store.")
+
+            return {field: self.externalize(key_str, item) for (field, item) in value.items()}
+
+        return value
+
+    def __store(self,
+                string: str) -> str:
+        """
+        :return: The hash of the given string (`string`), which is stored under it unless it is already
+        """
+
+        string_bytes = string.encode(UTF_8)
+        string_hash = Manifest.hash_value(string_bytes)
+
+        if not self.is_writing:
+            return string_hash
+
+        path_to_blob = self.path_to_blob_dir.joinpath(string_hash)
+
+        if path_to_blob.exists():
+            return string_hash
+
+        # the directory of an unpack is only created once its first file is written
+        self.path_to_blob_dir.mkdir(parents=True, exist_ok=True)
+
+        # other processes might store the same string at the same time
+        path_to_temp_file = self.path_to_blob_dir.joinpath(f".{string_hash}.{secrets.token_hex(8)}")
+
+        logging.debug("Storing blob '%s'", path_to_blob)
+
+        with MetricsRecorder.time(Stage.file_write):
+            with open(path_to_temp_file, "xb") as file:
+                MetricsRecorder.count(Counter.bytes_written, file.write(string_bytes))
+
+            os.replace(path_to_temp_file, path_to_blob)
+
+        return string_hash
+
+    @staticmethod
+    def inline(value_str: str,
+               path_to_file: Path) -> str:
+        """
+        Replaces the references to the blob store in the given minified value (`value_str`) of the given file
+        (`path_to_file`) with the strings they reference. The strings are inserted as they are, without parsing
+        `value_str` again.
+
+        :return: `value_str` as it is stored in the LevelDB
+        """
+
+        if blob_reference_field not in value_str:
+            return value_str
+
+        path_to_blob_dir: Union[Path, None] = None
+
+        def replace_reference(match: re.Match) -> str:
+            nonlocal path_to_blob_dir
+
+            if path_to_blob_dir is None:
+                path_to_blob_dir = BlobStore.__find_blob_dir(path_to_file)
+
+            return default_json_codec.dumps_minified(BlobStore.__read_blob(path_to_blob_dir.joinpath(match.group(1))))
+
+        return blob_reference_pattern.sub(replace_reference, value_str)
+
+    @staticmethod
+    def __find_blob_dir(path_to_file: Path) -> Path:
+        """
+        :return: The blob store of the directory the given file (`path_to_file`) belongs to, which is the closest
+        parent directory with one, as the file might be in a sub-directory of its layout
+        """
+
+        for path_to_dir in list(path_to_file.parents)[0:max_depth + 1]:
+            path_to_blob_dir = path_to_dir.joinpath(blob_dir_name)
+
+            if path_to_blob_dir.is_dir():
+                return path_to_blob_dir
+
+        raise FvttPackerException(f"'{path_to_file}' references blobs, but there is no '{blob_dir_name}' directory.")
+
+    @staticmethod
+    def __read_blob(path_to_blob: Path) -> str:
+
+        try:
+            with MetricsRecorder.time(Stage.file_read), open(path_to_blob, "rb") as file:
+                string_bytes = file.read()
+        except FileNotFoundError:
+            raise FvttPackerException(f"Missing blob '{path_to_blob}'.")
+
+        MetricsRecorder.count(Counter.bytes_read, len(string_bytes))
+
+        # named after its content, which must not have been edited
+        if Manifest.hash_value(string_bytes) != path_to_blob.name:
+            raise FvttPackerException(f"Blob '{path_to_blob}' does not match its hash, it must not be edited.")
+
+        try:
+            return string_bytes.decode(UTF_8)
+        except UnicodeDecodeError as err:
+            raise FvttPackerException(f"Error while reading blob '{path_to_blob}', reason:\n'{err}'")
@@ -0,0 +1,45 @@
+class ChangeType:
+    created = "created"
+    updated = "updated"
+    deleted = "deleted"
+    unchanged = "unchanged"
+
+
+class ChangeCounts:
+    """
+    Counts what happened to the entries of a single target (directory or LevelDB) or of several targets combined.
+    """
+
+    def __init__(self):
+        self.nb_created: int = 0
+        self.nb_updated: int = 0
+        self.nb_deleted: int = 0
+        self.nb_unchanged: int = 0
+
+    @property
+    def nb_changes(self) -> int:
+        return self.nb_created + self.nb_updated + self.nb_deleted
+
+    def count(self,
+              change_type: str) -> None:
+        if change_type == ChangeType.created:
+            self.nb_created += 1
+        elif change_type == ChangeType.updated:
+            self.nb_updated += 1
+        elif change_type == ChangeType.deleted:
+            self.nb_deleted += 1
+        else:
+            self.nb_unchanged += 1
+
+    def add(self,
+            other: "ChangeCounts") -> None:
+        self.nb_created += other.nb_created
+        self.nb_updated += other.nb_updated
+        self.nb_deleted += other.nb_deleted
+        self.nb_unchanged += other.nb_unchanged
+
+    def __str__(self) -> str:
+        return str(f"created: {self.nb_created}, "
+                   f"updated: {self.nb_updated}, "
+                   f"deleted: {self.nb_deleted}, "
+                   f"unchanged: {self.nb_unchanged}")
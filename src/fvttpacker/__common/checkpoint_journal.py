@@ -0,0 +1,163 @@
+import json
+import logging
+import os
+import time
+from json import JSONDecodeError
+from pathlib import Path
+from typing import Any, Dict, Union
+
+from fvttpacker.__constants import UTF_8
+from fvttpacker.key_filter import KeyFilter
+
+checkpoint_file_name = ".fvttpacker-checkpoint"
+checkpoint_version = 1
+
+checkpoint_operation_pack = "pack"
+checkpoint_operation_unpack = "unpack"
+
+# the progress within a LevelDB or directory is saved at most this often, in seconds
+checkpoint_interval = 1.0
+
+
+class CheckpointJournal:
+    """
+    Remembers how far a pack or unpack of a directory got, so it can be continued after it was interrupted, e.g.
+    killed. It is stored inside the directory (see `checkpoint_file_name`).
+
+    All entries and files with keys up to `last_key` are done, the others are still as they were before. Once the
+    LevelDB or directory is done completely, `is_complete` is True.
+    """
+
+    def __init__(self,
+                 path_to_dir: Path,
+                 operation: str,
+                 path_to_db: Path,
+                 key_filter: KeyFilter,
+                 last_key: Union[str, None] = None,
+                 is_complete: bool = False):
+        """
+        :param path_to_dir: The directory that is packed or unpacked into
+        :param operation: `checkpoint_operation_pack` or `checkpoint_operation_unpack`
+        :param path_to_db: The LevelDB that is packed into or unpacked
+        :param key_filter: The filter of the pack or unpack, a checkpoint is only continued with the same one
+        """
+        self.path_to_dir = path_to_dir
+        self.operation = operation
+        self.path_to_db = path_to_db
+        self.key_filter = key_filter
+        self.last_key = last_key
+        self.is_complete = is_complete
+
+        # what is restored by `restore`
+        self.__loaded_state = (last_key, is_complete)
+        self.__last_save_time = time.monotonic()
+
+    @staticmethod
+    def load(path_to_dir: Path,
+             operation: str,
+             path_to_db: Path,
+             key_filter: KeyFilter) -> "CheckpointJournal":
+        """
+        Loads the checkpoint stored in the given directory (`path_to_dir`).
+        If there is none, or it belongs to another operation, LevelDB or key filter, a checkpoint of a pack or unpack
+        that has not started yet is returned.
+        """
+
+        result = CheckpointJournal(path_to_dir, operation, path_to_db, key_filter)
+        path_to_checkpoint = path_to_dir.joinpath(checkpoint_file_name)
+
+        try:
+            with open(path_to_checkpoint, "rt", encoding=UTF_8) as file:
+                checkpoint_dict = json.load(file)
+        except (FileNotFoundError, NotADirectoryError):
+            return result
+        except (JSONDecodeError, UnicodeDecodeError) as err:
+            logging.warning("Ignoring checkpoint '%s', reason: %s", path_to_checkpoint, err)
+            return result
+
+        if any(checkpoint_dict.get(field) != value for (field, value) in result.__get_identity().items()):
+            logging.warning("Ignoring checkpoint '%s', it belongs to another %s, LevelDB or key filter",
+                            path_to_checkpoint,
+                            operation)
+            return result
+
+        return CheckpointJournal(path_to_dir,
+                                 operation,
+                                 path_to_db,
+                                 key_filter,
+                                 checkpoint_dict.get("last_key"),
+                                 checkpoint_dict.get("complete", False))
+
+    def get_remaining_key_filter(self) -> KeyFilter:
+        """
+        :return: `key_filter`, but only selecting the keys after `last_key`
+        """
+        return KeyFilter(self.key_filter.includes,
+                         self.key_filter.excludes,
+                         self.last_key)
+
+    def advance(self,
+                key: str) -> None:
+        """
+        Must be called once all entries or files with keys up to the given one (`key`) are done.
+        Only saved if the last save was at least `checkpoint_interval` ago.
+        """
+
+        self.last_key = key
+
+        if time.monotonic() - self.__last_save_time >= checkpoint_interval:
+            self.save()
+
+    def complete(self) -> None:
+        self.is_complete = True
+        self.save()
+
+    def restore(self) -> None:
+        """
+        Saves the checkpoint as it was loaded, e.g. after the changes made since then were rolled back.
+        """
+
+        (self.last_key, self.is_complete) = self.__loaded_state
+
+        if self.last_key is None and not self.is_complete:
+            self.delete()
+        else:
+            self.save()
+
+    def save(self) -> None:
+
+        # an unpack creates its directory once it writes the first file
+        if not self.path_to_dir.is_dir():
+            return
+
+        checkpoint_dict = {
+            **self.__get_identity(),
+            "last_key": self.last_key,
+            "complete": self.is_complete
+        }
+
+        path_to_checkpoint = self.path_to_dir.joinpath(checkpoint_file_name)
+        path_to_temp_file = self.path_to_dir.joinpath(checkpoint_file_name + ".tmp")
+
+        # replaced at once, so a checkpoint is never read half written
+        with open(path_to_temp_file, "wt", encoding=UTF_8) as file:
+            json.dump(checkpoint_dict, file, separators=(",", ":"))
+
+        os.replace(path_to_temp_file, path_to_checkpoint)
+
+        self.__last_save_time = time.monotonic()
+
+    def delete(self) -> None:
+        self.path_to_dir.joinpath(checkpoint_file_name).unlink(missing_ok=True)
+
+    def __get_identity(self) -> Dict[str, Any]:
+        """
+        :return: The fields a stored checkpoint must have to be continued
+        """
+        return {
+            "version": checkpoint_version,
+            "operation": self.operation,
+            "db": str(self.path_to_db.resolve()),
+            "includes": self.key_filter.includes,
+            "excludes": self.key_filter.excludes
+        }
@@ -0,0 +1,183 @@
+import functools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future
+from itertools import islice
+from typing import Callable, Deque, Iterable, Iterator, List, Tuple, TypeVar, Union
+
+from fvttpacker.__common.metrics_recorder import MetricsRecorder
+from fvttpacker.metrics import Metrics
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+default_chunk_size = 1000
+
+
+class ChunkExecutor:
+    """
+    Runs a function over chunks of work (e.g. a range of keys of a LevelDB or a range of files of a directory),
+    either in the current process (`jobs` <= 1) or spread across a pool of `jobs` processes.
+    The functions passed to `map` must be picklable, i.e. public functions or static methods of module-level classes.
+    """
+
+    def __init__(self,
+                 jobs: int = 1,
+                 io_threads: int = 1):
+        """
+        :param jobs: Number of processes the chunks are spread across
+        :param io_threads: Number of threads each chunk of `map_io` overlaps the reading or writing of its files on,
+        see `IOExecutor`
+        """
+        self.__jobs = max(jobs, 1)
+        self.__executor: Union[ProcessPoolExecutor, None] = None
+        self.io_threads = max(io_threads, 1)
+
+        if self.__jobs > 1:
+            self.__executor = ProcessPoolExecutor(max_workers=self.__jobs)
+
+    def __enter__(self) -> "ChunkExecutor":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.shutdown()
+
+    def shutdown(self) -> None:
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=True)
+            self.__executor = None
+
+    def map(self,
+            func: Callable[[List[T]], R],
+            chunks: Iterable[List[T]]) -> Iterator[R]:
+        """
+        Lazily applies `func` to each of the given chunks (`chunks`).
+        The results are yielded in the order of the chunks.
+        At most two chunks per process are submitted ahead of the chunk whose result is yielded next,
+        so only a bounded number of chunks and results are in memory at once.
+        Exceptions raised by `func` are re-raised when the result of the failing chunk is requested.
+        """
+
+        if self.__executor is None:
+            for chunk in chunks:
+                yield func(chunk)
+            return
+
+        max_in_flight = 2 * self.__jobs
+        in_flight: Deque[Future] = deque()
+        is_recording = MetricsRecorder.is_recording()
+
+        try:
+            for chunk in chunks:
+                if is_recording:
+                    in_flight.append(self.__executor.submit(ChunkExecutor.run_recording, func, chunk))
+                else:
+                    in_flight.append(self.__executor.submit(func, chunk))
+
+                if len(in_flight) >= max_in_flight:
+                    yield ChunkExecutor.__get_result(in_flight.popleft(), is_recording)
+
+            while len(in_flight) > 0:
+                yield ChunkExecutor.__get_result(in_flight.popleft(), is_recording)
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    @property
+    def max_chunks_in_memory(self) -> int:
+        """
+        The number of chunks `map` keeps in memory at once: the ones submitted ahead and the one whose result is
+        consumed.
+        """
+
+        if self.__executor is None:
+            return 1
+
+        return 2 * self.__jobs + 1
+
+    def get_max_chunk_bytes(self,
+                            max_bytes: int) -> int:
+        """
+        :return: The size of each chunk, so all chunks that are in memory at once take at most `max_bytes` bytes,
+        see `split_into_sized_chunks`
+        """
+        return max(max_bytes // self.max_chunks_in_memory, 1)
+
+    def map_io(self,
+               func: Callable[..., R],
+               chunks: Iterable[List[T]]) -> Iterator[R]:
+        """
+        Same as `map`, for functions that read or write a file for each item of a chunk and take the number of threads
+        to do that on as keyword argument `io_threads`, e.g. `DirToDictReader.read_files_as_entries`.
+        """
+
+        if self.io_threads > 1:
+            func = functools.partial(func, io_threads=self.io_threads)
+
+        return self.map(func, chunks)
+
+    @staticmethod
+    def run_recording(func: Callable[[T], R],
+                      chunk: T) -> Tuple[R, Metrics]:
+        """
+        Applies `func` to the given chunk (`chunk`) in a worker process or thread and records its metrics.
+        """
+
+        metrics = MetricsRecorder.start()
+
+        try:
+            return func(chunk), metrics
+        finally:
+            MetricsRecorder.stop()
+
+    @staticmethod
+    def __get_result(future: Future,
+                     is_recording: bool) -> R:
+
+        if not is_recording:
+            return future.result()
+
+        (result, metrics) = future.result()
+        MetricsRecorder.add(metrics)
+
+        return result
+
+    @staticmethod
+    def split_into_chunks(items: Iterable[T],
+                          chunk_size: int = default_chunk_size) -> Iterator[List[T]]:
+        """
+        Splits the given items (`items`) into consecutive chunks with at most `chunk_size` items each.
+        """
+
+        iterator = iter(items)
+
+        chunk = list(islice(iterator, chunk_size))
+
+        while len(chunk) > 0:
+            yield chunk
+            chunk = list(islice(iterator, chunk_size))
+
+    @staticmethod
+    def split_into_sized_chunks(sized_items: Iterable[Tuple[T, int]],
+                                max_chunk_bytes: int,
+                                chunk_size: int = default_chunk_size) -> Iterator[List[T]]:
+        """
+        Same as `split_into_chunks`, but a chunk also ends before the sizes of its items would exceed `max_chunk_bytes`.
+        An item that is larger than `max_chunk_bytes` gets a chunk of its own.
+
+        :param sized_items: (item, size in bytes) tuples, e.g. the paths to files and their sizes
+        """
+
+        chunk: List[T] = list()
+        chunk_bytes = 0
+
+        for (item, item_bytes) in sized_items:
+            if len(chunk) > 0 and (len(chunk) >= chunk_size or chunk_bytes + item_bytes > max_chunk_bytes):
+                yield chunk
+                chunk = list()
+                chunk_bytes = 0
+
+            chunk.append(item)
+            chunk_bytes += item_bytes
+
+        if len(chunk) > 0:
+            yield chunk
@@ -0,0 +1,117 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Iterable, Iterator, List, TypeVar, Union
+
+from fvttpacker.__common.chunk_executor import ChunkExecutor
+from fvttpacker.__common.metrics_recorder import MetricsRecorder
+from fvttpacker.fvttpacker_exception import FvttPackerException
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# items submitted per thread ahead of the item whose result is yielded next
+max_in_flight_per_thread = 4
+
+
+class IOExecutor:
+    """
+    Runs a function over items that mostly wait for the file system (e.g. reading or writing one file each),
+    either in the current thread (`threads` <= 1) or overlapped on a pool of `threads` threads.
+    Unlike `ChunkExecutor` it does not help with work that needs the CPU, but it needs no pickling and is cheap to
+    create, e.g. once per chunk inside a worker process of a `ChunkExecutor`.
+    """
+
+    def __init__(self,
+                 threads: int = 1):
+        self.__threads = max(threads, 1)
+        self.__executor: Union[ThreadPoolExecutor, None] = None
+
+        if self.__threads > 1:
+            self.__executor = ThreadPoolExecutor(max_workers=self.__threads)
+
+    def __enter__(self) -> "IOExecutor":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.shutdown()
+
+    def shutdown(self) -> None:
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=True)
+            self.__executor = None
+
+    def map(self,
+            func: Callable[[T], R],
+            items: Iterable[T]) -> Iterator[R]:
+        """
+        Lazily applies `func` to each of the given items (`items`).
+        The results are yielded in the order of the items, so anything that is logged by the caller for each result
+        is logged in order.
+        Only a bounded number of items is submitted ahead of the item whose result is yielded next.
+        If `func` raises for an item, no more items are submitted and the errors of all items that were already
+        submitted are raised together once they are done.
+        """
+
+        if self.__executor is None:
+            for item in items:
+                yield func(item)
+            return
+
+        max_in_flight = max_in_flight_per_thread * self.__threads
+        in_flight: Deque[Future] = deque()
+        is_recording = MetricsRecorder.is_recording()
+
+        try:
+            for item in items:
+                if is_recording:
+                    in_flight.append(self.__executor.submit(ChunkExecutor.run_recording, func, item))
+                else:
+                    in_flight.append(self.__executor.submit(func, item))
+
+                if len(in_flight) >= max_in_flight:
+                    yield IOExecutor.__get_result(in_flight, is_recording)
+
+            while len(in_flight) > 0:
+                yield IOExecutor.__get_result(in_flight, is_recording)
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    @staticmethod
+    def __get_result(in_flight: Deque[Future],
+                     is_recording: bool) -> R:
+
+        future = in_flight.popleft()
+
+        if future.exception() is not None:
+            IOExecutor.__raise_errors(future, in_flight)
+
+        if not is_recording:
+            return future.result()
+
+        (result, metrics) = future.result()
+        MetricsRecorder.add(metrics)
+
+        return result
+
+    @staticmethod
+    def __raise_errors(failed_future: Future,
+                       in_flight: Deque[Future]) -> None:
+        """
+        Waits for all futures that are in flight, so none of their errors is lost and no thread is still working on
+        a file when the error reaches the caller.
+        """
+
+        errors: List[BaseException] = [failed_future.exception()]
+
+        while len(in_flight) > 0:
+            error = in_flight.popleft().exception()
+
+            if error is not None:
+                errors.append(error)
+
+        if len(errors) == 1:
+            raise errors[0]
+
+        messages = "\n".join(str(error) for error in errors)
+        raise FvttPackerException(f"{len(errors)} errors occurred:\n{messages}") from errors[0]
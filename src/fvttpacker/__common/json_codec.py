@@ -0,0 +1,231 @@
+import json
+import logging
+import os
+import re
+from typing import Any, Dict, Type, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from fvttpacker.__common.metrics_recorder import MetricsRecorder
+from fvttpacker.__constants import UTF_8
+from fvttpacker.metrics import Stage
+
+json_backend_env_var = "FVTTPACKER_JSON_BACKEND"
+
+# Integers with this many digits might not fit into 64 bits, orjson would turn them into floats
+too_long_integer_pattern = re.compile(r"[0-9][0-9]{18}")
+# Start of the exponent of a float formatted by orjson, json formats those differently (e.g. 1e16 vs 1e+16)
+exponent_pattern = re.compile(rb"e[-0-9]")
+# Floats in [1e-5, 1e-4) are formatted without an exponent by orjson but with one by json (e.g. 0.00001 vs 1e-05)
+small_float_bytes = b"0.0000"
+# Everything json escapes as \uXXXX when `ensure_ascii` is True, orjson never escapes these
+non_ascii_pattern = re.compile(r"[^\x00-\x7e]")
+number_chars = b"-.0123456789"
+# Bytes that can come before a number in the output of orjson
+number_separators = b":,[ \n"
+
+
+class JsonCodec:
+    """
+    Parses and formats the values of the LevelDBs and the contents of the unpacked files.
+    The output must stay byte-identical to what the json module of the standard library produces, because that's
+    what Foundry and existing unpacked directories expect.
+
+    This class uses the json module itself. Subclasses may use faster libraries, but have to fall back to this class
+    whenever their output would differ.
+    """
+
+    name = "json"
+
+    def loads(self,
+              json_str: str) -> Any:
+        """
+        :raises JSONDecodeError: If `json_str` is not valid json, with the same message as `json.loads`
+        """
+        with MetricsRecorder.time(Stage.json_parse):
+            return json.loads(json_str)
+
+    def dumps_minified(self,
+                       value: Any) -> str:
+        """
+        :return: The given value (`value`) as json, as it is stored in the LevelDBs
+        """
+        with MetricsRecorder.time(Stage.json_serialize):
+            return json.dumps(value, separators=(",", ":"), indent=None)
+
+    def dumps_indented(self,
+                       value: Any) -> str:
+        """
+        :return: The given value (`value`) as json, as it is stored in the unpacked files
+        """
+        with MetricsRecorder.time(Stage.json_serialize):
+            return json.dumps(value, indent="  ")
+
+    def minify(self,
+               json_str: str) -> str:
+        """
+        Same as `dumps_minified(loads(json_str))`.
+        """
+        return self.dumps_minified(self.loads(json_str))
+
+    def indent(self,
+               json_str: str) -> str:
+        """
+        Same as `dumps_indented(loads(json_str))`.
+        """
+        return self.dumps_indented(self.loads(json_str))
+
+    @staticmethod
+    def get_backends() -> Dict[str, Type["JsonCodec"]]:
+        """
+        :return: The codecs that can be used in this environment by name, fastest first
+        """
+
+        result: Dict[str, Type[JsonCodec]] = dict()
+
+        if orjson is not None:
+            result[OrjsonCodec.name] = OrjsonCodec
+
+        result[JsonCodec.name] = JsonCodec
+
+        return result
+
+    @staticmethod
+    def create_default() -> "JsonCodec":
+        """
+        Creates the fastest available codec or the one named by the environment variable `FVTTPACKER_JSON_BACKEND`.
+        """
+
+        backends = JsonCodec.get_backends()
+        backend_name: Union[str, None] = os.environ.get(json_backend_env_var)
+
+        if backend_name is None:
+            return next(iter(backends.values()))()
+
+        if backend_name not in backends:
+            logging.warning("JSON backend '%s' is not available, available backends: %s",
+                            backend_name,
+                            ", ".join(backends.keys()))
+            return JsonCodec()
+
+        return backends[backend_name]()
+
+
+class OrjsonCodec(JsonCodec):
+    """
+    Uses orjson where its results are known to be identical to the ones of the json module.
+
+    Anything orjson rejects (e.g. NaN) or might parse differently (integers that don't fit into 64 bits) is parsed by
+    the json module, so values and error messages stay the same.
+    Only `minify` and `indent` format with orjson: they know that the value was parsed by orjson, so it contains no
+    NaN or Infinity, which orjson would silently turn into null. The output is then checked for everything orjson
+    formats differently, if there is anything, the json module parses and formats the input instead.
+    """
+
+    name = "orjson"
+
+    def loads(self,
+              json_str: str) -> Any:
+
+        if too_long_integer_pattern.search(json_str) is None:
+            try:
+                with MetricsRecorder.time(Stage.json_parse):
+                    return orjson.loads(json_str)
+            except orjson.JSONDecodeError:
+                pass
+
+        return super().loads(json_str)
+
+    def minify(self,
+               json_str: str) -> str:
+
+        result_str = OrjsonCodec.__try_reformat(json_str, orjson_options=0)
+
+        if result_str is None:
+            return super().minify(json_str)
+
+        return result_str
+
+    def indent(self,
+               json_str: str) -> str:
+
+        result_str = OrjsonCodec.__try_reformat(json_str, orjson_options=orjson.OPT_INDENT_2)
+
+        if result_str is None:
+            return super().indent(json_str)
+
+        return result_str
+
+    @staticmethod
+    def __try_reformat(json_str: str,
+                       orjson_options: int) -> Union[str, None]:
+        """
+        :return: The reformatted input or None if orjson can't produce exactly what the json module would produce
+        """
+
+        try:
+            with MetricsRecorder.time(Stage.json_parse):
+                value = orjson.loads(json_str)
+
+            with MetricsRecorder.time(Stage.json_serialize):
+                result_bytes: bytes = orjson.dumps(value, option=orjson_options)
+        except (orjson.JSONDecodeError, orjson.JSONEncodeError):
+            # e.g. NaN, invalid json or nested too deeply
+            return None
+
+        # integers that don't fit into 64 bits were turned into floats with an exponent as well
+        for match in exponent_pattern.finditer(result_bytes):
+            if OrjsonCodec.__is_number_before(result_bytes, match.start()):
+                return None
+
+        position = result_bytes.find(small_float_bytes)
+
+        while position != -1:
+            if OrjsonCodec.__is_number_before(result_bytes, position + 1):
+                return None
+
+            position = result_bytes.find(small_float_bytes, position + 1)
+
+        result_str = result_bytes.decode(UTF_8)
+
+        if result_bytes.isascii() and b"\x7f" not in result_bytes:
+            return result_str
+
+        # non-ASCII characters can only be part of strings, so they can be escaped without parsing the output again
+        return non_ascii_pattern.sub(OrjsonCodec.__escape_non_ascii, result_str)
+
+    @staticmethod
+    def __escape_non_ascii(match: re.Match) -> str:
+        """
+        :return: The matched character escaped the same way json escapes it
+        """
+
+        code_point = ord(match.group())
+
+        if code_point <= 0xffff:
+            return f"\\u{code_point:04x}"
+
+        # surrogate pair
+        code_point -= 0x10000
+
+        return f"\\u{0xd800 | (code_point >> 10):04x}\\u{0xdc00 | (code_point & 0x3ff):04x}"
+
+    @staticmethod
+    def __is_number_before(result_bytes: bytes,
+                           position: int) -> bool:
+        """
+        :return: True if the bytes right before `position` are the beginning of a number and not part of a string
+        """
+
+        start = position
+
+        while start > 0 and result_bytes[start - 1] in number_chars:
+            start -= 1
+
+        return start < position and (start == 0 or result_bytes[start - 1] in number_separators)
+
+
+default_json_codec: JsonCodec = JsonCodec.create_default()
@@ -0,0 +1,41 @@
+import re
+from typing import Union
+
+# Line breaks and indentation as added by `JsonCodec.dumps_indented`, they can't be part of a valid json string
+indentation_pattern = re.compile(r"\r?\n *")
+indented_key_separator = '": '
+minified_key_separator = '":'
+# Could be an escaped quote inside a string followed by ": " or an escaped backslash at the end of a key
+ambiguous_key_separator = '\\": '
+# A quote that opens a string follows one of these or the start of the minified json. If such a string started with
+# ": ", its space was removed like the one of a key separator. Could also be a key that ends with one of these.
+ambiguous_string_starts = ('{":', '[":', ',":', ':":')
+
+
+class JsonText:
+    """
+    Works on json as text, without parsing it.
+    """
+
+    @staticmethod
+    def minify_indented(json_str: str) -> Union[str, None]:
+        """
+        Removes the line breaks and indentation `JsonCodec.dumps_indented` adds to the given json (`json_str`).
+        The result is neither validated nor normalized. It only equals `JsonCodec.minify(json_str)` if `json_str` is
+        formatted like `JsonCodec.dumps_indented` would format it.
+        Can be used to check whether `json_str` still contains a known value, without parsing it.
+
+        :return: The minified json or None if it can't be minified without parsing it, e.g. if a string starts with
+        ": " and can't be told apart from a key separator
+        """
+
+        if ambiguous_key_separator in json_str:
+            return None
+
+        result = indentation_pattern.sub("", json_str).replace(indented_key_separator, minified_key_separator)
+
+        if result.startswith(minified_key_separator) \
+                or any(string_start in result for string_start in ambiguous_string_starts):
+            return None
+
+        return result
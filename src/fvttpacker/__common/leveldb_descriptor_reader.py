@@ -0,0 +1,145 @@
+from typing import Iterator, Set, Tuple
+
+# see `doc/log_format.md` of LevelDB, the MANIFEST (descriptor) uses the same format as the log files
+block_size = 32 * 1024
+record_header_size = 7
+record_type_full = 1
+record_type_first = 2
+record_type_middle = 3
+record_type_last = 4
+
+# see `db/version_edit.cc` of LevelDB
+tag_comparator = 1
+tag_log_number = 2
+tag_next_file_number = 3
+tag_last_sequence = 4
+tag_compact_pointer = 5
+tag_deleted_file = 6
+tag_new_file = 7
+tag_prev_log_number = 9
+
+
+class LevelDBVersion:
+    """
+    The files a LevelDB consists of, as recorded in its MANIFEST.
+    """
+
+    def __init__(self):
+        # log files with this or a higher number contain entries that are not in the table files yet
+        self.log_number = 0
+        # 0 if there is none
+        self.prev_log_number = 0
+        # all files in use have a lower number
+        self.next_file_number = 0
+        self.table_file_numbers: Set[int] = set()
+
+
+class LevelDBDescriptorReader:
+
+    @staticmethod
+    def read_version(descriptor_bytes: bytes) -> LevelDBVersion:
+        """
+        Applies all version edits of the given MANIFEST (`descriptor_bytes`).
+        An incomplete record at the end is ignored, like LevelDB does.
+        """
+
+        result = LevelDBVersion()
+
+        for record in LevelDBDescriptorReader.__read_records(descriptor_bytes):
+            offset = 0
+
+            while offset < len(record):
+                (tag, offset) = LevelDBDescriptorReader.__read_varint(record, offset)
+
+                if tag == tag_comparator:
+                    (_, offset) = LevelDBDescriptorReader.__read_length_prefixed(record, offset)
+                elif tag == tag_log_number:
+                    (result.log_number, offset) = LevelDBDescriptorReader.__read_varint(record, offset)
+                elif tag == tag_next_file_number:
+                    (result.next_file_number, offset) = LevelDBDescriptorReader.__read_varint(record, offset)
+                elif tag == tag_last_sequence:
+                    (_, offset) = LevelDBDescriptorReader.__read_varint(record, offset)
+                elif tag == tag_compact_pointer:
+                    (_, offset) = LevelDBDescriptorReader.__read_varint(record, offset)
+                    (_, offset) = LevelDBDescriptorReader.__read_length_prefixed(record, offset)
+                elif tag == tag_deleted_file:
+                    (_, offset) = LevelDBDescriptorReader.__read_varint(record, offset)
+                    (file_number, offset) = LevelDBDescriptorReader.__read_varint(record, offset)
+                    result.table_file_numbers.discard(file_number)
+                elif tag == tag_new_file:
+                    (_, offset) = LevelDBDescriptorReader.__read_varint(record, offset)
+                    (file_number, offset) = LevelDBDescriptorReader.__read_varint(record, offset)
+                    # file size
+                    (_, offset) = LevelDBDescriptorReader.__read_varint(record, offset)
+                    # smallest and largest key
+                    (_, offset) = LevelDBDescriptorReader.__read_length_prefixed(record, offset)
+                    (_, offset) = LevelDBDescriptorReader.__read_length_prefixed(record, offset)
+                    result.table_file_numbers.add(file_number)
+                elif tag == tag_prev_log_number:
+                    (result.prev_log_number, offset) = LevelDBDescriptorReader.__read_varint(record, offset)
+                else:
+                    raise ValueError(f"Unknown tag {tag} in LevelDB MANIFEST")
+
+        return result
+
+    @staticmethod
+    def __read_records(data: bytes) -> Iterator[bytes]:
+        """
+        Reassembles the records, which are split into fragments at the block boundaries.
+        """
+
+        offset = 0
+        fragments = bytearray()
+
+        while True:
+            remaining_in_block = block_size - offset % block_size
+
+            # the rest of a block that is too small for a header is padded with zeros
+            if remaining_in_block < record_header_size:
+                offset += remaining_in_block
+                continue
+
+            if offset + record_header_size > len(data):
+                return
+
+            # 4 bytes checksum, 2 bytes length, 1 byte type
+            length = data[offset + 4] | (data[offset + 5] << 8)
+            record_type = data[offset + 6]
+            start = offset + record_header_size
+            offset = start + length
+
+            if offset > len(data) or record_type == 0:
+                return
+
+            if record_type in (record_type_full, record_type_first):
+                fragments = bytearray()
+
+            fragments += data[start:offset]
+
+            if record_type in (record_type_full, record_type_last):
+                yield bytes(fragments)
+
+    @staticmethod
+    def __read_varint(data: bytes,
+                      offset: int) -> Tuple[int, int]:
+        """
+        :return: The value and the offset after it
+        """
+
+        result = 0
+        shift = 0
+
+        while True:
+            byte = data[offset]
+            offset += 1
+            result |= (byte & 0x7f) << shift
+            shift += 7
+
+            if byte < 0x80:
+                return result, offset
+
+    @staticmethod
+    def __read_length_prefixed(data: bytes,
+                               offset: int) -> Tuple[bytes, int]:
+        (length, offset) = LevelDBDescriptorReader.__read_varint(data, offset)
+        return data[offset:offset + length], offset + length
@@ -1,10 +1,33 @@
+import ctypes
 import logging
+import os
+import shutil
+import sys
+import tempfile
 from pathlib import Path
-from typing import Union
+from typing import Iterator, Tuple, Union
 
 import plyvel
 
+from fvttpacker.__common.leveldb_descriptor_reader import LevelDBDescriptorReader
+from fvttpacker.__common.manifest import db_log_file_suffix, db_table_file_suffixes
+from fvttpacker.__common.stat_cache import StatCache
+from fvttpacker.__constants import UTF_8
 from fvttpacker.fvttpacker_exception import FvttPackerException
+from fvttpacker.key_filter import KeyFilter
+from fvttpacker.leveldb_options import LevelDBOptions
+
+staging_db_suffix = ".fvttpacker-staging"
+old_db_suffix = ".fvttpacker-old"
+# followed by a random part, so several copies of the same LevelDB can exist at the same time
+snapshot_db_infix = ".fvttpacker-snapshot-"
+
+# how often a LevelDB is copied again because it changed while it was copied, see `copy_db_snapshot`
+max_snapshot_attempts = 5
+
+# see `man 2 renameat2`
+at_fdcwd = -100
+rename_exchange = 2
 
 
 class LevelDBHelper:
@@ -12,14 +35,17 @@ class LevelDBHelper:
     @staticmethod
     def try_open_db(path_to_db: Path,
                     skip_checks: bool,
-                    must_exist: bool) -> Union[plyvel.DB, None]:
+                    must_exist: bool,
+                    leveldb_options: LevelDBOptions = LevelDBOptions()) -> Union[plyvel.DB, None]:
         """
         Tries to open the LevelDB at the given path (`path_to_db`)
-
+        Opening it is the check whether it is a LevelDB, there is no separate test-open.
 
         :param path_to_db: Path to the LevelDB to open.
-        :param skip_checks: TODO
-        :param must_exist: TODO
+        :param skip_checks: If True, the path is not checked with `assert_path_to_db_is_ok` before it is opened, e.g.
+        because the decorator of the public function already checked it
+        :param must_exist: If True, the LevelDB must already exist, otherwise it is created if it is missing
+        :param leveldb_options: Options the LevelDB is opened with
 
         :return: The handle to the db.
         """
@@ -35,47 +61,246 @@ class LevelDBHelper:
             # bool_create_if_missing is not working even though it is suggested
             # use create_if_missing instead
             return plyvel.DB(str(path_to_db),
-                             create_if_missing=not must_exist)
+                             create_if_missing=not must_exist,
+                             **leveldb_options.to_plyvel_kwargs())
         except plyvel.Error as err:
             raise FvttPackerException(f"Unable to open {path_to_db} as leveldb.", err)
 
+    @staticmethod
+    def iterate_db(db: plyvel.DB,
+                   key_filter: KeyFilter = KeyFilter()) -> Iterator[Tuple[bytes, bytes]]:
+        """
+        Only reads the key ranges of the given LevelDB (`db`) that can contain keys selected by the given filter
+        (`key_filter`), see `KeyFilter.get_key_ranges`.
+
+        :return: Iterator over the selected (key, value) tuples, sorted by key
+        """
+
+        if key_filter.is_everything():
+            yield from db.iterator()
+            return
+
+        for (start, stop) in key_filter.get_key_ranges():
+            for (key_bytes, value_bytes) in db.iterator(start=start, stop=stop):
+                if key_filter.matches(key_bytes.decode(UTF_8)):
+                    yield key_bytes, value_bytes
+
+    @staticmethod
+    def get_path_to_staging_db(path_to_db: Path) -> Path:
+        """
+        :return: Where a new LevelDB that replaces the given one (`path_to_db`) is written.
+        It's next to it, so they are on the same filesystem and can be swapped by renaming them.
+        """
+        return path_to_db.with_name(path_to_db.name + staging_db_suffix)
+
+    @staticmethod
+    def replace_db(path_to_new_db: Path,
+                   path_to_db: Path) -> Union[Path, None]:
+        """
+        Replaces the LevelDB at the given path (`path_to_db`) with the new one (`path_to_new_db`). Both must be closed.
+        The old LevelDB is kept, so it can be put back with `restore_db`, and has to be deleted by the caller.
+        On Linux both directories are exchanged with a single atomic rename, so there is no moment without a LevelDB
+        at `path_to_db`. Elsewhere the old LevelDB is moved aside first.
+
+        :return: Where the old LevelDB is now, None if there was none
+        """
+
+        if not path_to_db.exists():
+            path_to_new_db.rename(path_to_db)
+            return None
+
+        if LevelDBHelper.__try_exchange(path_to_new_db, path_to_db):
+            # the new path contains the old LevelDB now
+            return path_to_new_db
+
+        path_to_old_db = path_to_db.with_name(path_to_db.name + old_db_suffix)
+        shutil.rmtree(path_to_old_db, ignore_errors=True)
+
+        path_to_db.rename(path_to_old_db)
+        path_to_new_db.rename(path_to_db)
+
+        return path_to_old_db
+
+    @staticmethod
+    def restore_db(path_to_old_db: Union[Path, None],
+                   path_to_db: Path) -> None:
+        """
+        Puts the old LevelDB (`path_to_old_db`) that `replace_db` returned back to the given path (`path_to_db`) and
+        deletes the LevelDB that replaced it. Both must be closed.
+        """
+
+        logging.warning("Restoring the LevelDB that was replaced at '%s'", path_to_db)
+
+        if path_to_old_db is None:
+            shutil.rmtree(path_to_db)
+            return
+
+        if LevelDBHelper.__try_exchange(path_to_old_db, path_to_db):
+            # the old path contains the replacing LevelDB now
+            shutil.rmtree(path_to_old_db)
+            return
+
+        shutil.rmtree(path_to_db)
+        path_to_old_db.rename(path_to_db)
+
+    @staticmethod
+    def copy_db_snapshot(path_to_db: Path) -> Path:
+        """
+        Copies the LevelDB at the given path (`path_to_db`) into a new directory next to it, without opening it.
+        So it also works while another process, e.g. a running Foundry, holds the LOCK of the LevelDB.
+        Table files are never modified, they are hard-linked if possible. The MANIFEST and the log files are copied.
+
+        :return: The path to the copy, which has to be deleted by the caller
+        """
+
+        for _ in range(max_snapshot_attempts):
+            path_to_copy = Path(tempfile.mkdtemp(prefix=path_to_db.name + snapshot_db_infix,
+                                                 dir=path_to_db.parent))
+
+            try:
+                is_consistent = LevelDBHelper.__try_copy_db(path_to_db, path_to_copy)
+            except BaseException:
+                shutil.rmtree(path_to_copy, ignore_errors=True)
+                raise
+
+            if is_consistent:
+                logging.debug("Copied LevelDB '%s' to '%s'", path_to_db, path_to_copy)
+                return path_to_copy
+
+            shutil.rmtree(path_to_copy, ignore_errors=True)
+            logging.info("LevelDB '%s' changed while it was copied, copying it again", path_to_db)
+
+        raise FvttPackerException(f"LevelDB '{path_to_db}' kept changing while it was copied.")
+
+    @staticmethod
+    def __try_copy_db(path_to_db: Path,
+                      path_to_copy: Path) -> bool:
+        """
+        Only the table files that the MANIFEST refers to are linked. Other ones may still be written by a compaction and
+        opening the copy could create a file with the same number, which would truncate the linked original.
+        LevelDB records every new table file in the MANIFEST before it deletes any file. So if the MANIFEST did not
+        change while the files were copied, the copy contains all files the copied MANIFEST refers to.
+        Log files may be copied in the middle of a write, LevelDB skips the incomplete record at the end.
+
+        :return: True if the copy is consistent
+        """
+
+        current_bytes = LevelDBHelper.__read_current(path_to_db)
+        path_to_manifest = path_to_db.joinpath(current_bytes.decode().strip())
+
+        try:
+            manifest_size = os.stat(path_to_manifest).st_size
+            manifest_bytes = path_to_manifest.read_bytes()
+        except FileNotFoundError:
+            # replaced by a new MANIFEST
+            return False
+
+        path_to_copy.joinpath(path_to_manifest.name).write_bytes(manifest_bytes)
+
+        try:
+            version = LevelDBDescriptorReader.read_version(manifest_bytes)
+        except (ValueError, IndexError) as err:
+            raise FvttPackerException(f"Unable to copy {path_to_db} as leveldb, its MANIFEST can't be read.", err)
+
+        try:
+            for file_number in version.table_file_numbers:
+                LevelDBHelper.__link_table_file(path_to_db, path_to_copy, file_number)
+
+            for name in os.listdir(path_to_db):
+                if not name.endswith(db_log_file_suffix):
+                    continue
+
+                file_number = int(name[0:-len(db_log_file_suffix)])
+
+                if file_number >= version.log_number or file_number == version.prev_log_number:
+                    shutil.copyfile(path_to_db.joinpath(name), path_to_copy.joinpath(name))
+        except FileNotFoundError:
+            # deleted after a new MANIFEST was written
+            return False
+
+        path_to_copy.joinpath("CURRENT").write_bytes(current_bytes)
+
+        try:
+            return LevelDBHelper.__read_current(path_to_db) == current_bytes \
+                and os.stat(path_to_manifest).st_size == manifest_size
+        except FileNotFoundError:
+            return False
+
+    @staticmethod
+    def __read_current(path_to_db: Path) -> bytes:
+        """
+        :return: The content of the CURRENT file, i.e. the name of the MANIFEST that is in use
+        """
+
+        try:
+            return path_to_db.joinpath("CURRENT").read_bytes()
+        except FileNotFoundError:
+            raise FvttPackerException(f"Unable to copy {path_to_db} as leveldb, it has no CURRENT file.")
+
+    @staticmethod
+    def __link_table_file(path_to_db: Path,
+                          path_to_copy: Path,
+                          file_number: int) -> None:
+        """
+        Hard-links the table file with the given number (`file_number`) into the copy, or copies it if the filesystem
+        doesn't support hard links.
+        """
+
+        # older versions of LevelDB named them .sst
+        for suffix in db_table_file_suffixes:
+            name = f"{file_number:06d}{suffix}"
+
+            try:
+                os.link(path_to_db.joinpath(name), path_to_copy.joinpath(name))
+                return
+            except FileNotFoundError:
+                continue
+            except OSError:
+                shutil.copyfile(path_to_db.joinpath(name), path_to_copy.joinpath(name))
+                return
+
+        raise FileNotFoundError(f"Missing table file {file_number} in '{path_to_db}'")
+
+    @staticmethod
+    def __try_exchange(path_to_a: Path,
+                       path_to_b: Path) -> bool:
+        """
+        :return: True if the given paths were exchanged atomically
+        """
+
+        if not sys.platform.startswith("linux"):
+            return False
+
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            renameat2 = libc.renameat2
+        except (OSError, AttributeError):
+            return False
+
+        # fails e.g. on filesystems that don't support it
+        return renameat2(at_fdcwd, bytes(path_to_a), at_fdcwd, bytes(path_to_b), rename_exchange) == 0
+
     @staticmethod
     def assert_path_to_db_is_ok(path_to_db: Path,
                                 must_exist):
+        """
+        Checks the given path (`path_to_db`) without opening the LevelDB, that only happens in `try_open_db`.
+        Opening a LevelDB replays its log and loads its manifest, so it should only happen once.
+        """
 
         # may have to exist
-        if must_exist and not path_to_db.exists():
+        if must_exist and not StatCache.exists(path_to_db):
             raise FvttPackerException(f"Directory '{path_to_db}' does not exist")
 
         # if exists, has to be a directory
-        if path_to_db.exists() and not path_to_db.is_dir():
+        if StatCache.exists(path_to_db) and not StatCache.is_dir(path_to_db):
             raise FvttPackerException(f"Path '{path_to_db}' exists but not as a directory.")
 
         # TODO: write test-case
-        # if exists and dir, must be openable as LevelDB
-        if path_to_db.exists() and not LevelDBHelper.test_open_as_leveldb(path_to_db):
+        # if exists and dir, must look like a LevelDB
+        if StatCache.exists(path_to_db) and not LevelDBHelper.__check_for_necessary_files(path_to_db):
             raise FvttPackerException(f"Path '{path_to_db}' cannot be opened as LevelDB")
 
-    @staticmethod
-    def test_open_as_leveldb(path_to_db: Path):
-
-        if not LevelDBHelper.__check_for_necessary_files(path_to_db):
-            return False
-
-        try:
-            logging.debug("Checking if '%s' can be opened as LevelDB",
-                          path_to_db)
-            db = plyvel.DB(str(path_to_db))
-            db.close()
-            logging.debug("'%s' can be opened as LevelDB",
-                          path_to_db)
-            return True
-        except plyvel.Error as err:
-            logging.debug("'%s' can not opened as LevelDB, reason: %s",
-                          path_to_db,
-                          err)
-            return False
-
     @staticmethod
     def __check_for_necessary_files(path_to_db: Path) -> bool:
         """
@@ -90,7 +315,7 @@ class LevelDBHelper:
                       path_to_db)
 
         # empty directories are ok
-        children = list(path_to_db.glob("*"))
+        children = StatCache.list_dir(path_to_db)
 
         if len(children) == 0:
             return True
@@ -100,13 +325,13 @@ class LevelDBHelper:
         current_found = False
 
         for child in children:
-            if child.name == "LOCK":
+            if child == "LOCK":
                 lock_found = True
                 logging.debug("Found LOCK")
-            if child.name == "LOG":
+            if child == "LOG":
                 log_found = True
                 logging.debug("Found LOG")
-            if child.name == "CURRENT":
+            if child == "CURRENT":
                 current_found = True
                 logging.debug("Found CURRENT")
 
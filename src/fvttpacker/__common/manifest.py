@@ -0,0 +1,189 @@
+import hashlib
+import json
+import logging
+import os
+from json import JSONDecodeError
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+from fvttpacker.__common.metrics_recorder import MetricsRecorder
+from fvttpacker.__constants import UTF_8
+from fvttpacker.dir_layout import DirLayout
+from fvttpacker.metrics import Stage
+
+# (size, mtime in ns)
+FileStat = Tuple[int, int]
+
+manifest_file_name = ".fvttpacker-manifest"
+manifest_version = 1
+
+# Files of a LevelDB that only change when its content changes, see `Manifest.compute_db_digest`
+db_table_file_suffixes = (".ldb", ".sst")
+db_log_file_suffix = ".log"
+
+
+class ManifestEntry:
+
+    def __init__(self,
+                 file_stat: FileStat,
+                 value_hash: str):
+        """
+        :param file_stat: Size and mtime of the json file of the entry
+        :param value_hash: Hash of the (minified) value of the entry as stored in the LevelDB
+        """
+        self.file_stat = file_stat
+        self.value_hash = value_hash
+
+
+class Manifest:
+    """
+    Remembers the state of a directory and of the LevelDB it was last packed into or unpacked from.
+    It is stored inside the directory (see `manifest_file_name`).
+
+    As long as the digest of the LevelDB did not change, the LevelDB still contains exactly the values whose hashes
+    are stored in the entries. As long as the stat of a file did not change, the file still contains the value whose
+    hash is stored in its entry.
+    """
+
+    def __init__(self,
+                 path_to_db: Path,
+                 db_digest: Union[str, None] = None,
+                 entries: Union[Dict[str, ManifestEntry], None] = None):
+        self.path_to_db = path_to_db
+        self.db_digest = db_digest
+        self.entries: Dict[str, ManifestEntry] = entries if entries is not None else dict()
+
+    @staticmethod
+    def load(path_to_dir: Path,
+             path_to_db: Path) -> "Manifest":
+        """
+        Loads the manifest stored in the given directory (`path_to_dir`).
+        If there is none, or it belongs to another LevelDB than the given one (`path_to_db`), an empty manifest is
+        returned, which is in sync with nothing.
+        """
+
+        path_to_manifest = path_to_dir.joinpath(manifest_file_name)
+
+        try:
+            with open(path_to_manifest, "rt", encoding=UTF_8) as file:
+                manifest_dict = json.load(file)
+        except (FileNotFoundError, NotADirectoryError):
+            return Manifest(path_to_db)
+        except JSONDecodeError as err:
+            logging.warning("Ignoring manifest '%s', reason: %s", path_to_manifest, err)
+            return Manifest(path_to_db)
+
+        if manifest_dict.get("version") != manifest_version \
+                or manifest_dict.get("db") != str(path_to_db.resolve()):
+            logging.info("Ignoring manifest '%s', it does not belong to '%s'", path_to_manifest, path_to_db)
+            return Manifest(path_to_db)
+
+        entries: Dict[str, ManifestEntry] = dict()
+
+        for (key, (size, mtime_ns, value_hash)) in manifest_dict["entries"].items():
+            entries[key] = ManifestEntry((size, mtime_ns), value_hash)
+
+        return Manifest(path_to_db,
+                        manifest_dict["db_digest"],
+                        entries)
+
+    def save(self,
+             path_to_dir: Path) -> None:
+
+        manifest_dict = {
+            "version": manifest_version,
+            "db": str(self.path_to_db.resolve()),
+            "db_digest": self.db_digest,
+            "entries": {key: [entry.file_stat[0], entry.file_stat[1], entry.value_hash]
+                        for (key, entry) in self.entries.items()}
+        }
+
+        with open(path_to_dir.joinpath(manifest_file_name), "wt", encoding=UTF_8) as file:
+            json.dump(manifest_dict, file, separators=(",", ":"))
+
+    def is_in_sync_with_db(self) -> bool:
+        return self.db_digest is not None and self.db_digest == Manifest.compute_db_digest(self.path_to_db)
+
+    def get_changed_and_deleted_keys(self,
+                                     file_stats: Dict[str, FileStat]) -> Tuple[List[str], List[str]]:
+        """
+        :param file_stats: Current stats of the files in the directory, see `stat_dir`
+        :return: The keys whose files are new or were modified and the keys whose files were deleted
+        """
+
+        changed_keys = [key for (key, file_stat) in file_stats.items()
+                        if key not in self.entries or self.entries[key].file_stat != file_stat]
+
+        deleted_keys = [key for key in self.entries.keys() if key not in file_stats]
+
+        return changed_keys, deleted_keys
+
+    def is_entry_unchanged(self,
+                           key: str,
+                           value_hash: str,
+                           file_stats: Dict[str, FileStat]) -> bool:
+        """
+        :return: True if the given value and the file of the given key are both still as they were recorded.
+        """
+
+        entry = self.entries.get(key)
+
+        return entry is not None \
+            and entry.value_hash == value_hash \
+            and file_stats.get(key) == entry.file_stat
+
+    @staticmethod
+    def hash_value(value_bytes: bytes) -> str:
+        return hashlib.blake2b(value_bytes, digest_size=16).hexdigest()
+
+    @staticmethod
+    def compute_db_digest(path_to_db: Path) -> Union[str, None]:
+        """
+        Computes a digest over the names and sizes of the table files and the non-empty log files of the given LevelDB
+        (`path_to_db`).
+        Table files are never modified and file numbers are never reused. Every write appends to the log file, which
+        is eventually turned into a new table file. So the digest changes whenever the content changes.
+        Opening and closing the LevelDB without writing only replaces the empty log file, the MANIFEST and CURRENT,
+        which is why those are left out.
+
+        :return: The digest or None if the LevelDB does not exist
+        """
+
+        digest = hashlib.blake2b(digest_size=16)
+
+        try:
+            dir_entries = sorted(os.scandir(path_to_db), key=lambda dir_entry: dir_entry.name)
+        except FileNotFoundError:
+            return None
+
+        for dir_entry in dir_entries:
+            size = dir_entry.stat().st_size
+
+            is_table_file = dir_entry.name.endswith(db_table_file_suffixes)
+            is_non_empty_log_file = dir_entry.name.endswith(db_log_file_suffix) and size > 0
+
+            if is_table_file or is_non_empty_log_file:
+                digest.update(f"{dir_entry.name}:{size}\n".encode(UTF_8))
+
+        return digest.hexdigest()
+
+    @staticmethod
+    def stat_dir(path_to_dir: Path) -> Dict[str, FileStat]:
+        """
+        :return: The keys of the json files in the given directory (`path_to_dir`) mapped to their stats.
+        The files are looked up according to the layout of the directory, see `DirLayout`.
+        """
+
+        result: Dict[str, FileStat] = dict()
+
+        with MetricsRecorder.time(Stage.dir_scan):
+            for (key, dir_entry) in DirLayout.load(path_to_dir).list_files(path_to_dir):
+                try:
+                    stat_result = dir_entry.stat()
+                except FileNotFoundError:
+                    # deleted since the directory was listed
+                    continue
+
+                result[key] = (stat_result.st_size, stat_result.st_mtime_ns)
+
+        return result
@@ -0,0 +1,187 @@
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator, List, TypeVar, Union
+
+from fvttpacker.__common.change_counts import ChangeCounts, ChangeType
+from fvttpacker.metrics import Metrics, MetricsObserver
+
+T = TypeVar("T")
+
+# Marks the end of an iterator, None can't be used as it might be an item
+end_of_iterator = object()
+
+
+class StageTimer:
+    """
+    Measures the time of a stage, without the time of the stages that happen within it.
+    """
+
+    def __init__(self,
+                 metrics: Metrics,
+                 stage: str,
+                 active_timers: List["StageTimer"]):
+        self.__metrics = metrics
+        self.__stage = stage
+        self.__active_timers = active_timers
+        self.__start = 0.0
+        self.__nested_seconds = 0.0
+
+    def __enter__(self) -> "StageTimer":
+        self.__active_timers.append(self)
+        self.__start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        seconds = time.perf_counter() - self.__start
+
+        self.__active_timers.pop()
+
+        if len(self.__active_timers) > 0:
+            self.__active_timers[-1].__nested_seconds += seconds
+
+        self.__metrics.add_stage_time(self.__stage, seconds - self.__nested_seconds)
+
+
+class NoOpStageTimer:
+
+    def __enter__(self) -> "NoOpStageTimer":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        pass
+
+
+no_op_stage_timer = NoOpStageTimer()
+
+
+class RecorderState(threading.local):
+    """
+    The state of the `MetricsRecorder` of the current thread.
+    """
+
+    def __init__(self):
+        self.metrics: Union[Metrics, None] = None
+        self.active_timers: List[StageTimer] = list()
+
+
+class MetricsRecorder:
+    """
+    Records the metrics of the current thread while recording is started.
+    As long as it's not started, all methods do (almost) nothing, so they can be called everywhere.
+    Other threads and processes record their own metrics, which are added with `add`, see `ChunkExecutor`.
+    """
+
+    __state = RecorderState()
+
+    @staticmethod
+    def start() -> Metrics:
+        """
+        :return: The metrics the recording goes into, until `stop` is called
+        """
+
+        MetricsRecorder.__state.metrics = Metrics()
+        MetricsRecorder.__state.active_timers = list()
+
+        return MetricsRecorder.__state.metrics
+
+    @staticmethod
+    def stop() -> None:
+        MetricsRecorder.__state.metrics = None
+
+    @staticmethod
+    @contextmanager
+    def observe(observer: Union[MetricsObserver, None]) -> Iterator[None]:
+        """
+        Records the metrics of everything that happens within the `with` block and passes them to the given observer
+        (`observer`) if the block finishes successfully. Nothing is recorded if `observer` is None.
+
+        Usage: `with MetricsRecorder.observe(pack_options.metrics_observer): ...`
+        """
+
+        if observer is None:
+            yield
+            return
+
+        metrics = MetricsRecorder.start()
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            MetricsRecorder.stop()
+
+        metrics.total_seconds = time.perf_counter() - start
+        observer.on_metrics(metrics)
+
+    @staticmethod
+    def is_recording() -> bool:
+        return MetricsRecorder.__state.metrics is not None
+
+    @staticmethod
+    def time(stage: str) -> Union[StageTimer, NoOpStageTimer]:
+        """
+        Usage: `with MetricsRecorder.time(Stage.file_read): ...`
+        """
+
+        metrics = MetricsRecorder.__state.metrics
+
+        if metrics is None:
+            return no_op_stage_timer
+
+        return StageTimer(metrics, stage, MetricsRecorder.__state.active_timers)
+
+    @staticmethod
+    def time_iterator(items: Iterable[T],
+                      stage: str) -> Iterator[T]:
+        """
+        Measures the time it takes to get each item of the given items (`items`), e.g. of a LevelDB iterator.
+        """
+
+        iterator = iter(items)
+
+        while True:
+            with MetricsRecorder.time(stage):
+                item = next(iterator, end_of_iterator)
+
+            if item is end_of_iterator:
+                return
+
+            yield item
+
+    @staticmethod
+    def count(counter: str,
+              value: int) -> None:
+        metrics = MetricsRecorder.__state.metrics
+
+        if metrics is not None:
+            metrics.add_to_counter(counter, value)
+
+    @staticmethod
+    def count_target(path_to_target: Path,
+                     change_counts: ChangeCounts) -> None:
+        """
+        Records what happened to the entries of the given target LevelDB or directory (`path_to_target`).
+        """
+
+        metrics = MetricsRecorder.__state.metrics
+
+        if metrics is not None:
+            metrics.targets[str(path_to_target)] = {
+                ChangeType.created: change_counts.nb_created,
+                ChangeType.updated: change_counts.nb_updated,
+                ChangeType.deleted: change_counts.nb_deleted,
+                ChangeType.unchanged: change_counts.nb_unchanged
+            }
+
+    @staticmethod
+    def add(metrics: Metrics) -> None:
+        """
+        Adds the given metrics (`metrics`), e.g. the ones recorded by a worker process or thread.
+        """
+
+        recorded_metrics = MetricsRecorder.__state.metrics
+
+        if recorded_metrics is not None:
+            recorded_metrics.add(metrics)
@@ -1,6 +1,8 @@
 from pathlib import Path
 from typing import Dict, List, Callable
 
+from fvttpacker.__common.stat_cache import StatCache
+
 callable_type = Callable[[List[Path]], Dict[Path, bool]]
 
 
@@ -13,7 +15,7 @@ class OverwriteHelper:
         # look for existing targets
         paths_to_existing_target_dbs: List[Path] = list()
         for (path_to_input_dir, path_to_target_db) in input_paths_to_target_paths.items():
-            if path_to_target_db.exists():
+            if StatCache.exists(path_to_target_db):
                 paths_to_existing_target_dbs.append(path_to_target_db)
 
         # ask which existing targets should be overwritten
@@ -0,0 +1,88 @@
+import os
+import stat
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Union
+
+
+class StatCache:
+    """
+    Caches the stats and directory listings used by the checks that happen before a pack or unpack, so the checks of
+    a call only look at each path once, even though they check overlapping paths (e.g. a LevelDB and its files).
+    As long as no cache is shared (see `share`), nothing is cached.
+
+    The cached results are the state at the beginning of the operation. They must only be used by checks that happen
+    before anything is written.
+    """
+
+    __stats: Union[Dict[Path, Union[os.stat_result, None]], None] = None
+    __listings: Union[Dict[Path, List[str]], None] = None
+
+    @staticmethod
+    @contextmanager
+    def share() -> Iterator[None]:
+        """
+        Shares a cache with everything that happens within the `with` block.
+        If a cache is already shared (i.e. in a nested call), that one is used.
+        """
+
+        if StatCache.__stats is not None:
+            yield
+            return
+
+        StatCache.__stats = dict()
+        StatCache.__listings = dict()
+
+        try:
+            yield
+        finally:
+            StatCache.__stats = None
+            StatCache.__listings = None
+
+    @staticmethod
+    def stat(path: Path) -> Union[os.stat_result, None]:
+        """
+        :return: The stat of the given path (`path`), following symlinks, or None if it does not exist
+        """
+
+        if StatCache.__stats is not None and path in StatCache.__stats:
+            return StatCache.__stats[path]
+
+        try:
+            result = os.stat(path)
+        except (FileNotFoundError, NotADirectoryError):
+            result = None
+
+        if StatCache.__stats is not None:
+            StatCache.__stats[path] = result
+
+        return result
+
+    @staticmethod
+    def exists(path: Path) -> bool:
+        return StatCache.stat(path) is not None
+
+    @staticmethod
+    def is_dir(path: Path) -> bool:
+        stat_result = StatCache.stat(path)
+
+        return stat_result is not None and stat.S_ISDIR(stat_result.st_mode)
+
+    @staticmethod
+    def list_dir(path_to_dir: Path) -> List[str]:
+        """
+        :return: The names of the children of the given directory (`path_to_dir`), empty if it does not exist
+        """
+
+        if StatCache.__listings is not None and path_to_dir in StatCache.__listings:
+            return StatCache.__listings[path_to_dir]
+
+        try:
+            result = os.listdir(path_to_dir)
+        except (FileNotFoundError, NotADirectoryError):
+            result = list()
+
+        if StatCache.__listings is not None:
+            StatCache.__listings[path_to_dir] = result
+
+        return result
@@ -22,3 +22,7 @@ world_db_names = ["actors",
                   "settings",
                   "tables",
                   "users"]
+
+# the fields of each line of newline delimited json, see `NdjsonToDictReader`
+ndjson_key_field = "key"
+ndjson_value_field = "value"
@@ -0,0 +1,124 @@
+import logging
+from typing import Union
+
+import plyvel
+
+from fvttpacker.__common.checkpoint_journal import CheckpointJournal
+from fvttpacker.__common.metrics_recorder import MetricsRecorder
+from fvttpacker.__constants import UTF_8
+from fvttpacker.__packer.__leveldb_write_journal import LevelDBWriteJournal
+from fvttpacker.metrics import Counter, Stage
+from fvttpacker.pack_options import PackOptions
+
+
+class WriteBatchOptions:
+
+    def __init__(self,
+                 max_bytes: Union[int, None] = None,
+                 max_entries: Union[int, None] = None,
+                 sync: bool = False):
+        """
+        :param max_bytes: Approximate number of bytes of keys and values after which a batch is written into the
+        LevelDB and a new one is started. None means no limit.
+        :param max_entries: Number of puts and deletes after which a batch is written. None means no limit.
+        :param sync: If True each batch is synced to disk before its write returns
+        """
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.sync = sync
+
+    @staticmethod
+    def from_pack_options(pack_options: PackOptions) -> "WriteBatchOptions":
+        max_bytes = pack_options.max_batch_bytes
+
+        if max_bytes is None and pack_options.streaming and pack_options.memory_limit is not None:
+            # the other half is for the chunks of files that are read ahead, see `DirToDictReader.read_dir_as_entries`
+            max_bytes = pack_options.memory_limit // 2
+
+        return WriteBatchOptions(max_bytes=max_bytes,
+                                 max_entries=pack_options.max_batch_entries,
+                                 sync=pack_options.sync)
+
+
+class BatchWriter:
+    """
+    Collects puts and deletes in a batch and writes it into the LevelDB whenever it reaches one of the limits of the
+    given `WriteBatchOptions`. Without limits everything is written with a single batch by `flush`.
+    """
+
+    def __init__(self,
+                 db: plyvel.DB,
+                 batch_options: WriteBatchOptions,
+                 journal: Union[LevelDBWriteJournal, None] = None,
+                 checkpoint: Union[CheckpointJournal, None] = None):
+        """
+        :param journal: If given, every key is recorded in it before it is written
+        :param checkpoint: If given, it is advanced to the last key of each batch once the batch is written, so the
+        keys must be written in sorted order
+        """
+        self.__db = db
+        self.__batch_options = batch_options
+        self.__journal = journal
+        self.__checkpoint = checkpoint
+
+        # noinspection PyProtectedMember
+        self.__wb: plyvel._plyvel.WriteBatch = db.write_batch(sync=batch_options.sync)
+        self.__batch_size = 0
+        self.__nb_batch_entries = 0
+        self.__last_batch_key: Union[bytes, None] = None
+
+    def put(self,
+            key_bytes: bytes,
+            value_bytes: bytes) -> None:
+        self.__record(key_bytes)
+        self.__wb.put(key_bytes, value_bytes)
+        self.__add(len(key_bytes) + len(value_bytes))
+
+    def delete(self,
+               key_bytes: bytes) -> None:
+        self.__record(key_bytes)
+        self.__wb.delete(key_bytes)
+        self.__add(len(key_bytes))
+
+    def flush(self) -> None:
+        """
+        Writes the current batch, if there is anything in it.
+        """
+
+        if self.__nb_batch_entries == 0:
+            return
+
+        logging.debug("Executing batch of %s entries and %s bytes",
+                      self.__nb_batch_entries,
+                      self.__batch_size)
+
+        with MetricsRecorder.time(Stage.batch_write):
+            self.__wb.write()
+
+        MetricsRecorder.count(Counter.bytes_written, self.__batch_size)
+
+        if self.__checkpoint is not None:
+            self.__checkpoint.advance(self.__last_batch_key.decode(UTF_8))
+
+        self.__wb = self.__db.write_batch(sync=self.__batch_options.sync)
+        self.__batch_size = 0
+        self.__nb_batch_entries = 0
+
+    def __record(self,
+                 key_bytes: bytes) -> None:
+        self.__last_batch_key = key_bytes
+
+        if self.__journal is not None:
+            self.__journal.record(key_bytes)
+
+    def __add(self,
+              size: int) -> None:
+        self.__batch_size += size
+        self.__nb_batch_entries += 1
+
+        max_bytes = self.__batch_options.max_bytes
+        max_entries = self.__batch_options.max_entries
+
+        if (max_bytes is not None and self.__batch_size > max_bytes) \
+                or (max_entries is not None and self.__nb_batch_entries >= max_entries):
+            self.flush()
@@ -1,16 +1,31 @@
 import logging
-from typing import Dict, Tuple
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
 
 import plyvel
 
+from fvttpacker.__common.change_counts import ChangeCounts, ChangeType
+from fvttpacker.__common.checkpoint_journal import CheckpointJournal
+from fvttpacker.__common.leveldb_helper import LevelDBHelper
+from fvttpacker.__common.metrics_recorder import MetricsRecorder
 from fvttpacker.__constants import UTF_8
+from fvttpacker.__packer.__batch_writer import BatchWriter, WriteBatchOptions
+from fvttpacker.__packer.__leveldb_write_journal import LevelDBWriteJournal
+from fvttpacker.fvttpacker_exception import FvttPackerInternalException
+from fvttpacker.key_filter import KeyFilter
+from fvttpacker.metrics import Stage
+
+# (change type, key, new value or None if deleted)
+EntryChange = Tuple[str, bytes, Union[bytes, None]]
+
+# number of entries `estimate_change_ratio` looks up
+default_sample_size = 256
 
 
 class DictToLevelDBWriter:
 
     @staticmethod
     def write_dict_into_db(input_dict: Dict[str, str],
-                           target_db: plyvel.DB) -> int:
+                           target_db: plyvel.DB) -> ChangeCounts:
 
         """
         Packs the given dictionary (`input_dict`) into the given LevelDB (`target_db`).
@@ -20,51 +35,217 @@ class DictToLevelDBWriter:
 
         :param input_dict: The dict to pack into the LevelDB
         :param target_db: The handle of the LevelDB to pack the dict into
-        :return: Number of changed entries
+        :return: What happened to the entries of the LevelDB
         """
 
         logging.info("Packing dict '%s' into LevelDB '%s'",
                      hex(id(input_dict)),
                      hex(id(target_db)))
 
-        # noinspection PyProtectedMember
-        wb: plyvel._plyvel.WriteBatch = target_db.write_batch()
-        logging.debug("Created batch")
+        return DictToLevelDBWriter.write_entries_into_db(sorted(input_dict.items()),
+                                                         target_db)
+
+    @staticmethod
+    def write_entries_into_db(input_entries: Iterable[Tuple[str, str]],
+                              target_db: plyvel.DB,
+                              batch_options: WriteBatchOptions = WriteBatchOptions(),
+                              journal: Union[LevelDBWriteJournal, None] = None,
+                              key_filter: KeyFilter = KeyFilter(),
+                              checkpoint: Union[CheckpointJournal, None] = None) -> ChangeCounts:
+        """
+        Packs the given entries (`input_entries`) into the given LevelDB (`target_db`).
+        Same as `write_dict_into_db`, but the entries are consumed one after another, so they don't have to be in
+        memory all at once.
+
+        :param input_entries: (key, value) tuples to pack into the LevelDB, sorted by key
+        :param target_db: The handle of the LevelDB to pack the entries into
+        :param batch_options: When the changes are written. Without limits they are written with a single batch.
+        :param journal: If given, all changed keys are recorded in it, so they can be rolled back
+        :param key_filter: see `diff_entries`
+        :param checkpoint: If given, it is advanced to the last key of each batch once the batch is written
+        :return: What happened to the entries of the LevelDB
+        """
+
+        batch_writer = BatchWriter(target_db, batch_options, journal, checkpoint)
+        change_counts = ChangeCounts()
+
+        with MetricsRecorder.time(Stage.leveldb_diff):
+            for (change_type, key_bytes, value_bytes) in DictToLevelDBWriter.diff_entries(input_entries,
+                                                                                          target_db,
+                                                                                          key_filter):
+
+                change_counts.count(change_type)
+
+                if change_type == ChangeType.unchanged:
+                    continue
+
+                if change_type == ChangeType.deleted:
+                    batch_writer.delete(key_bytes)
+                    logging.info("Deleted key '%s'", key_bytes.decode(UTF_8))
+                else:
+                    batch_writer.put(key_bytes, value_bytes)
+                    logging.info("Updated key '%s'", key_bytes.decode(UTF_8))
+
+        batch_writer.flush()
+
+        logging.info("Number of changes in db '%s': %s (%s)",
+                     hex(id(target_db)),
+                     change_counts.nb_changes,
+                     change_counts)
+
+        return change_counts
+
+    @staticmethod
+    def write_entries_into_new_db(input_entries: Iterable[Tuple[str, str]],
+                                  new_db: plyvel.DB,
+                                  batch_options: WriteBatchOptions = WriteBatchOptions()) -> ChangeCounts:
+        """
+        Writes the given entries (`input_entries`) into the given LevelDB (`new_db`), which must be empty.
+        Nothing is read from the LevelDB, so there is nothing to compare with: all entries are counted as created.
+
+        :param input_entries: (key, value) tuples, sorted by key
+        :param new_db: The handle of the empty LevelDB to write the entries into
+        :param batch_options: see `write_entries_into_db`
+        :return: What happened to the entries of the LevelDB
+        """
+
+        batch_writer = BatchWriter(new_db, batch_options)
+        change_counts = ChangeCounts()
+        previous_key_bytes: Union[bytes, None] = None
+
+        with MetricsRecorder.time(Stage.leveldb_bulk_load):
+            for (key_str, value_str) in input_entries:
+
+                key_bytes: bytes = key_str.encode(UTF_8)
+                value_bytes: bytes = value_str.encode(UTF_8)
+
+                # unsorted entries would be written correctly, but the order is what makes the writes cheap
+                if previous_key_bytes is not None and key_bytes <= previous_key_bytes:
+                    raise FvttPackerInternalException(f"Entries are not sorted by key, '{key_str}' came too late")
+
+                previous_key_bytes = key_bytes
 
-        entry: Tuple[bytes]
+                batch_writer.put(key_bytes, value_bytes)
+                change_counts.nb_created += 1
 
-        # Remove entries
-        for entry in target_db.iterator():
-            key_bytes: bytes = entry[0]
-            key_str: str = key_bytes.decode(UTF_8)
+        batch_writer.flush()
 
-            if key_str not in input_dict.keys():
-                wb.delete(key_bytes)
-                logging.info("Deleted key '%s'", key_str)
+        logging.info("Number of entries written into new db '%s': %s",
+                     hex(id(new_db)),
+                     change_counts.nb_created)
 
-        key_str: str
-        value_str: str
-        nb_changes: int = 0
+        return change_counts
 
-        for (key_str, value_str) in input_dict.items():
+    @staticmethod
+    def estimate_change_ratio(input_entries: List[Tuple[str, str]],
+                              target_db: plyvel.DB,
+                              sample_size: int = default_sample_size) -> float:
+        """
+        Looks up evenly spread entries of the given ones (`input_entries`) in the given LevelDB (`target_db`).
+        Entries of the LevelDB that would be deleted are not taken into account.
+
+        :return: The estimated fraction of the given entries that are new or changed
+        """
+
+        if len(input_entries) == 0:
+            return 0.0
+
+        sample = input_entries[::max(1, len(input_entries) // sample_size)]
+
+        nb_changed = sum(1 for (key_str, value_str) in sample
+                         if target_db.get(key_str.encode(UTF_8)) != value_str.encode(UTF_8))
+
+        return nb_changed / len(sample)
+
+    @staticmethod
+    def diff_entries(input_entries: Iterable[Tuple[str, str]],
+                     target_db: plyvel.DB,
+                     key_filter: KeyFilter = KeyFilter()) -> Iterator[EntryChange]:
+        """
+        Compares the given entries (`input_entries`) with the entries of the given LevelDB (`target_db`) by merging
+        them with a single pass of a LevelDB iterator. No point lookups are needed.
+        The iterator of each key range reads from an implicit snapshot. Batches written into the LevelDB while the
+        changes are consumed only contain keys that were already compared, so they don't interfere with the comparison.
+
+        :param input_entries: (key, value) tuples, sorted by key, all of them selected by `key_filter`
+        :param target_db: The handle of the LevelDB to compare with
+        :param key_filter: Only the entries of the LevelDB selected by this filter are compared, the others are
+        neither updated nor deleted
+        :return: Iterator over the changes that turn the LevelDB into the given entries, including unchanged entries,
+        sorted by key
+        """
+
+        db_iterator = LevelDBHelper.iterate_db(target_db, key_filter)
+        db_entry = next(db_iterator, None)
+
+        previous_key_bytes: Union[bytes, None] = None
+
+        for (key_str, value_str) in input_entries:
 
             key_bytes: bytes = key_str.encode(UTF_8)
-            target_value_bytes: bytes = value_str.encode(UTF_8)
+            value_bytes: bytes = value_str.encode(UTF_8)
+
+            if previous_key_bytes is not None and key_bytes <= previous_key_bytes:
+                raise FvttPackerInternalException(f"Entries are not sorted by key, '{key_str}' came too late")
+
+            previous_key_bytes = key_bytes
+
+            # entries in the db that come before the current key are not in the input
+            while db_entry is not None and db_entry[0] < key_bytes:
+                yield ChangeType.deleted, db_entry[0], None
+                db_entry = next(db_iterator, None)
+
+            if db_entry is not None and db_entry[0] == key_bytes:
+                if db_entry[1] == value_bytes:
+                    yield ChangeType.unchanged, key_bytes, value_bytes
+                else:
+                    yield ChangeType.updated, key_bytes, value_bytes
+
+                db_entry = next(db_iterator, None)
+            else:
+                yield ChangeType.created, key_bytes, value_bytes
+
+        # remaining entries in the db are not in the input
+        while db_entry is not None:
+            yield ChangeType.deleted, db_entry[0], None
+            db_entry = next(db_iterator, None)
+
+    @staticmethod
+    def write_changes_into_db(changed_entries: Iterable[Tuple[str, str]],
+                              deleted_keys: Iterable[str],
+                              target_db: plyvel.DB,
+                              batch_options: WriteBatchOptions = WriteBatchOptions(),
+                              journal: Union[LevelDBWriteJournal, None] = None) -> ChangeCounts:
+        """
+        Writes only the given changes into the given LevelDB (`target_db`).
+        Unlike `write_entries_into_db` all other entries of the LevelDB are left as they are.
+
+        :param changed_entries: (key, value) tuples of entries that are new or changed
+        :param deleted_keys: Keys of the entries that have to be removed
+        :param target_db: The handle of the LevelDB to write the changes into
+        :param batch_options: see `write_entries_into_db`
+        :param journal: see `write_entries_into_db`
+        :return: What happened to the entries of the LevelDB, new and changed entries are counted as updated
+        """
 
-            current_value_bytes: bytes = target_db.get(key_bytes)
+        batch_writer = BatchWriter(target_db, batch_options, journal)
+        change_counts = ChangeCounts()
 
-            should_put = current_value_bytes is None or current_value_bytes != target_value_bytes
+        for (key_str, value_str) in changed_entries:
+            batch_writer.put(key_str.encode(UTF_8), value_str.encode(UTF_8))
+            change_counts.nb_updated += 1
+            logging.info("Updated key '%s'", key_str)
 
-            if should_put:
-                wb.put(key_bytes, input_dict[key_str].encode(UTF_8))
-                nb_changes += 1
-                logging.info("Updated key '%s'", key_str)
+        for key_str in deleted_keys:
+            batch_writer.delete(key_str.encode(UTF_8))
+            change_counts.nb_deleted += 1
+            logging.info("Deleted key '%s'", key_str)
 
-        wb.write()
-        logging.debug("Executing batch")
+        batch_writer.flush()
 
-        logging.info("Number of changes in db '%s': %s",
+        logging.info("Number of changes in db '%s': %s (%s)",
                      hex(id(target_db)),
-                     nb_changes)
+                     change_counts.nb_changes,
+                     change_counts)
 
-        return nb_changes
+        return change_counts
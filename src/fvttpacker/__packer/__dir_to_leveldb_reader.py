@@ -1,24 +1,45 @@
-import json
 import logging
+import os
 from json import JSONDecodeError
 from pathlib import Path
-from typing import Dict, Iterable
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
 
 from fvttpacker.__common.assert_helper import AssertHelper
+from fvttpacker.__common.blob_store import BlobStore
+from fvttpacker.__common.chunk_executor import ChunkExecutor
+from fvttpacker.__common.io_executor import IOExecutor
+from fvttpacker.__common.json_codec import default_json_codec
+from fvttpacker.__common.json_text import JsonText
+from fvttpacker.__common.metrics_recorder import MetricsRecorder
 from fvttpacker.__constants import UTF_8
+from fvttpacker.dir_layout import DirLayout
 from fvttpacker.fvttpacker_exception import FvttPackerException
+from fvttpacker.key_filter import KeyFilter
+from fvttpacker.metrics import Counter, Stage
 
 
 class DirToDictReader:
 
     @staticmethod
-    def read_dirs_as_dicts(paths_to_input_dirs: Iterable[Path]) -> Dict[Path, Dict[str, str]]:
+    def read_dirs_as_dicts(paths_to_input_dirs: Iterable[Path],
+                           chunk_executor: ChunkExecutor = ChunkExecutor(),
+                           validate: bool = True,
+                           key_filter: KeyFilter = KeyFilter()) -> Dict[Path, Dict[str, str]]:
+        """
+        :param paths_to_input_dirs: e.g. ["./unpacked_data/actors", "./unpacked_data/items"]
+        :param chunk_executor: Executes the reading of the chunks of files, possibly in parallel
+        :param validate: If False the files are read with `read_files_as_unvalidated_entries`
+        :param key_filter: Only the files whose keys are selected by this filter are read
+        :return: dicts with filenames as keys and minified file contents as values
+        """
 
         result: Dict[Path, Dict[str, str]] = dict()
 
         for path_to_input_dir in paths_to_input_dirs:
-            dir_dict = DirToDictReader.read_dir_as_dict(path_to_input_dir,
-                                                        skip_checks=True)
+            dir_dict = dict(DirToDictReader.read_dir_as_entries(path_to_input_dir,
+                                                                chunk_executor,
+                                                                validate,
+                                                                key_filter))
 
             result[path_to_input_dir] = dir_dict
 
@@ -30,7 +51,9 @@ class DirToDictReader:
 
     @staticmethod
     def read_dir_as_dict(path_to_input_dir: Path,
-                         skip_checks=False) -> Dict[str, str]:
+                         skip_checks=False,
+                         key_filter: KeyFilter = KeyFilter(),
+                         io_threads: int = 1) -> Dict[str, str]:
         # May not be the best use of memory, but it's nice to have everything in a dict
         """
         Reads the given directory (`path_to_input_dir`) into memory.
@@ -38,6 +61,8 @@ class DirToDictReader:
 
         :param path_to_input_dir: e.g. "./unpacked_data/actors"
         :param skip_checks:
+        :param key_filter: Only the files whose keys are selected by this filter are read
+        :param io_threads: Number of threads the files are read on, see `IOExecutor`
 
         :return: dict with filenames as keys and file contents as values
         """
@@ -47,21 +72,193 @@ class DirToDictReader:
         if not skip_checks:
             AssertHelper.assert_path_to_input_dir_is_ok(path_to_input_dir)
 
-        result: Dict[str, str] = dict()
+        paths_to_files = [path_to_file
+                          for (_, path_to_file) in DirToDictReader.list_dir(path_to_input_dir, key_filter)]
+
+        return dict(DirToDictReader.read_files_as_entries(paths_to_files, io_threads))
 
-        for path_to_file in path_to_input_dir.glob("*.json"):
+    @staticmethod
+    def validate_dirs(paths_to_input_dirs: Iterable[Path],
+                      chunk_executor: ChunkExecutor = ChunkExecutor(),
+                      key_filter: KeyFilter = KeyFilter(),
+                      max_chunk_bytes: Union[int, None] = None) -> None:
+        """
+        Parses every json file in the given directories (`paths_to_input_dirs`) without keeping the results.
+        Used to fail fast before anything is written when the directories are read in a streaming fashion.
+
+        :param paths_to_input_dirs: e.g. ["./unpacked_data/actors", "./unpacked_data/items"]
+        :param chunk_executor: Executes the validation of the chunks of files, possibly in parallel
+        :param key_filter: Only the files whose keys are selected by this filter are parsed
+        :param max_chunk_bytes: see `read_dir_as_entries`
+        """
+
+        for path_to_input_dir in paths_to_input_dirs:
 
-            logging.debug("Reading file '%s'", path_to_file)
+            logging.info("Validating directory '%s'", path_to_input_dir)
 
-            with open(path_to_file, "rt", encoding=UTF_8) as file:
-                try:
-                    json_dict = json.load(file)
-                except JSONDecodeError as err:
-                    raise FvttPackerException(f"Error while parsing '{path_to_file}' as json, reason:\n'{err}'")
+            paths_to_files = [path_to_file
+                              for (_, path_to_file) in DirToDictReader.list_dir(path_to_input_dir, key_filter)]
+
+            for _ in chunk_executor.map_io(DirToDictReader.validate_files,
+                                           DirToDictReader.__split_into_chunks(paths_to_files, max_chunk_bytes)):
+                pass
+
+    @staticmethod
+    def read_dir_as_entries(path_to_input_dir: Path,
+                            chunk_executor: ChunkExecutor = ChunkExecutor(),
+                            validate: bool = True,
+                            key_filter: KeyFilter = KeyFilter(),
+                            max_chunk_bytes: Union[int, None] = None) -> Iterator[Tuple[str, str]]:
+        """
+        Lazily reads the given directory (`path_to_input_dir`).
+        Only the filenames are kept in memory, the files are read in chunks when their entries are requested.
+
+        :param path_to_input_dir: e.g. "./unpacked_data/actors"
+        :param chunk_executor: Executes the reading of the chunks of files, possibly in parallel
+        :param validate: If False the files are read with `read_files_as_unvalidated_entries`
+        :param key_filter: Only the files whose keys are selected by this filter are read
+        :param max_chunk_bytes: If given, a chunk of files ends before their sizes would exceed it, see
+        `ChunkExecutor.get_max_chunk_bytes`. Otherwise, the chunks have a fixed number of files.
+
+        :return: Iterator over (key, minified file content) tuples, sorted by key
+        """
 
-            # remove .json at the end
-            key: str = path_to_file.name[0:-5]
+        logging.info("Reading directory '%s' as entries", path_to_input_dir)
 
-            result[key] = json.dumps(json_dict, separators=(",", ":"), indent=None)
+        paths_to_files = [path_to_file
+                          for (_, path_to_file) in DirToDictReader.list_dir(path_to_input_dir, key_filter)]
+
+        if validate:
+            read_files = DirToDictReader.read_files_as_entries
+        else:
+            read_files = DirToDictReader.read_files_as_unvalidated_entries
+
+        for entries in chunk_executor.map_io(read_files,
+                                             DirToDictReader.__split_into_chunks(paths_to_files, max_chunk_bytes)):
+            yield from entries
+
+    @staticmethod
+    def __split_into_chunks(paths_to_files: List[Path],
+                            max_chunk_bytes: Union[int, None]) -> Iterator[List[Path]]:
+
+        if max_chunk_bytes is None:
+            return ChunkExecutor.split_into_chunks(paths_to_files)
+
+        # the files are stat'ed while they are read, not all at once up front
+        return ChunkExecutor.split_into_sized_chunks(((path_to_file, DirToDictReader.__get_size(path_to_file))
+                                                      for path_to_file in paths_to_files),
+                                                     max_chunk_bytes)
+
+    @staticmethod
+    def __get_size(path_to_file: Path) -> int:
+        try:
+            return os.stat(path_to_file).st_size
+        except FileNotFoundError:
+            # deleted since the directory was listed, reading it reports that
+            return 0
+
+    @staticmethod
+    def list_dir(path_to_input_dir: Path,
+                 key_filter: KeyFilter = KeyFilter()) -> List[Tuple[str, Path]]:
+        """
+        The files are looked up according to the layout of the directory, see `DirLayout`.
+
+        :return: (key, path to file) tuples of all json files in the given directory (`path_to_input_dir`) whose keys
+        are selected by the given filter (`key_filter`), sorted by key
+        """
+
+        with MetricsRecorder.time(Stage.dir_scan):
+            result = sorted((key, Path(dir_entry.path))
+                            for (key, dir_entry) in DirLayout.load(path_to_input_dir).list_files(path_to_input_dir)
+                            if key_filter.matches(key))
+
+        # e.g. a file that was copied into another sub-directory by hand
+        for ((key, path_to_file), (next_key, path_to_next_file)) in zip(result, result[1:]):
+            if key == next_key:
+                raise FvttPackerException(f"Found two files for the key '{key}': '{path_to_file}' and "
+                                          f"'{path_to_next_file}'. Remove one of them.")
 
         return result
+
+    @staticmethod
+    def read_files_as_entries(paths_to_files: List[Path],
+                              io_threads: int = 1) -> List[Tuple[str, str]]:
+        """
+        :param io_threads: Number of threads the files are read on, see `IOExecutor`
+        :return: (key, minified file content) tuples of the given files (`paths_to_files`)
+        """
+
+        with IOExecutor(io_threads) as io_executor:
+            return list(zip((DirToDictReader.__get_key(path_to_file) for path_to_file in paths_to_files),
+                            io_executor.map(DirToDictReader.__read_file_minified, paths_to_files)))
+
+    @staticmethod
+    def read_files_as_unvalidated_entries(paths_to_files: List[Path],
+                                          io_threads: int = 1) -> List[Tuple[str, str]]:
+        """
+        Same as `read_files_as_entries`, but the files are only minified by removing their indentation, without
+        parsing them (see `JsonText.minify_indented`). Files that can't be minified that way are parsed.
+        The results are only correct for files that were left as they were unpacked, so any result that differs from
+        the value in the LevelDB has to be read again with `read_files_as_entries`.
+
+        :param io_threads: Number of threads the files are read on, see `IOExecutor`
+        :return: (key, minified file content) tuples of the given files (`paths_to_files`)
+        """
+
+        with IOExecutor(io_threads) as io_executor:
+            return list(zip((DirToDictReader.__get_key(path_to_file) for path_to_file in paths_to_files),
+                            io_executor.map(DirToDictReader.__read_file_unvalidated, paths_to_files)))
+
+    @staticmethod
+    def validate_files(paths_to_files: List[Path],
+                       io_threads: int = 1) -> None:
+        """
+        Parses the given files (`paths_to_files`) without keeping the results.
+
+        :param io_threads: Number of threads the files are read on, see `IOExecutor`
+        """
+
+        with IOExecutor(io_threads) as io_executor:
+            for _ in io_executor.map(DirToDictReader.__read_file_minified, paths_to_files):
+                pass
+
+    @staticmethod
+    def __get_key(path_to_file: Path) -> str:
+        # remove .json at the end
+        return path_to_file.name[0:-5]
+
+    @staticmethod
+    def __read_file_unvalidated(path_to_file: Path) -> str:
+        file_content_str = DirToDictReader.__read_file(path_to_file)
+
+        with MetricsRecorder.time(Stage.text_minify):
+            value_str = JsonText.minify_indented(file_content_str)
+
+        if value_str is None:
+            value_str = DirToDictReader.__minify(path_to_file, file_content_str)
+
+        return BlobStore.inline(value_str, path_to_file)
+
+    @staticmethod
+    def __read_file_minified(path_to_file: Path) -> str:
+        return BlobStore.inline(DirToDictReader.__minify(path_to_file, DirToDictReader.__read_file(path_to_file)),
+                                path_to_file)
+
+    @staticmethod
+    def __read_file(path_to_file: Path) -> str:
+
+        logging.debug("Reading file '%s'", path_to_file)
+
+        with MetricsRecorder.time(Stage.file_read), open(path_to_file, "rt", encoding=UTF_8) as file:
+            if MetricsRecorder.is_recording():
+                MetricsRecorder.count(Counter.bytes_read, os.fstat(file.fileno()).st_size)
+
+            return file.read()
+
+    @staticmethod
+    def __minify(path_to_file: Path,
+                 file_content_str: str) -> str:
+        try:
+            return default_json_codec.minify(file_content_str)
+        except JSONDecodeError as err:
+            raise FvttPackerException(f"Error while parsing '{path_to_file}' as json, reason:\n'{err}'")
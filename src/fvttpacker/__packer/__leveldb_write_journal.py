@@ -0,0 +1,107 @@
+import logging
+from typing import Iterable, List, Tuple, Union
+
+import plyvel
+
+# after this many keys, the journal stops recording them and compares all entries with the snapshot on a rollback
+max_recorded_keys = 100_000
+# the entries restored per batch on a rollback, so a rollback never builds one batch of the whole LevelDB in memory
+rollback_batch_entries = 10_000
+
+
+class LevelDBWriteJournal:
+    """
+    Remembers which keys of a LevelDB are written, so all the batches written into it can be rolled back.
+    The previous values are not copied, they are read from a snapshot taken before the first batch.
+    """
+
+    def __init__(self,
+                 db: plyvel.DB):
+        self.__db = db
+        self.__snapshot = db.snapshot()
+        # None once more than `max_recorded_keys` were recorded
+        self.__keys: Union[List[bytes], None] = list()
+
+    def record(self,
+               key_bytes: bytes) -> None:
+        """
+        Must be called before the batch that writes or deletes the given key (`key_bytes`) is written.
+        """
+
+        if self.__keys is None:
+            return
+
+        self.__keys.append(key_bytes)
+
+        if len(self.__keys) > max_recorded_keys:
+            logging.debug("Not recording the keys written into LevelDB '%s' anymore", hex(id(self.__db)))
+            self.__keys = None
+
+    def rollback(self,
+                 sync: bool = False) -> None:
+        """
+        Restores the values all recorded keys had when the journal was created, in batches of at most
+        `rollback_batch_entries` entries.
+        """
+
+        if self.__keys is None:
+            self.__rollback_all(sync)
+            return
+
+        logging.warning("Rolling back %s changed entries of LevelDB '%s'",
+                        len(self.__keys),
+                        hex(id(self.__db)))
+
+        self.__write_in_batches(((key_bytes, self.__snapshot.get(key_bytes)) for key_bytes in self.__keys), sync)
+
+    def __rollback_all(self,
+                       sync: bool) -> None:
+        """
+        Restores all entries that differ from the snapshot, in batches of at most `rollback_batch_entries` entries.
+        """
+
+        logging.warning("Rolling back all changed entries of LevelDB '%s'", hex(id(self.__db)))
+
+        # the iterators read implicit snapshots, so they don't see the batches written while iterating
+        self.__write_in_batches(((key_bytes, None)
+                                 for key_bytes in self.__db.iterator(include_value=False)
+                                 if self.__snapshot.get(key_bytes) is None),
+                                sync)
+        self.__write_in_batches(((key_bytes, value_bytes)
+                                 for (key_bytes, value_bytes) in self.__snapshot
+                                 if self.__db.get(key_bytes) != value_bytes),
+                                sync)
+
+    def __write_in_batches(self,
+                           entries: Iterable[Tuple[bytes, Union[bytes, None]]],
+                           sync: bool) -> None:
+        """
+        Writes the given `entries` in batches of at most `rollback_batch_entries` entries.
+
+        :param entries: The keys with the values to restore, or None to delete the key
+        :param sync: Whether each batch is synced to disk
+        """
+
+        wb = self.__db.write_batch(sync=sync)
+        nb_entries = 0
+
+        for (key_bytes, value_bytes) in entries:
+            if value_bytes is None:
+                wb.delete(key_bytes)
+            else:
+                wb.put(key_bytes, value_bytes)
+
+            nb_entries += 1
+
+            if nb_entries >= rollback_batch_entries:
+                wb.write()
+                wb = self.__db.write_batch(sync=sync)
+                nb_entries = 0
+
+        wb.write()
+
+    def release(self) -> None:
+        """
+        Must be called before the LevelDB is closed.
+        """
+        self.__snapshot.close()
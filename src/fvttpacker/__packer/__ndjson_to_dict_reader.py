@@ -0,0 +1,88 @@
+import logging
+from json import JSONDecodeError
+from typing import Iterable, Iterator, List, Tuple, Union
+
+from fvttpacker.__common.chunk_executor import ChunkExecutor
+from fvttpacker.__common.json_codec import default_json_codec
+from fvttpacker.__constants import UTF_8, ndjson_key_field, ndjson_value_field
+from fvttpacker.fvttpacker_exception import FvttPackerException
+from fvttpacker.key_filter import KeyFilter
+
+
+class NdjsonToDictReader:
+    """
+    Reads newline delimited json, one `{"key": ..., "value": ...}` object per line, as written by
+    `LevelDBToDictReader.read_raw_entries_as_ndjson`.
+    """
+
+    @staticmethod
+    def read_lines_as_entries(lines: Iterable[bytes],
+                              chunk_executor: ChunkExecutor = ChunkExecutor(),
+                              key_filter: KeyFilter = KeyFilter(),
+                              max_chunk_bytes: Union[int, None] = None) -> Iterator[Tuple[str, str]]:
+        """
+        Lazily reads the given lines (`lines`). They are parsed in chunks, only a bounded number of chunks is in
+        memory at once.
+
+        :param lines: e.g. `sys.stdin.buffer`, the lines must be sorted by key
+        :param chunk_executor: Executes the parsing of the chunks of lines, possibly in parallel
+        :param key_filter: Only the entries whose keys are selected by this filter are returned
+        :param max_chunk_bytes: If given, a chunk of lines ends before their sizes would exceed it, see
+        `ChunkExecutor.get_max_chunk_bytes`. Otherwise, the chunks have a fixed number of lines.
+        :return: Iterator over (key, minified value) tuples, sorted by key
+        """
+
+        previous_key_str: Union[str, None] = None
+
+        numbered_lines = enumerate(lines, start=1)
+
+        if max_chunk_bytes is None:
+            chunks = ChunkExecutor.split_into_chunks(numbered_lines)
+        else:
+            chunks = ChunkExecutor.split_into_sized_chunks(((numbered_line, len(numbered_line[1]))
+                                                            for numbered_line in numbered_lines),
+                                                           max_chunk_bytes)
+
+        for entries in chunk_executor.map(NdjsonToDictReader.read_numbered_lines_as_entries, chunks):
+            for (key_str, value_str) in entries:
+
+                # the entries are compared with the LevelDB in a single pass, see `DictToLevelDBWriter.diff_entries`
+                if previous_key_str is not None and key_str.encode(UTF_8) <= previous_key_str.encode(UTF_8):
+                    raise FvttPackerException(f"The lines are not sorted by key, '{key_str}' came after "
+                                              f"'{previous_key_str}'.")
+
+                previous_key_str = key_str
+
+                if key_filter.matches(key_str):
+                    yield key_str, value_str
+
+    @staticmethod
+    def read_numbered_lines_as_entries(numbered_lines: List[Tuple[int, bytes]]) -> List[Tuple[str, str]]:
+        """
+        :param numbered_lines: (line number, line) tuples, empty lines are skipped
+        :return: (key, minified value) tuples of the given lines
+        """
+
+        result: List[Tuple[str, str]] = list()
+
+        for (line_number, line) in numbered_lines:
+            if line.isspace() or len(line) == 0:
+                continue
+
+            try:
+                line_object = default_json_codec.loads(line.decode(UTF_8))
+            except (JSONDecodeError, UnicodeDecodeError) as err:
+                raise FvttPackerException(f"Error while parsing line {line_number} as json, reason:\n'{err}'")
+
+            if not isinstance(line_object, dict) \
+                    or not isinstance(line_object.get(ndjson_key_field), str) \
+                    or ndjson_value_field not in line_object:
+                raise FvttPackerException(f"Line {line_number} is not an object with the fields "
+                                          f"'{ndjson_key_field}' (a string) and '{ndjson_value_field}'.")
+
+            logging.debug("Read key '%s' from line %s", line_object[ndjson_key_field], line_number)
+
+            result.append((line_object[ndjson_key_field],
+                           default_json_codec.dumps_minified(line_object[ndjson_value_field])))
+
+        return result
@@ -0,0 +1,101 @@
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from fvttpacker.__common.chunk_executor import ChunkExecutor
+from fvttpacker.__common.manifest import Manifest, ManifestEntry
+from fvttpacker.__constants import UTF_8
+from fvttpacker.__packer.__dir_to_leveldb_reader import DirToDictReader
+
+
+class PackManifestTracker:
+    """
+    Uses the manifest of an input directory to find out what has to be packed into the target LevelDB
+    and records what was packed, so the next run can skip it.
+    """
+
+    def __init__(self,
+                 path_to_input_dir: Path,
+                 path_to_target_db: Path):
+
+        self.__path_to_input_dir = path_to_input_dir
+        self.__path_to_target_db = path_to_target_db
+
+        self.__manifest = Manifest.load(path_to_input_dir, path_to_target_db)
+
+        # stat before reading, so files modified while reading show up as modified next time
+        self.__file_stats = Manifest.stat_dir(path_to_input_dir)
+        self.__value_hashes: Dict[str, str] = dict()
+
+        self.is_incremental = self.__manifest.is_in_sync_with_db()
+
+        self.changed_keys: List[str] = list()
+        self.deleted_keys: List[str] = list()
+
+        if self.is_incremental:
+            (self.changed_keys, self.deleted_keys) = self.__manifest.get_changed_and_deleted_keys(self.__file_stats)
+            logging.info("Directory '%s' has %s changed and %s deleted files since the last run",
+                         path_to_input_dir,
+                         len(self.changed_keys),
+                         len(self.deleted_keys))
+        else:
+            logging.info("LevelDB '%s' is not in sync with the manifest of '%s', packing everything",
+                         path_to_target_db,
+                         path_to_input_dir)
+
+    def is_unchanged(self) -> bool:
+        return self.is_incremental and len(self.changed_keys) == 0 and len(self.deleted_keys) == 0
+
+    def read_changed_entries(self,
+                             chunk_executor: ChunkExecutor) -> Dict[str, str]:
+        """
+        Reads the changed files.
+        Files that were only touched, i.e. whose value is still the one in the LevelDB, are left out.
+
+        :return: The entries that have to be written into the LevelDB
+        """
+
+        # the files may be in sub-directories, see `DirLayout`
+        keys_to_paths = dict(DirToDictReader.list_dir(self.__path_to_input_dir))
+        paths_to_files = [keys_to_paths[key] for key in sorted(self.changed_keys)]
+
+        result: Dict[str, str] = dict()
+
+        for entries in chunk_executor.map_io(DirToDictReader.read_files_as_entries,
+                                          ChunkExecutor.split_into_chunks(paths_to_files)):
+
+            for (key, value_str) in self.record_entries(entries):
+                manifest_entry = self.__manifest.entries.get(key)
+
+                if manifest_entry is None or manifest_entry.value_hash != self.__value_hashes[key]:
+                    result[key] = value_str
+
+        return result
+
+    def record_entries(self,
+                       entries: Iterable[Tuple[str, str]]) -> Iterator[Tuple[str, str]]:
+        """
+        Passes the given entries (`entries`) through and remembers the hashes of their values.
+        """
+
+        for (key, value_str) in entries:
+            self.__value_hashes[key] = Manifest.hash_value(value_str.encode(UTF_8))
+            yield key, value_str
+
+    def save(self) -> None:
+        """
+        Saves the new manifest. Must be called after the target LevelDB has been closed.
+        """
+
+        manifest = Manifest(self.__path_to_target_db,
+                            Manifest.compute_db_digest(self.__path_to_target_db))
+
+        for (key, file_stat) in self.__file_stats.items():
+
+            if key in self.__value_hashes:
+                manifest.entries[key] = ManifestEntry(file_stat, self.__value_hashes[key])
+            elif key in self.__manifest.entries:
+                # file was not read, because it did not change
+                manifest.entries[key] = self.__manifest.entries[key]
+
+        manifest.save(self.__path_to_input_dir)
@@ -1,18 +1,37 @@
+import copy
 import logging
+import shutil
 from pathlib import Path
-from typing import Dict, List, Iterable
+from typing import BinaryIO, Dict, List, Iterable, Iterator, Tuple, Union
 
 from plyvel import DB
 
 from fvttpacker.__common.__directory_checker_decorators import check_input_dir_and_target_dir, \
     check_input_dbs_and_target_dirs, check_input_dirs_and_target_dbs
+from fvttpacker.__common.assert_helper import AssertHelper
+from fvttpacker.__common.change_counts import ChangeCounts, ChangeType
+from fvttpacker.__common.checkpoint_journal import CheckpointJournal, checkpoint_operation_pack
+from fvttpacker.__common.chunk_executor import ChunkExecutor
 from fvttpacker.__common.leveldb_helper import LevelDBHelper
+from fvttpacker.__common.metrics_recorder import MetricsRecorder
 from fvttpacker.__common.overwrite_helper import OverwriteHelper
-from fvttpacker.__constants import world_db_names
+from fvttpacker.__common.stat_cache import StatCache
+from fvttpacker.__constants import UTF_8, world_db_names
+from fvttpacker.__packer.__batch_writer import WriteBatchOptions
 from fvttpacker.__packer.__dict_to_leveldb_writer import DictToLevelDBWriter
 from fvttpacker.__packer.__dir_to_leveldb_reader import DirToDictReader
+from fvttpacker.__packer.__leveldb_write_journal import LevelDBWriteJournal
+from fvttpacker.__packer.__ndjson_to_dict_reader import NdjsonToDictReader
+from fvttpacker.__packer.__pack_manifest_tracker import PackManifestTracker
+from fvttpacker.__planner.planner import Planner
 from fvttpacker.fvttpacker_exception import FvttPackerException
+from fvttpacker.key_filter import KeyFilter
+from fvttpacker.metrics import Counter, Stage
 from fvttpacker.overwrite_confirmer import OverwriteConfirmer, AllYesOverwriteConfirmer
+from fvttpacker.pack_options import PackOptions, strategy_diff, strategy_rebuild
+
+# `strategy_auto` rebuilds the LevelDB if at least this fraction of the entries changed
+rebuild_change_ratio = 0.5
 
 
 class Packer:
@@ -22,7 +41,8 @@ class Packer:
     def pack_world_dirs_under_x_into_dbs_under_y(
             x_path_to_parent_input_dir: Path,
             y_path_to_parent_target_dir: Path,
-            overwrite_confirmer: OverwriteConfirmer = AllYesOverwriteConfirmer()) -> None:
+            overwrite_confirmer: OverwriteConfirmer = AllYesOverwriteConfirmer(),
+            pack_options: PackOptions = PackOptions()) -> None:
         """
         Similar to `pack_dirs_under_x_into_dbs_under_y`, but only packs the sub-directories under the given directory
         (`x_path_to_parent_input_dir`) that belong to a world.
@@ -31,20 +51,23 @@ class Packer:
         :param x_path_to_parent_input_dir: e.g. "./unpacked_dbs/test-world"
         :param y_path_to_parent_target_dir: e.g. "./foundrydata/Data/worlds/test/data"
         :param overwrite_confirmer: TODO
+        :param pack_options: Options that control how the directories are packed
         """
 
         Packer.pack_given_dirs_under_x_into_dbs_under_y(
             x_path_to_parent_input_dir,
             y_path_to_parent_target_dir,
             world_db_names,
-            overwrite_confirmer)
+            overwrite_confirmer,
+            pack_options)
 
     @staticmethod
     @check_input_dir_and_target_dir
     def pack_dirs_under_x_into_dbs_under_y(
             x_path_to_parent_input_dir: Path,
             y_path_to_parent_target_dir: Path,
-            overwrite_confirmer: OverwriteConfirmer = AllYesOverwriteConfirmer()) -> None:
+            overwrite_confirmer: OverwriteConfirmer = AllYesOverwriteConfirmer(),
+            pack_options: PackOptions = PackOptions()) -> None:
         """
         Packs all sub-folders located under the given directory (`x_path_to_parent_input_dir`) into LevelDBs located
         under the given target directory (`parent_target_dir`).
@@ -52,6 +75,7 @@ class Packer:
         :param x_path_to_parent_input_dir: e.g. "./unpacked_dbs"
         :param y_path_to_parent_target_dir: e.g. "./foundrydata/Data/worlds/test/data"
         :param overwrite_confirmer: TODO
+        :param pack_options: Options that control how the directories are packed
         """
 
         db_names: List[str] = list()
@@ -63,7 +87,8 @@ class Packer:
             x_path_to_parent_input_dir,
             y_path_to_parent_target_dir,
             db_names,
-            overwrite_confirmer)
+            overwrite_confirmer,
+            pack_options)
 
     @staticmethod
     @check_input_dir_and_target_dir
@@ -71,7 +96,8 @@ class Packer:
             x_path_to_parent_input_dir: Path,
             y_path_to_parent_target_dir: Path,
             db_names: Iterable[str],
-            overwrite_confirmer: OverwriteConfirmer = AllYesOverwriteConfirmer()) -> None:
+            overwrite_confirmer: OverwriteConfirmer = AllYesOverwriteConfirmer(),
+            pack_options: PackOptions = PackOptions()) -> None:
 
         # mapping input dirs to target dbs
         input_dir_paths_to_target_db_paths: Dict[Path, Path] = dict()
@@ -80,7 +106,7 @@ class Packer:
             path_to_input_dir = x_path_to_parent_input_dir.joinpath(db_name)
 
             # all input paths must exist and be dirs
-            if not path_to_input_dir.is_dir():
+            if not StatCache.is_dir(path_to_input_dir):
                 raise FvttPackerException(f"Missing directory '{db_name}' under '{path_to_input_dir}'.")
 
             path_to_target_db = y_path_to_parent_target_dir.joinpath(db_name)
@@ -92,57 +118,423 @@ class Packer:
             input_dir_paths_to_target_db_paths,
             overwrite_confirmer.confirm_batch_overwrite_leveldb)
 
-        Packer.pack_dirs_into_dbs(input_dir_paths_to_target_db_paths)
+        Packer.pack_dirs_into_dbs(input_dir_paths_to_target_db_paths,
+                                  pack_options)
 
     @staticmethod
     @check_input_dirs_and_target_dbs
     def pack_dirs_into_dbs(
-            input_dir_paths_to_target_db_paths: Dict[Path, Path]) -> None:
+            input_dir_paths_to_target_db_paths: Dict[Path, Path],
+            pack_options: PackOptions = PackOptions()) -> None:
         """
         Packs all the given directories (keys). Each into its respective LevelDB at the given path (values).
 
         :param input_dir_paths_to_target_db_paths: Contains the paths to the input directories as keys
         and the paths to the target LevelDBs as values
+        :param pack_options: Options that control how the directories are packed
+        """
+
+        with MetricsRecorder.observe(pack_options.metrics_observer):
+            if pack_options.plan_observer is not None:
+                pack_options.plan_observer.on_plan(Planner.plan_pack_dirs_into_dbs(input_dir_paths_to_target_db_paths,
+                                                                                   pack_options))
+            elif pack_options.plan is not None:
+                Planner.apply_pack_plan(input_dir_paths_to_target_db_paths,
+                                        pack_options)
+            elif pack_options.resume:
+                Packer.__resume_pack_dirs_into_dbs(input_dir_paths_to_target_db_paths,
+                                                   pack_options)
+            else:
+                Packer.__pack_dirs_into_dbs(input_dir_paths_to_target_db_paths,
+                                            pack_options)
+
+    @staticmethod
+    def __resume_pack_dirs_into_dbs(
+            input_dir_paths_to_target_db_paths: Dict[Path, Path],
+            pack_options: PackOptions) -> None:
+        """
+        Same as `__pack_dirs_into_dbs`, but continues an interrupted pack, see `PackOptions.resume`.
+        """
+
+        input_dir_paths_to_checkpoints = {
+            path_to_input_dir: CheckpointJournal.load(path_to_input_dir,
+                                                      checkpoint_operation_pack,
+                                                      path_to_target_db,
+                                                      pack_options.key_filter)
+            for (path_to_input_dir, path_to_target_db) in input_dir_paths_to_target_db_paths.items()
+        }
+
+        for (path_to_input_dir, checkpoint) in input_dir_paths_to_checkpoints.items():
+            if checkpoint.is_complete:
+                logging.info("Skipping directory '%s', it was packed before the interruption", path_to_input_dir)
+            elif checkpoint.last_key is not None:
+                logging.info("Continuing to pack directory '%s' after key '%s'", path_to_input_dir, checkpoint.last_key)
+
+                # only the remaining keys of this directory are selected, so it is packed on its own
+                resumed_pack_options = copy.copy(pack_options)
+                resumed_pack_options.key_filter = checkpoint.get_remaining_key_filter()
+
+                Packer.__pack_dirs_into_dbs({path_to_input_dir: input_dir_paths_to_target_db_paths[path_to_input_dir]},
+                                            resumed_pack_options,
+                                            {path_to_input_dir: checkpoint})
+
+        remaining_input_dir_paths_to_target_db_paths = {
+            path_to_input_dir: path_to_target_db
+            for (path_to_input_dir, path_to_target_db) in input_dir_paths_to_target_db_paths.items()
+            if not input_dir_paths_to_checkpoints[path_to_input_dir].is_complete
+        }
+
+        if len(remaining_input_dir_paths_to_target_db_paths) > 0:
+            Packer.__pack_dirs_into_dbs(remaining_input_dir_paths_to_target_db_paths,
+                                        pack_options,
+                                        input_dir_paths_to_checkpoints)
+
+        # the pack has finished, the next one starts over
+        for checkpoint in input_dir_paths_to_checkpoints.values():
+            checkpoint.delete()
+
+    @staticmethod
+    def __pack_dirs_into_dbs(
+            input_dir_paths_to_target_db_paths: Dict[Path, Path],
+            pack_options: PackOptions,
+            input_dir_paths_to_checkpoints: Union[Dict[Path, CheckpointJournal], None] = None) -> None:
+        """
+        :param input_dir_paths_to_checkpoints: If given, the progress of each directory is recorded in its checkpoint.
+        If the pack fails, the checkpoints are restored along with the LevelDBs.
         """
 
         path_to_input_dir: Path
         path_to_target_db: Path
 
-        # read all input directories -> fail fast
-        input_dir_paths_to_dicts = DirToDictReader.read_dirs_as_dicts(input_dir_paths_to_target_db_paths.keys())
+        if input_dir_paths_to_checkpoints is None:
+            input_dir_paths_to_checkpoints = dict()
+
+        input_dir_paths_to_trackers: Dict[Path, PackManifestTracker] = dict()
+        key_filter = pack_options.key_filter
+
+        if pack_options.use_manifest and not key_filter.is_everything():
+            # the manifest describes the whole directory and LevelDB
+            logging.warning("Not using the manifest, because not all keys are packed")
+        elif pack_options.use_manifest:
+            input_dir_paths_to_target_db_paths = Packer.__filter_out_unchanged(input_dir_paths_to_target_db_paths,
+                                                                               input_dir_paths_to_trackers)
 
+        input_dir_paths_to_dicts: Dict[Path, Dict[str, str]] = dict()
         input_dir_paths_to_dbs: Dict[Path, DB] = dict()
+        # the keys written into each LevelDB, so they can be restored if a later batch or LevelDB fails
+        journals: List[LevelDBWriteJournal] = list()
+        # the rebuilt LevelDBs and where their old copies are, they are put back if a later LevelDB fails
+        replaced_db_paths_to_old_db_paths: Dict[Path, Union[Path, None]] = dict()
+
+        batch_options = WriteBatchOptions.from_pack_options(pack_options)
+        change_counts = ChangeCounts()
+
+        with ChunkExecutor(pack_options.jobs, pack_options.io_threads) as chunk_executor:
+
+            # directories that only have to be packed partially are always read completely -> fail fast
+            for (path_to_input_dir, tracker) in input_dir_paths_to_trackers.items():
+                if tracker.is_incremental:
+                    input_dir_paths_to_dicts[path_to_input_dir] = tracker.read_changed_entries(chunk_executor)
+
+            paths_to_fully_packed_input_dirs = [path_to_input_dir
+                                                for path_to_input_dir in input_dir_paths_to_target_db_paths.keys()
+                                                if path_to_input_dir not in input_dir_paths_to_dicts]
+
+            # the batches and the chunks of files that are read ahead each get half of the memory limit
+            max_chunk_bytes = chunk_executor.get_max_chunk_bytes(pack_options.memory_limit // 2) \
+                if pack_options.memory_limit is not None else None
+
+            if pack_options.streaming:
+                # only validate all input directories -> fail fast
+                DirToDictReader.validate_dirs(paths_to_fully_packed_input_dirs,
+                                              chunk_executor,
+                                              key_filter,
+                                              max_chunk_bytes)
+            else:
+                # read all input directories -> fail fast
+                input_dir_paths_to_dicts.update(DirToDictReader.read_dirs_as_dicts(paths_to_fully_packed_input_dirs,
+                                                                                   chunk_executor,
+                                                                                   pack_options.validate,
+                                                                                   key_filter))
+
+            try:
+                # open all the dbs -> fail fast
+                for (path_to_input_dir, path_to_target_db) in input_dir_paths_to_target_db_paths.items():
+                    db = LevelDBHelper.try_open_db(path_to_target_db, skip_checks=True,
+                                                   must_exist=False,
+                                                   leveldb_options=pack_options.leveldb_options)
+                    input_dir_paths_to_dbs[path_to_input_dir] = db
+                    logging.debug("Opened LevelDB at '%s' as '%s'",
+                                  path_to_target_db,
+                                  hex(id(db)))
+
+                if not pack_options.streaming and not pack_options.validate:
+                    # parse the files that changed before anything is written -> fail fast
+                    for path_to_input_dir in paths_to_fully_packed_input_dirs:
+                        Packer.__validate_changed_entries(path_to_input_dir,
+                                                          input_dir_paths_to_dicts[path_to_input_dir],
+                                                          input_dir_paths_to_dbs[path_to_input_dir],
+                                                          chunk_executor,
+                                                          key_filter)
+
+                # coming this far means:
+                # - all input directories were successfully read into dicts or validated
+                # - all target dbs were successfully opened as LevelDBs
+
+                # pack all the folders into
+                for (path_to_input_dir, target_db) in input_dir_paths_to_dbs.items():
+                    tracker = input_dir_paths_to_trackers.get(path_to_input_dir)
+                    checkpoint = input_dir_paths_to_checkpoints.get(path_to_input_dir)
+
+                    if tracker is not None and tracker.is_incremental:
+                        journals.append(LevelDBWriteJournal(target_db))
+                        target_change_counts = DictToLevelDBWriter.write_changes_into_db(
+                            input_dir_paths_to_dicts[path_to_input_dir].items(),
+                            tracker.deleted_keys,
+                            target_db,
+                            batch_options,
+                            journals[-1])
+                        change_counts.add(target_change_counts)
+                        MetricsRecorder.count_target(input_dir_paths_to_target_db_paths[path_to_input_dir],
+                                                     target_change_counts)
+                        Packer.__compact_if_changed(target_db, target_change_counts, pack_options)
+
+                        if checkpoint is not None:
+                            checkpoint.complete()
+                        continue
+
+                    path_to_target_db = input_dir_paths_to_target_db_paths[path_to_input_dir]
+
+                    if pack_options.streaming:
+                        input_entries = DirToDictReader.read_dir_as_entries(path_to_input_dir,
+                                                                            chunk_executor,
+                                                                            key_filter=key_filter,
+                                                                            max_chunk_bytes=max_chunk_bytes)
+                        is_rebuild = Packer.__is_rebuild(None, target_db, path_to_target_db, pack_options)
+                    else:
+                        input_entries = sorted(input_dir_paths_to_dicts[path_to_input_dir].items())
+                        is_rebuild = Packer.__is_rebuild(input_entries, target_db, path_to_target_db, pack_options)
+
+                    if tracker is not None:
+                        input_entries = tracker.record_entries(input_entries)
+
+                    if is_rebuild:
+                        target_change_counts = Packer.__rebuild_db(input_entries,
+                                                                   target_db,
+                                                                   path_to_target_db,
+                                                                   pack_options,
+                                                                   batch_options,
+                                                                   replaced_db_paths_to_old_db_paths)
+                    else:
+                        journals.append(LevelDBWriteJournal(target_db))
+                        target_change_counts = DictToLevelDBWriter.write_entries_into_db(
+                            input_entries,
+                            target_db,
+                            batch_options,
+                            journals[-1],
+                            key_filter,
+                            checkpoint)
+                        Packer.__compact_if_changed(target_db, target_change_counts, pack_options)
+
+                    change_counts.add(target_change_counts)
+                    MetricsRecorder.count_target(path_to_target_db, target_change_counts)
+
+                    if checkpoint is not None:
+                        checkpoint.complete()
+            except BaseException:
+                # leave the LevelDBs as they were before the pack
+                for journal in reversed(journals):
+                    journal.rollback(pack_options.sync)
+
+                # the rebuilt LevelDBs are closed already
+                for (path_to_target_db, path_to_old_db) in replaced_db_paths_to_old_db_paths.items():
+                    LevelDBHelper.restore_db(path_to_old_db, path_to_target_db)
+
+                for checkpoint in input_dir_paths_to_checkpoints.values():
+                    checkpoint.restore()
+                raise
+            finally:
+                # the snapshots of the journals must be released before their dbs are closed
+                for journal in journals:
+                    journal.release()
+
+                # close all the dbs
+                for target_db in input_dir_paths_to_dbs.values():
+                    target_db.close()
+
+        Packer.__delete_old_dbs(replaced_db_paths_to_old_db_paths)
+
+        for tracker in input_dir_paths_to_trackers.values():
+            tracker.save()
+
+        logging.info("Total number of changes: %s (%s)",
+                     change_counts.nb_changes,
+                     change_counts)
+
+    @staticmethod
+    def __is_rebuild(input_entries: Union[List[Tuple[str, str]], None],
+                     target_db: DB,
+                     path_to_target_db: Path,
+                     pack_options: PackOptions) -> bool:
+        """
+        :param input_entries: All entries that are packed, sorted by key, None if they are not in memory
+        """
+
+        if pack_options.strategy == strategy_diff:
+            return False
+
+        if not pack_options.key_filter.is_everything():
+            # the new LevelDB would only contain the selected entries
+            logging.info("Not rebuilding LevelDB '%s', because not all keys are packed", path_to_target_db)
+            return False
 
-        nb_changes: int = 0
+        if pack_options.strategy == strategy_rebuild:
+            return True
+
+        if input_entries is None:
+            # e.g. with `streaming`
+            logging.warning("Not rebuilding LevelDB '%s', because its entries are streamed and can't be sampled, "
+                            "use the rebuild strategy to rebuild it anyway",
+                            path_to_target_db)
+            return False
+
+        change_ratio = DictToLevelDBWriter.estimate_change_ratio(input_entries, target_db)
+
+        logging.info("About %.0f%% of the entries of LevelDB '%s' changed",
+                     change_ratio * 100,
+                     path_to_target_db)
+
+        return change_ratio >= rebuild_change_ratio
+
+    @staticmethod
+    def __rebuild_db(input_entries: Iterable[Tuple[str, str]],
+                     target_db: DB,
+                     path_to_target_db: Path,
+                     pack_options: PackOptions,
+                     batch_options: WriteBatchOptions,
+                     replaced_db_paths_to_old_db_paths: Dict[Path, Union[Path, None]]) -> ChangeCounts:
+        """
+        Writes the given entries (`input_entries`) into a new LevelDB and replaces the given one (`target_db`) with it.
+        `target_db` is closed afterwards.
+        Nothing is written into `target_db`, so it needs no journal. Instead, it is kept until the whole pack succeeded.
+
+        :param replaced_db_paths_to_old_db_paths: Where the old copy of `target_db` is, is added to it. The caller
+        restores it with `LevelDBHelper.restore_db` if the pack fails, or deletes it with `__delete_old_dbs`.
+        """
+
+        path_to_staging_db = LevelDBHelper.get_path_to_staging_db(path_to_target_db)
+
+        logging.info("Rebuilding LevelDB '%s' in '%s'", path_to_target_db, path_to_staging_db)
+
+        # left over from an interrupted run
+        shutil.rmtree(path_to_staging_db, ignore_errors=True)
+
+        staging_db = LevelDBHelper.try_open_db(path_to_staging_db,
+                                               skip_checks=True,
+                                               must_exist=False,
+                                               leveldb_options=pack_options.leveldb_options)
 
         try:
-            # open all the dbs -> fail fast
-            for (path_to_input_dir, path_to_target_db) in input_dir_paths_to_target_db_paths.items():
-                db = LevelDBHelper.try_open_db(path_to_target_db, skip_checks=True,
-                                               must_exist=False)
-                input_dir_paths_to_dbs[path_to_input_dir] = db
-                logging.debug("Opened LevelDB at '%s' as '%s'",
-                              path_to_target_db,
-                              hex(id(db)))
-            # coming this far means:
-            # - all input directories were successfully read into dicts
-            # - all target dbs were successfully opened as LevelDBs
-
-            # pack all the folders into
-            for (path_to_input_dir, target_db) in input_dir_paths_to_dbs.items():
-                nb_changes += DictToLevelDBWriter.write_dict_into_db(input_dir_paths_to_dicts[path_to_input_dir],
-                                                                     target_db)
-        finally:
-            # close all the dbs
-            for target_db in input_dir_paths_to_dbs.values():
-                target_db.close()
+            try:
+                result = DictToLevelDBWriter.write_entries_into_new_db(input_entries,
+                                                                       staging_db,
+                                                                       batch_options)
+
+                Packer.__compact_if_changed(staging_db, result, pack_options)
+            finally:
+                staging_db.close()
+
+            target_db.close()
+            replaced_db_paths_to_old_db_paths[path_to_target_db] = LevelDBHelper.replace_db(path_to_staging_db,
+                                                                                            path_to_target_db)
+        except BaseException:
+            shutil.rmtree(path_to_staging_db, ignore_errors=True)
+            raise
+
+        return result
+
+    @staticmethod
+    def __delete_old_dbs(replaced_db_paths_to_old_db_paths: Dict[Path, Union[Path, None]]) -> None:
+        """
+        Deletes the old copies of the rebuilt LevelDBs, once the pack can't be rolled back anymore.
+        """
+
+        for path_to_old_db in replaced_db_paths_to_old_db_paths.values():
+            if path_to_old_db is not None:
+                shutil.rmtree(path_to_old_db, ignore_errors=True)
+
+    @staticmethod
+    def __compact_if_changed(target_db: DB,
+                             target_change_counts: ChangeCounts,
+                             pack_options: PackOptions) -> None:
+
+        if not pack_options.compact or target_change_counts.nb_changes == 0:
+            return
+
+        logging.info("Compacting LevelDB '%s'", hex(id(target_db)))
+
+        with MetricsRecorder.time(Stage.compaction):
+            target_db.compact_range()
+
+    @staticmethod
+    def __validate_changed_entries(path_to_input_dir: Path,
+                                   input_dict: Dict[str, str],
+                                   target_db: DB,
+                                   chunk_executor: ChunkExecutor,
+                                   key_filter: KeyFilter) -> None:
+        """
+        Reads the files of all entries of the given dict (`input_dict`) that differ from the values in the given LevelDB
+        (`target_db`) again, this time parsing them.
+        Entries that were read without validation are only correct if they did not change.
+        """
+
+        changed_keys = [key_bytes.decode(UTF_8)
+                        for (change_type, key_bytes, _) in DictToLevelDBWriter.diff_entries(sorted(input_dict.items()),
+                                                                                            target_db,
+                                                                                            key_filter)
+                        if change_type == ChangeType.created or change_type == ChangeType.updated]
+
+        logging.info("Validating %s new or changed files in directory '%s'",
+                     len(changed_keys),
+                     path_to_input_dir)
+
+        keys_to_paths = dict(DirToDictReader.list_dir(path_to_input_dir, key_filter))
+        paths_to_files = [keys_to_paths[key] for key in changed_keys]
+
+        for entries in chunk_executor.map_io(DirToDictReader.read_files_as_entries,
+                                          ChunkExecutor.split_into_chunks(paths_to_files)):
+            input_dict.update(entries)
+
+    @staticmethod
+    def __filter_out_unchanged(
+            input_dir_paths_to_target_db_paths: Dict[Path, Path],
+            input_dir_paths_to_trackers: Dict[Path, PackManifestTracker]) -> Dict[Path, Path]:
+        """
+        Creates a manifest tracker for each of the given directories (keys) and puts it into
+        `input_dir_paths_to_trackers`.
 
-        logging.info("Total number of changes: %s", nb_changes)
+        :return: The given mapping without the directories that did not change since the LevelDB was last packed
+        """
+
+        result: Dict[Path, Path] = dict()
+
+        for (path_to_input_dir, path_to_target_db) in input_dir_paths_to_target_db_paths.items():
+            tracker = PackManifestTracker(path_to_input_dir, path_to_target_db)
+
+            if tracker.is_unchanged():
+                logging.info("Skipping '%s', nothing changed since the last run", path_to_input_dir)
+                continue
+
+            input_dir_paths_to_trackers[path_to_input_dir] = tracker
+            result[path_to_input_dir] = path_to_target_db
+
+        return result
 
     @staticmethod
     def pack_dir_at_x_into_db_at_y(
             x_path_to_input_dir: Path,
-            y_path_to_target_db: Path) -> None:
+            y_path_to_target_db: Path,
+            pack_options: PackOptions = PackOptions()) -> None:
         """
         Packs the given directory (`path_to_input_dir`) into the leveldb at the given location (`path_to_target_db`).
         If the `path_to_target_db` does not point to an existing LevelDB a new one will be created.
@@ -153,6 +545,100 @@ class Packer:
 
         :param x_path_to_input_dir: e.g. "./unpacked_dbs/actors"
         :param y_path_to_target_db: e.g. "./foundrydata/Data/worlds/test/data/actors"
+        :param pack_options: Options that control how the directory is packed
+        """
+
+        Packer.pack_dirs_into_dbs({x_path_to_input_dir: y_path_to_target_db},
+                                  pack_options)
+
+    @staticmethod
+    def pack_ndjson_stream_into_db_at_y(input_stream: BinaryIO,
+                                        y_path_to_target_db: Path,
+                                        pack_options: PackOptions = PackOptions()) -> None:
         """
+        Packs newline delimited json, one `{"key": ..., "value": ...}` object per line, sorted by key, into the LevelDB
+        at the given location (`y_path_to_target_db`). The LevelDB then contains exactly the entries of the lines,
+        like a LevelDB packed from a directory with a file per line.
+        The lines are written while they are read, so only a bounded number of lines is in memory at once. The stream
+        can't be read twice, so instead of validating it first, the LevelDB is rolled back if a line is invalid.
 
-        Packer.pack_dirs_into_dbs({x_path_to_input_dir: y_path_to_target_db})
+        :param input_stream: e.g. `sys.stdin.buffer`
+        :param y_path_to_target_db: e.g. "./foundrydata/Data/worlds/test/data/actors"
+        :param pack_options: Only `jobs`, `memory_limit`, `metrics_observer`, `leveldb_options`, `compact`,
+        `strategy`, the batch options, `sync` and `key_filter` are used. The values are always parsed.
+        """
+
+        with StatCache.share():
+            AssertHelper.assert_paths_to_target_dbs_are_ok([y_path_to_target_db])
+
+        if pack_options.use_manifest:
+            # the manifest describes a directory
+            logging.warning("Not using the manifest, because the entries are read from a stream")
+
+        if pack_options.resume:
+            # the checkpoints are stored in the directories
+            logging.warning("Not resuming, because the entries are read from a stream")
+
+        with MetricsRecorder.observe(pack_options.metrics_observer), \
+                ChunkExecutor(pack_options.jobs) as chunk_executor:
+
+            lines = MetricsRecorder.time_iterator(Packer.__count_bytes_read(input_stream), Stage.file_read)
+            # the stream is always consumed like a directory with --streaming
+            max_chunk_bytes = chunk_executor.get_max_chunk_bytes(pack_options.memory_limit // 2) \
+                if pack_options.memory_limit is not None else None
+            input_entries = NdjsonToDictReader.read_lines_as_entries(lines,
+                                                                     chunk_executor,
+                                                                     pack_options.key_filter,
+                                                                     max_chunk_bytes)
+
+            target_db = LevelDBHelper.try_open_db(y_path_to_target_db,
+                                                  skip_checks=True,
+                                                  must_exist=False,
+                                                  leveldb_options=pack_options.leveldb_options)
+            journal: Union[LevelDBWriteJournal, None] = None
+            replaced_db_paths_to_old_db_paths: Dict[Path, Union[Path, None]] = dict()
+
+            batch_options = WriteBatchOptions.from_pack_options(pack_options)
+
+            if batch_options.max_bytes is None and pack_options.memory_limit is not None:
+                batch_options.max_bytes = pack_options.memory_limit // 2
+
+            try:
+                if Packer.__is_rebuild(None, target_db, y_path_to_target_db, pack_options):
+                    target_change_counts = Packer.__rebuild_db(input_entries,
+                                                               target_db,
+                                                               y_path_to_target_db,
+                                                               pack_options,
+                                                               batch_options,
+                                                               replaced_db_paths_to_old_db_paths)
+                else:
+                    journal = LevelDBWriteJournal(target_db)
+                    target_change_counts = DictToLevelDBWriter.write_entries_into_db(input_entries,
+                                                                                     target_db,
+                                                                                     batch_options,
+                                                                                     journal,
+                                                                                     pack_options.key_filter)
+                    Packer.__compact_if_changed(target_db, target_change_counts, pack_options)
+            except BaseException:
+                # leave the LevelDB as it was before the pack
+                if journal is not None:
+                    journal.rollback(pack_options.sync)
+                raise
+            finally:
+                if journal is not None:
+                    journal.release()
+
+                target_db.close()
+
+            Packer.__delete_old_dbs(replaced_db_paths_to_old_db_paths)
+            MetricsRecorder.count_target(y_path_to_target_db, target_change_counts)
+
+        logging.info("Total number of changes: %s (%s)",
+                     target_change_counts.nb_changes,
+                     target_change_counts)
+
+    @staticmethod
+    def __count_bytes_read(lines: Iterable[bytes]) -> Iterator[bytes]:
+        for line in lines:
+            MetricsRecorder.count(Counter.bytes_read, len(line))
+            yield line
@@ -0,0 +1,480 @@
+import logging
+import shutil
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Dict, List, Set, Tuple, Union
+
+from plyvel import DB
+
+from fvttpacker.__common.blob_store import BlobStore
+from fvttpacker.__common.change_counts import ChangeCounts, ChangeType
+from fvttpacker.__common.chunk_executor import ChunkExecutor
+from fvttpacker.__common.leveldb_helper import LevelDBHelper
+from fvttpacker.__common.manifest import Manifest
+from fvttpacker.__common.metrics_recorder import MetricsRecorder
+from fvttpacker.__common.stat_cache import StatCache
+from fvttpacker.__constants import UTF_8
+from fvttpacker.__packer.__batch_writer import WriteBatchOptions
+from fvttpacker.__packer.__dict_to_leveldb_writer import DictToLevelDBWriter
+from fvttpacker.__packer.__dir_to_leveldb_reader import DirToDictReader
+from fvttpacker.__packer.__leveldb_write_journal import LevelDBWriteJournal
+from fvttpacker.__unpacker.__dict_to_dir_writer import DictToDirWriter
+from fvttpacker.__unpacker.__leveldb_to_dict_reader import LevelDBToDictReader
+from fvttpacker.change_plan import ChangePlan, PlannedChange, TargetPlan, plan_operation_pack, \
+    plan_operation_unpack
+from fvttpacker.dir_layout import DirLayout
+from fvttpacker.fvttpacker_exception import FvttPackerException
+from fvttpacker.metrics import Stage
+from fvttpacker.pack_options import PackOptions
+from fvttpacker.unpack_options import UnpackOptions
+
+
+class Planner:
+    """
+    Makes the plans of packs and unpacks (see `ChangePlan`) with the same comparisons the real operations use, and
+    applies them.
+    """
+
+    @staticmethod
+    def plan_pack_dirs_into_dbs(input_dir_paths_to_target_db_paths: Dict[Path, Path],
+                                pack_options: PackOptions) -> ChangePlan:
+        """
+        :return: The changes `Packer.pack_dirs_into_dbs` would make, see `PackOptions.plan_observer`
+        """
+
+        plan = ChangePlan(plan_operation_pack)
+
+        with ChunkExecutor(pack_options.jobs, pack_options.io_threads) as chunk_executor:
+            for (path_to_input_dir, path_to_target_db) in input_dir_paths_to_target_db_paths.items():
+                plan.targets.append(Planner.__plan_pack_dir_into_db(path_to_input_dir,
+                                                                    path_to_target_db,
+                                                                    chunk_executor,
+                                                                    pack_options))
+
+        return plan
+
+    @staticmethod
+    def __plan_pack_dir_into_db(path_to_input_dir: Path,
+                                path_to_target_db: Path,
+                                chunk_executor: ChunkExecutor,
+                                pack_options: PackOptions) -> TargetPlan:
+
+        logging.info("Planning the pack of directory '%s' into LevelDB '%s'", path_to_input_dir, path_to_target_db)
+
+        key_filter = pack_options.key_filter
+        target_plan = TargetPlan(path_to_input_dir, path_to_target_db, Manifest.compute_db_digest(path_to_target_db))
+
+        if target_plan.db_digest is None:
+            # nothing to compare with, the LevelDB is not created by a plan
+            for (key_str, value_str) in DirToDictReader.read_dir_as_entries(path_to_input_dir,
+                                                                            chunk_executor,
+                                                                            key_filter=key_filter):
+                target_plan.changes.append(Planner.__create_planned_change(key_str,
+                                                                           ChangeType.created,
+                                                                           value_str.encode(UTF_8),
+                                                                           None))
+            return target_plan
+
+        target_db = LevelDBHelper.try_open_db(path_to_target_db,
+                                              skip_checks=True,
+                                              must_exist=True,
+                                              leveldb_options=pack_options.leveldb_options)
+
+        try:
+            # same as a pack: without validation, the files that differ are parsed afterwards
+            validate = pack_options.validate or pack_options.streaming
+            input_entries = DirToDictReader.read_dir_as_entries(path_to_input_dir,
+                                                                chunk_executor,
+                                                                validate,
+                                                                key_filter)
+            changes: List[Tuple[str, str, Union[bytes, None]]] = list()
+
+            for (change_type, key_bytes, value_bytes) in DictToLevelDBWriter.diff_entries(input_entries,
+                                                                                          target_db,
+                                                                                          key_filter):
+                if change_type == ChangeType.unchanged:
+                    target_plan.nb_unchanged += 1
+                else:
+                    changes.append((change_type, key_bytes.decode(UTF_8), value_bytes))
+
+            if not validate:
+                changes = Planner.__validate_changes(path_to_input_dir, changes, chunk_executor, pack_options)
+
+            for (change_type, key_str, value_bytes) in changes:
+                previous_value_bytes = target_db.get(key_str.encode(UTF_8))
+
+                if change_type == ChangeType.updated and previous_value_bytes == value_bytes:
+                    # only differed before the file was parsed
+                    target_plan.nb_unchanged += 1
+                    continue
+
+                target_plan.changes.append(Planner.__create_planned_change(key_str,
+                                                                           change_type,
+                                                                           value_bytes,
+                                                                           previous_value_bytes))
+        finally:
+            target_db.close()
+
+        # opening a LevelDB turns its log file into a table file, what matters is the digest it is left with
+        target_plan.db_digest = Manifest.compute_db_digest(path_to_target_db)
+
+        return target_plan
+
+    @staticmethod
+    def __validate_changes(path_to_input_dir: Path,
+                           changes: List[Tuple[str, str, Union[bytes, None]]],
+                           chunk_executor: ChunkExecutor,
+                           pack_options: PackOptions) -> List[Tuple[str, str, Union[bytes, None]]]:
+        """
+        :return: The given changes (`changes`), with the values of the new and changed entries read from their parsed
+        files
+        """
+
+        keys_to_paths = dict(DirToDictReader.list_dir(path_to_input_dir, pack_options.key_filter))
+        paths_to_files = [keys_to_paths[key_str]
+                          for (change_type, key_str, _) in changes
+                          if change_type != ChangeType.deleted]
+
+        keys_to_values: Dict[str, str] = dict()
+
+        for entries in chunk_executor.map_io(DirToDictReader.read_files_as_entries,
+                                             ChunkExecutor.split_into_chunks(paths_to_files)):
+            keys_to_values.update(entries)
+
+        return [(change_type, key_str, None if value_bytes is None else keys_to_values[key_str].encode(UTF_8))
+                for (change_type, key_str, value_bytes) in changes]
+
+    @staticmethod
+    def apply_pack_plan(input_dir_paths_to_target_db_paths: Dict[Path, Path],
+                        pack_options: PackOptions) -> None:
+        """
+        Makes the changes of `pack_options.plan`, see `PackOptions.plan`.
+        """
+
+        plan = Planner.__check_plan(pack_options.plan, plan_operation_pack, input_dir_paths_to_target_db_paths)
+
+        target_plans_to_entries: Dict[int, List[Tuple[str, str]]] = dict()
+        target_plans_to_dbs: Dict[int, DB] = dict()
+        # the keys written into each LevelDB, so they can be restored if a later batch or LevelDB fails
+        journals: List[LevelDBWriteJournal] = list()
+
+        batch_options = WriteBatchOptions.from_pack_options(pack_options)
+        change_counts = ChangeCounts()
+
+        with ChunkExecutor(pack_options.jobs, pack_options.io_threads) as chunk_executor:
+            # read all changed files -> fail fast
+            for (index, target_plan) in enumerate(plan.targets):
+                Planner.__check_db_digest(target_plan.path_to_target, target_plan)
+                target_plans_to_entries[index] = Planner.__read_planned_files(target_plan,
+                                                                              chunk_executor,
+                                                                              pack_options)
+
+        try:
+            # open all the dbs -> fail fast
+            for (index, target_plan) in enumerate(plan.targets):
+                target_plans_to_dbs[index] = LevelDBHelper.try_open_db(target_plan.path_to_target,
+                                                                       skip_checks=True,
+                                                                       must_exist=False,
+                                                                       leveldb_options=pack_options.leveldb_options)
+
+            for (index, target_plan) in enumerate(plan.targets):
+                target_db = target_plans_to_dbs[index]
+
+                journals.append(LevelDBWriteJournal(target_db))
+                target_change_counts = DictToLevelDBWriter.write_changes_into_db(
+                    target_plans_to_entries[index],
+                    [change.key for change in target_plan.changes if change.change_type == ChangeType.deleted],
+                    target_db,
+                    batch_options,
+                    journals[-1])
+
+                if pack_options.compact and target_change_counts.nb_changes > 0:
+                    logging.info("Compacting LevelDB '%s'", hex(id(target_db)))
+
+                    with MetricsRecorder.time(Stage.compaction):
+                        target_db.compact_range()
+
+                change_counts.add(target_change_counts)
+                MetricsRecorder.count_target(target_plan.path_to_target, target_change_counts)
+        except BaseException:
+            # leave the LevelDBs as they were before the pack
+            for journal in reversed(journals):
+                journal.rollback(pack_options.sync)
+            raise
+        finally:
+            # the snapshots of the journals must be released before their dbs are closed
+            for journal in journals:
+                journal.release()
+
+            for target_db in target_plans_to_dbs.values():
+                target_db.close()
+
+        logging.info("Total number of changes: %s (%s)",
+                     change_counts.nb_changes,
+                     change_counts)
+
+    @staticmethod
+    def __read_planned_files(target_plan: TargetPlan,
+                             chunk_executor: ChunkExecutor,
+                             pack_options: PackOptions) -> List[Tuple[str, str]]:
+        """
+        :return: (key, value) tuples of the new and changed entries of the given plan (`target_plan`), read from their
+        files, which must not have changed since the plan was made
+        """
+
+        keys_to_paths = dict(DirToDictReader.list_dir(target_plan.path_to_source, pack_options.key_filter))
+        keys_to_changes = {change.key: change
+                           for change in target_plan.changes
+                           if change.change_type != ChangeType.deleted}
+
+        for key_str in keys_to_changes.keys():
+            if key_str not in keys_to_paths:
+                raise FvttPackerException(f"The file of key '{key_str}' was removed from "
+                                          f"'{target_plan.path_to_source}' since the plan was made.")
+
+        result: List[Tuple[str, str]] = list()
+
+        for entries in chunk_executor.map_io(DirToDictReader.read_files_as_entries,
+                                             ChunkExecutor.split_into_chunks([keys_to_paths[key_str]
+                                                                              for key_str in keys_to_changes.keys()])):
+            for (key_str, value_str) in entries:
+                Planner.__check_value_hash(keys_to_changes[key_str], value_str, target_plan.path_to_source)
+                result.append((key_str, value_str))
+
+        return result
+
+    @staticmethod
+    def plan_unpack_dbs_into_dirs(input_db_paths_to_target_dir_paths: Dict[Path, Path],
+                                  unpack_options: UnpackOptions) -> ChangePlan:
+        """
+        :return: The changes `Unpacker.unpack_dbs_into_dirs` would make, see `UnpackOptions.plan_observer`
+        """
+
+        plan = ChangePlan(plan_operation_unpack)
+
+        with ChunkExecutor(unpack_options.jobs, unpack_options.io_threads) as chunk_executor:
+            for (path_to_input_db, path_to_target_dir) in input_db_paths_to_target_dir_paths.items():
+                plan.targets.append(Planner.__plan_unpack_db_into_dir(path_to_input_db,
+                                                                      path_to_target_dir,
+                                                                      chunk_executor,
+                                                                      unpack_options))
+
+        return plan
+
+    @staticmethod
+    def __plan_unpack_db_into_dir(path_to_input_db: Path,
+                                  path_to_target_dir: Path,
+                                  chunk_executor: ChunkExecutor,
+                                  unpack_options: UnpackOptions) -> TargetPlan:
+
+        logging.info("Planning the unpack of LevelDB '%s' into directory '%s'", path_to_input_db, path_to_target_dir)
+
+        key_filter = unpack_options.key_filter
+        target_plan = TargetPlan(path_to_input_db, path_to_target_dir, None)
+
+        # the files are still where the current layout puts them, moving them changes nothing else
+        dir_layout = DirLayout.load(path_to_target_dir)
+        is_existing_dir = StatCache.is_dir(path_to_target_dir)
+        input_keys: Set[str] = set()
+
+        with ExitStack() as exit_stack:
+            input_db = Planner.__open_input_db(path_to_input_db, unpack_options, exit_stack)
+
+            # same as an unpack: without validation, entries whose files only differ by their indentation are skipped
+            path_to_existing_dir = path_to_target_dir if is_existing_dir and not unpack_options.validate else None
+
+            # the references are the same, but the strings are only stored once the plan is applied
+            blob_store = BlobStore(path_to_target_dir, unpack_options.blob_threshold, is_writing=False) \
+                if unpack_options.blob_threshold is not None else None
+
+            for (key_str, content_str) in LevelDBToDictReader.read_raw_entries_as_file_contents_in_chunks(
+                    MetricsRecorder.time_iterator(LevelDBHelper.iterate_db(input_db, key_filter), Stage.leveldb_read),
+                    chunk_executor,
+                    path_to_existing_dir,
+                    dir_layout,
+                    blob_store):
+
+                input_keys.add(key_str)
+
+                if content_str is None:
+                    target_plan.nb_unchanged += 1
+                    continue
+
+                path_to_file = dir_layout.get_path_to_file(path_to_target_dir, key_str)
+                previous_content_bytes = Planner.__try_read_file(path_to_file) if is_existing_dir else None
+                content_bytes = content_str.encode(UTF_8)
+
+                if previous_content_bytes == content_bytes:
+                    target_plan.nb_unchanged += 1
+                    continue
+
+                change_type = ChangeType.created if previous_content_bytes is None else ChangeType.updated
+                target_plan.changes.append(Planner.__create_planned_change(key_str,
+                                                                           change_type,
+                                                                           content_bytes,
+                                                                           previous_content_bytes))
+
+        # see `__plan_pack_dir_into_db`
+        target_plan.db_digest = Manifest.compute_db_digest(path_to_input_db)
+
+        if is_existing_dir:
+            with MetricsRecorder.time(Stage.dir_scan):
+                keys_and_dir_entries = sorted(dir_layout.list_files(path_to_target_dir),
+                                              key=lambda key_and_dir_entry: key_and_dir_entry[0])
+
+            for (key_str, dir_entry) in keys_and_dir_entries:
+                if key_str not in input_keys and key_filter.matches(key_str):
+                    target_plan.changes.append(PlannedChange(key_str,
+                                                             ChangeType.deleted,
+                                                             None,
+                                                             dir_entry.stat().st_size,
+                                                             None))
+
+            target_plan.changes.sort(key=lambda change: change.key)
+
+        return target_plan
+
+    @staticmethod
+    def apply_unpack_plan(input_db_paths_to_target_dir_paths: Dict[Path, Path],
+                          unpack_options: UnpackOptions) -> None:
+        """
+        Makes the changes of `unpack_options.plan`, see `UnpackOptions.plan`.
+        """
+
+        plan = Planner.__check_plan(unpack_options.plan, plan_operation_unpack, input_db_paths_to_target_dir_paths)
+
+        target_plans_to_file_contents: Dict[int, List[Tuple[str, str]]] = dict()
+        change_counts = ChangeCounts()
+
+        # read all changed entries -> fail fast
+        for (index, target_plan) in enumerate(plan.targets):
+            Planner.__check_db_digest(target_plan.path_to_source, target_plan)
+
+            with ExitStack() as exit_stack:
+                input_db = Planner.__open_input_db(target_plan.path_to_source, unpack_options, exit_stack)
+                blob_store = BlobStore(target_plan.path_to_target, unpack_options.blob_threshold) \
+                    if unpack_options.blob_threshold is not None else None
+                target_plans_to_file_contents[index] = Planner.__read_planned_entries(target_plan,
+                                                                                      input_db,
+                                                                                      blob_store)
+
+        for (index, target_plan) in enumerate(plan.targets):
+            target_change_counts = DictToDirWriter.write_changes_into_dir(
+                target_plans_to_file_contents[index],
+                [change.key for change in target_plan.changes if change.change_type == ChangeType.deleted],
+                target_plan.path_to_target,
+                unpack_options.dir_layout,
+                unpack_options.io_threads)
+            change_counts.add(target_change_counts)
+            MetricsRecorder.count_target(target_plan.path_to_target, target_change_counts)
+
+        logging.info("Total number of changes: %s (%s)",
+                     change_counts.nb_changes,
+                     change_counts)
+
+    @staticmethod
+    def __read_planned_entries(target_plan: TargetPlan,
+                               input_db: DB,
+                               blob_store: Union[BlobStore, None]) -> List[Tuple[str, str]]:
+        """
+        :param blob_store: see `LevelDBToDictReader.read_raw_entries_as_file_contents`
+        :return: (key, file content) tuples of the new and changed files of the given plan (`target_plan`), read from
+        the given LevelDB (`input_db`), whose entries must not have changed since the plan was made
+        """
+
+        result: List[Tuple[str, str]] = list()
+
+        for change in target_plan.changes:
+            if change.change_type == ChangeType.deleted:
+                continue
+
+            key_bytes = change.key.encode(UTF_8)
+            value_bytes = input_db.get(key_bytes)
+
+            if value_bytes is None:
+                raise FvttPackerException(f"The entry of key '{change.key}' was removed from "
+                                          f"'{target_plan.path_to_source}' since the plan was made.")
+
+            (key_str, content_str) = LevelDBToDictReader.read_raw_entries_as_file_contents([(key_bytes, value_bytes)],
+                                                                                           blob_store)[0]
+            Planner.__check_value_hash(change, content_str, target_plan.path_to_source)
+            result.append((key_str, content_str))
+
+        return result
+
+    @staticmethod
+    def __open_input_db(path_to_input_db: Path,
+                        unpack_options: UnpackOptions,
+                        exit_stack: ExitStack) -> DB:
+        """
+        Opens the given LevelDB (`path_to_input_db`) or a copy of it, see `UnpackOptions.snapshot`.
+        Closing it and deleting the copy is registered with `exit_stack`.
+        """
+
+        path_to_db_to_open = path_to_input_db
+
+        if unpack_options.snapshot:
+            with MetricsRecorder.time(Stage.leveldb_snapshot):
+                path_to_db_to_open = LevelDBHelper.copy_db_snapshot(path_to_input_db)
+
+            exit_stack.callback(shutil.rmtree, path_to_db_to_open, ignore_errors=True)
+
+        input_db = LevelDBHelper.try_open_db(path_to_db_to_open,
+                                             skip_checks=True,
+                                             must_exist=True,
+                                             leveldb_options=unpack_options.leveldb_options)
+        exit_stack.callback(input_db.close)
+
+        return input_db
+
+    @staticmethod
+    def __check_plan(plan: ChangePlan,
+                     operation: str,
+                     source_paths_to_target_paths: Dict[Path, Path]) -> ChangePlan:
+
+        if plan.operation != operation:
+            raise FvttPackerException(f"The plan is for '{plan.operation}', not for '{operation}'.")
+
+        planned_paths = {(target_plan.path_to_source, target_plan.path_to_target) for target_plan in plan.targets}
+
+        if planned_paths != set(source_paths_to_target_paths.items()):
+            raise FvttPackerException("The plan was made for other directories and LevelDBs.")
+
+        return plan
+
+    @staticmethod
+    def __check_db_digest(path_to_db: Path,
+                          target_plan: TargetPlan) -> None:
+
+        if Manifest.compute_db_digest(path_to_db) != target_plan.db_digest:
+            raise FvttPackerException(f"LevelDB '{path_to_db}' changed since the plan was made. Make a new plan.")
+
+    @staticmethod
+    def __check_value_hash(change: PlannedChange,
+                           value_str: str,
+                           path_to_source: Path) -> None:
+
+        if Manifest.hash_value(value_str.encode(UTF_8)) != change.value_hash:
+            raise FvttPackerException(f"The entry of key '{change.key}' in '{path_to_source}' changed since the plan "
+                                      f"was made. Make a new plan.")
+
+    @staticmethod
+    def __create_planned_change(key_str: str,
+                                change_type: str,
+                                value_bytes: Union[bytes, None],
+                                previous_value_bytes: Union[bytes, None]) -> PlannedChange:
+
+        return PlannedChange(key_str,
+                             change_type,
+                             None if value_bytes is None else len(value_bytes),
+                             None if previous_value_bytes is None else len(previous_value_bytes),
+                             None if value_bytes is None else Manifest.hash_value(value_bytes))
+
+    @staticmethod
+    def __try_read_file(path_to_file: Path) -> Union[bytes, None]:
+
+        try:
+            with MetricsRecorder.time(Stage.file_read), open(path_to_file, "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
@@ -1,10 +1,19 @@
-import json
 import logging
+import os
 from pathlib import Path
-from typing import Dict
+from typing import AbstractSet, Dict, Iterable, Iterator, List, Set, Tuple, Union
 
 from fvttpacker.__common.assert_helper import AssertHelper
+from fvttpacker.__common.change_counts import ChangeCounts, ChangeType
+from fvttpacker.__common.checkpoint_journal import CheckpointJournal
+from fvttpacker.__common.io_executor import IOExecutor
+from fvttpacker.__common.json_codec import default_json_codec
+from fvttpacker.__common.metrics_recorder import MetricsRecorder
 from fvttpacker.__constants import UTF_8
+from fvttpacker.dir_layout import DirLayout
+from fvttpacker.fvttpacker_exception import FvttPackerException
+from fvttpacker.key_filter import KeyFilter
+from fvttpacker.metrics import Counter, Stage
 
 
 class DictToDirWriter:
@@ -12,7 +21,7 @@ class DictToDirWriter:
     @staticmethod
     def write_dict_into_dir(input_dict: Dict[str, Dict],
                             path_to_target_dir: Path,
-                            skip_checks: bool):
+                            skip_checks: bool) -> ChangeCounts:
         """
         Packs the given dictionary (`input_dict`) into the given directory (`path_to_target_dict`).
         - Removes all entries from `path_to_target_dir` that are not in `from_dict`
@@ -21,48 +30,320 @@ class DictToDirWriter:
 
         :param input_dict: The dict to unpack into the directory
         :param path_to_target_dir: The path to the directory to unpack the dict into
-        :param skip_checks: TODO
+        :param skip_checks: If True, the target directory is not checked with
+        `AssertHelper.assert_path_to_target_dir_is_ok` first, e.g. because the caller already checked it
+        :return: What happened to the files in the directory
+        """
+
+        logging.info("Unpacking dict '%s' into directory '%s'",
+                     hex(id(input_dict)),
+                     path_to_target_dir)
+
+        return DictToDirWriter.write_entries_into_dir(input_dict.items(),
+                                                      path_to_target_dir,
+                                                      skip_checks)
+
+    @staticmethod
+    def write_entries_into_dir(input_entries: Iterable[Tuple[str, Dict]],
+                               path_to_target_dir: Path,
+                               skip_checks: bool) -> ChangeCounts:
+        """
+        Unpacks the given entries (`input_entries`) into the given directory (`path_to_target_dir`).
+        Same as `write_dict_into_dir`, but each entry is written as soon as it is consumed, so the entries don't have
+        to be in memory all at once.
+
+        :param input_entries: (key, decoded value) tuples to unpack into the directory
+        :param path_to_target_dir: The path to the directory to unpack the entries into
+        :param skip_checks: If True, the target directory is not checked with
+        `AssertHelper.assert_path_to_target_dir_is_ok` first, e.g. because the caller already checked it
+        :return: What happened to the files in the directory
+        """
+
+        return DictToDirWriter.write_file_contents_into_dir(
+            ((key, DictToDirWriter.to_file_content(value_dict)) for (key, value_dict) in input_entries),
+            path_to_target_dir,
+            skip_checks)
+
+    @staticmethod
+    def write_file_contents_into_dir(input_file_contents: Iterable[Tuple[str, Union[str, None]]],
+                                     path_to_target_dir: Path,
+                                     skip_checks: bool,
+                                     unchanged_keys: AbstractSet[str] = frozenset(),
+                                     key_filter: KeyFilter = KeyFilter(),
+                                     dir_layout: Union[DirLayout, None] = None,
+                                     io_threads: int = 1,
+                                     checkpoint: Union[CheckpointJournal, None] = None) -> ChangeCounts:
+        """
+        Writes the given file contents (`input_file_contents`) into the given directory (`path_to_target_dir`).
+        Each content is written as soon as it is consumed.
+        Only the keys are kept in memory until the end.
+        Files whose content would not change are neither written nor deleted, so their mtime stays the same.
+
+        :param input_file_contents: (key, file content) tuples to write into the directory. A file content of None
+        means the file is known to be up-to-date.
+        :param path_to_target_dir: The path to the directory to write the file contents into
+        :param skip_checks: If True, the target directory is not checked with
+        `AssertHelper.assert_path_to_target_dir_is_ok` first, e.g. because the caller already checked it
+        :param unchanged_keys: Keys whose files are known to be up-to-date, they are neither written nor deleted.
+        It is only read after all file contents were consumed.
+        :param key_filter: Only the files whose keys are selected by this filter are deleted if they are not in
+        `input_file_contents`, the others are left as they are
+        :param dir_layout: Where the files are written to, see `DirLayout`. If the directory has another layout, its
+        files are moved first. If None, the layout of the directory is kept.
+        :param io_threads: Number of threads the files are compared, written and deleted on, see `IOExecutor`.
+        They are still logged in the order of `input_file_contents`.
+        :param checkpoint: If given, it is advanced to the key of each file once it and all files before it were
+        written, so `input_file_contents` must be sorted by key
+        :return: What happened to the files in the directory
         """
 
         if not skip_checks:
             AssertHelper.assert_path_to_target_dir_is_ok(path_to_target_dir)
 
+        if dir_layout is None:
+            dir_layout = DirLayout.load(path_to_target_dir)
+
         if not path_to_target_dir.exists():
             path_to_target_dir.mkdir()
+            dir_layout.save(path_to_target_dir)
+        else:
+            DictToDirWriter.apply_layout(path_to_target_dir, dir_layout)
 
-        logging.info("Unpacking dict '%s' into directory '%s'",
-                     hex(id(input_dict)),
+        logging.info("Unpacking entries into directory '%s'",
                      path_to_target_dir)
 
-        files_in_target_dir = path_to_target_dir.glob("*")
+        change_counts = ChangeCounts()
+        input_keys: Set[str] = set()
+
+        with IOExecutor(io_threads) as io_executor:
+            files_to_write = DictToDirWriter.__get_files_to_write(input_file_contents,
+                                                                  path_to_target_dir,
+                                                                  dir_layout,
+                                                                  input_keys,
+                                                                  change_counts)
+
+            for (target_filename, change_type) in io_executor.map(DictToDirWriter.__write_file_if_changed,
+                                                                  files_to_write):
+                change_counts.count(change_type)
+
+                if change_type == ChangeType.created:
+                    logging.info("Created file '%s'", target_filename)
+                elif change_type == ChangeType.updated:
+                    logging.info("Updated file '%s'", target_filename)
+
+                if checkpoint is not None:
+                    checkpoint.advance(target_filename)
+
+            paths_to_files_to_delete = DictToDirWriter.__get_files_to_delete(path_to_target_dir,
+                                                                             dir_layout,
+                                                                             input_keys,
+                                                                             unchanged_keys,
+                                                                             key_filter,
+                                                                             change_counts)
+
+            for path_to_file in io_executor.map(DictToDirWriter.__delete_file, paths_to_files_to_delete):
+                logging.info("Deleted file '%s'", path_to_file)
+
+        change_counts.nb_unchanged += len(unchanged_keys)
+
+        logging.info("Number of changes in directory '%s': %s (%s)",
+                     path_to_target_dir,
+                     change_counts.nb_changes,
+                     change_counts)
+
+        return change_counts
+
+    @staticmethod
+    def write_changes_into_dir(changed_file_contents: Iterable[Tuple[str, str]],
+                               deleted_keys: Iterable[str],
+                               path_to_target_dir: Path,
+                               dir_layout: Union[DirLayout, None] = None,
+                               io_threads: int = 1) -> ChangeCounts:
+        """
+        Writes only the given changes into the given directory (`path_to_target_dir`).
+        Unlike `write_file_contents_into_dir` all other files of the directory are left as they are.
+
+        :param changed_file_contents: (key, file content) tuples of files that are new or changed
+        :param deleted_keys: Keys of the files that have to be removed
+        :param path_to_target_dir: The path to the directory to write the changes into
+        :param dir_layout: see `write_file_contents_into_dir`
+        :param io_threads: see `write_file_contents_into_dir`
+        :return: What happened to the files in the directory
+        """
+
+        if dir_layout is None:
+            dir_layout = DirLayout.load(path_to_target_dir)
+
+        if not path_to_target_dir.exists():
+            path_to_target_dir.mkdir()
+            dir_layout.save(path_to_target_dir)
+        else:
+            DictToDirWriter.apply_layout(path_to_target_dir, dir_layout)
+
+        logging.info("Writing changes into directory '%s'",
+                     path_to_target_dir)
+
+        change_counts = ChangeCounts()
+
+        with IOExecutor(io_threads) as io_executor:
+            files_to_write = DictToDirWriter.__get_files_to_write(changed_file_contents,
+                                                                  path_to_target_dir,
+                                                                  dir_layout,
+                                                                  set(),
+                                                                  change_counts)
+
+            for (target_filename, change_type) in io_executor.map(DictToDirWriter.__write_file_if_changed,
+                                                                  files_to_write):
+                change_counts.count(change_type)
+
+                if change_type == ChangeType.created:
+                    logging.info("Created file '%s'", target_filename)
+                elif change_type == ChangeType.updated:
+                    logging.info("Updated file '%s'", target_filename)
+
+            paths_to_files_to_delete = [str(dir_layout.get_path_to_file(path_to_target_dir, key))
+                                        for key in deleted_keys]
+            change_counts.nb_deleted += len(paths_to_files_to_delete)
+
+            for path_to_file in io_executor.map(DictToDirWriter.__delete_file, paths_to_files_to_delete):
+                logging.info("Deleted file '%s'", path_to_file)
 
-        # Remove entries
-        for file_in_target_dir in files_in_target_dir:
-            if file_in_target_dir.name not in input_dict.keys():
-                file_in_target_dir.unlink()
-                logging.info("Deleted file '%s'", file_in_target_dir)
+        logging.info("Number of changes in directory '%s': %s (%s)",
+                     path_to_target_dir,
+                     change_counts.nb_changes,
+                     change_counts)
+
+        return change_counts
+
+    @staticmethod
+    def __get_files_to_write(input_file_contents: Iterable[Tuple[str, Union[str, None]]],
+                             path_to_target_dir: Path,
+                             dir_layout: DirLayout,
+                             input_keys: Set[str],
+                             change_counts: ChangeCounts) -> Iterator[Tuple[str, Path, str]]:
+        """
+        Adds the keys of the given file contents (`input_file_contents`) to `input_keys` and counts the ones that are
+        known to be up-to-date, as they are consumed.
+        Creates the sub-directories of the files, so the files can be written from any thread.
+
+        :return: (key, path to file, file content) tuples of the files that may have to be written
+        """
+
+        # sub-directories that are known to exist
+        paths_to_created_dirs: Set[Path] = {path_to_target_dir}
 
         target_filename: str
-        target_content_dict: Dict
+        target_content_str: Union[str, None]
+
+        for (target_filename, target_content_str) in input_file_contents:
+
+            input_keys.add(target_filename)
+
+            if target_content_str is None:
+                change_counts.nb_unchanged += 1
+                continue
+
+            path_to_file = dir_layout.get_path_to_file(path_to_target_dir, target_filename)
+
+            if path_to_file.parent not in paths_to_created_dirs:
+                path_to_file.parent.mkdir(parents=True, exist_ok=True)
+                paths_to_created_dirs.add(path_to_file.parent)
+
+            yield target_filename, path_to_file, target_content_str
+
+    @staticmethod
+    def __write_file_if_changed(file_to_write: Tuple[str, Path, str]) -> Tuple[str, str]:
+        """
+        :return: The key of the given file (`file_to_write`) and what happened to it, see `ChangeType`
+        """
+
+        (target_filename, path_to_file, target_content_str) = file_to_write
+
+        current_content_str = DictToDirWriter.__try_read_file(path_to_file)
+
+        if current_content_str == target_content_str:
+            return target_filename, ChangeType.unchanged
+
+        with MetricsRecorder.time(Stage.file_write), open(path_to_file, "wt", encoding=UTF_8) as file:
+            MetricsRecorder.count(Counter.bytes_written, file.write(target_content_str))
 
-        for (target_filename, target_content_dict) in input_dict.items():
+        return target_filename, ChangeType.created if current_content_str is None else ChangeType.updated
 
-            path_to_file = path_to_target_dir.joinpath(target_filename + ".json")
+    @staticmethod
+    def __get_files_to_delete(path_to_target_dir: Path,
+                              dir_layout: DirLayout,
+                              input_keys: AbstractSet[str],
+                              unchanged_keys: AbstractSet[str],
+                              key_filter: KeyFilter,
+                              change_counts: ChangeCounts) -> List[str]:
+        """
+        Counts the deleted entries.
 
-            if not path_to_file.exists():
-                path_to_file.touch()
+        :return: The paths of the files in the given directory (`path_to_target_dir`) that have to be deleted
+        """
 
-            current_content_str: str
+        result: List[str] = list()
 
-            # TODO: catch exception that could happen here
-            with open(path_to_file, "rt", encoding=UTF_8) as file:
-                current_content_str = file.read()
+        with MetricsRecorder.time(Stage.dir_scan):
+            keys_and_dir_entries = list(dir_layout.list_files(path_to_target_dir))
 
-            target_content_str = json.dumps(target_content_dict, indent="  ")
+        for (key, dir_entry) in keys_and_dir_entries:
 
-            if target_content_str == current_content_str:
+            if not key_filter.matches(key):
                 continue
 
-            with open(path_to_file, "wt", encoding=UTF_8) as file:
-                file.write(target_content_str)
-                logging.info("Updated file '%s'", target_filename)
+            if key in input_keys or key in unchanged_keys:
+                path_to_file = dir_layout.get_path_to_file(path_to_target_dir, key)
+
+                # only remove copies that are not where they belong, e.g. added by hand to another sub-directory,
+                # they would be read as duplicates
+                if dir_entry.path == str(path_to_file) or not path_to_file.exists():
+                    continue
+            else:
+                change_counts.nb_deleted += 1
+
+            result.append(dir_entry.path)
+
+        return result
+
+    @staticmethod
+    def __delete_file(path_to_file: str) -> str:
+
+        with MetricsRecorder.time(Stage.file_delete):
+            os.remove(path_to_file)
+
+        return path_to_file
+
+    @staticmethod
+    def apply_layout(path_to_target_dir: Path,
+                     dir_layout: DirLayout) -> None:
+        """
+        Moves the files of the given directory (`path_to_target_dir`) to where they belong in the given layout
+        (`dir_layout`), if the directory exists and has another layout.
+        """
+
+        if path_to_target_dir.is_dir() and DirLayout.load(path_to_target_dir) != dir_layout:
+            DirLayout.migrate(path_to_target_dir, dir_layout)
+
+    @staticmethod
+    def to_file_content(value_dict: Dict) -> str:
+        return default_json_codec.dumps_indented(value_dict)
+
+    @staticmethod
+    def __try_read_file(path_to_file: Path) -> Union[str, None]:
+        """
+        :return: The content of the given file (`path_to_file`), None if it does not exist or an empty string if it is
+        not valid UTF-8. The content of an entry is never empty, so such a file is overwritten.
+        """
+
+        try:
+            with MetricsRecorder.time(Stage.file_read), open(path_to_file, "rt", encoding=UTF_8) as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+        except UnicodeDecodeError:
+            logging.warning("File '%s' is not valid UTF-8, overwriting it", path_to_file)
+            return ""
+        except OSError as err:
+            # e.g. a directory or a file without read permission
+            raise FvttPackerException(f"Unable to read file '{path_to_file}', reason:\n'{err}'")
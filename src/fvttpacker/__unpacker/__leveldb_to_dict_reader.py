@@ -1,13 +1,28 @@
-import json
+import functools
 import logging
+from json import JSONDecodeError
 from pathlib import Path
-from typing import Iterable, Dict, Union
+from typing import Iterable, Dict, Union, Iterator, Tuple, List
 
 import plyvel
 
 from fvttpacker.__common.assert_helper import AssertHelper
+from fvttpacker.__common.blob_store import BlobStore
+from fvttpacker.__common.chunk_executor import ChunkExecutor
+from fvttpacker.__common.io_executor import IOExecutor
+from fvttpacker.__common.json_codec import default_json_codec
+from fvttpacker.__common.json_text import JsonText
 from fvttpacker.__common.leveldb_helper import LevelDBHelper
-from fvttpacker.__constants import UTF_8
+from fvttpacker.__common.metrics_recorder import MetricsRecorder
+from fvttpacker.__constants import UTF_8, ndjson_key_field, ndjson_value_field
+from fvttpacker.dir_layout import DirLayout
+from fvttpacker.fvttpacker_exception import FvttPackerException
+from fvttpacker.key_filter import KeyFilter
+from fvttpacker.metrics import Stage
+
+ndjson_line_start = f'{{"{ndjson_key_field}":'.encode(UTF_8)
+ndjson_value_start = f',"{ndjson_value_field}":'.encode(UTF_8)
+ndjson_line_end = b"}\n"
 
 
 class LevelDBToDictReader:
@@ -52,17 +67,223 @@ class LevelDBToDictReader:
                 db.close()
 
     @staticmethod
-    def read_db_into_dict(db: plyvel.DB) -> Dict[str, Dict]:
+    def read_db_into_dict(db: plyvel.DB,
+                          key_filter: KeyFilter = KeyFilter()) -> Dict[str, Dict]:
 
         result: Dict[str, Dict] = dict()
 
-        for entry in db.iterator():
-            key: bytes = entry[0]
-            value: bytes = entry[1]
+        for (key_str, value_dict) in LevelDBToDictReader.read_db_as_entries(db, key_filter):
+            result[key_str] = value_dict
+
+        return result
+
+    @staticmethod
+    def read_db_as_entries(db: plyvel.DB,
+                           key_filter: KeyFilter = KeyFilter()) -> Iterator[Tuple[str, Dict]]:
+        """
+        Lazily reads the given LevelDB (`db`).
+        Each entry is decoded when it is requested, so only one entry at a time has to be in memory.
+
+        :param db: The handle of the LevelDB to read
+        :param key_filter: Only the entries selected by this filter are read, see `LevelDBHelper.iterate_db`
+        :return: Iterator over (key, decoded value) tuples, sorted by key
+        """
+
+        return LevelDBToDictReader.decode_raw_entries(LevelDBHelper.iterate_db(db, key_filter))
+
+    @staticmethod
+    def read_raw_entries_as_file_contents_in_chunks(
+            raw_entries: Iterable[Tuple[bytes, bytes]],
+            chunk_executor: ChunkExecutor = ChunkExecutor(),
+            path_to_target_dir: Union[Path, None] = None,
+            dir_layout: DirLayout = DirLayout(),
+            blob_store: Union[BlobStore, None] = None) -> Iterator[Tuple[str, Union[str, None]]]:
+        """
+        Lazily converts the given raw LevelDB entries (`raw_entries`) into the contents of the files they are unpacked
+        to. The entries are converted in key ranges, only a bounded number of key ranges is in memory at once.
+
+        :param raw_entries: e.g. `db.iterator()`
+        :param chunk_executor: Executes the decoding and formatting of the key ranges, possibly in parallel
+        :param path_to_target_dir: If given, entries are converted with `read_raw_entries_as_changed_file_contents`
+        :param dir_layout: The layout of `path_to_target_dir`
+        :param blob_store: see `read_raw_entries_as_file_contents`
+        :return: Iterator over (key, file content) tuples, in the order of the given entries
+        """
+
+        chunks = ChunkExecutor.split_into_chunks(raw_entries)
 
+        if path_to_target_dir is None:
+            file_contents_of_chunks = chunk_executor.map(functools.partial(
+                LevelDBToDictReader.read_raw_entries_as_file_contents,
+                blob_store=blob_store), chunks)
+        else:
+            read_raw_entries = functools.partial(LevelDBToDictReader.read_raw_entries_as_changed_file_contents,
+                                                 path_to_target_dir=path_to_target_dir,
+                                                 dir_layout=dir_layout,
+                                                 blob_store=blob_store)
+            file_contents_of_chunks = chunk_executor.map_io(read_raw_entries, chunks)
+
+        for file_contents in file_contents_of_chunks:
+            yield from file_contents
+
+    @staticmethod
+    def read_raw_entries_as_file_contents(raw_entries: List[Tuple[bytes, bytes]],
+                                          blob_store: Union[BlobStore, None] = None) -> List[Tuple[str, str]]:
+        """
+        :param blob_store: If given, large strings of the values are moved into it, see `BlobStore`
+        :return: (key, file content) tuples of the given raw LevelDB entries (`raw_entries`)
+        """
+
+        result: List[Tuple[str, str]] = list()
+
+        for (key, value) in raw_entries:
+            key_str = key.decode(UTF_8)
+            result.append((key_str, LevelDBToDictReader.__to_file_content(key_str, value.decode(UTF_8), blob_store)))
+
+        return result
+
+    @staticmethod
+    def read_raw_entries_as_ndjson_in_chunks(raw_entries: Iterable[Tuple[bytes, bytes]],
+                                             chunk_executor: ChunkExecutor = ChunkExecutor(),
+                                             validate: bool = False) -> Iterator[bytes]:
+        """
+        Lazily converts the given raw LevelDB entries (`raw_entries`) into newline delimited json, in key ranges like
+        `read_raw_entries_as_file_contents_in_chunks`.
+
+        :param raw_entries: e.g. `db.iterator()`
+        :param chunk_executor: Executes the conversion of the key ranges, possibly in parallel
+        :param validate: see `read_raw_entries_as_ndjson`
+        :return: Iterator over the lines of each key range, in the order of the given entries
+        """
+
+        return chunk_executor.map(functools.partial(LevelDBToDictReader.read_raw_entries_as_ndjson,
+                                                    validate=validate),
+                                  ChunkExecutor.split_into_chunks(raw_entries))
+
+    @staticmethod
+    def read_raw_entries_as_ndjson(raw_entries: List[Tuple[bytes, bytes]],
+                                   validate: bool = False) -> bytes:
+        """
+        The values are stored minified, so they are copied as they are. Only values that span several lines are
+        parsed and minified.
+
+        :param validate: If True every value is parsed and minified
+        :return: The given raw LevelDB entries (`raw_entries`) as lines of `{"key": ..., "value": ...}` objects, see
+        `NdjsonToDictReader`
+        """
+
+        lines: List[bytes] = list()
+
+        for (key, value) in raw_entries:
             key_str = key.decode(UTF_8)
-            value_str = value.decode(UTF_8)
 
-            result[key_str] = json.loads(value_str)
+            if validate or b"\n" in value:
+                value = LevelDBToDictReader.__minify(key_str, value.decode(UTF_8)).encode(UTF_8)
+
+            lines.append(b"".join((ndjson_line_start,
+                                   default_json_codec.dumps_minified(key_str).encode(UTF_8),
+                                   ndjson_value_start,
+                                   value,
+                                   ndjson_line_end)))
+
+        return b"".join(lines)
+
+    @staticmethod
+    def read_raw_entries_as_changed_file_contents(
+            raw_entries: List[Tuple[bytes, bytes]],
+            path_to_target_dir: Path,
+            dir_layout: DirLayout = DirLayout(),
+            io_threads: int = 1,
+            blob_store: Union[BlobStore, None] = None) -> List[Tuple[str, Union[str, None]]]:
+        """
+        Same as `read_raw_entries_as_file_contents`, but entries whose files in the given directory
+        (`path_to_target_dir`) only differ from them by their indentation (see `JsonText.minify_indented`) are neither
+        parsed nor formatted.
+        The files are looked up according to the given layout (`dir_layout`).
+
+        :param io_threads: Number of threads the files are read on, see `IOExecutor`
+        :param blob_store: see `read_raw_entries_as_file_contents`, the files are compared with the strings they
+        reference inserted
+        :return: (key, file content) tuples of the given raw LevelDB entries (`raw_entries`), the file content is None
+        if the file is up-to-date
+        """
+
+        result: List[Tuple[str, Union[str, None]]] = list()
+
+        keys_and_values = [(key.decode(UTF_8), value.decode(UTF_8)) for (key, value) in raw_entries]
+        paths_to_files = [dir_layout.get_path_to_file(path_to_target_dir, key_str) for (key_str, _) in keys_and_values]
+
+        with IOExecutor(io_threads) as io_executor:
+            current_content_strs = list(io_executor.map(LevelDBToDictReader.__try_read_file, paths_to_files))
+
+        for ((key_str, value_str), current_content_str, path_to_file) in zip(keys_and_values,
+                                                                             current_content_strs,
+                                                                             paths_to_files):
+
+            is_up_to_date = False
+
+            if current_content_str is not None:
+                with MetricsRecorder.time(Stage.text_minify):
+                    current_value_str = JsonText.minify_indented(current_content_str)
+
+                if current_value_str is not None and blob_store is not None:
+                    current_value_str = BlobStore.inline(current_value_str, path_to_file)
+
+                is_up_to_date = current_value_str == value_str
+
+            if is_up_to_date:
+                result.append((key_str, None))
+            else:
+                result.append((key_str, LevelDBToDictReader.__to_file_content(key_str, value_str, blob_store)))
 
         return result
+
+    @staticmethod
+    def __try_read_file(path_to_file: Path) -> Union[str, None]:
+        """
+        :return: The content of the given file (`path_to_file`) or None if it does not exist
+        """
+
+        try:
+            with MetricsRecorder.time(Stage.file_read), open(path_to_file, "rt", encoding=UTF_8) as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def __to_file_content(key_str: str,
+                          value_str: str,
+                          blob_store: Union[BlobStore, None] = None) -> str:
+        try:
+            if blob_store is not None and blob_store.is_affected(value_str):
+                return default_json_codec.dumps_indented(blob_store.externalize(key_str,
+                                                                                default_json_codec.loads(value_str)))
+
+            # same as DictToDirWriter.to_file_content, but lets the codec format the value it parsed itself
+            return default_json_codec.indent(value_str)
+        except JSONDecodeError as err:
+            raise FvttPackerException(f"Error while parsing value of key '{key_str}' as json, reason:\n'{err}'")
+
+    @staticmethod
+    def __minify(key_str: str,
+                 value_str: str) -> str:
+        try:
+            return default_json_codec.minify(value_str)
+        except JSONDecodeError as err:
+            raise FvttPackerException(f"Error while parsing value of key '{key_str}' as json, reason:\n'{err}'")
+
+    @staticmethod
+    def decode_raw_entries(raw_entries: Iterable[Tuple[bytes, bytes]]) -> Iterator[Tuple[str, Dict]]:
+        """
+        :return: Iterator over (key, decoded value) tuples of the given raw LevelDB entries (`raw_entries`)
+        """
+
+        for (key, value) in raw_entries:
+
+            key_str = key.decode(UTF_8)
+            value_str = value.decode(UTF_8)
+
+            try:
+                yield key_str, default_json_codec.loads(value_str)
+            except JSONDecodeError as err:
+                raise FvttPackerException(f"Error while parsing value of key '{key_str}' as json, reason:\n'{err}'")
@@ -0,0 +1,75 @@
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Set, Tuple, Union
+
+from fvttpacker.__common.manifest import Manifest, ManifestEntry
+from fvttpacker.__constants import UTF_8
+
+
+class UnpackManifestTracker:
+    """
+    Uses the manifest of a target directory to find out which entries of the input LevelDB have to be unpacked
+    and records what was unpacked, so the next run can skip it.
+    """
+
+    def __init__(self,
+                 path_to_input_db: Path,
+                 path_to_target_dir: Path):
+
+        self.__path_to_input_db = path_to_input_db
+        self.__path_to_target_dir = path_to_target_dir
+
+        self.__manifest = Manifest.load(path_to_target_dir, path_to_input_db)
+        self.__file_stats = Manifest.stat_dir(path_to_target_dir)
+        self.__value_hashes: Dict[str, str] = dict()
+
+        self.unchanged_keys: Set[str] = set()
+        # digest of the LevelDB the entries are read from, if it's not the one at `path_to_input_db`
+        self.db_digest: Union[str, None] = None
+
+    def is_unchanged(self) -> bool:
+
+        if not self.__manifest.is_in_sync_with_db():
+            return False
+
+        (changed_keys, deleted_keys) = self.__manifest.get_changed_and_deleted_keys(self.__file_stats)
+
+        return len(changed_keys) == 0 and len(deleted_keys) == 0
+
+    def filter_raw_entries(self,
+                           raw_entries: Iterable[Tuple[bytes, bytes]]) -> Iterator[Tuple[bytes, bytes]]:
+        """
+        Passes through the given raw LevelDB entries (`raw_entries`) that have to be unpacked.
+        Entries whose value and file did not change since the last run are left out and put into `unchanged_keys`.
+        """
+
+        for (key, value) in raw_entries:
+            key_str = key.decode(UTF_8)
+            value_hash = Manifest.hash_value(value)
+
+            self.__value_hashes[key_str] = value_hash
+
+            if self.__manifest.is_entry_unchanged(key_str, value_hash, self.__file_stats):
+                self.unchanged_keys.add(key_str)
+            else:
+                yield key, value
+
+    def save(self) -> None:
+        """
+        Saves the new manifest. Must be called after the input LevelDB has been closed and all files were written.
+        """
+
+        db_digest = self.db_digest if self.db_digest is not None \
+            else Manifest.compute_db_digest(self.__path_to_input_db)
+
+        manifest = Manifest(self.__path_to_input_db, db_digest)
+
+        for (key, file_stat) in Manifest.stat_dir(self.__path_to_target_dir).items():
+            if key in self.__value_hashes:
+                manifest.entries[key] = ManifestEntry(file_stat, self.__value_hashes[key])
+
+        logging.debug("Saving manifest with %s entries for '%s'",
+                      len(manifest.entries),
+                      self.__path_to_target_dir)
+
+        manifest.save(self.__path_to_target_dir)
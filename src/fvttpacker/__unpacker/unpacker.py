@@ -1,14 +1,35 @@
+import copy
+import itertools
+import logging
+import shutil
 from pathlib import Path
-from typing import Dict, Iterable, List
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Set, Tuple, Union
 
+from plyvel import DB
+
+from fvttpacker.__common.assert_helper import AssertHelper
+from fvttpacker.__common.blob_store import BlobStore
+from fvttpacker.__common.change_counts import ChangeCounts
+from fvttpacker.__common.checkpoint_journal import CheckpointJournal, checkpoint_operation_unpack
+from fvttpacker.__common.chunk_executor import ChunkExecutor
+from fvttpacker.__common.leveldb_helper import LevelDBHelper
+from fvttpacker.__common.manifest import Manifest
+from fvttpacker.__common.metrics_recorder import MetricsRecorder
 from fvttpacker.__common.overwrite_helper import OverwriteHelper
-from fvttpacker.__constants import world_db_names
+from fvttpacker.__common.stat_cache import StatCache
+from fvttpacker.__constants import UTF_8, world_db_names
+from fvttpacker.__planner.planner import Planner
 from fvttpacker.__unpacker.__dict_to_dir_writer import DictToDirWriter
 from fvttpacker.__unpacker.__leveldb_to_dict_reader import LevelDBToDictReader
+from fvttpacker.__unpacker.__unpack_manifest_tracker import UnpackManifestTracker
 from fvttpacker.__common.__directory_checker_decorators import check_input_dir_and_target_dir, \
     check_input_dbs_and_target_dirs
+from fvttpacker.dir_layout import DirLayout
 from fvttpacker.fvttpacker_exception import FvttPackerException
+from fvttpacker.key_filter import KeyFilter
+from fvttpacker.metrics import Counter, Stage
 from fvttpacker.overwrite_confirmer import OverwriteConfirmer, AllYesOverwriteConfirmer
+from fvttpacker.unpack_options import UnpackOptions
 
 
 class Unpacker:
@@ -18,7 +39,8 @@ class Unpacker:
     def unpack_world_dbs_under_x_into_dirs_under_y(
             x_path_to_parent_input_dir: Path,
             y_path_to_parent_target_dir: Path,
-            overwrite_confirmer: OverwriteConfirmer = AllYesOverwriteConfirmer()) -> None:
+            overwrite_confirmer: OverwriteConfirmer = AllYesOverwriteConfirmer(),
+            unpack_options: UnpackOptions = UnpackOptions()) -> None:
         """
         Similar to `unpack_dbs_under_x_into_dirs_under_y`, but only unpacks the LevelDBs under the given directory
         (`x_path_to_parent_input_dir`) that belong to a world and ignores the rest.
@@ -26,19 +48,22 @@ class Unpacker:
         :param x_path_to_parent_input_dir: e.g. "./foundrydata/Data/worlds/test/data"
         :param y_path_to_parent_target_dir: e.g. "./unpack_result"
         :param overwrite_confirmer: TODO
+        :param unpack_options: Options that control how the LevelDBs are unpacked
         """
 
         Unpacker.unpack_given_dbs_under_x_into_dirs_under_y(x_path_to_parent_input_dir,
                                                             y_path_to_parent_target_dir,
                                                             world_db_names,
-                                                            overwrite_confirmer)
+                                                            overwrite_confirmer,
+                                                            unpack_options)
 
     @staticmethod
     @check_input_dir_and_target_dir
     def unpack_all_dbs_under_x_into_dirs_under_y(
             x_path_to_parent_input_dir: Path,
             y_path_to_parent_target_dir: Path,
-            overwrite_confirmer: OverwriteConfirmer = AllYesOverwriteConfirmer()) -> None:
+            overwrite_confirmer: OverwriteConfirmer = AllYesOverwriteConfirmer(),
+            unpack_options: UnpackOptions = UnpackOptions()) -> None:
         """
         Unpacks all LevelDBs in the given directory (`x_path_to_parent_input_dir`) into sub-folders of the given target
         directory (`y_path_to_parent_target_dir').
@@ -46,6 +71,7 @@ class Unpacker:
         :param x_path_to_parent_input_dir: e.g. "./foundrydata/Data/modules/shared-module/packs"
         :param y_path_to_parent_target_dir: e.g. "unpack_result"
         :param overwrite_confirmer: TODO
+        :param unpack_options: Options that control how the LevelDBs are unpacked
         """
 
         db_names: List[str] = list()
@@ -58,7 +84,8 @@ class Unpacker:
         Unpacker.unpack_given_dbs_under_x_into_dirs_under_y(x_path_to_parent_input_dir,
                                                             y_path_to_parent_target_dir,
                                                             db_names,
-                                                            overwrite_confirmer)
+                                                            overwrite_confirmer,
+                                                            unpack_options)
 
     @staticmethod
     @check_input_dir_and_target_dir
@@ -66,7 +93,8 @@ class Unpacker:
             x_path_to_parent_input_dir: Path,
             y_path_to_parent_target_dir: Path,
             db_names: Iterable[str],
-            overwrite_confirmer: OverwriteConfirmer = AllYesOverwriteConfirmer()) -> None:
+            overwrite_confirmer: OverwriteConfirmer = AllYesOverwriteConfirmer(),
+            unpack_options: UnpackOptions = UnpackOptions()) -> None:
 
         # map input dbs to target directories
         input_db_paths_to_target_dir_paths: Dict[Path, Path] = dict()
@@ -77,7 +105,7 @@ class Unpacker:
             path_to_target_dir = y_path_to_parent_target_dir.joinpath(db_name)
 
             # input dbs must all be directories
-            if not path_to_input_db.is_dir():
+            if not StatCache.is_dir(path_to_input_db):
                 raise FvttPackerException(f"Missing LevelDB '{db_name}' under '{x_path_to_parent_input_dir}'.")
 
             input_db_paths_to_target_dir_paths[path_to_input_db] = path_to_target_dir
@@ -90,41 +118,382 @@ class Unpacker:
             overwrite_confirmer.confirm_batch_overwrite_dirs)
 
         # finally, do the unpacking
-        Unpacker.unpack_dbs_into_dirs(input_db_paths_to_target_dir_paths)
+        Unpacker.unpack_dbs_into_dirs(input_db_paths_to_target_dir_paths,
+                                      unpack_options)
 
     @staticmethod
     @check_input_dbs_and_target_dirs
     def unpack_dbs_into_dirs(
-            input_db_paths_to_target_dir_paths: Dict[Path, Path]):
+            input_db_paths_to_target_dir_paths: Dict[Path, Path],
+            unpack_options: UnpackOptions = UnpackOptions()):
         """
         Unpacks all the given LevelDB at the given Paths (keys).
         Each into its respective directory at the given Path (values).
 
         :param input_db_paths_to_target_dir_paths: Contains the paths to the input LevelDBs as keys
         and the paths to the target directories as values
+        :param unpack_options: Options that control how the LevelDBs are unpacked
+        """
+
+        with MetricsRecorder.observe(unpack_options.metrics_observer):
+            if unpack_options.plan_observer is not None:
+                unpack_options.plan_observer.on_plan(Planner.plan_unpack_dbs_into_dirs(
+                    input_db_paths_to_target_dir_paths,
+                    unpack_options))
+            elif unpack_options.plan is not None:
+                Planner.apply_unpack_plan(input_db_paths_to_target_dir_paths,
+                                          unpack_options)
+            elif unpack_options.resume:
+                Unpacker.__resume_unpack_dbs_into_dirs(input_db_paths_to_target_dir_paths,
+                                                       unpack_options)
+            else:
+                Unpacker.__unpack_dbs_into_dirs(input_db_paths_to_target_dir_paths,
+                                                unpack_options)
+
+    @staticmethod
+    def __resume_unpack_dbs_into_dirs(
+            input_db_paths_to_target_dir_paths: Dict[Path, Path],
+            unpack_options: UnpackOptions) -> None:
+        """
+        Same as `__unpack_dbs_into_dirs`, but continues an interrupted unpack, see `UnpackOptions.resume`.
+        """
+
+        input_db_paths_to_checkpoints = {
+            path_to_input_db: CheckpointJournal.load(path_to_target_dir,
+                                                     checkpoint_operation_unpack,
+                                                     path_to_input_db,
+                                                     unpack_options.key_filter)
+            for (path_to_input_db, path_to_target_dir) in input_db_paths_to_target_dir_paths.items()
+        }
+
+        for (path_to_input_db, checkpoint) in input_db_paths_to_checkpoints.items():
+            if checkpoint.is_complete:
+                logging.info("Skipping LevelDB '%s', it was unpacked before the interruption", path_to_input_db)
+            elif checkpoint.last_key is not None:
+                logging.info("Continuing to unpack LevelDB '%s' after key '%s'", path_to_input_db, checkpoint.last_key)
+
+                # only the remaining keys of this LevelDB are selected, so it is unpacked on its own
+                resumed_unpack_options = copy.copy(unpack_options)
+                resumed_unpack_options.key_filter = checkpoint.get_remaining_key_filter()
+
+                path_to_target_dir = input_db_paths_to_target_dir_paths[path_to_input_db]
+                Unpacker.__unpack_dbs_into_dirs({path_to_input_db: path_to_target_dir},
+                                                resumed_unpack_options,
+                                                {path_to_input_db: checkpoint})
+
+        remaining_input_db_paths_to_target_dir_paths = {
+            path_to_input_db: path_to_target_dir
+            for (path_to_input_db, path_to_target_dir) in input_db_paths_to_target_dir_paths.items()
+            if not input_db_paths_to_checkpoints[path_to_input_db].is_complete
+        }
+
+        if len(remaining_input_db_paths_to_target_dir_paths) > 0:
+            Unpacker.__unpack_dbs_into_dirs(remaining_input_db_paths_to_target_dir_paths,
+                                            unpack_options,
+                                            input_db_paths_to_checkpoints)
+
+        # the unpack has finished, the next one starts over
+        for checkpoint in input_db_paths_to_checkpoints.values():
+            checkpoint.delete()
+
+    @staticmethod
+    def __unpack_dbs_into_dirs(
+            input_db_paths_to_target_dir_paths: Dict[Path, Path],
+            unpack_options: UnpackOptions,
+            input_db_paths_to_checkpoints: Union[Dict[Path, CheckpointJournal], None] = None) -> None:
+        """
+        :param input_db_paths_to_checkpoints: If given, the progress of each directory is recorded in its checkpoint
         """
 
         path_to_input_db: Path
         path_to_target_dir: Path
 
-        # read all input dbs -> fail fast
-        input_db_paths_to_dicts: Dict[Path, Dict[str, Dict]] = LevelDBToDictReader.read_dbs_as_dicts(
-            input_db_paths_to_target_dir_paths.keys())
+        if input_db_paths_to_checkpoints is None:
+            input_db_paths_to_checkpoints = dict()
+
+        change_counts = ChangeCounts()
+        input_db_paths_to_trackers: Dict[Path, UnpackManifestTracker] = dict()
+        input_db_paths_to_dbs: Dict[Path, DB] = dict()
+        paths_to_db_copies: List[Path] = list()
+
+        target_dir_paths_to_layouts: Dict[Path, DirLayout] = dict()
+
+        for path_to_target_dir in input_db_paths_to_target_dir_paths.values():
+            if unpack_options.dir_layout is not None:
+                # the files are only renamed, so they still match the manifest afterwards
+                DictToDirWriter.apply_layout(path_to_target_dir, unpack_options.dir_layout)
+                target_dir_paths_to_layouts[path_to_target_dir] = unpack_options.dir_layout
+            else:
+                target_dir_paths_to_layouts[path_to_target_dir] = DirLayout.load(path_to_target_dir)
+
+        if unpack_options.use_manifest and not unpack_options.key_filter.is_everything():
+            # the manifest describes the whole LevelDB and directory
+            logging.warning("Not using the manifest, because not all keys are unpacked")
+        elif unpack_options.use_manifest:
+            input_db_paths_to_target_dir_paths = Unpacker.__filter_out_unchanged(input_db_paths_to_target_dir_paths,
+                                                                                 input_db_paths_to_trackers)
+
+        with ChunkExecutor(unpack_options.jobs, unpack_options.io_threads) as chunk_executor:
+            try:
+                # open all the dbs -> fail fast
+                for path_to_input_db in input_db_paths_to_target_dir_paths.keys():
+                    path_to_db_to_open = path_to_input_db
+
+                    if unpack_options.snapshot:
+                        tracker = input_db_paths_to_trackers.get(path_to_input_db)
+                        path_to_db_to_open = Unpacker.__copy_db_snapshot(path_to_input_db, tracker)
+                        paths_to_db_copies.append(path_to_db_to_open)
+
+                    input_db_paths_to_dbs[path_to_input_db] = LevelDBHelper.try_open_db(
+                        path_to_db_to_open,
+                        skip_checks=True,
+                        must_exist=True,
+                        leveldb_options=unpack_options.leveldb_options)
+
+                input_db_paths_to_file_contents: Dict[Path, Iterable[Tuple[str, Union[str, None]]]] = dict()
+
+                for (path_to_input_db, input_db) in input_db_paths_to_dbs.items():
+                    tracker = input_db_paths_to_trackers.get(path_to_input_db)
+
+                    path_to_target_dir = input_db_paths_to_target_dir_paths[path_to_input_db]
+
+                    # compare with the existing files first, only parse the entries that changed
+                    path_to_existing_dir = None if unpack_options.validate else path_to_target_dir
+
+                    blob_store = BlobStore(path_to_target_dir, unpack_options.blob_threshold) \
+                        if unpack_options.blob_threshold is not None else None
+
+                    if unpack_options.streaming:
+                        # each entry is parsed once, while it is written -> an invalid entry stops the unpack after the
+                        # files of the entries before it were written
+                        input_db_paths_to_file_contents[path_to_input_db] = \
+                            LevelDBToDictReader.read_raw_entries_as_file_contents_in_chunks(
+                                Unpacker.__get_raw_entries(input_db, tracker, unpack_options.key_filter),
+                                chunk_executor,
+                                path_to_existing_dir,
+                                target_dir_paths_to_layouts[path_to_target_dir],
+                                blob_store)
+                    else:
+                        # read all input dbs -> fail fast
+                        input_db_paths_to_file_contents[path_to_input_db] = \
+                            list(LevelDBToDictReader.read_raw_entries_as_file_contents_in_chunks(
+                                Unpacker.__get_raw_entries(input_db, tracker, unpack_options.key_filter),
+                                chunk_executor,
+                                path_to_existing_dir,
+                                target_dir_paths_to_layouts[path_to_target_dir],
+                                blob_store))
+
+                # coming this far means:
+                # - all input dbs were successfully opened as LevelDBs
+                # - all entries of all input dbs were successfully read, unless they are streamed
+
+                for (path_to_input_db, path_to_target_dir) in input_db_paths_to_target_dir_paths.items():
+                    tracker = input_db_paths_to_trackers.get(path_to_input_db)
+                    checkpoint = input_db_paths_to_checkpoints.get(path_to_input_db)
+
+                    unchanged_keys = tracker.unchanged_keys if tracker is not None else frozenset()
+                    deletion_key_filter = unpack_options.key_filter
+
+                    if checkpoint is not None and unpack_options.key_filter.after is not None:
+                        # the files of the keys unpacked before the interruption are up-to-date, but the files that
+                        # are not in the LevelDB are only deleted once all keys were unpacked
+                        unchanged_keys = Unpacker.__get_resumed_keys(input_db_paths_to_dbs[path_to_input_db],
+                                                                     checkpoint.key_filter,
+                                                                     unpack_options.key_filter)
+                        deletion_key_filter = checkpoint.key_filter
+
+                    target_change_counts = DictToDirWriter.write_file_contents_into_dir(
+                        input_db_paths_to_file_contents[path_to_input_db],
+                        path_to_target_dir,
+                        skip_checks=True,
+                        unchanged_keys=unchanged_keys,
+                        key_filter=deletion_key_filter,
+                        dir_layout=target_dir_paths_to_layouts[path_to_target_dir],
+                        io_threads=unpack_options.io_threads,
+                        checkpoint=checkpoint)
+                    change_counts.add(target_change_counts)
+                    MetricsRecorder.count_target(path_to_target_dir, target_change_counts)
+
+                    if checkpoint is not None:
+                        checkpoint.complete()
+            finally:
+                # close all the dbs
+                for input_db in input_db_paths_to_dbs.values():
+                    input_db.close()
+
+                for path_to_db_copy in paths_to_db_copies:
+                    shutil.rmtree(path_to_db_copy, ignore_errors=True)
+
+        for tracker in input_db_paths_to_trackers.values():
+            tracker.save()
+
+        logging.info("Total number of changes: %s (%s)",
+                     change_counts.nb_changes,
+                     change_counts)
+
+    @staticmethod
+    def __get_resumed_keys(input_db: DB,
+                           key_filter: KeyFilter,
+                           remaining_key_filter: KeyFilter) -> Set[str]:
+        """
+        :return: The keys of the given LevelDB (`input_db`) that are selected by `key_filter`, but not by
+        `remaining_key_filter`, which only selects the keys after the ones that were unpacked before the interruption
+        """
+
+        resumed_entries = itertools.takewhile(lambda entry: not remaining_key_filter.matches(entry[0].decode(UTF_8)),
+                                              LevelDBHelper.iterate_db(input_db, key_filter))
+
+        return {key_bytes.decode(UTF_8) for (key_bytes, _) in resumed_entries}
+
+    @staticmethod
+    def __copy_db_snapshot(path_to_input_db: Path,
+                           tracker: Union[UnpackManifestTracker, None]) -> Path:
+        """
+        :return: The path to a copy of the given LevelDB (`path_to_input_db`), see `UnpackOptions.snapshot`
+        """
+
+        with MetricsRecorder.time(Stage.leveldb_snapshot):
+            path_to_db_copy = LevelDBHelper.copy_db_snapshot(path_to_input_db)
+
+        if tracker is not None:
+            # the LevelDB may have changed since it was copied, its content is the one of the copy
+            # opening the copy changes its digest, so it is computed now
+            tracker.db_digest = Manifest.compute_db_digest(path_to_db_copy)
+
+        return path_to_db_copy
+
+    @staticmethod
+    def __get_raw_entries(input_db: DB,
+                          tracker: Union[UnpackManifestTracker, None],
+                          key_filter: KeyFilter) -> Iterable[Tuple[bytes, bytes]]:
+        raw_entries: Iterable[Tuple[bytes, bytes]] = LevelDBHelper.iterate_db(input_db, key_filter)
+
+        if MetricsRecorder.is_recording():
+            raw_entries = Unpacker.__count_bytes_read(MetricsRecorder.time_iterator(raw_entries, Stage.leveldb_read))
+
+        if tracker is None:
+            return raw_entries
+
+        return tracker.filter_raw_entries(raw_entries)
+
+    @staticmethod
+    def __count_bytes_read(raw_entries: Iterable[Tuple[bytes, bytes]]) -> Iterator[Tuple[bytes, bytes]]:
+        for (key_bytes, value_bytes) in raw_entries:
+            MetricsRecorder.count(Counter.bytes_read, len(key_bytes) + len(value_bytes))
+            yield key_bytes, value_bytes
+
+    @staticmethod
+    def __filter_out_unchanged(
+            input_db_paths_to_target_dir_paths: Dict[Path, Path],
+            input_db_paths_to_trackers: Dict[Path, UnpackManifestTracker]) -> Dict[Path, Path]:
+        """
+        Creates a manifest tracker for each of the given LevelDBs (keys) and puts it into `input_db_paths_to_trackers`.
+
+        :return: The given mapping without the LevelDBs that did not change since they were last unpacked
+        """
+
+        result: Dict[Path, Path] = dict()
 
         for (path_to_input_db, path_to_target_dir) in input_db_paths_to_target_dir_paths.items():
-            DictToDirWriter.write_dict_into_dir(input_db_paths_to_dicts[path_to_input_db],
-                                                path_to_target_dir,
-                                                skip_checks=True)
+            tracker = UnpackManifestTracker(path_to_input_db, path_to_target_dir)
+
+            if tracker.is_unchanged():
+                logging.info("Skipping '%s', nothing changed since the last run", path_to_input_db)
+                continue
+
+            input_db_paths_to_trackers[path_to_input_db] = tracker
+            result[path_to_input_db] = path_to_target_dir
+
+        return result
 
     @staticmethod
     def unpack_db_at_x_into_dir_at_y(x_path_to_input_db: Path,
-                                     y_path_to_target_dir: Path) -> None:
+                                     y_path_to_target_dir: Path,
+                                     unpack_options: UnpackOptions = UnpackOptions()) -> None:
         """
         Unpacks the leveldb at the LevelDB at the given Path (`x_path_to_input_db`) into the directory at the given
         target Path (`y_path_to_target_dir`).
 
         :param x_path_to_input_db: e.g. "./foundrydata/Data/worlds/test/data/actors"
         :param y_path_to_target_dir: e.g. "./unpack_result/actors"
+        :param unpack_options: Options that control how the LevelDB is unpacked
+        """
+
+        Unpacker.unpack_dbs_into_dirs({x_path_to_input_db: y_path_to_target_dir},
+                                      unpack_options)
+
+    @staticmethod
+    def unpack_db_at_x_into_ndjson_stream(x_path_to_input_db: Path,
+                                          output_stream: BinaryIO,
+                                          unpack_options: UnpackOptions = UnpackOptions()) -> None:
         """
+        Unpacks the LevelDB at the given Path (`x_path_to_input_db`) into newline delimited json, one
+        `{"key": ..., "value": ...}` object per entry, sorted by key. The lines are written while the LevelDB is
+        iterated, so only a bounded number of entries is in memory at once.
+
+        :param x_path_to_input_db: e.g. "./foundrydata/Data/worlds/test/data/actors"
+        :param output_stream: e.g. `sys.stdout.buffer`
+        :param unpack_options: Only `jobs`, `validate`, `metrics_observer`, `leveldb_options`, `snapshot` and
+        `key_filter` are used. Without `validate` the values are written as they are stored.
+        """
+
+        with StatCache.share():
+            AssertHelper.assert_path_to_input_db_is_ok(x_path_to_input_db)
+
+        if unpack_options.blob_threshold is not None:
+            # the blobs are stored next to the files of a directory
+            logging.warning("Not using a blob store, because the entries are written into a stream")
+
+        if unpack_options.resume:
+            # the checkpoints are stored in the directories
+            logging.warning("Not resuming, because the entries are written into a stream")
+
+        with MetricsRecorder.observe(unpack_options.metrics_observer):
+            path_to_db_to_open = x_path_to_input_db
+
+            if unpack_options.snapshot:
+                with MetricsRecorder.time(Stage.leveldb_snapshot):
+                    path_to_db_to_open = LevelDBHelper.copy_db_snapshot(x_path_to_input_db)
+
+            target_change_counts = ChangeCounts()
+
+            try:
+                input_db = LevelDBHelper.try_open_db(path_to_db_to_open,
+                                                     skip_checks=True,
+                                                     must_exist=True,
+                                                     leveldb_options=unpack_options.leveldb_options)
+
+                try:
+                    raw_entries = MetricsRecorder.time_iterator(
+                        Unpacker.__count_entries(LevelDBHelper.iterate_db(input_db, unpack_options.key_filter),
+                                                 target_change_counts),
+                        Stage.leveldb_read)
+
+                    with ChunkExecutor(unpack_options.jobs) as chunk_executor:
+                        for lines in LevelDBToDictReader.read_raw_entries_as_ndjson_in_chunks(raw_entries,
+                                                                                              chunk_executor,
+                                                                                              unpack_options.validate):
+                            with MetricsRecorder.time(Stage.file_write):
+                                output_stream.write(lines)
+
+                            MetricsRecorder.count(Counter.bytes_written, len(lines))
+                finally:
+                    input_db.close()
+            finally:
+                if unpack_options.snapshot:
+                    shutil.rmtree(path_to_db_to_open, ignore_errors=True)
+
+            output_stream.flush()
+
+            logging.info("Unpacked %s entries of LevelDB '%s' as newline delimited json",
+                         target_change_counts.nb_created,
+                         x_path_to_input_db)
+            MetricsRecorder.count_target(x_path_to_input_db, target_change_counts)
+
+    @staticmethod
+    def __count_entries(raw_entries: Iterable[Tuple[bytes, bytes]],
+                        change_counts: ChangeCounts) -> Iterator[Tuple[bytes, bytes]]:
 
-        Unpacker.unpack_dbs_into_dirs({x_path_to_input_db: y_path_to_target_dir})
+        for raw_entry in raw_entries:
+            change_counts.nb_created += 1
+            yield raw_entry
@@ -0,0 +1,254 @@
+import functools
+import logging
+import shutil
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+
+from fvttpacker.__common.chunk_executor import ChunkExecutor
+from fvttpacker.__common.leveldb_helper import LevelDBHelper
+from fvttpacker.__common.manifest import Manifest
+from fvttpacker.__common.metrics_recorder import MetricsRecorder
+from fvttpacker.__common.stat_cache import StatCache
+from fvttpacker.__constants import UTF_8
+from fvttpacker.__packer.__dir_to_leveldb_reader import DirToDictReader
+from fvttpacker.fvttpacker_exception import FvttPackerException
+from fvttpacker.metrics import Stage
+from fvttpacker.verify_options import VerifyOptions
+from fvttpacker.verify_result import VerifyResult
+
+# (key, hash of the value or minified file content)
+HashedEntry = Tuple[str, str]
+
+
+class Verifier:
+    """
+    Compares LevelDBs and unpacked directories with each other by merging their entries, which are sorted by key on
+    both sides, in a single pass. Only the hashes of the values are compared, so nothing has to be kept in memory.
+    """
+
+    @staticmethod
+    def verify_x_against_y(x_path: Path,
+                           y_path: Path,
+                           verify_options: VerifyOptions = VerifyOptions()) -> VerifyResult:
+        """
+        Compares the given LevelDB or directory (`x_path`) with the given LevelDB or directory (`y_path`).
+        A path that does not exist is compared as if it was empty.
+
+        :param x_path: e.g. "./foundrydata/Data/worlds/test/data/actors"
+        :param y_path: e.g. "./unpacked_dbs/actors"
+        :param verify_options: Options that control how they are compared
+        """
+
+        return Verifier.verify_pairs({x_path: y_path},
+                                     verify_options)[0]
+
+    @staticmethod
+    def verify_all_under_x_against_y(x_path_to_parent_dir: Path,
+                                     y_path_to_parent_dir: Path,
+                                     verify_options: VerifyOptions = VerifyOptions()) -> List[VerifyResult]:
+        """
+        Compares each LevelDB or directory under the given directory (`x_path_to_parent_dir`) with the one with the
+        same name under the other given directory (`y_path_to_parent_dir`).
+
+        :param x_path_to_parent_dir: e.g. "./foundrydata/Data/worlds/test/data"
+        :param y_path_to_parent_dir: e.g. "./unpacked_dbs"
+        :param verify_options: Options that control how they are compared
+        """
+
+        names = set()
+
+        for path_to_parent_dir in [x_path_to_parent_dir, y_path_to_parent_dir]:
+            if not StatCache.is_dir(path_to_parent_dir):
+                raise FvttPackerException(f"Directory '{path_to_parent_dir}' does not exist")
+
+            names.update(path.name for path in path_to_parent_dir.glob("*/"))
+
+        return Verifier.verify_pairs({x_path_to_parent_dir.joinpath(name): y_path_to_parent_dir.joinpath(name)
+                                      for name in sorted(names)},
+                                     verify_options)
+
+    @staticmethod
+    def verify_pairs(paths_a_to_paths_b: Dict[Path, Path],
+                     verify_options: VerifyOptions = VerifyOptions()) -> List[VerifyResult]:
+        """
+        Compares each of the given LevelDBs or directories (keys) with its respective LevelDB or directory (values).
+        With `verify_options.jobs` > 1 several pairs are compared at the same time.
+
+        :return: The results in the order of the pairs
+        """
+
+        for (path_a, path_b) in paths_a_to_paths_b.items():
+            if not StatCache.exists(path_a) and not StatCache.exists(path_b):
+                raise FvttPackerException(f"Neither '{path_a}' nor '{path_b}' exists.")
+
+        with MetricsRecorder.observe(verify_options.metrics_observer), \
+                ChunkExecutor(verify_options.jobs, verify_options.io_threads) as chunk_executor:
+
+            if len(paths_a_to_paths_b) == 1 or verify_options.jobs <= 1:
+                # the files of each pair are read by all processes
+                return [Verifier.__verify_pair(path_a, path_b, chunk_executor, verify_options)
+                        for (path_a, path_b) in paths_a_to_paths_b.items()]
+
+            # only what the workers use, the observer might not be picklable
+            worker_verify_options = VerifyOptions(io_threads=verify_options.io_threads,
+                                                  validate=verify_options.validate,
+                                                  leveldb_options=verify_options.leveldb_options,
+                                                  snapshot=verify_options.snapshot,
+                                                  key_filter=verify_options.key_filter)
+
+            return list(chunk_executor.map(functools.partial(Verifier.verify_pair,
+                                                             verify_options=worker_verify_options),
+                                           paths_a_to_paths_b.items()))
+
+    @staticmethod
+    def verify_pair(paths: Tuple[Path, Path],
+                    verify_options: VerifyOptions) -> VerifyResult:
+        """
+        Compares a single pair in a worker process, see `verify_pairs`.
+        """
+
+        (path_a, path_b) = paths
+
+        with ChunkExecutor(io_threads=verify_options.io_threads) as chunk_executor:
+            return Verifier.__verify_pair(path_a, path_b, chunk_executor, verify_options)
+
+    @staticmethod
+    def __verify_pair(path_a: Path,
+                      path_b: Path,
+                      chunk_executor: ChunkExecutor,
+                      verify_options: VerifyOptions) -> VerifyResult:
+
+        logging.info("Comparing '%s' with '%s'", path_a, path_b)
+
+        result = VerifyResult(path_a, path_b)
+        # keys to the hashes of both sides
+        keys_to_different_hashes: Dict[str, Tuple[str, str]] = dict()
+
+        with ExitStack() as exit_stack:
+            hashed_entries_a = Verifier.__open_side(path_a, chunk_executor, verify_options, exit_stack)
+            hashed_entries_b = Verifier.__open_side(path_b, chunk_executor, verify_options, exit_stack)
+
+            for (key, hash_a, hash_b) in Verifier.__merge(hashed_entries_a, hashed_entries_b):
+                if hash_b is None:
+                    result.keys_only_in_a.append(key)
+                elif hash_a is None:
+                    result.keys_only_in_b.append(key)
+                elif hash_a == hash_b:
+                    result.nb_equal += 1
+                else:
+                    keys_to_different_hashes[key] = (hash_a, hash_b)
+
+        if not verify_options.validate and len(keys_to_different_hashes) > 0:
+            # files that were only minified by removing their indentation might just have been formatted differently
+            keys = list(keys_to_different_hashes.keys())
+            keys_to_hashes_a = Verifier.__hash_files_validated(path_a, keys, chunk_executor, verify_options)
+            keys_to_hashes_b = Verifier.__hash_files_validated(path_b, keys, chunk_executor, verify_options)
+
+            for (key, (hash_a, hash_b)) in list(keys_to_different_hashes.items()):
+                if keys_to_hashes_a.get(key, hash_a) == keys_to_hashes_b.get(key, hash_b):
+                    result.nb_equal += 1
+                    del keys_to_different_hashes[key]
+
+        result.keys_with_different_values = list(keys_to_different_hashes.keys())
+
+        logging.info("Compared '%s' with '%s': %s mismatches, %s equal entries",
+                     path_a,
+                     path_b,
+                     result.nb_mismatches,
+                     result.nb_equal)
+
+        return result
+
+    @staticmethod
+    def __open_side(path: Path,
+                    chunk_executor: ChunkExecutor,
+                    verify_options: VerifyOptions,
+                    exit_stack: ExitStack) -> Iterator[HashedEntry]:
+        """
+        :return: The hashed entries of the given LevelDB or directory (`path`), sorted by key.
+        Whatever has to be cleaned up afterwards is registered with `exit_stack`.
+        """
+
+        if not StatCache.exists(path):
+            logging.warning("'%s' does not exist, comparing with nothing", path)
+            return iter(())
+
+        if not Verifier.__is_db(path):
+            entries = DirToDictReader.read_dir_as_entries(path,
+                                                          chunk_executor,
+                                                          verify_options.validate,
+                                                          verify_options.key_filter)
+
+            return ((key, Manifest.hash_value(value_str.encode(UTF_8))) for (key, value_str) in entries)
+
+        path_to_db_to_open = path
+
+        if verify_options.snapshot:
+            with MetricsRecorder.time(Stage.leveldb_snapshot):
+                path_to_db_to_open = LevelDBHelper.copy_db_snapshot(path)
+
+            exit_stack.callback(shutil.rmtree, path_to_db_to_open, ignore_errors=True)
+
+        db = LevelDBHelper.try_open_db(path_to_db_to_open,
+                                       skip_checks=False,
+                                       must_exist=True,
+                                       leveldb_options=verify_options.leveldb_options)
+        exit_stack.callback(db.close)
+
+        raw_entries = MetricsRecorder.time_iterator(LevelDBHelper.iterate_db(db, verify_options.key_filter),
+                                                    Stage.leveldb_read)
+
+        return ((key_bytes.decode(UTF_8), Manifest.hash_value(value_bytes)) for (key_bytes, value_bytes) in raw_entries)
+
+    @staticmethod
+    def __hash_files_validated(path: Path,
+                               keys: List[str],
+                               chunk_executor: ChunkExecutor,
+                               verify_options: VerifyOptions) -> Dict[str, str]:
+        """
+        :return: The given keys (`keys`) mapped to the hashes of their parsed and minified files, empty if the given
+        path (`path`) is not a directory
+        """
+
+        if not StatCache.exists(path) or Verifier.__is_db(path):
+            return dict()
+
+        keys_to_paths = dict(DirToDictReader.list_dir(path, verify_options.key_filter))
+        paths_to_files = [keys_to_paths[key] for key in keys]
+
+        return {key: Manifest.hash_value(value_str.encode(UTF_8))
+                for entries in chunk_executor.map_io(DirToDictReader.read_files_as_entries,
+                                                     ChunkExecutor.split_into_chunks(paths_to_files))
+                for (key, value_str) in entries}
+
+    @staticmethod
+    def __is_db(path: Path) -> bool:
+        # every LevelDB has one, an unpacked directory only contains json files
+        return StatCache.exists(path.joinpath("CURRENT"))
+
+    @staticmethod
+    def __merge(hashed_entries_a: Iterable[HashedEntry],
+                hashed_entries_b: Iterable[HashedEntry]) -> Iterator[Tuple[str, Union[str, None], Union[str, None]]]:
+        """
+        :return: Iterator over (key, hash in a, hash in b) tuples, sorted by key. The hash is None if the key is missing
+        on that side.
+        """
+
+        iterator_a = iter(hashed_entries_a)
+        iterator_b = iter(hashed_entries_b)
+
+        entry_a = next(iterator_a, None)
+        entry_b = next(iterator_b, None)
+
+        while entry_a is not None or entry_b is not None:
+            if entry_b is None or (entry_a is not None and entry_a[0] < entry_b[0]):
+                yield entry_a[0], entry_a[1], None
+                entry_a = next(iterator_a, None)
+            elif entry_a is None or entry_b[0] < entry_a[0]:
+                yield entry_b[0], None, entry_b[1]
+                entry_b = next(iterator_b, None)
+            else:
+                yield entry_a[0], entry_a[1], entry_b[1]
+                entry_a = next(iterator_a, None)
+                entry_b = next(iterator_b, None)
@@ -0,0 +1,257 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Union
+
+from fvttpacker.__common.manifest import FileStat
+from fvttpacker.__common.metrics_recorder import MetricsRecorder
+from fvttpacker.dir_layout import DirLayout
+from fvttpacker.metrics import Stage
+
+# see `man 7 inotify`
+in_close_write = 0x00000008
+in_moved_from = 0x00000040
+in_moved_to = 0x00000080
+in_delete = 0x00000200
+in_delete_self = 0x00000400
+in_move_self = 0x00000800
+in_q_overflow = 0x00004000
+in_nonblock = 0o4000
+in_cloexec = 0o2000000
+
+watched_events = in_close_write | in_moved_from | in_moved_to | in_delete | in_delete_self | in_move_self
+# events after which the content of the whole directory is unknown
+dir_events = in_delete_self | in_move_self
+
+# int wd, uint32 mask, uint32 cookie, uint32 len, followed by the name padded to `len` bytes
+event_header = struct.Struct("iIII")
+
+
+class ChangeSource(ABC):
+    """
+    Reports the json files that were created, modified or deleted in a set of directories.
+    """
+
+    @abstractmethod
+    def wait_for_changes(self,
+                         timeout_seconds: float) -> Set[Path]:
+        """
+        Waits at most `timeout_seconds` for changes.
+
+        :return: The paths of the changed json files. The path of a watched directory means that any of its files
+        may have changed. Empty if nothing changed.
+        """
+
+    def close(self) -> None:
+        pass
+
+    @staticmethod
+    def create(paths_to_dirs: Iterable[Path],
+               use_polling: bool) -> "ChangeSource":
+        """
+        Creates an `InotifyChangeSource` if possible, a `PollingChangeSource` otherwise, e.g. if any of the
+        directories is not flat (see `DirLayout`).
+        """
+
+        paths_to_dirs = list(paths_to_dirs)
+
+        # inotify does not watch sub-directories
+        is_flat = all(DirLayout.load(path_to_dir).is_flat() for path_to_dir in paths_to_dirs)
+
+        if not use_polling and is_flat and InotifyChangeSource.is_available():
+            return InotifyChangeSource(paths_to_dirs)
+
+        if not use_polling and not is_flat:
+            logging.info("Some directories have sub-directories, polling for changes instead")
+        elif not use_polling:
+            logging.info("inotify is not available, polling for changes instead")
+
+        return PollingChangeSource(paths_to_dirs)
+
+
+class InotifyChangeSource(ChangeSource):
+    """
+    Uses inotify of the Linux kernel through the C library, so it needs neither threads nor additional packages.
+    """
+
+    __libc: Union[ctypes.CDLL, None] = None
+
+    def __init__(self,
+                 paths_to_dirs: List[Path]):
+
+        libc = InotifyChangeSource.__get_libc()
+
+        self.__fd: int = libc.inotify_init1(in_nonblock | in_cloexec)
+
+        if self.__fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self.__paths_to_dirs = paths_to_dirs
+        self.__wds_to_dir_paths: Dict[int, Path] = dict()
+
+        for path_to_dir in paths_to_dirs:
+            self.__add_watch(path_to_dir)
+
+    def wait_for_changes(self,
+                         timeout_seconds: float) -> Set[Path]:
+
+        result: Set[Path] = set()
+
+        # directories that were deleted or replaced have to be watched again once they exist again
+        for path_to_dir in self.__paths_to_dirs:
+            if path_to_dir not in self.__wds_to_dir_paths.values() and path_to_dir.is_dir() \
+                    and self.__add_watch(path_to_dir):
+                result.add(path_to_dir)
+
+        (readable, _, _) = select.select([self.__fd], [], [], 0 if len(result) > 0 else timeout_seconds)
+
+        if len(readable) == 0:
+            return result
+
+        while True:
+            try:
+                buffer = os.read(self.__fd, 64 * 1024)
+            except BlockingIOError:
+                break
+
+            self.__parse_events(buffer, result)
+
+        return result
+
+    def close(self) -> None:
+        os.close(self.__fd)
+
+    def __parse_events(self,
+                       buffer: bytes,
+                       result: Set[Path]) -> None:
+        offset = 0
+
+        while offset < len(buffer):
+            (wd, mask, _, name_length) = event_header.unpack_from(buffer, offset)
+            offset += event_header.size
+            name = buffer[offset:offset + name_length].rstrip(b"\0").decode(sys.getfilesystemencoding())
+            offset += name_length
+
+            if mask & in_q_overflow:
+                logging.warning("Missed inotify events, checking all directories")
+                result.update(self.__paths_to_dirs)
+                continue
+
+            path_to_dir = self.__wds_to_dir_paths.get(wd)
+
+            if path_to_dir is None:
+                continue
+
+            if mask & dir_events:
+                del self.__wds_to_dir_paths[wd]
+                result.add(path_to_dir)
+            elif name.endswith(".json"):
+                result.add(path_to_dir.joinpath(name))
+
+    def __add_watch(self,
+                    path_to_dir: Path) -> bool:
+        """
+        :return: True if the given directory (`path_to_dir`) is watched now
+        """
+
+        wd = InotifyChangeSource.__get_libc().inotify_add_watch(self.__fd,
+                                                                os.fsencode(path_to_dir),
+                                                                watched_events)
+
+        if wd < 0:
+            logging.warning("Unable to watch directory '%s', reason: %s", path_to_dir,
+                            os.strerror(ctypes.get_errno()))
+            return False
+
+        self.__wds_to_dir_paths[wd] = path_to_dir
+
+        return True
+
+    @staticmethod
+    def is_available() -> bool:
+        return sys.platform.startswith("linux") and InotifyChangeSource.__get_libc() is not None
+
+    @staticmethod
+    def __get_libc() -> Union[ctypes.CDLL, None]:
+
+        if InotifyChangeSource.__libc is None:
+            name = ctypes.util.find_library("c")
+
+            try:
+                libc = ctypes.CDLL(name, use_errno=True)
+                # only check that they exist
+                _ = libc.inotify_init1, libc.inotify_add_watch
+            except (OSError, AttributeError):
+                return None
+
+            InotifyChangeSource.__libc = libc
+
+        return InotifyChangeSource.__libc
+
+
+class PollingChangeSource(ChangeSource):
+    """
+    Compares the stats of the files with the ones of the last check.
+    The files are looked up according to the layout of each directory, see `DirLayout`.
+    """
+
+    def __init__(self,
+                 paths_to_dirs: List[Path]):
+        self.__dir_paths_to_file_stats: Dict[Path, Dict[Path, FileStat]] = dict()
+
+        for path_to_dir in paths_to_dirs:
+            self.__dir_paths_to_file_stats[path_to_dir] = PollingChangeSource.__stat_files(path_to_dir)
+
+    def wait_for_changes(self,
+                         timeout_seconds: float) -> Set[Path]:
+
+        time.sleep(timeout_seconds)
+
+        result: Set[Path] = set()
+
+        for (path_to_dir, previous_file_stats) in self.__dir_paths_to_file_stats.items():
+
+            # e.g. while it is replaced, its files are compared once it exists again
+            if not path_to_dir.is_dir():
+                continue
+
+            file_stats = PollingChangeSource.__stat_files(path_to_dir)
+
+            for (path_to_file, file_stat) in file_stats.items():
+                if previous_file_stats.get(path_to_file) != file_stat:
+                    result.add(path_to_file)
+
+            for path_to_file in previous_file_stats.keys():
+                if path_to_file not in file_stats:
+                    result.add(path_to_file)
+
+            self.__dir_paths_to_file_stats[path_to_dir] = file_stats
+
+        return result
+
+    @staticmethod
+    def __stat_files(path_to_dir: Path) -> Dict[Path, FileStat]:
+        """
+        :return: The paths of the json files in the given directory (`path_to_dir`) mapped to their stats
+        """
+
+        result: Dict[Path, FileStat] = dict()
+
+        with MetricsRecorder.time(Stage.dir_scan):
+            for (_, dir_entry) in DirLayout.load(path_to_dir).list_files(path_to_dir):
+                try:
+                    stat_result = dir_entry.stat()
+                except FileNotFoundError:
+                    # deleted since the directory was listed
+                    continue
+
+                result[Path(dir_entry.path)] = (stat_result.st_size, stat_result.st_mtime_ns)
+
+        return result
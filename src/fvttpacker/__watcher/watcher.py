@@ -0,0 +1,265 @@
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Set, Tuple, Union
+
+from plyvel import DB
+
+from fvttpacker.__common.__directory_checker_decorators import check_input_dir_and_target_dir, \
+    check_input_dirs_and_target_dbs
+from fvttpacker.__common.change_counts import ChangeCounts
+from fvttpacker.__common.leveldb_helper import LevelDBHelper
+from fvttpacker.__constants import UTF_8
+from fvttpacker.__packer.__batch_writer import WriteBatchOptions
+from fvttpacker.__packer.__dict_to_leveldb_writer import DictToLevelDBWriter
+from fvttpacker.__packer.__dir_to_leveldb_reader import DirToDictReader
+from fvttpacker.__packer.packer import Packer
+from fvttpacker.__watcher.__change_sources import ChangeSource
+from fvttpacker.dir_layout import DirLayout
+from fvttpacker.fvttpacker_exception import FvttPackerException
+from fvttpacker.key_filter import KeyFilter
+from fvttpacker.pack_options import PackOptions
+from fvttpacker.watch_options import WatchOptions
+
+
+class Watcher:
+
+    @staticmethod
+    @check_input_dir_and_target_dir
+    def watch_dirs_under_x_into_dbs_under_y(
+            x_path_to_parent_input_dir: Path,
+            y_path_to_parent_target_dir: Path,
+            pack_options: PackOptions = PackOptions(),
+            watch_options: WatchOptions = WatchOptions(),
+            stop_event: Union[threading.Event, None] = None) -> None:
+        """
+        Same as `watch_dirs_into_dbs` for all sub-folders located under the given directory
+        (`x_path_to_parent_input_dir`) and the LevelDBs with the same names under the given target directory
+        (`y_path_to_parent_target_dir`).
+
+        :param x_path_to_parent_input_dir: e.g. "./unpacked_dbs"
+        :param y_path_to_parent_target_dir: e.g. "./foundrydata/Data/worlds/test/data"
+        :param pack_options: Options that control how the directories are packed before they are watched
+        :param watch_options: Options that control how the directories are watched
+        :param stop_event: see `watch_dirs_into_dbs`
+        """
+
+        input_dir_paths_to_target_db_paths: Dict[Path, Path] = dict()
+
+        for path_to_input_dir in x_path_to_parent_input_dir.glob("*/"):
+            input_dir_paths_to_target_db_paths[path_to_input_dir] = \
+                y_path_to_parent_target_dir.joinpath(path_to_input_dir.name)
+
+        Watcher.watch_dirs_into_dbs(input_dir_paths_to_target_db_paths,
+                                    pack_options,
+                                    watch_options,
+                                    stop_event)
+
+    @staticmethod
+    @check_input_dirs_and_target_dbs
+    def watch_dirs_into_dbs(
+            input_dir_paths_to_target_db_paths: Dict[Path, Path],
+            pack_options: PackOptions = PackOptions(),
+            watch_options: WatchOptions = WatchOptions(),
+            stop_event: Union[threading.Event, None] = None) -> None:
+        """
+        Packs all the given directories (keys), each into its respective LevelDB at the given path (values).
+        Then keeps the LevelDBs open and writes every change of a json file into its LevelDB as soon as the file stops
+        changing, until `stop_event` is set or the process is interrupted.
+        Files that are not valid json are skipped until they are valid again.
+
+        :param input_dir_paths_to_target_db_paths: Contains the paths to the input directories as keys
+        and the paths to the target LevelDBs as values
+        :param pack_options: Options that control how the directories are packed before they are watched
+        :param watch_options: Options that control how the directories are watched
+        :param stop_event: Watching stops once this is set. It is checked at least every
+        `watch_options.poll_interval_seconds`.
+        """
+
+        # start watching before packing, so changes made while packing are not missed
+        change_source = ChangeSource.create(input_dir_paths_to_target_db_paths.keys(),
+                                            watch_options.use_polling)
+
+        input_dir_paths_to_dbs: Dict[Path, DB] = dict()
+
+        try:
+            Packer.pack_dirs_into_dbs(input_dir_paths_to_target_db_paths,
+                                      pack_options)
+
+            for (path_to_input_dir, path_to_target_db) in input_dir_paths_to_target_db_paths.items():
+                input_dir_paths_to_dbs[path_to_input_dir] = LevelDBHelper.try_open_db(
+                    path_to_target_db,
+                    skip_checks=True,
+                    must_exist=False,
+                    leveldb_options=pack_options.leveldb_options)
+
+            logging.info("Watching %s directories for changes", len(input_dir_paths_to_dbs))
+
+            batch_options = WriteBatchOptions(max_entries=watch_options.max_batch_entries,
+                                              sync=pack_options.sync)
+
+            while stop_event is None or not stop_event.is_set():
+                changed_paths = Watcher.__wait_for_changes(change_source, watch_options)
+
+                if len(changed_paths) > 0:
+                    Watcher.__sync_changes(changed_paths,
+                                           input_dir_paths_to_dbs,
+                                           batch_options,
+                                           pack_options.key_filter,
+                                           pack_options.io_threads)
+        except KeyboardInterrupt:
+            logging.info("Stopped watching")
+        finally:
+            change_source.close()
+
+            for target_db in input_dir_paths_to_dbs.values():
+                target_db.close()
+
+    @staticmethod
+    def __wait_for_changes(change_source: ChangeSource,
+                           watch_options: WatchOptions) -> Set[Path]:
+        """
+        Waits for the first change and then until nothing changed for `watch_options.debounce_seconds`.
+        """
+
+        result = change_source.wait_for_changes(watch_options.poll_interval_seconds)
+
+        if len(result) == 0:
+            return result
+
+        while True:
+            changed_paths = change_source.wait_for_changes(watch_options.debounce_seconds)
+
+            if len(changed_paths) == 0:
+                return result
+
+            result.update(changed_paths)
+
+    @staticmethod
+    def __sync_changes(changed_paths: Set[Path],
+                       input_dir_paths_to_dbs: Dict[Path, DB],
+                       batch_options: WriteBatchOptions,
+                       key_filter: KeyFilter,
+                       io_threads: int) -> None:
+
+        start = time.perf_counter()
+        change_counts = ChangeCounts()
+
+        for (path_to_input_dir, target_db) in input_dir_paths_to_dbs.items():
+
+            if path_to_input_dir in changed_paths:
+                change_counts.add(Watcher.__sync_dir(path_to_input_dir,
+                                                 target_db,
+                                                 batch_options,
+                                                 key_filter,
+                                                 io_threads))
+                continue
+
+            # the files may be in sub-directories, see `DirLayout`
+            # remove .json at the end
+            paths_to_files = sorted(path for path in changed_paths
+                                    if path_to_input_dir in path.parents and key_filter.matches(path.name[0:-5]))
+
+            if len(paths_to_files) > 0:
+                change_counts.add(Watcher.__sync_files(path_to_input_dir, paths_to_files, target_db, batch_options))
+
+        logging.info("Synced %s changes in %.1f ms (%s)",
+                     change_counts.nb_changes,
+                     (time.perf_counter() - start) * 1000,
+                     change_counts)
+
+    @staticmethod
+    def __sync_dir(path_to_input_dir: Path,
+                   target_db: DB,
+                   batch_options: WriteBatchOptions,
+                   key_filter: KeyFilter,
+                   io_threads: int) -> ChangeCounts:
+        """
+        Syncs the whole directory, e.g. after it was replaced or after inotify events were lost.
+        """
+
+        if not path_to_input_dir.is_dir():
+            logging.warning("Directory '%s' is gone, leaving its LevelDB as it is", path_to_input_dir)
+            return ChangeCounts()
+
+        try:
+            input_dict = DirToDictReader.read_dir_as_dict(path_to_input_dir,
+                                                          skip_checks=True,
+                                                          key_filter=key_filter,
+                                                          io_threads=io_threads)
+
+            return DictToLevelDBWriter.write_entries_into_db(sorted(input_dict.items()),
+                                                             target_db,
+                                                             batch_options,
+                                                             key_filter=key_filter)
+        except FvttPackerException as err:
+            logging.warning("Skipping directory '%s' until all its files are valid, reason: %s",
+                            path_to_input_dir,
+                            err)
+            return ChangeCounts()
+
+    @staticmethod
+    def __sync_files(path_to_input_dir: Path,
+                     paths_to_files: List[Path],
+                     target_db: DB,
+                     batch_options: WriteBatchOptions) -> ChangeCounts:
+        """
+        Writes the entries of the given files (`paths_to_files`) whose value differs from the one in the given LevelDB
+        (`target_db`) and deletes the entries of the files that no longer exist.
+        A file that is gone from its path, but is where it belongs in the layout of the given directory
+        (`path_to_input_dir`), e.g. after `DirLayout.migrate`, was only moved.
+        """
+
+        keys_to_paths: Dict[str, List[Path]] = dict()
+
+        for path_to_file in paths_to_files:
+            # remove .json at the end
+            keys_to_paths.setdefault(path_to_file.name[0:-5], list()).append(path_to_file)
+
+        dir_layout = DirLayout.load(path_to_input_dir)
+
+        changed_entries: List[Tuple[str, str]] = list()
+        deleted_keys: List[str] = list()
+
+        for (key, paths_to_key_files) in keys_to_paths.items():
+            current_value_bytes = target_db.get(key.encode(UTF_8))
+
+            path_to_layout_file = dir_layout.get_path_to_file(path_to_input_dir, key)
+
+            if path_to_layout_file not in paths_to_key_files:
+                paths_to_key_files.append(path_to_layout_file)
+
+            try:
+                value_str = Watcher.__try_read_file(paths_to_key_files)
+            except FvttPackerException as err:
+                logging.warning("Skipping the file of '%s' until it is valid, reason: %s", key, err)
+                continue
+
+            if value_str is None:
+                if current_value_bytes is not None:
+                    deleted_keys.append(key)
+                continue
+
+            if current_value_bytes != value_str.encode(UTF_8):
+                changed_entries.append((key, value_str))
+
+        return DictToLevelDBWriter.write_changes_into_db(changed_entries,
+                                                         deleted_keys,
+                                                         target_db,
+                                                         batch_options)
+
+    @staticmethod
+    def __try_read_file(paths_to_files: List[Path]) -> Union[str, None]:
+        """
+        :return: The minified content of the first of the given files (`paths_to_files`) that exists, None if none
+        exists
+        """
+
+        for path_to_file in paths_to_files:
+            try:
+                return DirToDictReader.read_files_as_entries([path_to_file])[0][1]
+            except FileNotFoundError:
+                continue
+
+        return None
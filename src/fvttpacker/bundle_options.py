@@ -0,0 +1,25 @@
+from typing import Union
+
+# zstd if the zstandard package is installed, zlib otherwise
+bundle_compression_auto = "auto"
+bundle_compression_zstd = "zstd"
+bundle_compression_zlib = "zlib"
+
+bundle_compression_choices = [bundle_compression_auto, bundle_compression_zstd, bundle_compression_zlib]
+
+
+class BundleOptions:
+
+    def __init__(self,
+                 compression: str = bundle_compression_auto,
+                 compression_level: Union[int, None] = None):
+        """
+        Options that control how LevelDBs are exported into a bundle.
+
+        :param compression: How the entries of each LevelDB are compressed, one of `bundle_compression_choices`.
+        `bundle_compression_zstd` needs the zstandard package (e.g. `pip install fvttpacker[zstd]`).
+        Importing a bundle needs the package it was compressed with.
+        :param compression_level: Level of the compression, None means the default level of the compression.
+        """
+        self.compression = compression
+        self.compression_level = compression_level
@@ -0,0 +1,159 @@
+import json
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Union
+
+from fvttpacker.__constants import UTF_8
+from fvttpacker.fvttpacker_exception import FvttPackerException
+
+plan_operation_pack = "pack"
+plan_operation_unpack = "unpack"
+
+plan_version = 1
+
+
+class PlannedChange:
+
+    def __init__(self,
+                 key: str,
+                 change_type: str,
+                 size: Union[int, None],
+                 previous_size: Union[int, None],
+                 value_hash: Union[str, None]):
+        """
+        :param key: The key of the entry or file
+        :param change_type: One of created, updated and deleted
+        :param size: Number of bytes of the new value or file content, None if it is deleted
+        :param previous_size: Number of bytes of the current value or file content, None if it is created
+        :param value_hash: Hash of the new value or file content, None if it is deleted. A plan is only applied if
+        the value or file content it would write still has this hash.
+        """
+        self.key = key
+        self.change_type = change_type
+        self.size = size
+        self.previous_size = previous_size
+        self.value_hash = value_hash
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "key": self.key,
+            "change": self.change_type,
+            "size": self.size,
+            "previous_size": self.previous_size,
+            "hash": self.value_hash
+        }
+
+    @staticmethod
+    def from_dict(value: Dict[str, Any]) -> "PlannedChange":
+        return PlannedChange(value["key"],
+                             value["change"],
+                             value["size"],
+                             value["previous_size"],
+                             value["hash"])
+
+
+class TargetPlan:
+
+    def __init__(self,
+                 path_to_source: Path,
+                 path_to_target: Path,
+                 db_digest: Union[str, None],
+                 nb_unchanged: int = 0,
+                 changes: Union[List[PlannedChange], None] = None):
+        """
+        :param path_to_source: The directory that is packed or the LevelDB that is unpacked
+        :param path_to_target: The LevelDB or directory that is changed
+        :param db_digest: Digest of the LevelDB (the target of a pack, the source of an unpack) when the plan was made,
+        None if it did not exist. A plan is only applied if the LevelDB did not change since then.
+        :param nb_unchanged: Number of entries or files that stay as they are
+        :param changes: The changes, sorted by key
+        """
+        self.path_to_source = path_to_source
+        self.path_to_target = path_to_target
+        self.db_digest = db_digest
+        self.nb_unchanged = nb_unchanged
+        self.changes: List[PlannedChange] = changes if changes is not None else list()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "source": str(self.path_to_source),
+            "target": str(self.path_to_target),
+            "db_digest": self.db_digest,
+            "unchanged": self.nb_unchanged,
+            "bytes_written": sum(change.size for change in self.changes if change.size is not None),
+            "changes": [change.to_dict() for change in self.changes]
+        }
+
+    @staticmethod
+    def from_dict(value: Dict[str, Any]) -> "TargetPlan":
+        return TargetPlan(Path(value["source"]),
+                          Path(value["target"]),
+                          value["db_digest"],
+                          value["unchanged"],
+                          [PlannedChange.from_dict(change) for change in value["changes"]])
+
+
+class ChangePlan:
+    """
+    The changes a pack or unpack would make, without making them. See `PackOptions.plan_observer` and
+    `PackOptions.plan`.
+    """
+
+    def __init__(self,
+                 operation: str,
+                 targets: Union[List[TargetPlan], None] = None):
+        """
+        :param operation: `plan_operation_pack` or `plan_operation_unpack`
+        :param targets: The plan of each LevelDB (pack) or directory (unpack)
+        """
+        self.operation = operation
+        self.targets: List[TargetPlan] = targets if targets is not None else list()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": plan_version,
+            "operation": self.operation,
+            "targets": [target.to_dict() for target in self.targets]
+        }
+
+    @staticmethod
+    def from_dict(value: Dict[str, Any]) -> "ChangePlan":
+        if value.get("version") != plan_version:
+            raise FvttPackerException(f"Unsupported plan version '{value.get('version')}'.")
+
+        return ChangePlan(value["operation"],
+                          [TargetPlan.from_dict(target) for target in value["targets"]])
+
+    def save(self,
+             path_to_file: Path) -> None:
+        with open(path_to_file, "wt", encoding=UTF_8) as file:
+            json.dump(self.to_dict(), file, indent="  ", ensure_ascii=False)
+
+    @staticmethod
+    def load(path_to_file: Path) -> "ChangePlan":
+        try:
+            with open(path_to_file, "rt", encoding=UTF_8) as file:
+                return ChangePlan.from_dict(json.load(file))
+        except (OSError, ValueError, KeyError, TypeError) as err:
+            raise FvttPackerException(f"Unable to read plan '{path_to_file}'.", err)
+
+
+class PlanObserver(ABC):
+
+    @abstractmethod
+    def on_plan(self,
+                plan: ChangePlan) -> None:
+        """
+        Called once the plan of a pack or unpack has been made.
+        """
+
+
+class JsonFilePlanObserver(PlanObserver):
+
+    def __init__(self,
+                 path_to_file: Path):
+        self.path_to_file = path_to_file
+
+    def on_plan(self,
+                plan: ChangePlan) -> None:
+        plan.save(self.path_to_file)
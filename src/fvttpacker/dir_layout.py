@@ -0,0 +1,198 @@
+import hashlib
+import json
+import logging
+import os
+from json import JSONDecodeError
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+from fvttpacker.__constants import UTF_8
+from fvttpacker.fvttpacker_exception import FvttPackerException
+
+# all files directly in the directory
+layout_flat = "flat"
+# in sub-directories named after the hex digits of a hash of the key, spreads the files evenly
+layout_hash = "hash"
+# in sub-directories named after the first characters of the document id, i.e. the part of the key after the last "!"
+layout_prefix = "prefix"
+
+layout_choices = [layout_flat, layout_hash, layout_prefix]
+
+# number of characters of the hash or of the document id that name a sub-directory, 256 per level with `layout_hash`
+shard_width = 2
+max_depth = 4
+
+# stored in each directory that is not flat
+layout_file_name = ".fvttpacker-layout"
+
+
+class DirLayout:
+
+    def __init__(self,
+                 scheme: str = layout_flat,
+                 depth: int = 1):
+        """
+        Where the json files of the entries are located inside a directory.
+        Large directories are slow to list and to look up files in, on some filesystems and in git, so they can be
+        split into sub-directories. The files keep their names, so each file can be found by its key either way.
+
+        :param scheme: One of `layout_choices`
+        :param depth: Number of levels of sub-directories, ignored by `layout_flat`
+        """
+
+        if scheme not in layout_choices:
+            raise FvttPackerException(f"Unknown directory layout '{scheme}'.")
+
+        if scheme != layout_flat and not 1 <= depth <= max_depth:
+            raise FvttPackerException(f"The depth of a directory layout must be between 1 and {max_depth}.")
+
+        self.scheme = scheme
+        self.depth = 0 if scheme == layout_flat else depth
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, DirLayout) and self.scheme == other.scheme and self.depth == other.depth
+
+    def __str__(self) -> str:
+        return self.scheme if self.depth == 0 else f"{self.scheme} (depth: {self.depth})"
+
+    def is_flat(self) -> bool:
+        return self.depth == 0
+
+    def get_path_to_file(self,
+                         path_to_dir: Path,
+                         key: str) -> Path:
+        """
+        :return: Where the file of the given key belongs in the given directory (`path_to_dir`)
+        """
+        return path_to_dir.joinpath(*self.__get_shard_names(key), key + ".json")
+
+    def list_files(self,
+                   path_to_dir: Path) -> Iterator[Tuple[str, os.DirEntry]]:
+        """
+        Files in sub-directories that are not where they belong, e.g. files that were added by hand to the top level
+        of a sharded directory, are listed as well.
+
+        :return: (key, directory entry) tuples of all json files in the given directory (`path_to_dir`) and its
+        sub-directories up to the depth of the layout, in no particular order
+        """
+        return DirLayout.__list_files(path_to_dir, self.depth)
+
+    def save(self,
+             path_to_dir: Path) -> None:
+
+        path_to_layout_file = path_to_dir.joinpath(layout_file_name)
+
+        if self.is_flat():
+            path_to_layout_file.unlink(missing_ok=True)
+            return
+
+        with open(path_to_layout_file, "wt", encoding=UTF_8) as file:
+            json.dump({"scheme": self.scheme, "depth": self.depth}, file)
+
+    @staticmethod
+    def load(path_to_dir: Path) -> "DirLayout":
+        """
+        :return: The layout of the given directory (`path_to_dir`), flat if it has none or does not exist
+        """
+
+        path_to_layout_file = path_to_dir.joinpath(layout_file_name)
+
+        try:
+            with open(path_to_layout_file, "rt", encoding=UTF_8) as file:
+                layout_dict = json.load(file)
+        except (FileNotFoundError, NotADirectoryError):
+            return DirLayout()
+        except JSONDecodeError as err:
+            raise FvttPackerException(f"Unable to read the directory layout '{path_to_layout_file}', reason:\n'{err}'")
+
+        return DirLayout(layout_dict.get("scheme", layout_flat), layout_dict.get("depth", 1))
+
+    @staticmethod
+    def migrate(path_to_dir: Path,
+                new_layout: "DirLayout") -> int:
+        """
+        Moves all files of the given directory (`path_to_dir`) to where they belong in the given layout
+        (`new_layout`) and removes the sub-directories that are empty afterwards.
+        The files are renamed, so their content and their mtime stay the same.
+
+        :return: The number of files that were moved
+        """
+
+        old_layout = DirLayout.load(path_to_dir)
+
+        # files of deeper levels may be left over from an interrupted migration
+        keys_and_dir_entries = list(DirLayout.__list_files(path_to_dir, max(old_layout.depth, new_layout.depth)))
+
+        nb_moved = 0
+
+        for (key, dir_entry) in keys_and_dir_entries:
+            path_to_file = new_layout.get_path_to_file(path_to_dir, key)
+
+            if dir_entry.path == str(path_to_file):
+                continue
+
+            path_to_file.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(dir_entry.path, path_to_file)
+            nb_moved += 1
+
+        new_layout.save(path_to_dir)
+        DirLayout.__remove_empty_dirs(path_to_dir, max(old_layout.depth, new_layout.depth))
+
+        logging.info("Moved %s files in '%s' from layout %s to %s", nb_moved, path_to_dir, old_layout, new_layout)
+
+        return nb_moved
+
+    def __get_shard_names(self,
+                          key: str) -> List[str]:
+
+        if self.scheme == layout_hash:
+            key_hash = hashlib.blake2b(key.encode(UTF_8), digest_size=max_depth).hexdigest()
+            return [key_hash[level * shard_width:(level + 1) * shard_width] for level in range(self.depth)]
+
+        if self.scheme == layout_prefix:
+            document_id = key.rsplit("!", 1)[-1]
+            return [DirLayout.__to_shard_name(document_id[level * shard_width:(level + 1) * shard_width])
+                    for level in range(self.depth)]
+
+        return []
+
+    @staticmethod
+    def __to_shard_name(part_of_id: str) -> str:
+        # ids are alphanumeric, anything else could be a separator or reserved on some filesystems
+        shard_name = "".join(char if char.isascii() and char.isalnum() else "_" for char in part_of_id)
+
+        # keys that are shorter than the layout is deep
+        return shard_name.ljust(shard_width, "_")
+
+    @staticmethod
+    def __list_files(path_to_dir: Path,
+                     depth: int) -> Iterator[Tuple[str, os.DirEntry]]:
+
+        try:
+            dir_entries = list(os.scandir(path_to_dir))
+        except FileNotFoundError:
+            return
+
+        for dir_entry in dir_entries:
+            if dir_entry.name.endswith(".json") and dir_entry.is_file():
+                # remove .json at the end
+                yield dir_entry.name[0:-5], dir_entry
+            elif depth > 0 and not dir_entry.name.startswith(".") and dir_entry.is_dir():
+                yield from DirLayout.__list_files(Path(dir_entry.path), depth - 1)
+
+    @staticmethod
+    def __remove_empty_dirs(path_to_dir: Path,
+                            depth: int) -> None:
+
+        if depth == 0:
+            return
+
+        for dir_entry in os.scandir(path_to_dir):
+            if not dir_entry.name.startswith(".") and dir_entry.is_dir():
+                DirLayout.__remove_empty_dirs(Path(dir_entry.path), depth - 1)
+
+                try:
+                    os.rmdir(dir_entry.path)
+                except OSError:
+                    # not empty
+                    pass
@@ -0,0 +1,137 @@
+import fnmatch
+from typing import Iterable, List, Tuple, Union
+
+from fvttpacker.__constants import UTF_8
+
+# characters that make a pattern a glob instead of a key prefix, see `fnmatch`
+glob_chars = "*?["
+
+# start (inclusive) and stop (exclusive) of a range of keys, None means unbounded
+KeyRange = Tuple[Union[bytes, None], Union[bytes, None]]
+
+
+class KeyFilter:
+
+    def __init__(self,
+                 includes: Iterable[str] = (),
+                 excludes: Iterable[str] = (),
+                 after: Union[str, None] = None):
+        """
+        Selects the entries of LevelDBs and the files of directories that are packed or unpacked by their keys.
+        Everything else is neither read, written nor deleted.
+        A pattern that contains any of `glob_chars` is matched against the whole key with `fnmatch.fnmatchcase`,
+        any other pattern is a key prefix. E.g. "!actors!" or "!actors.items!KDsnRSr1Bg7NcW9O.*".
+
+        :param includes: Only keys that match any of these are selected. If empty, all keys are selected.
+        :param excludes: Keys that match any of these are not selected
+        :param after: If not None only keys greater than this one are selected, e.g. the keys an interrupted pack or
+        unpack did not get to
+        """
+        self.includes = list(includes)
+        self.excludes = list(excludes)
+        self.after = after
+
+    def is_everything(self) -> bool:
+        """
+        :return: True if all keys are selected
+        """
+        return len(self.includes) == 0 and len(self.excludes) == 0 and self.after is None
+
+    def matches(self,
+                key: str) -> bool:
+        """
+        :return: True if the given key is selected
+        """
+
+        # str compares code points, which is the order of the UTF-8 encoded keys in the LevelDBs as well
+        if self.after is not None and key <= self.after:
+            return False
+
+        if len(self.includes) > 0 and not any(KeyFilter.__matches_pattern(key, include) for include in self.includes):
+            return False
+
+        return not any(KeyFilter.__matches_pattern(key, exclude) for exclude in self.excludes)
+
+    def get_key_ranges(self) -> List[KeyRange]:
+        """
+        Only the part of a pattern before its first glob character can be used to limit the range, so the keys in
+        the ranges still have to be checked with `matches`.
+
+        :return: Sorted, non-overlapping ranges that contain all selected keys
+        """
+
+        key_ranges = self.__get_include_ranges()
+
+        if self.after is None:
+            return key_ranges
+
+        # the smallest key that is greater than `after`
+        after_start = self.after.encode(UTF_8) + b"\x00"
+
+        return [(after_start if start is None or start < after_start else start, stop)
+                for (start, stop) in key_ranges
+                if stop is None or stop > after_start]
+
+    def __get_include_ranges(self) -> List[KeyRange]:
+
+        if len(self.includes) == 0:
+            return [(None, None)]
+
+        key_ranges: List[KeyRange] = list()
+
+        for include in self.includes:
+            prefix_bytes = KeyFilter.__get_literal_prefix(include).encode(UTF_8)
+
+            if len(prefix_bytes) == 0:
+                return [(None, None)]
+
+            key_ranges.append((prefix_bytes, KeyFilter.__get_prefix_stop(prefix_bytes)))
+
+        key_ranges.sort()
+
+        result: List[KeyRange] = [key_ranges[0]]
+
+        for (start, stop) in key_ranges[1:]:
+            (previous_start, previous_stop) = result[-1]
+
+            if previous_stop is None or start <= previous_stop:
+                result[-1] = (previous_start, None if previous_stop is None or stop is None
+                              else max(previous_stop, stop))
+            else:
+                result.append((start, stop))
+
+        return result
+
+    @staticmethod
+    def __matches_pattern(key: str,
+                          pattern: str) -> bool:
+
+        if any(glob_char in pattern for glob_char in glob_chars):
+            return fnmatch.fnmatchcase(key, pattern)
+
+        return key.startswith(pattern)
+
+    @staticmethod
+    def __get_literal_prefix(pattern: str) -> str:
+        """
+        :return: The part of the given pattern before its first glob character
+        """
+
+        for (index, char) in enumerate(pattern):
+            if char in glob_chars:
+                return pattern[0:index]
+
+        return pattern
+
+    @staticmethod
+    def __get_prefix_stop(prefix_bytes: bytes) -> Union[bytes, None]:
+        """
+        :return: The smallest key that is greater than all keys with the given prefix, None if there is none
+        """
+
+        prefix_bytes = prefix_bytes.rstrip(b"\xff")
+
+        if len(prefix_bytes) == 0:
+            return None
+
+        return prefix_bytes[0:-1] + bytes([prefix_bytes[-1] + 1])
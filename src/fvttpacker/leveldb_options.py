@@ -0,0 +1,84 @@
+from typing import Any, Callable, Dict, Union
+
+compression_snappy = "snappy"
+compression_none = "none"
+
+compression_choices = [compression_snappy, compression_none]
+
+
+class LevelDBOptions:
+
+    def __init__(self,
+                 write_buffer_size: Union[int, None] = None,
+                 block_cache_size: Union[int, None] = None,
+                 bloom_filter_bits: Union[int, None] = None,
+                 compression: str = compression_snappy,
+                 max_open_files: Union[int, None] = None):
+        """
+        Options the LevelDBs are opened with. None means the default of LevelDB itself.
+
+        :param write_buffer_size: Number of bytes written into the log and kept in memory before they are written into
+        a sorted table. Larger buffers speed up large packs, but need as much memory per open LevelDB.
+        :param block_cache_size: Number of bytes of uncompressed blocks that are cached while reading.
+        :param bloom_filter_bits: Bits per key of the bloom filters written into the sorted tables, speeds up point
+        lookups of keys that don't exist. LevelDBs opened without bloom filters simply ignore them.
+        :param compression: How the blocks of the sorted tables are compressed, one of `compression_choices`.
+        Foundry writes its LevelDBs with snappy compression.
+        :param max_open_files: Number of files LevelDB keeps open at once
+        """
+        self.write_buffer_size = write_buffer_size
+        self.block_cache_size = block_cache_size
+        self.bloom_filter_bits = bloom_filter_bits
+        self.compression = compression
+        self.max_open_files = max_open_files
+
+    def to_plyvel_kwargs(self) -> Dict[str, Any]:
+        """
+        :return: The options as keyword arguments of `plyvel.DB`, without the ones that should stay at their defaults
+        """
+
+        result: Dict[str, Any] = {
+            "compression": None if self.compression == compression_none else self.compression
+        }
+
+        if self.write_buffer_size is not None:
+            result["write_buffer_size"] = self.write_buffer_size
+
+        if self.block_cache_size is not None:
+            result["lru_cache_size"] = self.block_cache_size
+
+        if self.bloom_filter_bits is not None:
+            result["bloom_filter_bits"] = self.bloom_filter_bits
+
+        if self.max_open_files is not None:
+            result["max_open_files"] = self.max_open_files
+
+        return result
+
+    @staticmethod
+    def create_write_heavy() -> "LevelDBOptions":
+        """
+        For packing: Large batches go into a large write buffer, so fewer and larger sorted tables are written.
+        """
+        return LevelDBOptions(write_buffer_size=64 * 1024 * 1024,
+                              bloom_filter_bits=10)
+
+    @staticmethod
+    def create_read_heavy() -> "LevelDBOptions":
+        """
+        For unpacking: A larger block cache for LevelDBs that are read more than once, e.g. when they are validated
+        before they are unpacked with `streaming`.
+        """
+        return LevelDBOptions(block_cache_size=32 * 1024 * 1024)
+
+
+profile_default = "default"
+profile_write_heavy = "write-heavy"
+profile_read_heavy = "read-heavy"
+
+# name -> function that creates the options of the profile
+leveldb_profiles: Dict[str, Callable[[], LevelDBOptions]] = {
+    profile_default: LevelDBOptions,
+    profile_write_heavy: LevelDBOptions.create_write_heavy,
+    profile_read_heavy: LevelDBOptions.create_read_heavy
+}
@@ -0,0 +1,109 @@
+import json
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict
+
+from fvttpacker.__constants import UTF_8
+
+
+class Stage:
+    """
+    The stages of packing and unpacking whose time is measured.
+    """
+    dir_scan = "dir_scan"
+    file_read = "file_read"
+    json_parse = "json_parse"
+    json_serialize = "json_serialize"
+    # minifying json as text, see `JsonText`
+    text_minify = "text_minify"
+    leveldb_read = "leveldb_read"
+    leveldb_diff = "leveldb_diff"
+    # writing into a new LevelDB, see `strategy_rebuild`
+    leveldb_bulk_load = "leveldb_bulk_load"
+    batch_write = "batch_write"
+    file_write = "file_write"
+    file_delete = "file_delete"
+    compaction = "compaction"
+    # copying a LevelDB before unpacking it, see `UnpackOptions.snapshot`
+    leveldb_snapshot = "leveldb_snapshot"
+    # (de)compressing the entries of a bundle, see `Bundler`
+    bundle_compress = "bundle_compress"
+    bundle_decompress = "bundle_decompress"
+
+
+class Counter:
+    bytes_read = "bytes_read"
+    bytes_written = "bytes_written"
+
+
+class Metrics:
+    """
+    What happened during a single pack or unpack and where the time was spent.
+
+    The time of a stage does not include the time of stages that happened within it (e.g. the time spent reading from
+    the LevelDB while it is diffed). The times of all processes and threads are summed up, so with `jobs` > 1 or
+    `io_threads` > 1 the sum of all stages can be greater than the total time.
+    """
+
+    def __init__(self):
+        self.total_seconds: float = 0.0
+        self.stage_seconds: Dict[str, float] = dict()
+        self.stage_calls: Dict[str, int] = dict()
+        self.counters: Dict[str, int] = dict()
+        # path of the target LevelDB or directory -> counter or change type -> value
+        self.targets: Dict[str, Dict[str, int]] = dict()
+
+    def add_stage_time(self,
+                       stage: str,
+                       seconds: float) -> None:
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+        self.stage_calls[stage] = self.stage_calls.get(stage, 0) + 1
+
+    def add_to_counter(self,
+                       counter: str,
+                       value: int) -> None:
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def add(self,
+            other: "Metrics") -> None:
+        """
+        Adds the stage times and counters of the given metrics (`other`), e.g. the ones of a worker process.
+        """
+
+        for (stage, seconds) in other.stage_seconds.items():
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+            self.stage_calls[stage] = self.stage_calls.get(stage, 0) + other.stage_calls[stage]
+
+        for (counter, value) in other.counters.items():
+            self.add_to_counter(counter, value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_seconds": self.total_seconds,
+            "stages": {stage: {"seconds": seconds, "calls": self.stage_calls[stage]}
+                       for (stage, seconds) in sorted(self.stage_seconds.items())},
+            "counters": dict(sorted(self.counters.items())),
+            "targets": self.targets
+        }
+
+
+class MetricsObserver(ABC):
+
+    @abstractmethod
+    def on_metrics(self,
+                   metrics: Metrics) -> None:
+        """
+        Called once the pack or unpack has finished successfully.
+        """
+
+
+class JsonFileMetricsObserver(MetricsObserver):
+
+    def __init__(self,
+                 path_to_file: Path):
+        self.path_to_file = path_to_file
+
+    def on_metrics(self,
+                   metrics: Metrics) -> None:
+        with open(self.path_to_file, "wt", encoding=UTF_8) as file:
+            json.dump(metrics.to_dict(), file, indent="  ")
@@ -13,6 +13,10 @@ class OverwriteConfirmer(ABC):
                                  path_to_target_dir: Path) -> bool:
         raise NotImplemented()
 
+    def confirm_overwrite_bundle(self,
+                                 path_to_target_bundle: Path) -> bool:
+        raise NotImplemented()
+
     def confirm_batch_overwrite_leveldb(self,
                                         paths_to_target_dbs: List[Path]) -> Dict[Path, bool]:
         raise NotImplemented()
@@ -31,6 +35,10 @@ class AllYesOverwriteConfirmer(OverwriteConfirmer):
                                  path_to_target_dir: Path) -> bool:
         return True
 
+    def confirm_overwrite_bundle(self,
+                                 path_to_target_bundle: Path) -> bool:
+        return True
+
     def confirm_batch_overwrite_leveldb(self,
                                         paths_to_target_dbs: List[Path]) -> Dict[Path, bool]:
 
@@ -0,0 +1,112 @@
+from typing import Union
+
+from fvttpacker.change_plan import ChangePlan, PlanObserver
+from fvttpacker.key_filter import KeyFilter
+from fvttpacker.leveldb_options import LevelDBOptions
+from fvttpacker.metrics import MetricsObserver
+
+default_memory_limit = 64 * 1024 * 1024
+
+# compare with the existing entries and only write the changes
+strategy_diff = "diff"
+# write a new LevelDB and replace the existing one with it
+strategy_rebuild = "rebuild"
+# estimate how much changed and choose between diff and rebuild
+strategy_auto = "auto"
+
+strategy_choices = [strategy_diff, strategy_rebuild, strategy_auto]
+
+
+class PackOptions:
+
+    def __init__(self,
+                 streaming: bool = False,
+                 memory_limit: Union[int, None] = default_memory_limit,
+                 jobs: int = 1,
+                 use_manifest: bool = False,
+                 validate: bool = False,
+                 metrics_observer: Union[MetricsObserver, None] = None,
+                 leveldb_options: LevelDBOptions = LevelDBOptions(),
+                 compact: bool = False,
+                 strategy: str = strategy_diff,
+                 max_batch_entries: Union[int, None] = None,
+                 max_batch_bytes: Union[int, None] = None,
+                 sync: bool = False,
+                 key_filter: KeyFilter = KeyFilter(),
+                 io_threads: int = 1,
+                 plan_observer: Union[PlanObserver, None] = None,
+                 plan: Union[ChangePlan, None] = None,
+                 resume: bool = False):
+        """
+        Options that control how directories are packed into LevelDBs.
+
+        :param streaming: If True the input directories are not read into memory as a whole.
+        Instead, all files are validated in a first pass and then read, converted and written in chunks.
+        :param memory_limit: Approximate maximum number of bytes that are buffered when `streaming` is True. Half of
+        it is for the files that are read ahead, the other half for the batch that is written into the LevelDB.
+        None means no limit.
+        :param jobs: Number of processes used to read and validate the input files. The files of each directory are
+        split into chunks, so large directories are spread across the processes as well.
+        :param use_manifest: If True a manifest with the stats and hashes of the packed files is kept in each input
+        directory. Directories and files that did not change since the last pack or unpack are skipped, as long as the
+        target LevelDB was not modified in the meantime.
+        :param validate: If True every input file is parsed. Otherwise, files that only differ from the value in the
+        LevelDB by their indentation are left as they are without parsing them, only new and changed files are parsed.
+        `streaming` always parses every file.
+        :param metrics_observer: If not None the time spent in each stage of the pack and what happened to each LevelDB
+        are recorded and passed to this observer once the pack has finished.
+        :param leveldb_options: Options the target LevelDBs are opened with, e.g. `LevelDBOptions.create_write_heavy()`
+        :param compact: If True each target LevelDB that changed is compacted after it was packed. Takes longer, but
+        Foundry doesn't have to replay the log and read fragmented tables when it opens the LevelDB.
+        :param strategy: How the entries get into the target LevelDBs, one of `strategy_choices`.
+        `strategy_rebuild` writes all entries into a new LevelDB in a staging directory next to the target LevelDB
+        and then swaps the directories, which is faster than the diff when most of the entries changed.
+        `strategy_auto` compares a sample of the entries with the target LevelDB and rebuilds it if most of them
+        changed. Without a complete sample, i.e. with `streaming` or from a stream, it always uses the diff and logs a
+        warning.
+        Directories that are packed incrementally (see `use_manifest`) and packs with a `key_filter` always use the
+        diff.
+        :param max_batch_entries: Maximum number of puts and deletes written into a LevelDB with a single batch.
+        None means no limit.
+        :param max_batch_bytes: Approximate maximum number of bytes of keys and values written into a LevelDB with a
+        single batch. None means half of `memory_limit` when `streaming` is True and no limit otherwise.
+        If the pack fails after some batches were written, the entries they changed are restored, so the LevelDBs
+        are left as they were before the pack.
+        :param sync: If True every batch is synced to disk before the next one is written. Slower, but a written batch
+        survives a crash of the machine.
+        :param key_filter: Only the files and entries whose keys are selected by this filter are packed. Entries of
+        the LevelDBs that are not selected are neither updated nor deleted. `use_manifest` is ignored if not all keys
+        are selected.
+        :param io_threads: Number of threads each process reads the input files on. Reading many small files is
+        mostly waiting for the file system, which threads can overlap, especially on network drives or with a virus
+        scanner.
+        :param plan_observer: If not None nothing is written. Instead, the changes the pack would make are compared
+        the same way and passed to this observer as a `ChangePlan`. The manifest is neither used nor updated.
+        :param plan: If not None exactly the changes of this plan are made, without comparing the directories with the
+        LevelDBs again. Fails before anything is written if a LevelDB or a changed file is not as it was when the plan
+        was made. The plan must have been made for the same directories and LevelDBs.
+        :param resume: If True, how far the pack got is recorded in a checkpoint in each input directory
+        (`.fvttpacker-checkpoint`) while it runs: the LevelDBs that were packed completely and the last key written
+        into the LevelDB that is being packed. If a pack with the same directories, LevelDBs and `key_filter` was
+        killed, e.g. by the OOM killer, it continues where that one stopped and ends with the same LevelDBs as an
+        uninterrupted pack. The directories must not be changed in between. A pack that fails with an error rolls
+        back its LevelDBs and checkpoints as usual. The checkpoints are deleted once the pack has finished. Ignored
+        with `plan_observer` and `plan`.
+        """
+        self.streaming = streaming
+        self.memory_limit = memory_limit
+        self.jobs = jobs
+        self.use_manifest = use_manifest
+        self.validate = validate
+        self.metrics_observer = metrics_observer
+        self.leveldb_options = leveldb_options
+        self.compact = compact
+        self.strategy = strategy
+        self.max_batch_entries = max_batch_entries
+        self.max_batch_bytes = max_batch_bytes
+        self.sync = sync
+        self.key_filter = key_filter
+        self.io_threads = io_threads
+        self.plan_observer = plan_observer
+        self.plan = plan
+        self.resume = resume
@@ -0,0 +1,86 @@
+from typing import Union
+
+from fvttpacker.change_plan import ChangePlan, PlanObserver
+from fvttpacker.dir_layout import DirLayout
+from fvttpacker.key_filter import KeyFilter
+from fvttpacker.leveldb_options import LevelDBOptions
+from fvttpacker.metrics import MetricsObserver
+
+
+class UnpackOptions:
+
+    def __init__(self,
+                 streaming: bool = False,
+                 jobs: int = 1,
+                 use_manifest: bool = False,
+                 validate: bool = False,
+                 metrics_observer: Union[MetricsObserver, None] = None,
+                 leveldb_options: LevelDBOptions = LevelDBOptions(),
+                 snapshot: bool = False,
+                 key_filter: KeyFilter = KeyFilter(),
+                 dir_layout: Union[DirLayout, None] = None,
+                 io_threads: int = 1,
+                 plan_observer: Union[PlanObserver, None] = None,
+                 plan: Union[ChangePlan, None] = None,
+                 blob_threshold: Union[int, None] = None,
+                 resume: bool = False):
+        """
+        Options that control how LevelDBs are unpacked into directories.
+
+        :param streaming: If True the input LevelDBs are not read into memory as a whole.
+        Instead, each entry is parsed and written into its file as soon as it has been read from the LevelDB. An entry
+        that is not valid json stops the unpack, after the files of the entries before it were written.
+        :param jobs: Number of processes used to decode and format the entries. The entries of each LevelDB are split
+        into key ranges, so large LevelDBs are spread across the processes as well.
+        :param use_manifest: If True a manifest with the stats and hashes of the unpacked files is kept in each target
+        directory. LevelDBs and entries that did not change since the last pack or unpack are skipped, as long as the
+        files were not modified in the meantime.
+        :param validate: If True every entry is parsed. Otherwise, entries whose files only differ from them by their
+        indentation are left as they are without parsing them, only new and changed entries are parsed.
+        :param metrics_observer: If not None the time spent in each stage of the unpack and what happened to each
+        directory are recorded and passed to this observer once the unpack has finished.
+        :param leveldb_options: Options the input LevelDBs are opened with, e.g. `LevelDBOptions.create_read_heavy()`
+        :param snapshot: If True each input LevelDB is copied first and the copy is unpacked, so LevelDBs that are in
+        use by a running Foundry can be unpacked. The table files are hard-linked, so the copy is fast and takes
+        little space. The copy is deleted afterwards.
+        :param key_filter: Only the entries and files whose keys are selected by this filter are unpacked. Only the key
+        ranges of the LevelDBs that can contain them are read. Files that are not selected are neither updated nor
+        deleted. `use_manifest` is ignored if not all keys are selected.
+        :param dir_layout: Where the files are located inside the target directories, see `DirLayout`.
+        The files of existing directories with another layout are moved first. If None, each directory keeps its
+        layout and new directories are flat. Packing reads any layout.
+        :param io_threads: Number of threads each process reads, writes and deletes the target files on. Unpacking
+        into many small files is mostly waiting for the file system, which threads can overlap, especially on network
+        drives or with a virus scanner.
+        :param plan_observer: If not None nothing is written. Instead, the changes the unpack would make are compared
+        the same way and passed to this observer as a `ChangePlan`. The manifest is neither used nor updated and files
+        are not moved into `dir_layout` yet.
+        :param plan: If not None exactly the changes of this plan are made, without comparing the LevelDBs with the
+        directories again. Fails before anything is written if a LevelDB is not as it was when the plan was made.
+        The plan must have been made for the same LevelDBs and directories.
+        :param blob_threshold: If not None strings of at least this many characters, e.g. base64 encoded images, are
+        moved into files of their own in the sub-directory `.fvttpacker-blobs` of each target directory, named after
+        the hashes of their contents. The files of the entries reference them instead, so they stay small to diff and
+        edit, and a string that occurs in many entries is only stored once. Packing inserts them again. The blobs must
+        not be edited.
+        :param resume: If True, how far the unpack got is recorded in a checkpoint in each target directory
+        (`.fvttpacker-checkpoint`) while it runs: the directories that were unpacked completely and the last key
+        written into the directory that is being unpacked. If an unpack with the same LevelDBs, directories and
+        `key_filter` was killed, e.g. by the OOM killer, it continues where that one stopped and ends with the same
+        directories as an uninterrupted unpack. The LevelDBs must not be changed in between. The checkpoints are
+        deleted once the unpack has finished. Ignored with `plan_observer` and `plan`.
+        """
+        self.streaming = streaming
+        self.jobs = jobs
+        self.use_manifest = use_manifest
+        self.validate = validate
+        self.metrics_observer = metrics_observer
+        self.leveldb_options = leveldb_options
+        self.snapshot = snapshot
+        self.key_filter = key_filter
+        self.dir_layout = dir_layout
+        self.io_threads = io_threads
+        self.plan_observer = plan_observer
+        self.plan = plan
+        self.blob_threshold = blob_threshold
+        self.resume = resume
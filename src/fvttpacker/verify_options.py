@@ -0,0 +1,39 @@
+from typing import Union
+
+from fvttpacker.key_filter import KeyFilter
+from fvttpacker.leveldb_options import LevelDBOptions
+from fvttpacker.metrics import MetricsObserver
+
+
+class VerifyOptions:
+
+    def __init__(self,
+                 jobs: int = 1,
+                 io_threads: int = 1,
+                 validate: bool = False,
+                 metrics_observer: Union[MetricsObserver, None] = None,
+                 leveldb_options: LevelDBOptions = LevelDBOptions(),
+                 snapshot: bool = False,
+                 key_filter: KeyFilter = KeyFilter()):
+        """
+        Options that control how LevelDBs and directories are compared.
+
+        :param jobs: Number of processes used for the comparison. Several pairs are compared at the same time, the
+        files of a single pair are read by the processes in chunks.
+        :param io_threads: Number of threads each process reads the files on
+        :param validate: If True every file is parsed. Otherwise, files are only minified by removing their
+        indentation, and only the ones that differ are parsed, like a pack does.
+        :param metrics_observer: If not None the time spent in each stage is recorded and passed to this observer once
+        the comparison has finished.
+        :param leveldb_options: Options the LevelDBs are opened with
+        :param snapshot: If True a copy of each LevelDB is compared, so LevelDBs in use by a running Foundry can be
+        compared, see `UnpackOptions.snapshot`
+        :param key_filter: Only the entries and files whose keys are selected by this filter are compared
+        """
+        self.jobs = jobs
+        self.io_threads = io_threads
+        self.validate = validate
+        self.metrics_observer = metrics_observer
+        self.leveldb_options = leveldb_options
+        self.snapshot = snapshot
+        self.key_filter = key_filter
@@ -0,0 +1,56 @@
+from pathlib import Path
+from typing import List
+
+# number of keys listed per kind of mismatch by `VerifyResult.format`
+default_max_listed_keys = 10
+
+
+class VerifyResult:
+    """
+    The differences between two LevelDBs or directories, as keys.
+    A directory is compared by the values its files would be packed into, i.e. their minified contents.
+    """
+
+    def __init__(self,
+                 path_a: Path,
+                 path_b: Path):
+        self.path_a = path_a
+        self.path_b = path_b
+        self.keys_only_in_a: List[str] = list()
+        self.keys_only_in_b: List[str] = list()
+        self.keys_with_different_values: List[str] = list()
+        self.nb_equal: int = 0
+
+    @property
+    def nb_mismatches(self) -> int:
+        return len(self.keys_only_in_a) + len(self.keys_only_in_b) + len(self.keys_with_different_values)
+
+    @property
+    def is_equal(self) -> bool:
+        return self.nb_mismatches == 0
+
+    def format(self,
+               max_listed_keys: int = default_max_listed_keys) -> str:
+        """
+        :return: A summary of the result, with the first `max_listed_keys` keys of each kind of mismatch
+        """
+
+        if self.is_equal:
+            return f"'{self.path_a}' and '{self.path_b}' are equal ({self.nb_equal} entries)"
+
+        lines = [f"'{self.path_a}' and '{self.path_b}' differ: "
+                 f"{len(self.keys_only_in_a)} only in '{self.path_a}', "
+                 f"{len(self.keys_only_in_b)} only in '{self.path_b}', "
+                 f"{len(self.keys_with_different_values)} different, "
+                 f"{self.nb_equal} equal"]
+
+        for (description, keys) in [(f"only in '{self.path_a}'", self.keys_only_in_a),
+                                    (f"only in '{self.path_b}'", self.keys_only_in_b),
+                                    ("different", self.keys_with_different_values)]:
+            for key in keys[:max_listed_keys]:
+                lines.append(f"  {description}: {key}")
+
+            if len(keys) > max_listed_keys:
+                lines.append(f"  {description}: ... and {len(keys) - max_listed_keys} more")
+
+        return "\n".join(lines)
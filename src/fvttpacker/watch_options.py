@@ -0,0 +1,21 @@
+class WatchOptions:
+
+    def __init__(self,
+                 debounce_seconds: float = 0.1,
+                 poll_interval_seconds: float = 1.0,
+                 use_polling: bool = False,
+                 max_batch_entries: int = 500):
+        """
+        Options that control how directories are watched and synced into LevelDBs.
+
+        :param debounce_seconds: Changes are collected until no file changed for this long, then they are synced.
+        Editors often write a file several times when saving it.
+        :param poll_interval_seconds: How often the directories are checked for changes when inotify is not available
+        or `use_polling` is True. Also, how often a stop is checked for.
+        :param use_polling: If True the directories are polled for changes even if inotify is available
+        :param max_batch_entries: Maximum number of changed entries written into a LevelDB with a single batch
+        """
+        self.debounce_seconds = debounce_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+        self.use_polling = use_polling
+        self.max_batch_entries = max_batch_entries
@@ -0,0 +1,134 @@
+# Checks that large strings are moved into the blob store when unpacking, stored once, and inserted again when packing.
+#
+# Run with `python -m pytest test/test_blob_store.py` after executing `source scripts/init_pythonpath.sh`
+
+import json
+from pathlib import Path
+
+import plyvel
+import pytest
+
+from fvttpacker.__common.blob_store import blob_dir_name, blob_reference_field
+from fvttpacker.__packer.packer import Packer
+from fvttpacker.__unpacker.unpacker import Unpacker
+from fvttpacker.__verifier.verifier import Verifier
+from fvttpacker.dir_layout import DirLayout, layout_flat, layout_hash
+from fvttpacker.fvttpacker_exception import FvttPackerException
+from fvttpacker.unpack_options import UnpackOptions
+
+image = "data:image/webp;base64," + "QUJD\"\\é" * 200
+
+values = {
+    "!scenes!001": {"name": "Scene 1", "thumb": image, "fog": {"data": "x" * 2000}},
+    # same image as the first scene
+    "!scenes!002": {"name": "Scene 2", "thumb": image, "notes": ["short", image]},
+    "!scenes!003": {"name": "Scene 3", "thumb": None}
+}
+
+unpack_options = UnpackOptions(blob_threshold=1000)
+
+
+def write_db(path_to_db: Path, entries: dict) -> None:
+    db = plyvel.DB(str(path_to_db), create_if_missing=True)
+
+    for (key, value) in entries.items():
+        db.put(key.encode(), json.dumps(value, separators=(",", ":")).encode())
+
+    db.close()
+
+
+def read_db(path_to_db: Path) -> dict:
+    db = plyvel.DB(str(path_to_db))
+
+    try:
+        return {key.decode(): value.decode() for (key, value) in db}
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("layout", [layout_flat, layout_hash])
+def test_round_trip(tmp_path: Path, layout: str):
+    write_db(tmp_path / "db", values)
+    path_to_dir = tmp_path / "dir"
+    path_to_dir.mkdir()
+
+    Unpacker.unpack_db_at_x_into_dir_at_y(tmp_path / "db",
+                                          path_to_dir,
+                                          UnpackOptions(blob_threshold=1000, dir_layout=DirLayout(layout)))
+
+    # the image and the fog, each stored once
+    assert len(list(path_to_dir.joinpath(blob_dir_name).iterdir())) == 2
+
+    path_to_file = DirLayout(layout).get_path_to_file(path_to_dir, "!scenes!002")
+    file_value = json.loads(path_to_file.read_text(encoding="utf-8"))
+    assert set(file_value["thumb"].keys()) == {blob_reference_field}
+    assert file_value["notes"][0] == "short"
+    assert file_value["notes"][1] == file_value["thumb"]
+
+    assert Verifier.verify_x_against_y(tmp_path / "db", path_to_dir).is_equal
+
+    Packer.pack_dir_at_x_into_db_at_y(path_to_dir, tmp_path / "packed")
+    assert read_db(tmp_path / "packed") == read_db(tmp_path / "db")
+
+
+def test_unchanged_and_changed(tmp_path: Path):
+    write_db(tmp_path / "db", values)
+    path_to_dir = tmp_path / "dir"
+    path_to_dir.mkdir()
+    Unpacker.unpack_db_at_x_into_dir_at_y(tmp_path / "db", path_to_dir, unpack_options)
+
+    modification_times = {path.name: path.stat().st_mtime_ns for path in path_to_dir.glob("*.json")}
+
+    changed_values = dict(values)
+    changed_values["!scenes!003"] = {"name": "Scene 3", "thumb": "y" * 1500}
+    write_db(tmp_path / "db", changed_values)
+    Unpacker.unpack_db_at_x_into_dir_at_y(tmp_path / "db", path_to_dir, unpack_options)
+
+    # only the changed entry is written, the others are compared with their blobs inserted
+    assert {path.name: path.stat().st_mtime_ns for path in path_to_dir.glob("*.json")
+            if path.name != "!scenes!003.json"} == \
+           {name: mtime for (name, mtime) in modification_times.items() if name != "!scenes!003.json"}
+    assert len(list(path_to_dir.joinpath(blob_dir_name).iterdir())) == 3
+
+    Packer.pack_dir_at_x_into_db_at_y(path_to_dir, tmp_path / "packed")
+    assert read_db(tmp_path / "packed") == read_db(tmp_path / "db")
+
+
+def test_edited_blob(tmp_path: Path):
+    write_db(tmp_path / "db", values)
+    path_to_dir = tmp_path / "dir"
+    path_to_dir.mkdir()
+    Unpacker.unpack_db_at_x_into_dir_at_y(tmp_path / "db", path_to_dir, unpack_options)
+
+    path_to_blob = next(path_to_dir.joinpath(blob_dir_name).iterdir())
+    path_to_blob.write_text("edited")
+
+    with pytest.raises(FvttPackerException):
+        Packer.pack_dir_at_x_into_db_at_y(path_to_dir, tmp_path / "packed")
+
+
+def test_value_with_reference_field(tmp_path: Path):
+    write_db(tmp_path / "db", {"!scenes!001": {blob_reference_field: "x"}})
+    path_to_dir = tmp_path / "dir"
+    path_to_dir.mkdir()
+
+    with pytest.raises(FvttPackerException):
+        Unpacker.unpack_db_at_x_into_dir_at_y(tmp_path / "db", path_to_dir, unpack_options)
+
+
+@pytest.mark.parametrize("layout", [layout_flat, layout_hash])
+def test_new_target_dir(tmp_path: Path, layout: str):
+    write_db(tmp_path / "db", values)
+    # like the directory of a LevelDB that is unpacked for the first time by `unpack_world`
+    path_to_dir = tmp_path / "world" / "scenes"
+    path_to_dir.parent.mkdir()
+
+    Unpacker.unpack_dbs_into_dirs({tmp_path / "db": path_to_dir},
+                                  UnpackOptions(blob_threshold=1000, dir_layout=DirLayout(layout)))
+
+    assert len(list(path_to_dir.joinpath(blob_dir_name).iterdir())) == 2
+    assert DirLayout.load(path_to_dir) == DirLayout(layout)
+    assert DirLayout(layout).get_path_to_file(path_to_dir, "!scenes!002").is_file()
+
+    Packer.pack_dir_at_x_into_db_at_y(path_to_dir, tmp_path / "packed")
+    assert read_db(tmp_path / "packed") == read_db(tmp_path / "db")
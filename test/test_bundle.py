@@ -0,0 +1,91 @@
+# Checks that bundles keep the entries byte for byte, that each LevelDB can be read on its own and that damaged
+# bundles are detected.
+#
+# Run with `python -m pytest test/test_bundle.py` after executing `source scripts/init_pythonpath.sh`
+
+from pathlib import Path
+
+import pytest
+
+from fvttpacker.__bundler.__bundle_reader import BundleReader
+from fvttpacker.__bundler.__bundle_writer import BundleWriter
+from fvttpacker.bundle_options import bundle_compression_zlib
+from fvttpacker.fvttpacker_exception import FvttPackerException
+from fvttpacker.key_filter import KeyFilter
+
+dbs = {
+    "actors": [(f"!actors!{index:04}".encode(), f'{{"name":"Actor {index}","hp":{index}}}'.encode())
+               for index in range(2000)],
+    "journal": [("!journal!Ünïcödé".encode(), '{"text":"\\"quoted\\" ] [ , \\\\n"}'.encode()),
+                (b'!journal!"quotes"', b'  {"spaces" : [ 1 , 2 ] }  ')],
+    "empty": [],
+}
+
+
+def write_bundle(path_to_bundle: Path) -> None:
+    with BundleWriter(path_to_bundle, bundle_compression_zlib, None) as bundle_writer:
+        for (db_name, raw_entries) in dbs.items():
+            bundle_writer.write_db(db_name, raw_entries)
+
+
+def decode(raw_entries):
+    return [(key_bytes.decode(), value_bytes.decode()) for (key_bytes, value_bytes) in raw_entries]
+
+
+def test_entries_are_kept(tmp_path: Path):
+    write_bundle(tmp_path / "test.bundle")
+
+    bundle_reader = BundleReader(tmp_path / "test.bundle")
+
+    assert list(bundle_reader.bundled_dbs.keys()) == list(dbs.keys())
+
+    # in reverse, every LevelDB is read on its own
+    for db_name in reversed(dbs.keys()):
+        assert list(bundle_reader.read_entries(db_name)) == decode(dbs[db_name])
+
+
+def test_key_filter(tmp_path: Path):
+    write_bundle(tmp_path / "test.bundle")
+
+    entries = list(BundleReader(tmp_path / "test.bundle").read_entries("actors", KeyFilter(["!actors!000"])))
+
+    assert entries == decode(dbs["actors"][:10])
+
+
+def test_failed_export_keeps_existing_bundle(tmp_path: Path):
+    write_bundle(tmp_path / "test.bundle")
+    content = (tmp_path / "test.bundle").read_bytes()
+
+    with pytest.raises(FvttPackerException, match="line break"):
+        with BundleWriter(tmp_path / "test.bundle", bundle_compression_zlib, None) as bundle_writer:
+            bundle_writer.write_db("bad", [(b"!bad!a", b'{\n}')])
+
+    assert (tmp_path / "test.bundle").read_bytes() == content
+    assert [path.name for path in tmp_path.iterdir()] == ["test.bundle"]
+
+
+def test_damaged_frame_is_detected(tmp_path: Path):
+    write_bundle(tmp_path / "test.bundle")
+
+    bundle_reader = BundleReader(tmp_path / "test.bundle")
+    bundled_db = bundle_reader.bundled_dbs["actors"]
+
+    content = bytearray((tmp_path / "test.bundle").read_bytes())
+    content[bundled_db.offset + bundled_db.length // 2] ^= 0xff
+    (tmp_path / "test.bundle").write_bytes(content)
+
+    with pytest.raises(FvttPackerException):
+        list(bundle_reader.read_entries("actors"))
+
+    # the other LevelDBs are still readable
+    assert list(bundle_reader.read_entries("journal")) == decode(dbs["journal"])
+
+
+def test_truncated_bundle_is_detected(tmp_path: Path):
+    write_bundle(tmp_path / "test.bundle")
+
+    content = (tmp_path / "test.bundle").read_bytes()
+    (tmp_path / "test.bundle").write_bytes(content[:-100])
+
+    with pytest.raises(FvttPackerException):
+        BundleReader(tmp_path / "test.bundle")
@@ -0,0 +1,142 @@
+# Checks that a pack or unpack that was killed partway continues with `resume` where it stopped and ends with the same
+# LevelDBs and directories as an uninterrupted one.
+#
+# Run with `python -m pytest test/test_checkpoint.py` after executing `source scripts/init_pythonpath.sh`
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import plyvel
+
+from fvttpacker.__common.checkpoint_journal import CheckpointJournal, checkpoint_file_name, \
+    checkpoint_operation_pack, checkpoint_operation_unpack
+from fvttpacker.__packer.packer import Packer
+from fvttpacker.__unpacker.unpacker import Unpacker
+from fvttpacker.key_filter import KeyFilter
+from fvttpacker.pack_options import PackOptions
+from fvttpacker.unpack_options import UnpackOptions
+
+values = {f"!actors!{index:03}": {"name": f"Actor {index}", "hp": index} for index in range(20)}
+
+# runs the given call, but exits without any clean-up once the checkpoints were advanced a number of times
+killed_script = """
+import os
+import sys
+from pathlib import Path
+import fvttpacker.__common.checkpoint_journal as checkpoint_journal
+from fvttpacker.__packer.packer import Packer
+from fvttpacker.__unpacker.unpacker import Unpacker
+from fvttpacker.pack_options import PackOptions
+from fvttpacker.unpack_options import UnpackOptions
+
+checkpoint_journal.checkpoint_interval = 0
+advance = checkpoint_journal.CheckpointJournal.advance
+nb_advances = 0
+
+def advance_and_exit(self, key):
+    global nb_advances
+    advance(self, key)
+    nb_advances += 1
+    if nb_advances == int(sys.argv[1]):
+        os._exit(1)
+
+checkpoint_journal.CheckpointJournal.advance = advance_and_exit
+"""
+
+
+def run_killed(nb_advances: int,
+               call: str) -> None:
+    result = subprocess.run([sys.executable, "-c", killed_script + call, str(nb_advances)],
+                            env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)})
+
+    assert result.returncode == 1
+
+
+def write_db(path_to_db: Path, entries: dict) -> None:
+    db = plyvel.DB(str(path_to_db), create_if_missing=True)
+
+    for (key, value) in entries.items():
+        db.put(key.encode(), json.dumps(value, separators=(",", ":")).encode())
+
+    db.close()
+
+
+def read_db(path_to_db: Path) -> dict:
+    db = plyvel.DB(str(path_to_db))
+
+    try:
+        return {key.decode(): json.loads(value) for (key, value) in db}
+    finally:
+        db.close()
+
+
+def read_dir(path_to_dir: Path) -> dict:
+    return {path.name[0:-5]: json.loads(path.read_text()) for path in path_to_dir.glob("*.json")}
+
+
+def test_resume_pack(tmp_path: Path):
+    for name in ("a", "b"):
+        write_db(tmp_path / name, values)
+        (tmp_path / f"dir_{name}").mkdir()
+        Unpacker.unpack_db_at_x_into_dir_at_y(tmp_path / name, tmp_path / f"dir_{name}")
+        # stale entries that have to be updated or deleted
+        write_db(tmp_path / name, {**{key: {"old": True} for key in values.keys()}, "!actors!0055": {}})
+
+    call = f"""
+Packer.pack_dirs_into_dbs({{Path({str(tmp_path / "dir_a")!r}): Path({str(tmp_path / "a")!r}),
+                            Path({str(tmp_path / "dir_b")!r}): Path({str(tmp_path / "b")!r})}},
+                          PackOptions(max_batch_entries=3, resume=True))
+"""
+    # a is packed with 7 batches, b is killed after its third batch
+    run_killed(10, call)
+
+    checkpoint_a = CheckpointJournal.load(tmp_path / "dir_a", checkpoint_operation_pack, tmp_path / "a", KeyFilter())
+    checkpoint_b = CheckpointJournal.load(tmp_path / "dir_b", checkpoint_operation_pack, tmp_path / "b", KeyFilter())
+    assert checkpoint_a.is_complete
+    assert not checkpoint_b.is_complete and checkpoint_b.last_key == "!actors!007"
+
+    Packer.pack_dirs_into_dbs({tmp_path / "dir_a": tmp_path / "a", tmp_path / "dir_b": tmp_path / "b"},
+                              PackOptions(max_batch_entries=3, resume=True))
+
+    assert read_db(tmp_path / "a") == values
+    assert read_db(tmp_path / "b") == values
+    assert not (tmp_path / "dir_a" / checkpoint_file_name).exists()
+    assert not (tmp_path / "dir_b" / checkpoint_file_name).exists()
+
+
+def test_resume_unpack(tmp_path: Path):
+    write_db(tmp_path / "db", values)
+    path_to_dir = tmp_path / "dir"
+    path_to_dir.mkdir()
+    # a stale file among the keys unpacked before the kill, it is only deleted at the end
+    path_to_dir.joinpath("!actors!0055.json").write_text("{}")
+
+    call = f"""
+Unpacker.unpack_db_at_x_into_dir_at_y(Path({str(tmp_path / "db")!r}),
+                                      Path({str(path_to_dir)!r}),
+                                      UnpackOptions(resume=True))
+"""
+    run_killed(8, call)
+
+    checkpoint = CheckpointJournal.load(path_to_dir, checkpoint_operation_unpack, tmp_path / "db", KeyFilter())
+    assert checkpoint.last_key == "!actors!007"
+    assert path_to_dir.joinpath("!actors!0055.json").exists()
+
+    Unpacker.unpack_db_at_x_into_dir_at_y(tmp_path / "db", path_to_dir, UnpackOptions(resume=True))
+
+    assert read_dir(path_to_dir) == values
+    assert not (path_to_dir / checkpoint_file_name).exists()
+
+
+def test_checkpoint_of_other_key_filter(tmp_path: Path):
+    CheckpointJournal(tmp_path, checkpoint_operation_pack, tmp_path / "db", KeyFilter(["!actors!"]), "!actors!007") \
+        .save()
+
+    assert CheckpointJournal.load(tmp_path, checkpoint_operation_pack, tmp_path / "db", KeyFilter()).last_key is None
+    assert CheckpointJournal.load(tmp_path, checkpoint_operation_unpack, tmp_path / "db",
+                                  KeyFilter(["!actors!"])).last_key is None
+    assert CheckpointJournal.load(tmp_path, checkpoint_operation_pack, tmp_path / "db",
+                                  KeyFilter(["!actors!"])).last_key == "!actors!007"
@@ -0,0 +1,199 @@
+# Checks that the snapshot copy of a LevelDB contains exactly its entries, even while the LevelDB is open in this or
+# another process, and that a MANIFEST that can't be read fails the copy cleanly.
+#
+# Run with `python -m pytest test/test_db_snapshot.py` after executing `source scripts/init_pythonpath.sh`
+
+import json
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import plyvel
+import pytest
+
+from fvttpacker.__common.leveldb_descriptor_reader import LevelDBDescriptorReader, block_size, record_type_first, \
+    record_type_full, record_type_last, tag_comparator, tag_deleted_file, tag_log_number, tag_new_file, \
+    tag_next_file_number
+from fvttpacker.__common.leveldb_helper import LevelDBHelper
+from fvttpacker.__unpacker.unpacker import Unpacker
+from fvttpacker.fvttpacker_exception import FvttPackerException
+from fvttpacker.unpack_options import UnpackOptions
+
+values = {f"!actors!{index:04}": {"name": f"Actor {index}", "biography": "x" * 200} for index in range(1000)}
+
+
+def put_values(db: plyvel.DB, entries: dict) -> None:
+    for (key, value) in entries.items():
+        db.put(key.encode(), json.dumps(value, separators=(",", ":")).encode())
+
+
+def read_db(path_to_db: Path) -> dict:
+    db = plyvel.DB(str(path_to_db))
+
+    try:
+        return {key.decode(): json.loads(value) for (key, value) in db}
+    finally:
+        db.close()
+
+
+def read_dir(path_to_dir: Path) -> dict:
+    return {path.name[0:-5]: json.loads(path.read_text()) for path in path_to_dir.glob("*.json")}
+
+
+def assert_copy_equals(path_to_db: Path, expected_entries: dict) -> None:
+    """
+    Checks the copy itself and an unpack of it, and that no copy is left behind.
+    """
+
+    path_to_copy = LevelDBHelper.copy_db_snapshot(path_to_db)
+
+    try:
+        assert read_db(path_to_copy) == expected_entries
+    finally:
+        shutil.rmtree(path_to_copy)
+
+    path_to_dir = path_to_db.parent / "dir"
+    path_to_dir.mkdir()
+    Unpacker.unpack_db_at_x_into_dir_at_y(path_to_db, path_to_dir, UnpackOptions(snapshot=True))
+
+    assert read_dir(path_to_dir) == expected_entries
+    assert sorted(path.name for path in path_to_db.parent.iterdir()) == ["db", "dir"]
+
+
+def test_db_locked_by_another_handle(tmp_path: Path):
+    db = plyvel.DB(str(tmp_path / "db"), create_if_missing=True)
+
+    try:
+        put_values(db, values)
+
+        # only in the log, not in a table file yet
+        assert not any(path.suffix == ".ldb" for path in (tmp_path / "db").iterdir())
+
+        assert_copy_equals(tmp_path / "db", values)
+    finally:
+        db.close()
+
+
+def test_db_locked_by_another_process(tmp_path: Path):
+    script = "\n".join([
+        "import json, sys, plyvel",
+        f"db = plyvel.DB({str(tmp_path / 'db')!r}, create_if_missing=True)",
+        "for (key, value) in json.loads(sys.stdin.readline()).items():",
+        "    db.put(key.encode(), json.dumps(value, separators=(',', ':')).encode())",
+        "print('ready', flush=True)",
+        "sys.stdin.readline()",
+        "db.close()"
+    ])
+
+    with subprocess.Popen([sys.executable, "-c", script], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                          text=True) as process:
+        try:
+            process.stdin.write(json.dumps(values) + "\n")
+            process.stdin.flush()
+            assert process.stdout.readline().strip() == "ready"
+
+            with pytest.raises(plyvel.IOError):
+                plyvel.DB(str(tmp_path / "db"))
+
+            assert_copy_equals(tmp_path / "db", values)
+        finally:
+            process.communicate("\n", timeout=10)
+
+
+def test_db_after_compactions(tmp_path: Path):
+    db = plyvel.DB(str(tmp_path / "db"), create_if_missing=True, write_buffer_size=64 * 1024)
+    expected_entries = dict(values)
+
+    try:
+        # several table files, some of them replaced by compactions
+        put_values(db, values)
+        db.compact_range()
+
+        for key in list(expected_entries.keys())[::3]:
+            db.delete(key.encode())
+            del expected_entries[key]
+
+        changed_values = {key: {"name": "Changed"} for key in list(expected_entries.keys())[::5]}
+        put_values(db, changed_values)
+        expected_entries.update(changed_values)
+        db.compact_range()
+
+        # and some entries that are only in the log
+        put_values(db, {"!items!0001": {"name": "Item"}})
+        expected_entries["!items!0001"] = {"name": "Item"}
+    finally:
+        db.close()
+
+    assert_copy_equals(tmp_path / "db", expected_entries)
+
+
+def write_manifest(path_to_db: Path, payload: bytes) -> None:
+    path_to_manifest = path_to_db / (path_to_db / "CURRENT").read_text().strip()
+    path_to_manifest.write_bytes(record(record_type_full, payload))
+
+
+def record(record_type: int, payload: bytes) -> bytes:
+    # the checksum is not checked
+    return bytes(4) + len(payload).to_bytes(2, "little") + bytes([record_type]) + payload
+
+
+def length_prefixed(data: bytes) -> bytes:
+    return bytes([len(data)]) + data
+
+
+@pytest.mark.parametrize("payload", [
+    # unknown tag
+    bytes([tag_log_number, 3, 42, 1]),
+    # ends in the middle of a varint
+    bytes([tag_log_number, 0x80]),
+    # ends in the middle of a new file
+    bytes([tag_new_file, 0, 5])
+])
+def test_unreadable_manifest_fails(tmp_path: Path, payload: bytes):
+    db = plyvel.DB(str(tmp_path / "db"), create_if_missing=True)
+    put_values(db, values)
+    db.close()
+    write_manifest(tmp_path / "db", payload)
+
+    with pytest.raises(FvttPackerException, match="MANIFEST"):
+        LevelDBHelper.copy_db_snapshot(tmp_path / "db")
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["db"]
+
+
+def test_read_version():
+    payload = b"".join([
+        bytes([tag_comparator]), length_prefixed(b"leveldb.BytewiseComparator"),
+        bytes([tag_log_number, 9]),
+        bytes([tag_next_file_number, 0x96, 0x01]),
+        bytes([tag_new_file, 0, 5, 100]), length_prefixed(b"!a!1"), length_prefixed(b"!a!5"),
+        bytes([tag_new_file, 1, 7, 100]), length_prefixed(b"!b!1"), length_prefixed(b"!b!5"),
+        bytes([tag_deleted_file, 0, 5])
+    ])
+    split_payload = bytes([tag_new_file, 2, 8, 100]) + length_prefixed(b"!c!1") + length_prefixed(b"!c!5")
+    # fills the first block up to the split record, the filler has an even length and the rest of the block after the
+    # split record is too small for a header
+    nb_padding_bytes = 3 + (block_size - len(payload) - 3 * 7 - 4 - 3) % 2
+    filler_payload = bytes([tag_log_number, 9]) * ((block_size - len(payload) - 3 * 7 - 4 - nb_padding_bytes) // 2)
+
+    first_block = b"".join([
+        record(record_type_full, payload),
+        record(record_type_full, filler_payload),
+        record(record_type_first, split_payload[0:4]),
+        bytes(nb_padding_bytes)
+    ])
+    descriptor_bytes = b"".join([
+        first_block,
+        record(record_type_last, split_payload[4:]),
+        # incomplete record at the end
+        record(record_type_full, bytes([tag_log_number, 12]))[0:8]
+    ])
+
+    assert len(first_block) == block_size
+
+    version = LevelDBDescriptorReader.read_version(descriptor_bytes)
+
+    assert version.log_number == 9
+    assert version.next_file_number == 150
+    assert version.table_file_numbers == {7, 8}
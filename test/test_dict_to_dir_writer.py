@@ -0,0 +1,39 @@
+# Checks that unpacking over files that can't be read either overwrites them or fails with a clear error.
+#
+# Run with `python -m pytest test/test_dict_to_dir_writer.py` after executing `source scripts/init_pythonpath.sh`
+
+from pathlib import Path
+
+import pytest
+
+from fvttpacker.__unpacker.__dict_to_dir_writer import DictToDirWriter
+from fvttpacker.fvttpacker_exception import FvttPackerException
+
+values = {"!actors!001": {"name": "Actor 1"}}
+
+
+def write(path_to_dir: Path, io_threads: int):
+    return DictToDirWriter.write_file_contents_into_dir(((key, DictToDirWriter.to_file_content(value))
+                                                         for (key, value) in values.items()),
+                                                        path_to_dir,
+                                                        skip_checks=False,
+                                                        io_threads=io_threads)
+
+
+@pytest.mark.parametrize("io_threads", [1, 4])
+def test_file_that_is_not_utf_8_is_overwritten(tmp_path: Path, io_threads: int):
+    (tmp_path / "!actors!001.json").write_bytes(b"{\"name\": \"\xff\"}")
+
+    change_counts = write(tmp_path, io_threads)
+
+    assert change_counts.nb_updated == 1
+    assert (tmp_path / "!actors!001.json").read_text() == DictToDirWriter.to_file_content(values["!actors!001"])
+
+
+@pytest.mark.parametrize("io_threads", [1, 4])
+def test_unreadable_file_fails(tmp_path: Path, io_threads: int):
+    # can't be opened as a file
+    (tmp_path / "!actors!001.json").mkdir()
+
+    with pytest.raises(FvttPackerException, match="Unable to read file"):
+        write(tmp_path, io_threads)
@@ -0,0 +1,93 @@
+# Checks that merging the sorted input entries with a LevelDB yields exactly the changes that turn the LevelDB into the
+# input, and never touches entries that the key filter does not select.
+#
+# Run with `python -m pytest test/test_diff_entries.py` after executing `source scripts/init_pythonpath.sh`
+
+from pathlib import Path
+
+import plyvel
+import pytest
+
+from fvttpacker.__common.change_counts import ChangeType
+from fvttpacker.__packer.__dict_to_leveldb_writer import DictToLevelDBWriter
+from fvttpacker.fvttpacker_exception import FvttPackerInternalException
+from fvttpacker.key_filter import KeyFilter
+
+
+@pytest.fixture
+def db(tmp_path: Path):
+    result = plyvel.DB(str(tmp_path / "db"), create_if_missing=True)
+    yield result
+    result.close()
+
+
+def diff(db: plyvel.DB,
+         db_entries: dict,
+         input_entries: dict,
+         key_filter: KeyFilter = KeyFilter()) -> list:
+    for (key, value) in db_entries.items():
+        db.put(key.encode(), value.encode())
+
+    return [(change_type, key_bytes.decode(), None if value_bytes is None else value_bytes.decode())
+            for (change_type, key_bytes, value_bytes)
+            in DictToLevelDBWriter.diff_entries(sorted(input_entries.items()), db, key_filter)]
+
+
+def test_interleaved_changes(db: plyvel.DB):
+    db_entries = {"!a!1": "1", "!a!2": "2", "!a!4": "4", "!a!5": "5", "!a!7": "7"}
+    input_entries = {"!a!0": "0", "!a!2": "2", "!a!3": "3", "!a!5": "five", "!a!6": "6", "!a!8": "8"}
+
+    assert diff(db, db_entries, input_entries) == [
+        (ChangeType.created, "!a!0", "0"),
+        (ChangeType.deleted, "!a!1", None),
+        (ChangeType.unchanged, "!a!2", "2"),
+        (ChangeType.created, "!a!3", "3"),
+        (ChangeType.deleted, "!a!4", None),
+        (ChangeType.updated, "!a!5", "five"),
+        (ChangeType.created, "!a!6", "6"),
+        (ChangeType.deleted, "!a!7", None),
+        (ChangeType.created, "!a!8", "8")
+    ]
+
+
+def test_empty_db(db: plyvel.DB):
+    assert diff(db, {}, {"!a!1": "1", "!a!2": "2"}) == [(ChangeType.created, "!a!1", "1"),
+                                                        (ChangeType.created, "!a!2", "2")]
+
+
+def test_empty_input(db: plyvel.DB):
+    assert diff(db, {"!a!1": "1", "!a!2": "2"}, {}) == [(ChangeType.deleted, "!a!1", None),
+                                                        (ChangeType.deleted, "!a!2", None)]
+
+
+def test_both_empty(db: plyvel.DB):
+    assert diff(db, {}, {}) == []
+
+
+def test_key_filter_boundaries(db: plyvel.DB):
+    db_entries = {
+        # right before and after the range of "!actors!"
+        "!actors": "x",
+        "!actors!": "root",
+        "!actors!1": "1",
+        "!actors!2": "2",
+        "!actors!9\uffff": "last",
+        "!actors\"": "x",
+        "!actors.items!1.1": "x",
+        "!actors!2.secret": "x"
+    }
+    input_entries = {"!actors!1": "one", "!actors!3": "3"}
+    key_filter = KeyFilter(["!actors!"], ["!actors!*.secret"])
+
+    assert diff(db, db_entries, input_entries, key_filter) == [
+        (ChangeType.deleted, "!actors!", None),
+        (ChangeType.updated, "!actors!1", "one"),
+        (ChangeType.deleted, "!actors!2", None),
+        (ChangeType.created, "!actors!3", "3"),
+        (ChangeType.deleted, "!actors!9\uffff", None)
+    ]
+
+
+def test_unsorted_input(db: plyvel.DB):
+    with pytest.raises(FvttPackerInternalException):
+        list(DictToLevelDBWriter.diff_entries([("!a!2", "2"), ("!a!1", "1")], db))
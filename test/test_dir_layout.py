@@ -0,0 +1,80 @@
+# Checks that every layout puts each key into exactly one place and that migrating between layouts keeps all files.
+#
+# Run with `python -m pytest test/test_dir_layout.py` after executing `source scripts/init_pythonpath.sh`
+
+from pathlib import Path
+
+import pytest
+
+from fvttpacker.dir_layout import DirLayout, layout_file_name, layout_flat, layout_hash, layout_prefix
+
+keys = [
+    "!actors!KDsnRSr1Bg7NcW9O",
+    "!actors.items!KDsnRSr1Bg7NcW9O.3uXp3PZkUdXW9Y4M",
+    "!journal!Ünïcödé",
+    "!folders!a",
+    "!folders!",
+    "no-separator",
+]
+
+layouts = [
+    DirLayout(),
+    DirLayout(layout_hash),
+    DirLayout(layout_hash, 2),
+    DirLayout(layout_prefix),
+    DirLayout(layout_prefix, 3),
+]
+
+
+def write_files(path_to_dir: Path,
+                dir_layout: DirLayout) -> None:
+    path_to_dir.mkdir(exist_ok=True)
+    dir_layout.save(path_to_dir)
+
+    for key in keys:
+        path_to_file = dir_layout.get_path_to_file(path_to_dir, key)
+        path_to_file.parent.mkdir(parents=True, exist_ok=True)
+        path_to_file.write_text(key)
+
+
+@pytest.mark.parametrize("dir_layout", layouts)
+def test_list_files_finds_every_key(tmp_path: Path,
+                                    dir_layout: DirLayout):
+    write_files(tmp_path, dir_layout)
+
+    listed = sorted((key, Path(dir_entry.path)) for (key, dir_entry) in DirLayout.load(tmp_path).list_files(tmp_path))
+
+    assert listed == sorted((key, dir_layout.get_path_to_file(tmp_path, key)) for key in keys)
+
+
+@pytest.mark.parametrize("old_layout", layouts)
+@pytest.mark.parametrize("new_layout", layouts)
+def test_migrate_keeps_files(tmp_path: Path,
+                             old_layout: DirLayout,
+                             new_layout: DirLayout):
+    write_files(tmp_path, old_layout)
+
+    DirLayout.migrate(tmp_path, new_layout)
+
+    assert DirLayout.load(tmp_path) == new_layout
+
+    for key in keys:
+        assert new_layout.get_path_to_file(tmp_path, key).read_text() == key
+
+    # only the files, their sub-directories and the layout are left
+    paths_to_files = {path for path in tmp_path.rglob("*") if path.is_file()}
+    expected_paths = {new_layout.get_path_to_file(tmp_path, key) for key in keys}
+
+    if not new_layout.is_flat():
+        expected_paths.add(tmp_path.joinpath(layout_file_name))
+
+    assert paths_to_files == expected_paths
+    assert all(any(path.iterdir()) for path in tmp_path.rglob("*") if path.is_dir())
+
+
+def test_shard_names():
+    assert DirLayout(layout_prefix, 2).get_path_to_file(Path("d"), "!actors!KDsnRSr1Bg7NcW9O") \
+           == Path("d/KD/sn/!actors!KDsnRSr1Bg7NcW9O.json")
+    assert DirLayout(layout_prefix, 2).get_path_to_file(Path("d"), "!folders!a") == Path("d/a_/__/!folders!a.json")
+    assert DirLayout(layout_flat, 3).get_path_to_file(Path("d"), "!folders!a") == Path("d/!folders!a.json")
+    assert len(DirLayout(layout_hash, 4).get_path_to_file(Path("d"), "x").parts) == 6
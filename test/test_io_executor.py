@@ -0,0 +1,41 @@
+# Checks that the IO executor keeps the order of the items and does not lose errors when running on threads.
+#
+# Run with `python -m pytest test/test_io_executor.py` after executing `source scripts/init_pythonpath.sh`
+
+import time
+
+import pytest
+
+from fvttpacker.__common.io_executor import IOExecutor
+from fvttpacker.fvttpacker_exception import FvttPackerException
+
+
+def sleep_and_square(item: int) -> int:
+    # later items finish first
+    time.sleep((20 - item) / 2000)
+    return item * item
+
+
+def fail_on_odd(item: int) -> int:
+    if item % 2 == 1:
+        raise FvttPackerException(f"odd {item}")
+
+    return item
+
+
+@pytest.mark.parametrize("threads", [1, 8])
+def test_results_are_in_order(threads: int):
+    with IOExecutor(threads) as io_executor:
+        assert list(io_executor.map(sleep_and_square, range(20))) == [item * item for item in range(20)]
+
+
+def test_single_error_is_raised_as_it_is():
+    with IOExecutor(8) as io_executor, pytest.raises(FvttPackerException, match="^odd 1$"):
+        list(io_executor.map(fail_on_odd, [0, 1, 2]))
+
+
+def test_errors_in_flight_are_raised_together():
+    with IOExecutor(8) as io_executor, pytest.raises(FvttPackerException) as exc_info:
+        list(io_executor.map(fail_on_odd, range(6)))
+
+    assert str(exc_info.value).splitlines() == ["3 errors occurred:", "odd 1", "odd 3", "odd 5"]
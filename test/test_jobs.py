@@ -0,0 +1,76 @@
+# Checks that packing and unpacking with several processes gives exactly the same result as with a single one.
+#
+# Run with `python -m pytest test/test_jobs.py` after executing `source scripts/init_pythonpath.sh`
+
+import json
+from pathlib import Path
+
+import plyvel
+import pytest
+
+from fvttpacker.__packer.packer import Packer
+from fvttpacker.__unpacker.unpacker import Unpacker
+from fvttpacker.pack_options import PackOptions
+from fvttpacker.unpack_options import UnpackOptions
+
+# more than one chunk of entries, see `ChunkExecutor.split_into_chunks`
+values = {f"!actors!{index:04}": {"name": f"Actor {index}", "items": [index, {"x": "é" * (index % 5)}]}
+          for index in range(2500)}
+
+
+def write_db(path_to_db: Path, entries: dict) -> None:
+    db = plyvel.DB(str(path_to_db), create_if_missing=True)
+
+    for (key, value) in entries.items():
+        db.put(key.encode(), json.dumps(value, separators=(",", ":")).encode())
+
+    db.close()
+
+
+def read_db_bytes(path_to_db: Path) -> dict:
+    db = plyvel.DB(str(path_to_db))
+
+    try:
+        return dict(db)
+    finally:
+        db.close()
+
+
+def read_dir_bytes(path_to_dir: Path) -> dict:
+    return {path.name: path.read_bytes() for path in path_to_dir.iterdir()}
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_unpack_with_jobs(tmp_path: Path, streaming: bool):
+    write_db(tmp_path / "db", values)
+
+    for jobs in (1, 3):
+        path_to_dir = tmp_path / f"dir_{jobs}"
+        path_to_dir.mkdir()
+        # some files exist already
+        (path_to_dir / "!actors!0001.json").write_text("{}")
+        (path_to_dir / "!actors!9999.json").write_text("{}")
+
+        Unpacker.unpack_db_at_x_into_dir_at_y(tmp_path / "db",
+                                              path_to_dir,
+                                              UnpackOptions(streaming=streaming, jobs=jobs))
+
+    assert read_dir_bytes(tmp_path / "dir_3") == read_dir_bytes(tmp_path / "dir_1")
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_pack_with_jobs(tmp_path: Path, streaming: bool):
+    write_db(tmp_path / "source", values)
+    (tmp_path / "dir").mkdir()
+    Unpacker.unpack_db_at_x_into_dir_at_y(tmp_path / "source", tmp_path / "dir")
+    # some entries are changed or deleted
+    old_values = {key: {"name": "Old"} for key in list(values.keys())[::7]}
+    old_values["!actors!9999"] = {"name": "Deleted"}
+
+    for jobs in (1, 3):
+        write_db(tmp_path / f"db_{jobs}", old_values)
+
+        Packer.pack_dirs_into_dbs({tmp_path / "dir": tmp_path / f"db_{jobs}"},
+                                  PackOptions(streaming=streaming, jobs=jobs))
+
+    assert read_db_bytes(tmp_path / "db_3") == read_db_bytes(tmp_path / "db_1") == read_db_bytes(tmp_path / "source")
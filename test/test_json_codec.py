@@ -0,0 +1,115 @@
+# Checks that every available json codec produces exactly the same bytes as the json module of the standard library,
+# which is what Foundry and existing unpacked directories expect.
+#
+# Run with `python -m pytest test/test_json_codec.py` after executing `source scripts/init_pythonpath.sh`
+
+import json
+import random
+import struct
+from json import JSONDecodeError
+from typing import List
+
+import pytest
+
+from fvttpacker.__common.json_codec import JsonCodec
+
+codecs: List[JsonCodec] = [backend() for backend in JsonCodec.get_backends().values()]
+
+documents = [
+    '{}',
+    '[]',
+    '{"a":[],"b":{},"c":[{}],"d":[[]]}',
+    '{"_id":"4e8Xk1e5AbCdEfGh","name":"Goblin","img":"icons/goblin.webp","flags":{}}',
+    '{"name":"Ünïcödé ✓ 😀 日本語","text":"<p>caf\\u00e9 \\u2028</p>"}',
+    '{"control":"\\u0000\\u0001\\u001f\\u007f\\t\\n\\r\\b\\f","slash":"/\\/","quote":"\\"\\\\"}',
+    '{"a":1,"b":2,"a":3}',
+    '{"ints":[0,-0,1,-1,9007199254740993,-9223372036854775808,9223372036854775807,18446744073709551615]}',
+    '{"big":[18446744073709551616,-9223372036854775809,123456789012345678901234567890]}',
+    '{"floats":[0.0,-0.0,1.0,1.5,100.0,1e15,1e16,1.5e16,1e-4,1e-5,1.5e-5,5e-324,1.7976931348623157e308]}',
+    '{"floats":[1E5,1.0E+5,2e-7,0.1,0.30000000000000004,123456789.123456789]}',
+    '{"special":[NaN,Infinity,-Infinity,1e400]}',
+    '{"surrogate":"\\ud800","pair":"\\ud83d\\ude00"}',
+    '  {  "whitespace" : [ 1 , 2 ] , "tabs":\t"x"\n}\n',
+    '"just a string"',
+    '1e-05',
+    '12345',
+    'null',
+    '[' * 300 + ']' * 300,
+]
+
+
+def create_random_floats() -> List[float]:
+    rng = random.Random(0)
+    result = [m * 10.0 ** e for e in range(-320, 308) for m in [1, 1.5, 3, 7.1, 9.999999999999999]]
+
+    while len(result) < 20000:
+        value = struct.unpack("d", struct.pack("Q", rng.getrandbits(64)))[0]
+
+        # NaN and Infinity are covered by the documents
+        if value == value and value not in (float("inf"), float("-inf")):
+            result.append(value)
+
+    return result
+
+
+def create_random_documents() -> List[str]:
+    rng = random.Random(1)
+    characters = [chr(code_point) for code_point in range(0, 0x250)] + ["😀", "\u2028", "\ufeff"]
+    result = []
+
+    for i in range(500):
+        document = {
+            "_id": "".join(rng.choice("0123456789abcdefABCDEF") for _ in range(16)),
+            "name": "".join(rng.choice(characters) for _ in range(rng.randint(0, 20))),
+            "system": {"hp": rng.randint(-10 ** 20, 10 ** 20), "weight": rng.uniform(-1e6, 1e6), "tags": []},
+            "sort": i * 100000
+        }
+        result.append(json.dumps(document, ensure_ascii=rng.random() < 0.5))
+
+    return result
+
+
+all_documents = documents + [json.dumps(value) for value in create_random_floats()] + create_random_documents()
+
+
+@pytest.mark.parametrize("codec", codecs, ids=lambda codec: codec.name)
+def test_minify_is_identical_to_json(codec: JsonCodec):
+    for document in all_documents:
+        expected = json.dumps(json.loads(document), separators=(",", ":"), indent=None)
+
+        assert codec.minify(document) == expected, document
+        assert codec.dumps_minified(codec.loads(document)) == expected, document
+
+
+@pytest.mark.parametrize("codec", codecs, ids=lambda codec: codec.name)
+def test_indent_is_identical_to_json(codec: JsonCodec):
+    for document in all_documents:
+        expected = json.dumps(json.loads(document), indent="  ")
+
+        assert codec.indent(document) == expected, document
+        assert codec.dumps_indented(codec.loads(document)) == expected, document
+
+
+@pytest.mark.parametrize("codec", codecs, ids=lambda codec: codec.name)
+def test_loads_is_identical_to_json(codec: JsonCodec):
+    for document in all_documents:
+        expected = json.loads(document)
+        value = codec.loads(document)
+
+        # repr distinguishes 1 from 1.0 and -0.0 from 0.0, NaN is never equal to itself
+        assert repr(value) == repr(expected), document
+
+
+@pytest.mark.parametrize("codec", codecs, ids=lambda codec: codec.name)
+def test_errors_are_identical_to_json(codec: JsonCodec):
+    invalid_documents = ['', '{', '{"a":}', '{"a":1,}', '[1 2]', '\ufeff{}', "{'a':1}", '{"a":1} x', '"\x01"']
+
+    for document in invalid_documents:
+        with pytest.raises(JSONDecodeError) as expected:
+            json.loads(document)
+
+        for function in [codec.loads, codec.minify, codec.indent]:
+            with pytest.raises(JSONDecodeError) as actual:
+                function(document)
+
+            assert str(actual.value) == str(expected.value), document
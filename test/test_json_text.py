@@ -0,0 +1,132 @@
+# Checks that minifying indented json as text, without parsing it, never yields a value the json does not contain, so
+# an unpack never mistakes an edited file for an up-to-date one.
+#
+# Run with `python -m pytest test/test_json_text.py` after executing `source scripts/init_pythonpath.sh`
+
+import json
+import random
+from pathlib import Path
+
+import plyvel
+import pytest
+
+from fvttpacker.__common.json_text import JsonText
+from fvttpacker.__unpacker.unpacker import Unpacker
+from fvttpacker.unpack_options import UnpackOptions
+
+values = [
+    {},
+    [],
+    {"name": "Goblin", "items": [1, 2.5, None, True, {"a": []}], "flags": {}},
+    {"text": 'say "hi": ok'},
+    {'key ": with separator': 1},
+    {"key\\": "ends with a backslash"},
+    {'key"': "ends with a quote"},
+    {"text": "a: b, c\": d", "other": "\\\": "},
+    {"unicode": "Ünïcödé ✓ 😀", "escaped": "\n\r\t "},
+    [[{"deep": [[[]]]}]],
+]
+
+
+def minify(value) -> str:
+    return json.dumps(value, separators=(",", ":"))
+
+
+def indent(value) -> str:
+    return json.dumps(value, indent="  ")
+
+
+def create_random_values() -> list:
+    rng = random.Random(0)
+    characters = ['"', "\\", ":", " ", ",", "\n", "\t", "{", "}", "[", "a", "é"]
+
+    def random_str() -> str:
+        return "".join(rng.choice(characters) for _ in range(rng.randint(0, 8)))
+
+    return [{random_str(): [random_str(), {random_str(): random_str()}]} for _ in range(2000)]
+
+
+@pytest.mark.parametrize("value", values + create_random_values())
+def test_indented_json_is_minified_like_json(value):
+    result = JsonText.minify_indented(indent(value))
+
+    # None means that it has to be parsed
+    assert result is None or result == minify(value)
+
+
+@pytest.mark.parametrize("value", [values[2], values[8], values[9],
+                                   {"_id": "4e8Xk1e5AbCdEfGh", "system": {"description": {"value": "<p>A: b</p>"}}}])
+def test_ordinary_json_is_minified_without_parsing(value):
+    assert JsonText.minify_indented(indent(value)) == minify(value)
+
+
+@pytest.mark.parametrize("value", [{": ": 1}, {"a": ": x"}, [": x"], ": x", {"a": [1, ": x"]}, {"a\\": 1}])
+def test_string_like_a_key_separator_is_parsed(value):
+    assert JsonText.minify_indented(indent(value)) is None
+
+
+@pytest.mark.parametrize("json_str", [
+    '{\n    "name": "Goblin",\n    "items": [\n        1\n    ]\n}',
+    '{\r\n  "name": "Goblin"\r\n}',
+    '{\n\t"name": "Goblin"\n}',
+    '{\n  "name" : "Goblin"\n}',
+    '{\n  "name":"Goblin"  \n}',
+    '{"name": "Goblin", "items": [1,  2]}',
+    '{\n  "text": "say \\"hi\\": ok"\n}',
+    '{\n  "a": "x",\n  "b": "y"}',
+])
+def test_irregular_json_never_yields_another_value(json_str: str):
+    result = JsonText.minify_indented(json_str)
+
+    if result is None:
+        return
+
+    # either it is the minified value of the json or it is not minified json of any value, i.e. the file is rewritten
+    try:
+        parsed_result = json.loads(result)
+    except json.JSONDecodeError:
+        return
+
+    assert parsed_result == json.loads(json_str)
+
+    if result != minify(parsed_result):
+        assert result != minify(json.loads(json_str))
+
+
+@pytest.mark.parametrize("validate", [False, True])
+def test_unpack_over_edited_files(tmp_path: Path, validate: bool):
+    entries = {f"!actors!{index:03}": value for (index, value) in enumerate(values)}
+    db = plyvel.DB(str(tmp_path / "db"), create_if_missing=True)
+
+    for (key, value) in entries.items():
+        db.put(key.encode(), minify(value).encode())
+
+    db.close()
+
+    path_to_dir = tmp_path / "dir"
+    path_to_dir.mkdir()
+    Unpacker.unpack_db_at_x_into_dir_at_y(tmp_path / "db", path_to_dir)
+
+    for (key, value) in entries.items():
+        assert (path_to_dir / f"{key}.json").read_bytes() == indent(value).encode()
+
+    # only the indentation differs
+    reindented = json.dumps(entries["!actors!002"], indent="    ")
+    (path_to_dir / "!actors!002.json").write_text(reindented)
+    # same value, but irregular whitespace
+    (path_to_dir / "!actors!003.json").write_text(indent(entries["!actors!003"]).replace('": ', '" : '))
+    # edited value
+    (path_to_dir / "!actors!004.json").write_text(indent(entries["!actors!004"]).replace("1", "2"))
+    # edited indentation inside the value, not just in front of it
+    (path_to_dir / "!actors!007.json").write_text(indent(entries["!actors!007"]).replace(",\n  ", ",\t"))
+
+    Unpacker.unpack_db_at_x_into_dir_at_y(tmp_path / "db", path_to_dir, UnpackOptions(validate=validate))
+
+    for (key, value) in entries.items():
+        content = (path_to_dir / f"{key}.json").read_text()
+
+        if key == "!actors!002" and not validate:
+            # left as it is without parsing it
+            assert content == reindented
+        else:
+            assert content == indent(value)
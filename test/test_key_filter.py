@@ -0,0 +1,96 @@
+# Checks that the key ranges of a key filter contain every key it selects, so reading only those ranges of a LevelDB
+# never misses an entry.
+#
+# Run with `python -m pytest test/test_key_filter.py` after executing `source scripts/init_pythonpath.sh`
+
+import pytest
+
+from fvttpacker.key_filter import KeyFilter
+
+keys = [
+    "",
+    "!actors!",
+    "!actors!KDsnRSr1Bg7NcW9O",
+    "!actors!zzzzzzzzzzzzzzzz",
+    "!actors.items!KDsnRSr1Bg7NcW9O.3uXp3PZkUdXW9Y4M",
+    "!actors.items!KDsnRSr1Bg7NcW9O.Yx2Kq1Z0abcdefgh",
+    "!actors.items!abcdefghijklmnop.3uXp3PZkUdXW9Y4M",
+    "!actors.effects!KDsnRSr1Bg7NcW9O.e1",
+    "!actors\"",
+    "!items!3uXp3PZkUdXW9Y4M",
+    "!journal!Ünïcödé",
+    "!journal.pages!Ünïcödé.p1",
+    "actors",
+    "\x7f\x7f",
+    "ÿÿ",
+]
+
+filters = [
+    KeyFilter(),
+    KeyFilter(["!actors!"]),
+    KeyFilter(["!actors"]),
+    KeyFilter(["!actors!", "!actors.items!"]),
+    KeyFilter(["!actors.items!KDsnRSr1Bg7NcW9O.*"]),
+    KeyFilter(["!actors*!KDsnRSr1Bg7NcW9O*"]),
+    KeyFilter(["*KDsnRSr1Bg7NcW9O*"]),
+    KeyFilter(["!actors.[ie]*"]),
+    KeyFilter(["!journal"]),
+    KeyFilter(["ÿ"]),
+    KeyFilter(["\x7f"]),
+    KeyFilter(["!actors"], ["!actors.items!"]),
+    KeyFilter(excludes=["!actors*"]),
+    KeyFilter(["!items!", "!actors!", "!actors!K"]),
+    KeyFilter(after="!actors!KDsnRSr1Bg7NcW9O"),
+    KeyFilter(["!actors!", "!journal"], after="!actors!zzz"),
+    KeyFilter(["!actors"], ["!actors.items!"], after="!actors.effects!KDsnRSr1Bg7NcW9O.e1"),
+    KeyFilter(after="!journal!Ünïcödé"),
+]
+
+
+@pytest.mark.parametrize("key_filter", filters)
+def test_ranges_contain_selected_keys(key_filter: KeyFilter):
+    key_ranges = key_filter.get_key_ranges()
+
+    for key in keys:
+        if not key_filter.matches(key):
+            continue
+
+        key_bytes = key.encode("utf-8")
+
+        assert any((start is None or start <= key_bytes) and (stop is None or key_bytes < stop)
+                   for (start, stop) in key_ranges), key
+
+
+@pytest.mark.parametrize("key_filter", filters)
+def test_ranges_are_sorted_and_disjoint(key_filter: KeyFilter):
+    key_ranges = key_filter.get_key_ranges()
+
+    for ((_, previous_stop), (start, _)) in zip(key_ranges, key_ranges[1:]):
+        assert previous_stop is not None and start is not None and previous_stop < start
+
+
+def test_matches():
+    key_filter = KeyFilter(["!actors!", "!actors.items!KDsnRSr1Bg7NcW9O.*"], ["!actors!zzz"])
+
+    assert key_filter.matches("!actors!KDsnRSr1Bg7NcW9O")
+    assert key_filter.matches("!actors.items!KDsnRSr1Bg7NcW9O.3uXp3PZkUdXW9Y4M")
+    assert not key_filter.matches("!actors.items!abcdefghijklmnop.3uXp3PZkUdXW9Y4M")
+    assert not key_filter.matches("!actors!zzzzzzzzzzzzzzzz")
+    assert not key_filter.matches("!items!3uXp3PZkUdXW9Y4M")
+
+
+def test_prefix_ranges_are_narrow():
+    assert KeyFilter(["!actors!"]).get_key_ranges() == [(b"!actors!", b"!actors\"")]
+    assert KeyFilter(["!actors!", "!actors!K"]).get_key_ranges() == [(b"!actors!", b"!actors\"")]
+    assert KeyFilter(["*x"]).get_key_ranges() == [(None, None)]
+
+
+def test_after():
+    key_filter = KeyFilter(["!actors!", "!items!"], after="!actors!K")
+
+    assert not key_filter.is_everything()
+    assert not key_filter.matches("!actors!K")
+    assert key_filter.matches("!actors!KDsnRSr1Bg7NcW9O")
+    assert key_filter.matches("!items!3uXp3PZkUdXW9Y4M")
+    assert key_filter.get_key_ranges() == [(b"!actors!K\x00", b"!actors\""), (b"!items!", b"!items\"")]
+    assert KeyFilter(["!actors!"], after="!b").get_key_ranges() == []
@@ -0,0 +1,180 @@
+# Checks that the LevelDBs are opened with the options of the chosen profile and of the options that override it, and
+# that --compact compacts exactly the LevelDBs that changed.
+#
+# Run with `python -m pytest test/test_leveldb_options.py` after executing `source scripts/init_pythonpath.sh`
+
+import json
+from pathlib import Path
+
+import plyvel
+import pytest
+from click.testing import CliRunner
+
+from fvttpacker.__cli_wrapper.main import cli
+from fvttpacker.__packer.packer import Packer
+from fvttpacker.__unpacker.unpacker import Unpacker
+from fvttpacker.leveldb_options import LevelDBOptions, compression_none
+from fvttpacker.metrics import Metrics, MetricsObserver, Stage
+from fvttpacker.pack_options import PackOptions, strategy_diff, strategy_rebuild
+
+# long runs of the same character are compressed a lot by snappy
+values = {f"!actors!{index:03}": {"name": f"Actor {index}", "biography": "x" * 1000} for index in range(20)}
+
+mib = 1024 * 1024
+
+
+def write_db(path_to_db: Path, entries: dict) -> None:
+    db = plyvel.DB(str(path_to_db), create_if_missing=True)
+
+    for (key, value) in entries.items():
+        db.put(key.encode(), json.dumps(value, separators=(",", ":")).encode())
+
+    db.close()
+
+
+def read_db(path_to_db: Path) -> dict:
+    db = plyvel.DB(str(path_to_db))
+
+    try:
+        return {key.decode(): json.loads(value) for (key, value) in db}
+    finally:
+        db.close()
+
+
+def read_files(path_to_db: Path, suffix: str) -> bytes:
+    return b"".join(path.read_bytes() for path in sorted(path_to_db.iterdir()) if path.suffix == suffix)
+
+
+def record_plyvel_kwargs(monkeypatch, path_to_db: Path) -> list:
+    """
+    :return: The keyword arguments of every `plyvel.DB` call that opens the given LevelDB (`path_to_db`), as they
+    happen
+    """
+
+    result = list()
+    open_db = plyvel.DB
+
+    def open_and_record(name, **kwargs):
+        if Path(name) == path_to_db:
+            result.append(kwargs)
+        return open_db(name, **kwargs)
+
+    monkeypatch.setattr(plyvel, "DB", open_and_record)
+
+    return result
+
+
+def prepare_dirs(tmp_path: Path) -> None:
+    (tmp_path / "dbs").mkdir()
+    (tmp_path / "dirs").mkdir()
+    write_db(tmp_path / "dbs" / "actors", values)
+    (tmp_path / "dirs" / "actors").mkdir()
+    Unpacker.unpack_db_at_x_into_dir_at_y(tmp_path / "dbs" / "actors", tmp_path / "dirs" / "actors")
+
+
+def test_to_plyvel_kwargs():
+    assert LevelDBOptions().to_plyvel_kwargs() == {"compression": "snappy"}
+    assert LevelDBOptions(write_buffer_size=1,
+                          block_cache_size=2,
+                          bloom_filter_bits=3,
+                          compression=compression_none,
+                          max_open_files=4).to_plyvel_kwargs() == {"compression": None,
+                                                                   "write_buffer_size": 1,
+                                                                   "lru_cache_size": 2,
+                                                                   "bloom_filter_bits": 3,
+                                                                   "max_open_files": 4}
+
+
+@pytest.mark.parametrize(("args", "expected_kwargs"), [
+    ([], {"compression": "snappy"}),
+    (["--leveldb-profile", "write-heavy"], {"compression": "snappy",
+                                            "write_buffer_size": 64 * mib,
+                                            "bloom_filter_bits": 10}),
+    (["--leveldb-profile", "write-heavy", "--write-buffer-size", "4", "--compression", "none",
+      "--max-open-files", "50"], {"compression": None,
+                                  "write_buffer_size": 4 * mib,
+                                  "bloom_filter_bits": 10,
+                                  "max_open_files": 50})
+])
+def test_pack_opens_target_with_options(tmp_path: Path, monkeypatch, args: list, expected_kwargs: dict):
+    prepare_dirs(tmp_path)
+    recorded_kwargs = record_plyvel_kwargs(monkeypatch, tmp_path / "dbs" / "actors")
+
+    result = CliRunner().invoke(cli, ["--no-interaction", "pack-all", str(tmp_path / "dirs"), str(tmp_path / "dbs")]
+                                + args, obj={})
+    assert result.exit_code == 0, result.output
+
+    assert len(recorded_kwargs) > 0
+    for kwargs in recorded_kwargs:
+        assert {key: value for (key, value) in kwargs.items() if key != "create_if_missing"} == expected_kwargs
+
+
+@pytest.mark.parametrize(("args", "expected_kwargs"), [
+    (["--leveldb-profile", "read-heavy"], {"compression": "snappy", "lru_cache_size": 32 * mib}),
+    (["--leveldb-profile", "read-heavy", "--block-cache-size", "8"], {"compression": "snappy",
+                                                                      "lru_cache_size": 8 * mib})
+])
+def test_unpack_opens_input_with_options(tmp_path: Path, monkeypatch, args: list, expected_kwargs: dict):
+    prepare_dirs(tmp_path)
+    recorded_kwargs = record_plyvel_kwargs(monkeypatch, tmp_path / "dbs" / "actors")
+
+    result = CliRunner().invoke(cli, ["--no-interaction", "unpack-all", str(tmp_path / "dbs"), str(tmp_path / "dirs")]
+                                + args, obj={})
+    assert result.exit_code == 0, result.output
+
+    assert len(recorded_kwargs) > 0
+    for kwargs in recorded_kwargs:
+        assert {key: value for (key, value) in kwargs.items() if key != "create_if_missing"} == expected_kwargs
+
+
+@pytest.mark.parametrize("compression", ["snappy", compression_none])
+def test_compression_of_written_tables(tmp_path: Path, compression: str):
+    path_to_dir = tmp_path / "dir"
+    path_to_dir.mkdir()
+    write_db(tmp_path / "source", values)
+    Unpacker.unpack_db_at_x_into_dir_at_y(tmp_path / "source", path_to_dir)
+
+    # a new LevelDB with all entries -> compacting it writes all of them into sorted tables
+    Packer.pack_dirs_into_dbs({path_to_dir: tmp_path / "db"},
+                              PackOptions(leveldb_options=LevelDBOptions(compression=compression), compact=True))
+
+    assert read_db(tmp_path / "db") == values
+    assert (b"x" * 1000 in read_files(tmp_path / "db", ".ldb")) == (compression == compression_none)
+
+
+class RecordingObserver(MetricsObserver):
+
+    def __init__(self):
+        self.metrics = list()
+
+    def on_metrics(self, metrics: Metrics) -> None:
+        self.metrics.append(metrics)
+
+
+@pytest.mark.parametrize("strategy", [strategy_diff, strategy_rebuild])
+@pytest.mark.parametrize("compact", [True, False])
+def test_only_changed_dbs_are_compacted(tmp_path: Path, strategy: str, compact: bool):
+    input_dir_paths_to_target_db_paths = dict()
+
+    for name in ("changed", "unchanged"):
+        write_db(tmp_path / name, values)
+        (tmp_path / f"dir_{name}").mkdir()
+        Unpacker.unpack_db_at_x_into_dir_at_y(tmp_path / name, tmp_path / f"dir_{name}")
+        input_dir_paths_to_target_db_paths[tmp_path / f"dir_{name}"] = tmp_path / name
+
+    (tmp_path / "dir_changed" / "!actors!000.json").write_text('{"name": "Changed"}')
+    observer = RecordingObserver()
+
+    Packer.pack_dirs_into_dbs(input_dir_paths_to_target_db_paths,
+                              PackOptions(strategy=strategy, compact=compact, metrics_observer=observer))
+
+    assert read_db(tmp_path / "changed") == {**values, "!actors!000": {"name": "Changed"}}
+    assert read_db(tmp_path / "unchanged") == values
+    # a rebuilt LevelDB is written from scratch -> all its entries are created
+    nb_changed_dbs = 2 if strategy == strategy_rebuild else 1
+    assert observer.metrics[0].stage_calls.get(Stage.compaction, 0) == (nb_changed_dbs if compact else 0)
+
+    if compact:
+        # the change was moved from the log into a sorted table
+        assert read_files(tmp_path / "changed", ".log") == b""
+        assert b"Changed" in read_files(tmp_path / "changed", ".ldb")
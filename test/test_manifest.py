@@ -0,0 +1,115 @@
+# Checks that a pack with the manifest skips directories that did not change and only writes the changes of the others
+# into their LevelDBs.
+#
+# Run with `python -m pytest test/test_manifest.py` after executing `source scripts/init_pythonpath.sh`
+
+import json
+import os
+from pathlib import Path
+
+import plyvel
+import pytest
+
+from fvttpacker.__common.leveldb_helper import LevelDBHelper
+from fvttpacker.__packer.__dict_to_leveldb_writer import DictToLevelDBWriter
+from fvttpacker.__packer.packer import Packer
+from fvttpacker.__unpacker.unpacker import Unpacker
+from fvttpacker.pack_options import PackOptions
+
+values = {f"!actors!{index:03}": {"name": f"Actor {index}"} for index in range(10)}
+
+pack_options = PackOptions(use_manifest=True)
+
+
+def write_db(path_to_db: Path, entries: dict) -> None:
+    db = plyvel.DB(str(path_to_db), create_if_missing=True)
+
+    for (key, value) in entries.items():
+        db.put(key.encode(), json.dumps(value, separators=(",", ":")).encode())
+
+    db.close()
+
+
+def read_db(path_to_db: Path) -> dict:
+    db = plyvel.DB(str(path_to_db))
+
+    try:
+        return {key.decode(): json.loads(value) for (key, value) in db}
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def path_to_dir(tmp_path: Path) -> Path:
+    """
+    :return: A directory unpacked from the LevelDB at `tmp_path / "db"` and packed into it with the manifest once
+    """
+
+    write_db(tmp_path / "db", values)
+    result = tmp_path / "dir"
+    result.mkdir()
+    Unpacker.unpack_db_at_x_into_dir_at_y(tmp_path / "db", result)
+    Packer.pack_dir_at_x_into_db_at_y(result, tmp_path / "db", pack_options)
+
+    return result
+
+
+def record_changes(monkeypatch) -> list:
+    """
+    :return: The (changed entries, deleted keys) of each call of `DictToLevelDBWriter.write_changes_into_db`
+    """
+
+    result = list()
+    write_changes_into_db = DictToLevelDBWriter.write_changes_into_db
+
+    def record(changed_entries, deleted_keys, *args):
+        changed_entries = list(changed_entries)
+        result.append((dict(changed_entries), list(deleted_keys)))
+        return write_changes_into_db(changed_entries, deleted_keys, *args)
+
+    monkeypatch.setattr(DictToLevelDBWriter, "write_changes_into_db", staticmethod(record))
+
+    return result
+
+
+def test_unchanged_dir_is_skipped(tmp_path: Path, path_to_dir: Path, monkeypatch):
+
+    def fail(*args, **kwargs):
+        raise AssertionError("LevelDB was opened")
+
+    monkeypatch.setattr(LevelDBHelper, "try_open_db", staticmethod(fail))
+
+    Packer.pack_dir_at_x_into_db_at_y(path_to_dir, tmp_path / "db", pack_options)
+
+    monkeypatch.undo()
+    assert read_db(tmp_path / "db") == values
+
+
+def test_edited_file_is_packed(tmp_path: Path, path_to_dir: Path, monkeypatch):
+    changes = record_changes(monkeypatch)
+    path_to_file = path_to_dir / "!actors!003.json"
+    path_to_file.write_text(json.dumps({"name": "Edited"}))
+    # the stats must differ, even on filesystems with coarse timestamps
+    os.utime(path_to_file, ns=(0, path_to_file.stat().st_mtime_ns + 10 ** 9))
+
+    Packer.pack_dir_at_x_into_db_at_y(path_to_dir, tmp_path / "db", pack_options)
+
+    assert len(changes) == 1
+    assert list(changes[0][0].keys()) == ["!actors!003"]
+    assert changes[0][1] == []
+    assert read_db(tmp_path / "db") == {**values, "!actors!003": {"name": "Edited"}}
+
+    # the manifest was updated
+    changes.clear()
+    Packer.pack_dir_at_x_into_db_at_y(path_to_dir, tmp_path / "db", pack_options)
+    assert changes == []
+
+
+def test_deleted_file_is_removed(tmp_path: Path, path_to_dir: Path, monkeypatch):
+    changes = record_changes(monkeypatch)
+    path_to_dir.joinpath("!actors!005.json").unlink()
+
+    Packer.pack_dir_at_x_into_db_at_y(path_to_dir, tmp_path / "db", pack_options)
+
+    assert changes == [({}, ["!actors!005"])]
+    assert read_db(tmp_path / "db") == {key: value for (key, value) in values.items() if key != "!actors!005"}
@@ -0,0 +1,147 @@
+# Checks that the metrics attribute the time to the innermost stage, include the metrics of the worker processes and
+# are written by --metrics-json.
+#
+# Run with `python -m pytest test/test_metrics.py` after executing `source scripts/init_pythonpath.sh`
+
+import json
+import time
+from pathlib import Path
+
+import plyvel
+import pytest
+from click.testing import CliRunner
+
+from fvttpacker.__cli_wrapper.main import cli
+from fvttpacker.__common.change_counts import ChangeCounts, ChangeType
+from fvttpacker.__common.metrics_recorder import MetricsRecorder
+from fvttpacker.metrics import Counter, Metrics, MetricsObserver, Stage
+
+
+class RecordingObserver(MetricsObserver):
+
+    def __init__(self):
+        self.metrics = list()
+
+    def on_metrics(self, metrics: Metrics) -> None:
+        self.metrics.append(metrics)
+
+
+def test_nested_stages_are_not_counted_twice():
+    observer = RecordingObserver()
+
+    with MetricsRecorder.observe(observer):
+        with MetricsRecorder.time(Stage.leveldb_diff):
+            time.sleep(0.02)
+
+            with MetricsRecorder.time(Stage.leveldb_read):
+                time.sleep(0.05)
+
+        for _ in MetricsRecorder.time_iterator([1, 2, 3], Stage.leveldb_read):
+            pass
+
+        MetricsRecorder.count(Counter.bytes_read, 10)
+        MetricsRecorder.count(Counter.bytes_read, 5)
+
+    (metrics,) = observer.metrics
+
+    assert 0.02 <= metrics.stage_seconds[Stage.leveldb_diff] < 0.05
+    assert metrics.stage_seconds[Stage.leveldb_read] >= 0.05
+    # once within the diff and once per item and for the end of the iterator
+    assert metrics.stage_calls == {Stage.leveldb_diff: 1, Stage.leveldb_read: 5}
+    assert metrics.counters == {Counter.bytes_read: 15}
+    assert metrics.total_seconds >= 0.07
+    assert not MetricsRecorder.is_recording()
+
+
+def test_nothing_is_recorded_without_observer():
+    with MetricsRecorder.observe(None):
+        assert not MetricsRecorder.is_recording()
+
+        with MetricsRecorder.time(Stage.file_read):
+            MetricsRecorder.count(Counter.bytes_read, 10)
+
+
+def test_failed_operation_is_not_observed():
+    observer = RecordingObserver()
+
+    with pytest.raises(OSError):
+        with MetricsRecorder.observe(observer):
+            raise OSError("disk full")
+
+    assert observer.metrics == []
+    assert not MetricsRecorder.is_recording()
+
+
+def test_metrics_of_workers_and_targets_are_added():
+    observer = RecordingObserver()
+
+    worker_metrics = Metrics()
+    worker_metrics.add_stage_time(Stage.json_parse, 1.0)
+    worker_metrics.add_to_counter(Counter.bytes_read, 100)
+    change_counts = ChangeCounts()
+    change_counts.count(ChangeType.created)
+    change_counts.count(ChangeType.unchanged)
+
+    with MetricsRecorder.observe(observer):
+        with MetricsRecorder.time(Stage.json_parse):
+            pass
+
+        MetricsRecorder.add(worker_metrics)
+        MetricsRecorder.count_target(Path("db"), change_counts)
+
+    metrics_dict = observer.metrics[0].to_dict()
+
+    assert metrics_dict["stages"][Stage.json_parse]["calls"] == 2
+    assert metrics_dict["stages"][Stage.json_parse]["seconds"] >= 1.0
+    assert metrics_dict["counters"] == {Counter.bytes_read: 100}
+    assert metrics_dict["targets"] == {"db": {ChangeType.created: 1,
+                                              ChangeType.updated: 0,
+                                              ChangeType.deleted: 0,
+                                              ChangeType.unchanged: 1}}
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_metrics_json(tmp_path: Path, jobs: str):
+    (tmp_path / "dbs").mkdir()
+    (tmp_path / "dirs").mkdir()
+    db = plyvel.DB(str(tmp_path / "dbs" / "actors"), create_if_missing=True)
+
+    for index in range(20):
+        db.put(f"!actors!{index:03}".encode(), json.dumps({"name": f"Actor {index}"}, separators=(",", ":")).encode())
+
+    db.close()
+    (tmp_path / "dirs" / "actors").mkdir()
+
+    runner = CliRunner()
+
+    result = runner.invoke(cli, ["--no-interaction", "unpack-all", str(tmp_path / "dbs"), str(tmp_path / "dirs"),
+                                 "--jobs", jobs, "--metrics-json", str(tmp_path / "unpack.json")], obj={})
+    assert result.exit_code == 0, result.output
+
+    unpack_metrics = json.loads((tmp_path / "unpack.json").read_text())
+
+    assert unpack_metrics["total_seconds"] > 0
+    assert unpack_metrics["stages"][Stage.file_write]["calls"] == 20
+    assert unpack_metrics["counters"][Counter.bytes_written] == sum(path.stat().st_size for path
+                                                                    in (tmp_path / "dirs" / "actors").iterdir())
+    assert unpack_metrics["targets"] == {str(tmp_path / "dirs" / "actors"): {ChangeType.created: 20,
+                                                                             ChangeType.updated: 0,
+                                                                             ChangeType.deleted: 0,
+                                                                             ChangeType.unchanged: 0}}
+
+    (tmp_path / "dirs" / "actors" / "!actors!000.json").unlink()
+
+    result = runner.invoke(cli, ["--no-interaction", "pack-all", str(tmp_path / "dirs"), str(tmp_path / "dbs"),
+                                 "--jobs", jobs, "--metrics-json", str(tmp_path / "pack.json")], obj={})
+    assert result.exit_code == 0, result.output
+
+    pack_metrics = json.loads((tmp_path / "pack.json").read_text())
+
+    # only the deleted entry changed -> no file is read again to validate it
+    assert pack_metrics["stages"][Stage.file_read]["calls"] == 19
+    assert pack_metrics["counters"][Counter.bytes_read] == sum(path.stat().st_size for path
+                                                               in (tmp_path / "dirs" / "actors").iterdir())
+    assert pack_metrics["targets"] == {str(tmp_path / "dbs" / "actors"): {ChangeType.created: 0,
+                                                                          ChangeType.updated: 0,
+                                                                          ChangeType.deleted: 1,
+                                                                          ChangeType.unchanged: 19}}
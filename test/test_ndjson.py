@@ -0,0 +1,112 @@
+# Checks that LevelDBs can be unpacked into newline delimited json and packed from it, and that invalid input leaves
+# the LevelDB as it was.
+#
+# Run with `python -m pytest test/test_ndjson.py` after executing `source scripts/init_pythonpath.sh`
+
+import io
+import json
+import logging
+from pathlib import Path
+
+import plyvel
+import pytest
+
+from fvttpacker.__packer.packer import Packer
+from fvttpacker.__unpacker.unpacker import Unpacker
+from fvttpacker.fvttpacker_exception import FvttPackerException
+from fvttpacker.key_filter import KeyFilter
+from fvttpacker.pack_options import PackOptions, strategy_auto, strategy_rebuild
+from fvttpacker.unpack_options import UnpackOptions
+
+values = {f"!actors!{index:04}": {"name": f"Actor é {index}", "hp": index / 3, "tags": ["a", {"b": None}]}
+          for index in range(2500)}
+
+
+def write_db(path_to_db: Path, entries: dict) -> None:
+    db = plyvel.DB(str(path_to_db), create_if_missing=True)
+
+    for (key, value) in entries.items():
+        db.put(key.encode(), json.dumps(value, separators=(",", ":")).encode())
+
+    db.close()
+
+
+def read_db(path_to_db: Path) -> dict:
+    db = plyvel.DB(str(path_to_db))
+    result = {key.decode(): json.loads(value) for (key, value) in db.iterator()}
+    db.close()
+
+    return result
+
+
+def unpack(path_to_db: Path, unpack_options: UnpackOptions = UnpackOptions()) -> bytes:
+    output_stream = io.BytesIO()
+    Unpacker.unpack_db_at_x_into_ndjson_stream(path_to_db, output_stream, unpack_options)
+
+    return output_stream.getvalue()
+
+
+def pack(ndjson: bytes, path_to_db: Path, pack_options: PackOptions = PackOptions()) -> None:
+    Packer.pack_ndjson_stream_into_db_at_y(io.BytesIO(ndjson), path_to_db, pack_options)
+
+
+def test_round_trip(tmp_path: Path):
+    write_db(tmp_path / "db", values)
+
+    ndjson = unpack(tmp_path / "db")
+    lines = ndjson.splitlines()
+
+    assert len(lines) == len(values)
+    assert json.loads(lines[1]) == {"key": "!actors!0001", "value": values["!actors!0001"]}
+    assert unpack(tmp_path / "db", UnpackOptions(validate=True, jobs=2)) == ndjson
+
+    pack(ndjson, tmp_path / "new_db")
+    pack(ndjson, tmp_path / "rebuilt_db", PackOptions(strategy=strategy_rebuild))
+
+    assert read_db(tmp_path / "new_db") == values
+    assert read_db(tmp_path / "rebuilt_db") == values
+
+
+def test_changes_and_key_filter(tmp_path: Path):
+    write_db(tmp_path / "db", values)
+    lines = unpack(tmp_path / "db").splitlines()
+
+    changed_line = json.dumps({"key": "!actors!0001", "value": {"name": "Changed"}}, indent=2).replace("\n", "")
+    # !actors!0000 is deleted, !actors!0001 is changed and !actors!1xxx and !actors!2xxx are not selected
+    ndjson = b"\n".join([changed_line.encode()] + lines[2:1000] + [b""])
+    pack(ndjson, tmp_path / "db", PackOptions(key_filter=KeyFilter(excludes=["!actors!1", "!actors!2"])))
+
+    expected_values = dict(values)
+    del expected_values["!actors!0000"]
+    expected_values["!actors!0001"] = {"name": "Changed"}
+
+    assert read_db(tmp_path / "db") == expected_values
+
+
+def test_auto_strategy_uses_the_diff(tmp_path: Path, caplog):
+    caplog.set_level(logging.INFO)
+    write_db(tmp_path / "db", values)
+    changed_lines = [json.dumps({"key": key, "value": {}}).encode() for key in sorted(values.keys())]
+
+    # all entries changed, but a stream can't be sampled
+    pack(b"\n".join(changed_lines), tmp_path / "db", PackOptions(strategy=strategy_auto))
+
+    assert "can't be sampled" in caplog.text
+    assert "Rebuilding" not in caplog.text
+    assert read_db(tmp_path / "db") == {key: {} for key in values.keys()}
+
+
+@pytest.mark.parametrize("invalid_lines", [[b'{"key": "!actors!9999", "value": '],
+                                           [b'{"key": "!actors!9999"}'],
+                                           [b'{"key": "!actors!0000", "value": {}}']])
+def test_invalid_input_is_rolled_back(tmp_path: Path, invalid_lines: list):
+    write_db(tmp_path / "db", values)
+    lines = unpack(tmp_path / "db").splitlines()
+    changed_lines = [json.dumps({"key": key, "value": {}}).encode() for key in sorted(values.keys())]
+
+    # written in several batches before the invalid line is read
+    with pytest.raises(FvttPackerException):
+        pack(b"\n".join(changed_lines + invalid_lines), tmp_path / "db", PackOptions(max_batch_entries=100))
+
+    assert read_db(tmp_path / "db") == values
+    assert unpack(tmp_path / "db").splitlines() == lines
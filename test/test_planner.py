@@ -0,0 +1,117 @@
+# Checks that plans list exactly the changes a pack or unpack would make, and that they are only applied as long as
+# nothing changed since they were made.
+#
+# Run with `python -m pytest test/test_planner.py` after executing `source scripts/init_pythonpath.sh`
+
+import json
+from pathlib import Path
+
+import plyvel
+import pytest
+
+from fvttpacker.__packer.packer import Packer
+from fvttpacker.__unpacker.unpacker import Unpacker
+from fvttpacker.__verifier.verifier import Verifier
+from fvttpacker.change_plan import ChangePlan, PlanObserver
+from fvttpacker.fvttpacker_exception import FvttPackerException
+from fvttpacker.pack_options import PackOptions
+from fvttpacker.unpack_options import UnpackOptions
+
+values = {f"!actors!{index:03}": {"name": f"Actor {index}", "hp": index} for index in range(20)}
+
+
+class ListPlanObserver(PlanObserver):
+
+    def __init__(self):
+        self.plans = list()
+
+    def on_plan(self, plan: ChangePlan) -> None:
+        self.plans.append(plan)
+
+
+def write_db(path_to_db: Path, entries: dict) -> None:
+    db = plyvel.DB(str(path_to_db), create_if_missing=True)
+
+    for (key, value) in entries.items():
+        db.put(key.encode(), json.dumps(value, separators=(",", ":")).encode())
+
+    db.close()
+
+
+def unpacked(tmp_path: Path) -> None:
+    write_db(tmp_path / "db", values)
+    (tmp_path / "dir").mkdir()
+    Unpacker.unpack_db_at_x_into_dir_at_y(tmp_path / "db", tmp_path / "dir")
+
+
+def plan_pack(tmp_path: Path) -> ChangePlan:
+    observer = ListPlanObserver()
+    Packer.pack_dir_at_x_into_db_at_y(tmp_path / "dir", tmp_path / "db", PackOptions(plan_observer=observer))
+
+    # what is applied is what was written
+    return ChangePlan.from_dict(json.loads(json.dumps(observer.plans[0].to_dict())))
+
+
+def test_pack_plan(tmp_path: Path):
+    unpacked(tmp_path)
+    path_to_dir = tmp_path / "dir"
+    path_to_dir.joinpath("!actors!001.json").write_text(json.dumps({"name": "Changed", "hp": 1}))
+    # only formatted differently
+    path_to_dir.joinpath("!actors!002.json").write_text(json.dumps(values["!actors!002"], indent=4))
+    path_to_dir.joinpath("!actors!003.json").unlink()
+    path_to_dir.joinpath("!actors!new.json").write_text("{}")
+
+    plan = plan_pack(tmp_path)
+    target_plan = plan.targets[0]
+
+    assert [(change.key, change.change_type) for change in target_plan.changes] == [("!actors!001", "updated"),
+                                                                                    ("!actors!003", "deleted"),
+                                                                                    ("!actors!new", "created")]
+    assert target_plan.nb_unchanged == len(values) - 2
+    # nothing was written
+    assert len(Verifier.verify_x_against_y(tmp_path / "db", path_to_dir).keys_with_different_values) == 1
+
+    Packer.pack_dir_at_x_into_db_at_y(path_to_dir, tmp_path / "db", PackOptions(plan=plan))
+
+    assert Verifier.verify_x_against_y(tmp_path / "db", path_to_dir).is_equal
+
+    # the LevelDB changed since the plan was made
+    with pytest.raises(FvttPackerException):
+        Packer.pack_dir_at_x_into_db_at_y(path_to_dir, tmp_path / "db", PackOptions(plan=plan))
+
+
+def test_pack_plan_of_changed_file_is_not_applied(tmp_path: Path):
+    unpacked(tmp_path)
+    path_to_file = tmp_path / "dir" / "!actors!001.json"
+    path_to_file.write_text(json.dumps({"name": "Changed", "hp": 1}))
+
+    plan = plan_pack(tmp_path)
+    path_to_file.write_text(json.dumps({"name": "Changed again", "hp": 1}))
+
+    with pytest.raises(FvttPackerException):
+        Packer.pack_dir_at_x_into_db_at_y(tmp_path / "dir", tmp_path / "db", PackOptions(plan=plan))
+
+    assert Verifier.verify_x_against_y(tmp_path / "db", tmp_path / "dir").keys_with_different_values == [
+        "!actors!001"]
+
+
+def test_unpack_plan(tmp_path: Path):
+    unpacked(tmp_path)
+    changed_values = dict(values)
+    changed_values["!actors!001"] = {"name": "Changed"}
+    del changed_values["!actors!003"]
+    write_db(tmp_path / "changed_db", changed_values)
+
+    observer = ListPlanObserver()
+    Unpacker.unpack_db_at_x_into_dir_at_y(tmp_path / "changed_db", tmp_path / "dir",
+                                          UnpackOptions(plan_observer=observer))
+    target_plan = observer.plans[0].targets[0]
+
+    assert [(change.key, change.change_type) for change in target_plan.changes] == [("!actors!001", "updated"),
+                                                                                    ("!actors!003", "deleted")]
+    assert not Verifier.verify_x_against_y(tmp_path / "changed_db", tmp_path / "dir").is_equal
+
+    Unpacker.unpack_db_at_x_into_dir_at_y(tmp_path / "changed_db", tmp_path / "dir",
+                                          UnpackOptions(plan=observer.plans[0]))
+
+    assert Verifier.verify_x_against_y(tmp_path / "changed_db", tmp_path / "dir").is_equal
@@ -0,0 +1,230 @@
+# Checks that a pack that fails partway leaves all its LevelDBs as they were before, including those that were already
+# written with several batches or rebuilt.
+#
+# Run with `python -m pytest test/test_rollback.py` after executing `source scripts/init_pythonpath.sh`
+
+import io
+import json
+from pathlib import Path
+
+import plyvel
+import pytest
+
+import fvttpacker.__packer.__leveldb_write_journal as leveldb_write_journal
+from fvttpacker.__common.leveldb_helper import LevelDBHelper
+from fvttpacker.__common.metrics_recorder import MetricsRecorder
+from fvttpacker.__packer.__batch_writer import BatchWriter
+from fvttpacker.__packer.__dict_to_leveldb_writer import DictToLevelDBWriter
+from fvttpacker.__packer.packer import Packer
+from fvttpacker.__unpacker.unpacker import Unpacker
+from fvttpacker.fvttpacker_exception import FvttPackerException
+from fvttpacker.pack_options import PackOptions, strategy_rebuild
+
+old_values = {f"!actors!{index:03}": {"name": f"Actor {index}"} for index in range(10)}
+new_values = {f"!actors!{index:03}": {"name": f"New Actor {index}"} for index in range(5, 15)}
+
+
+def write_db(path_to_db: Path, entries: dict) -> None:
+    db = plyvel.DB(str(path_to_db), create_if_missing=True)
+
+    for (key, value) in entries.items():
+        db.put(key.encode(), json.dumps(value, separators=(",", ":")).encode())
+
+    db.close()
+
+
+def read_db(path_to_db: Path) -> dict:
+    db = plyvel.DB(str(path_to_db))
+
+    try:
+        return {key.decode(): json.loads(value) for (key, value) in db}
+    finally:
+        db.close()
+
+
+def prepare(tmp_path: Path) -> dict:
+    """
+    :return: Two directories with `new_values`, mapped to LevelDBs with `old_values`
+    """
+
+    result = dict()
+
+    for name in ("a", "b"):
+        write_db(tmp_path / "source", new_values)
+        (tmp_path / f"dir_{name}").mkdir()
+        Unpacker.unpack_db_at_x_into_dir_at_y(tmp_path / "source", tmp_path / f"dir_{name}")
+
+        write_db(tmp_path / name, old_values)
+        result[tmp_path / f"dir_{name}"] = tmp_path / name
+
+    return result
+
+
+@pytest.mark.parametrize("can_exchange", [True, False])
+def test_rebuilt_db_is_restored(tmp_path: Path, monkeypatch, can_exchange: bool):
+    input_dir_paths_to_target_db_paths = prepare(tmp_path)
+
+    if not can_exchange:
+        # like on other platforms than Linux
+        monkeypatch.setattr(LevelDBHelper, "_LevelDBHelper__try_exchange", staticmethod(lambda *args: False))
+
+    write_entries_into_new_db = DictToLevelDBWriter.write_entries_into_new_db
+    nb_calls = 0
+
+    def fail_on_second_db(*args, **kwargs):
+        nonlocal nb_calls
+        nb_calls += 1
+        if nb_calls == 2:
+            raise OSError("disk full")
+        return write_entries_into_new_db(*args, **kwargs)
+
+    monkeypatch.setattr(DictToLevelDBWriter, "write_entries_into_new_db", staticmethod(fail_on_second_db))
+
+    with pytest.raises(OSError):
+        Packer.pack_dirs_into_dbs(input_dir_paths_to_target_db_paths, PackOptions(strategy=strategy_rebuild))
+
+    assert nb_calls == 2
+    assert read_db(tmp_path / "a") == old_values
+    assert read_db(tmp_path / "b") == old_values
+    # no staging or old copies are left behind
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["a", "b", "dir_a", "dir_b", "source"]
+
+
+def test_old_dbs_are_deleted(tmp_path: Path):
+    input_dir_paths_to_target_db_paths = prepare(tmp_path)
+
+    Packer.pack_dirs_into_dbs(input_dir_paths_to_target_db_paths, PackOptions(strategy=strategy_rebuild))
+
+    assert read_db(tmp_path / "a") == new_values
+    assert read_db(tmp_path / "b") == new_values
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["a", "b", "dir_a", "dir_b", "source"]
+
+
+def fail_on_second_flush(monkeypatch) -> None:
+    flush = BatchWriter.flush
+    nb_calls = 0
+
+    def flush_or_fail(self):
+        nonlocal nb_calls
+        nb_calls += 1
+        if nb_calls == 2:
+            raise OSError("disk full")
+        flush(self)
+
+    monkeypatch.setattr(BatchWriter, "flush", flush_or_fail)
+
+
+@pytest.mark.parametrize("nb_recorded_keys", [100, 2])
+def test_failure_after_first_batch(tmp_path: Path, monkeypatch, nb_recorded_keys: int):
+    input_dir_paths_to_target_db_paths = prepare(tmp_path)
+    # too few to record all keys -> all entries are compared with the snapshot
+    monkeypatch.setattr(leveldb_write_journal, "max_recorded_keys", nb_recorded_keys)
+    fail_on_second_flush(monkeypatch)
+
+    with pytest.raises(OSError):
+        Packer.pack_dirs_into_dbs(input_dir_paths_to_target_db_paths, PackOptions(max_batch_entries=1))
+
+    assert read_db(tmp_path / "a") == old_values
+    assert read_db(tmp_path / "b") == old_values
+
+
+def test_failure_of_later_db(tmp_path: Path, monkeypatch):
+    input_dir_paths_to_target_db_paths = prepare(tmp_path)
+    # a is written with a single batch, b fails before its single batch
+    fail_on_second_flush(monkeypatch)
+
+    with pytest.raises(OSError):
+        Packer.pack_dirs_into_dbs(input_dir_paths_to_target_db_paths, PackOptions())
+
+    assert read_db(tmp_path / "a") == old_values
+    assert read_db(tmp_path / "b") == old_values
+
+
+@pytest.mark.parametrize("nb_recorded_keys", [100, 2])
+def test_failure_of_stream_after_first_batch(tmp_path: Path, monkeypatch, nb_recorded_keys: int):
+    write_db(tmp_path / "db", old_values)
+    monkeypatch.setattr(leveldb_write_journal, "max_recorded_keys", nb_recorded_keys)
+    lines = [json.dumps({"key": key, "value": value}).encode() for (key, value) in sorted(new_values.items())]
+
+    # the first lines are written before the unsorted line is read
+    with pytest.raises(FvttPackerException):
+        Packer.pack_ndjson_stream_into_db_at_y(io.BytesIO(b"\n".join(lines + lines[0:1])),
+                                               tmp_path / "db",
+                                               PackOptions(max_batch_entries=1))
+
+    assert read_db(tmp_path / "db") == old_values
+
+
+def test_failure_after_last_db_was_written(tmp_path: Path, monkeypatch):
+    input_dir_paths_to_target_db_paths = prepare(tmp_path)
+    # both LevelDBs are written with a single batch, then counting the changes of b fails
+    nb_calls = 0
+
+    def count_or_fail(*args):
+        nonlocal nb_calls
+        nb_calls += 1
+        if nb_calls == 2:
+            raise OSError("observer failed")
+
+    monkeypatch.setattr(MetricsRecorder, "count_target", staticmethod(count_or_fail))
+
+    with pytest.raises(OSError):
+        Packer.pack_dirs_into_dbs(input_dir_paths_to_target_db_paths, PackOptions())
+
+    assert nb_calls == 2
+    assert read_db(tmp_path / "a") == old_values
+    assert read_db(tmp_path / "b") == old_values
+
+
+# all entries are compared with the snapshot -> the deletes and puts are written separately
+@pytest.mark.parametrize(("nb_recorded_keys", "expected_batch_sizes"), [(100, [3, 3, 3, 1]), (2, [3, 2, 3, 2])])
+def test_rollback_is_written_in_bounded_batches(tmp_path: Path,
+                                                monkeypatch,
+                                                nb_recorded_keys: int,
+                                                expected_batch_sizes: list):
+    write_db(tmp_path / "db", old_values)
+    monkeypatch.setattr(leveldb_write_journal, "max_recorded_keys", nb_recorded_keys)
+    monkeypatch.setattr(leveldb_write_journal, "rollback_batch_entries", 3)
+
+    db = plyvel.DB(str(tmp_path / "db"))
+    journal = leveldb_write_journal.LevelDBWriteJournal(db)
+    nb_written_entries = list()
+    write_batch = db.write_batch
+
+    class CountingWriteBatch:
+
+        def __init__(self, **kwargs):
+            self.__wb = write_batch(**kwargs)
+            self.__nb_entries = 0
+
+        def put(self, key_bytes, value_bytes):
+            self.__nb_entries += 1
+            self.__wb.put(key_bytes, value_bytes)
+
+        def delete(self, key_bytes):
+            self.__nb_entries += 1
+            self.__wb.delete(key_bytes)
+
+        def write(self):
+            nb_written_entries.append(self.__nb_entries)
+            self.__wb.write()
+
+    try:
+        for (key, value) in new_values.items():
+            journal.record(key.encode())
+            db.put(key.encode(), json.dumps(value).encode())
+
+        # plyvel.DB doesn't allow setting attributes -> wrap it
+        journal._LevelDBWriteJournal__db = type("DB", (), {
+            "write_batch": staticmethod(CountingWriteBatch),
+            "iterator": staticmethod(db.iterator),
+            "get": staticmethod(db.get)
+        })()
+        journal.rollback()
+    finally:
+        journal.release()
+        db.close()
+
+    # 5 new keys are deleted and 5 old values are put back
+    assert nb_written_entries == expected_batch_sizes
+    assert read_db(tmp_path / "db") == old_values
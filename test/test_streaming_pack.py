@@ -0,0 +1,129 @@
+# Checks that a streaming pack validates all files before anything is written, reads the files in chunks that fit
+# into the memory limit and writes batches that do not exceed it.
+#
+# Run with `python -m pytest test/test_streaming_pack.py` after executing `source scripts/init_pythonpath.sh`
+
+import json
+from pathlib import Path
+
+import plyvel
+import pytest
+
+from fvttpacker.__common.chunk_executor import ChunkExecutor
+from fvttpacker.__packer.__batch_writer import BatchWriter
+from fvttpacker.__packer.__dir_to_leveldb_reader import DirToDictReader
+from fvttpacker.__packer.packer import Packer
+from fvttpacker.fvttpacker_exception import FvttPackerException
+from fvttpacker.pack_options import PackOptions
+
+old_values = {f"!actors!{index:04}": {"name": f"Actor {index}"} for index in range(10)}
+new_values = {f"!actors!{index:04}": {"name": f"New Actor {index}", "biography": "x" * (index % 7) * 100}
+              for index in range(1500)}
+
+memory_limit = 64 * 1024
+
+
+def write_db(path_to_db: Path, entries: dict) -> None:
+    db = plyvel.DB(str(path_to_db), create_if_missing=True)
+
+    for (key, value) in entries.items():
+        db.put(key.encode(), json.dumps(value, separators=(",", ":")).encode())
+
+    db.close()
+
+
+def read_db(path_to_db: Path) -> dict:
+    db = plyvel.DB(str(path_to_db))
+
+    try:
+        return {key.decode(): json.loads(value) for (key, value) in db}
+    finally:
+        db.close()
+
+
+def write_dir(path_to_dir: Path, entries: dict) -> None:
+    path_to_dir.mkdir()
+
+    for (key, value) in entries.items():
+        (path_to_dir / f"{key}.json").write_text(json.dumps(value, indent=2))
+
+
+def record_flushes(monkeypatch) -> list:
+    """
+    :return: The sizes of the batches, once they are written
+    """
+
+    result = list()
+    flush = BatchWriter.flush
+
+    def record_and_flush(self):
+        if self._BatchWriter__nb_batch_entries > 0:
+            result.append(self._BatchWriter__batch_size)
+        flush(self)
+
+    monkeypatch.setattr(BatchWriter, "flush", record_and_flush)
+
+    return result
+
+
+def test_invalid_file_fails_before_anything_is_written(tmp_path: Path, monkeypatch):
+    write_db(tmp_path / "db", old_values)
+    write_dir(tmp_path / "dir", new_values)
+    # in the last chunk of files
+    (tmp_path / "dir" / "!actors!1499.json").write_text('{"name": ')
+    batch_sizes = record_flushes(monkeypatch)
+
+    with pytest.raises(FvttPackerException, match="!actors!1499"):
+        Packer.pack_dirs_into_dbs({tmp_path / "dir": tmp_path / "db"},
+                                  PackOptions(streaming=True, memory_limit=memory_limit))
+
+    assert batch_sizes == []
+    assert read_db(tmp_path / "db") == old_values
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_chunks_and_batches_fit_into_the_memory_limit(tmp_path: Path, monkeypatch, jobs: int):
+    write_db(tmp_path / "db", old_values)
+    write_dir(tmp_path / "dir", new_values)
+    batch_sizes = record_flushes(monkeypatch)
+
+    read_files_as_entries = DirToDictReader.read_files_as_entries
+    chunk_sizes = list()
+
+    def record_and_read(paths_to_files, *args, **kwargs):
+        chunk_sizes.append(sum(path_to_file.stat().st_size for path_to_file in paths_to_files))
+        return read_files_as_entries(paths_to_files, *args, **kwargs)
+
+    if jobs == 1:
+        # the worker processes don't see the patch
+        monkeypatch.setattr(DirToDictReader, "read_files_as_entries", staticmethod(record_and_read))
+
+    Packer.pack_dirs_into_dbs({tmp_path / "dir": tmp_path / "db"},
+                              PackOptions(streaming=True, memory_limit=memory_limit, jobs=jobs))
+
+    assert read_db(tmp_path / "db") == new_values
+
+    largest_entry_size = max(len(key) + len(json.dumps(value, separators=(",", ":")))
+                             for (key, value) in new_values.items())
+    assert len(batch_sizes) > 1
+    assert all(batch_size <= memory_limit // 2 + largest_entry_size for batch_size in batch_sizes)
+
+    if jobs == 1:
+        assert len(chunk_sizes) > 1
+        assert all(chunk_size <= memory_limit // 2 for chunk_size in chunk_sizes)
+
+
+def test_split_into_sized_chunks():
+    sized_items = [("a", 3), ("b", 3), ("c", 5), ("d", 20), ("e", 1), ("f", 1), ("g", 1)]
+
+    assert list(ChunkExecutor.split_into_sized_chunks(sized_items, 6)) == [["a", "b"], ["c"], ["d"], ["e", "f", "g"]]
+    assert list(ChunkExecutor.split_into_sized_chunks(sized_items, 6, chunk_size=2)) == [["a", "b"], ["c"], ["d"],
+                                                                                         ["e", "f"], ["g"]]
+
+
+def test_max_chunk_bytes():
+    assert ChunkExecutor().get_max_chunk_bytes(1000) == 1000
+
+    with ChunkExecutor(jobs=2) as chunk_executor:
+        # two chunks per process ahead of the one that is consumed
+        assert chunk_executor.get_max_chunk_bytes(1000) == 200
@@ -0,0 +1,84 @@
+# Checks that a streaming unpack writes the same files as a regular unpack, parses each entry only once and stops at
+# an invalid entry.
+#
+# Run with `python -m pytest test/test_streaming_unpack.py` after executing `source scripts/init_pythonpath.sh`
+
+import json
+from pathlib import Path
+
+import plyvel
+import pytest
+
+from fvttpacker.__common.json_codec import default_json_codec
+from fvttpacker.__unpacker.unpacker import Unpacker
+from fvttpacker.fvttpacker_exception import FvttPackerException
+from fvttpacker.unpack_options import UnpackOptions
+
+values = {f"!actors!{index:03}": {"name": f"Actor {index}", "items": [index, {"x": "é"}]} for index in range(50)}
+
+
+def write_db(path_to_db: Path, entries: dict) -> None:
+    db = plyvel.DB(str(path_to_db), create_if_missing=True)
+
+    for (key, value) in entries.items():
+        db.put(key.encode(), value.encode() if isinstance(value, str) else json.dumps(value).encode())
+
+    db.close()
+
+
+def read_dir(path_to_dir: Path) -> dict:
+    return {path.name: path.read_bytes() for path in path_to_dir.iterdir()}
+
+
+def unpack(tmp_path: Path, name: str, unpack_options: UnpackOptions) -> Path:
+    path_to_dir = tmp_path / name
+    path_to_dir.mkdir()
+    Unpacker.unpack_db_at_x_into_dir_at_y(tmp_path / "db", path_to_dir, unpack_options)
+
+    return path_to_dir
+
+
+@pytest.mark.parametrize("validate", [False, True])
+def test_same_files_as_regular_unpack(tmp_path: Path, validate: bool):
+    write_db(tmp_path / "db", values)
+
+    path_to_expected_dir = unpack(tmp_path, "expected", UnpackOptions())
+    path_to_streamed_dir = unpack(tmp_path, "streamed", UnpackOptions(streaming=True, validate=validate))
+
+    assert read_dir(path_to_streamed_dir) == read_dir(path_to_expected_dir)
+
+    # update the files in place
+    write_db(tmp_path / "db", {"!actors!001": {"name": "Changed"}})
+    Unpacker.unpack_db_at_x_into_dir_at_y(tmp_path / "db",
+                                          path_to_streamed_dir,
+                                          UnpackOptions(streaming=True, validate=validate))
+    Unpacker.unpack_db_at_x_into_dir_at_y(tmp_path / "db", path_to_expected_dir)
+
+    assert read_dir(path_to_streamed_dir) == read_dir(path_to_expected_dir)
+
+
+def test_each_entry_is_parsed_once(tmp_path: Path, monkeypatch):
+    write_db(tmp_path / "db", values)
+    indent = default_json_codec.indent
+    parsed_values = list()
+
+    def count_and_indent(value_str: str) -> str:
+        parsed_values.append(value_str)
+        return indent(value_str)
+
+    monkeypatch.setattr(default_json_codec, "indent", count_and_indent)
+    monkeypatch.setattr(default_json_codec, "loads", None)
+
+    unpack(tmp_path, "dir", UnpackOptions(streaming=True, validate=True))
+
+    assert len(parsed_values) == len(values)
+
+
+def test_invalid_entry_stops_the_unpack(tmp_path: Path):
+    write_db(tmp_path / "db", {**values, "!actors!025": '{"name": '})
+
+    with pytest.raises(FvttPackerException, match="!actors!025"):
+        unpack(tmp_path, "dir", UnpackOptions(streaming=True))
+
+    assert not (tmp_path / "dir" / "!actors!025.json").exists()
+    assert not (tmp_path / "dir" / "!actors!049.json").exists()
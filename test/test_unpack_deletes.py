@@ -0,0 +1,66 @@
+# Checks that an unpack only deletes the stale json files of the keys it selects, and leaves all other files in the
+# directory alone.
+#
+# Run with `python -m pytest test/test_unpack_deletes.py` after executing `source scripts/init_pythonpath.sh`
+
+import json
+from pathlib import Path
+
+import plyvel
+import pytest
+
+from fvttpacker.__unpacker.unpacker import Unpacker
+from fvttpacker.dir_layout import DirLayout, layout_flat, layout_hash
+from fvttpacker.key_filter import KeyFilter
+from fvttpacker.unpack_options import UnpackOptions
+
+values = {
+    "!actors!001": {"name": "Actor 1"},
+    "!actors!002": {"name": "Actor 2"},
+    "!items!001": {"name": "Item 1"}
+}
+
+
+def write_db(path_to_db: Path, entries: dict) -> None:
+    db = plyvel.DB(str(path_to_db), create_if_missing=True)
+
+    for (key, value) in entries.items():
+        db.put(key.encode(), json.dumps(value, separators=(",", ":")).encode())
+
+    db.close()
+
+
+@pytest.mark.parametrize("layout", [layout_flat, layout_hash])
+def test_only_stale_selected_files_are_deleted(tmp_path: Path, layout: str):
+    dir_layout = DirLayout(layout)
+    write_db(tmp_path / "db", values)
+    path_to_dir = tmp_path / "dir"
+    path_to_dir.mkdir()
+
+    # stale, because their keys are not in the LevelDB
+    path_to_stale_actor = dir_layout.get_path_to_file(path_to_dir, "!actors!003")
+    # not selected by the key filter
+    path_to_stale_item = dir_layout.get_path_to_file(path_to_dir, "!items!002")
+    for path_to_file in (path_to_stale_actor, path_to_stale_item):
+        path_to_file.parent.mkdir(parents=True, exist_ok=True)
+        path_to_file.write_text("{}")
+
+    # not json files
+    paths_to_other_files = [path_to_dir / "README.md",
+                            path_to_dir / "!actors!004.json.bak",
+                            path_to_stale_actor.with_name("notes.txt")]
+    for path_to_file in paths_to_other_files:
+        path_to_file.write_text("keep me")
+
+    Unpacker.unpack_db_at_x_into_dir_at_y(tmp_path / "db",
+                                          path_to_dir,
+                                          UnpackOptions(key_filter=KeyFilter(["!actors!"]), dir_layout=dir_layout))
+
+    assert not path_to_stale_actor.exists()
+    assert path_to_stale_item.read_text() == "{}"
+    for path_to_file in paths_to_other_files:
+        assert path_to_file.read_text() == "keep me"
+
+    assert dir_layout.get_path_to_file(path_to_dir, "!actors!001").is_file()
+    assert dir_layout.get_path_to_file(path_to_dir, "!actors!002").is_file()
+    assert not dir_layout.get_path_to_file(path_to_dir, "!items!001").exists()
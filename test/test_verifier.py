@@ -0,0 +1,81 @@
+# Checks that the verifier finds every kind of mismatch between LevelDBs and directories, and nothing else.
+#
+# Run with `python -m pytest test/test_verifier.py` after executing `source scripts/init_pythonpath.sh`
+
+import json
+from pathlib import Path
+
+import plyvel
+
+from fvttpacker.__verifier.verifier import Verifier
+from fvttpacker.key_filter import KeyFilter
+from fvttpacker.verify_options import VerifyOptions
+
+values = {f"!actors!{index:03}": {"name": f"Actor {index}", "hp": index} for index in range(100)}
+
+
+def write_db(path_to_db: Path, entries: dict) -> None:
+    db = plyvel.DB(str(path_to_db), create_if_missing=True)
+
+    for (key, value) in entries.items():
+        db.put(key.encode(), json.dumps(value, separators=(",", ":")).encode())
+
+    db.close()
+
+
+def write_dir(path_to_dir: Path, entries: dict, indent="  ") -> None:
+    path_to_dir.mkdir()
+
+    for (key, value) in entries.items():
+        path_to_dir.joinpath(f"{key}.json").write_text(json.dumps(value, indent=indent))
+
+
+def test_equal_db_and_dir(tmp_path: Path):
+    write_db(tmp_path / "db", values)
+    # formatted differently, but packed into the same values
+    write_dir(tmp_path / "dir", values, indent=4)
+
+    result = Verifier.verify_x_against_y(tmp_path / "db", tmp_path / "dir")
+
+    assert result.is_equal
+    assert result.nb_equal == len(values)
+
+
+def test_mismatches(tmp_path: Path):
+    changed_values = dict(values)
+    del changed_values["!actors!000"]
+    changed_values["!actors!050"] = {"name": "Changed", "hp": 50}
+    changed_values["!actors!new"] = {"name": "New"}
+
+    write_db(tmp_path / "a", values)
+    write_db(tmp_path / "b", changed_values)
+    write_dir(tmp_path / "dir", changed_values)
+
+    for path_b in [tmp_path / "b", tmp_path / "dir"]:
+        result = Verifier.verify_x_against_y(tmp_path / "a", path_b)
+
+        assert result.keys_only_in_a == ["!actors!000"]
+        assert result.keys_only_in_b == ["!actors!new"]
+        assert result.keys_with_different_values == ["!actors!050"]
+        assert result.nb_equal == len(values) - 2
+
+
+def test_key_filter_and_jobs(tmp_path: Path):
+    (tmp_path / "a").mkdir()
+    write_db(tmp_path / "a" / "actors", values)
+    (tmp_path / "b").mkdir()
+    write_dir(tmp_path / "b" / "actors", values)
+
+    verify_options = VerifyOptions(jobs=2, key_filter=KeyFilter(["!actors!00"]))
+    results = Verifier.verify_all_under_x_against_y(tmp_path / "a", tmp_path / "b", verify_options)
+
+    assert [(result.is_equal, result.nb_equal) for result in results] == [(True, 10)]
+
+
+def test_missing_side_is_empty(tmp_path: Path):
+    write_dir(tmp_path / "dir", values)
+
+    result = Verifier.verify_x_against_y(tmp_path / "dir", tmp_path / "missing")
+
+    assert len(result.keys_only_in_a) == len(values)
+    assert not result.is_equal
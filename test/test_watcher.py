@@ -0,0 +1,135 @@
+# Checks that watching a directory writes every change of its json files into the LevelDB, with both the inotify and
+# the polling change source.
+#
+# Run with `python -m pytest test/test_watcher.py` after executing `source scripts/init_pythonpath.sh`
+
+import json
+import queue
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from fvttpacker.__watcher.__change_sources import InotifyChangeSource
+from fvttpacker.__watcher.watcher import Watcher
+from fvttpacker.watch_options import WatchOptions
+
+values = {f"!actors!{index:03}": {"name": f"Actor {index}"} for index in range(3)}
+
+
+def write_file(path_to_dir: Path, key: str, text: str) -> None:
+    (path_to_dir / f"{key}.json").write_text(text)
+
+
+class WatchedDir:
+    """
+    Watches a directory in a thread and reports the entries of its LevelDB after every sync.
+    """
+
+    def __init__(self, tmp_path: Path, monkeypatch, use_polling: bool):
+        self.path_to_dir = tmp_path / "dir"
+        self.path_to_dir.mkdir()
+
+        for (key, value) in values.items():
+            write_file(self.path_to_dir, key, json.dumps(value, indent=2))
+
+        self.__states: queue.Queue = queue.Queue()
+        self.__is_watching = threading.Event()
+        self.__stop_event = threading.Event()
+        self.__error = None
+
+        sync_changes = Watcher._Watcher__sync_changes
+        wait_for_changes = Watcher._Watcher__wait_for_changes
+
+        def sync_and_report(changed_paths, input_dir_paths_to_dbs, *args):
+            sync_changes(changed_paths, input_dir_paths_to_dbs, *args)
+            # the LevelDB is locked by the watcher -> read it through its handle
+            self.__states.put({key.decode(): json.loads(value)
+                               for (key, value) in input_dir_paths_to_dbs[self.path_to_dir]})
+
+        def report_watching(*args):
+            self.__is_watching.set()
+            return wait_for_changes(*args)
+
+        monkeypatch.setattr(Watcher, "_Watcher__sync_changes", staticmethod(sync_and_report))
+        monkeypatch.setattr(Watcher, "_Watcher__wait_for_changes", staticmethod(report_watching))
+
+        watch_options = WatchOptions(debounce_seconds=0.05, poll_interval_seconds=0.05, use_polling=use_polling)
+        self.__thread = threading.Thread(target=self.__watch, args=(tmp_path / "db", watch_options))
+        self.__thread.start()
+
+        assert self.__is_watching.wait(timeout=10)
+
+    def __watch(self, path_to_db: Path, watch_options: WatchOptions) -> None:
+        try:
+            Watcher.watch_dirs_into_dbs({self.path_to_dir: path_to_db},
+                                        watch_options=watch_options,
+                                        stop_event=self.__stop_event)
+        except BaseException as err:
+            self.__error = err
+
+    def wait_for_state(self, expected_state: dict) -> None:
+        """
+        Fails if the LevelDB does not contain exactly the given entries (`expected_state`) after a sync within 10 s.
+        """
+
+        deadline = time.monotonic() + 10
+        state = None
+
+        while state != expected_state:
+            assert self.__error is None
+            state = self.__states.get(timeout=max(0.0, deadline - time.monotonic()))
+
+    def stop(self) -> None:
+        self.__stop_event.set()
+        self.__thread.join(timeout=10)
+        assert not self.__thread.is_alive()
+        assert self.__error is None
+
+
+@pytest.fixture(params=["polling", "inotify"])
+def watched_dir(request, tmp_path: Path, monkeypatch):
+    if request.param == "inotify" and not InotifyChangeSource.is_available():
+        pytest.skip("inotify is not available")
+
+    result = WatchedDir(tmp_path, monkeypatch, request.param == "polling")
+    yield result
+    result.stop()
+
+
+def test_edited_file(watched_dir: WatchedDir):
+    write_file(watched_dir.path_to_dir, "!actors!001", '{"name": "Edited"}')
+
+    watched_dir.wait_for_state({**values, "!actors!001": {"name": "Edited"}})
+
+
+def test_deleted_file(watched_dir: WatchedDir):
+    (watched_dir.path_to_dir / "!actors!001.json").unlink()
+
+    watched_dir.wait_for_state({key: value for (key, value) in values.items() if key != "!actors!001"})
+
+
+def test_invalid_file_is_skipped(watched_dir: WatchedDir):
+    write_file(watched_dir.path_to_dir, "!actors!005", '{"name": ')
+    write_file(watched_dir.path_to_dir, "!actors!001", '{"name": "Edited"}')
+
+    watched_dir.wait_for_state({**values, "!actors!001": {"name": "Edited"}})
+
+    # still watching
+    write_file(watched_dir.path_to_dir, "!actors!005", '{"name": "Fixed"}')
+
+    watched_dir.wait_for_state({**values, "!actors!001": {"name": "Edited"}, "!actors!005": {"name": "Fixed"}})
+
+
+def test_recreated_dir(watched_dir: WatchedDir):
+    shutil.rmtree(watched_dir.path_to_dir)
+    # give the watcher a chance to see the directory gone
+    time.sleep(0.2)
+
+    watched_dir.path_to_dir.mkdir()
+    write_file(watched_dir.path_to_dir, "!actors!000", '{"name": "Recreated"}')
+    write_file(watched_dir.path_to_dir, "!actors!002", json.dumps(values["!actors!002"]))
+
+    watched_dir.wait_for_state({"!actors!000": {"name": "Recreated"}, "!actors!002": values["!actors!002"]})